@@ -1,7 +1,9 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
 import pandas as pd
 import io
 
+from app.services import compare_engine
+
 router = APIRouter()
 
 # ---------------------------------------------------
@@ -42,7 +44,8 @@ def detect_columns(df: pd.DataFrame):
 @router.post("/compare-sooratvaziat/")
 async def compare_soorat_vaziat(
         previous_file: UploadFile = File(...),
-        current_file: UploadFile = File(...)
+        current_file: UploadFile = File(...),
+        align: str = Query("aggregate", pattern=f"^({'|'.join(compare_engine.ALIGN_MODES)})$")
 ):
     try:
         # ---- فایل قبلی ----
@@ -57,48 +60,21 @@ async def compare_soorat_vaziat(
         desc_prev, amount_prev = detect_columns(df_prev)
         desc_curr, amount_curr = detect_columns(df_current)
 
-        prev_dict = dict(zip(df_prev[desc_prev], df_prev[amount_prev]))
-        curr_dict = dict(zip(df_current[desc_curr], df_current[amount_curr]))
-
-        items = set(prev_dict.keys()) | set(curr_dict.keys())
-
-        results = []
-        total_prev = 0
-        total_curr = 0
-
-        for item in items:
-            old = prev_dict.get(item, 0)
-            new = curr_dict.get(item, 0)
-
-            total_prev += old
-            total_curr += new
-
-            diff = new - old
-
-            if diff > 0:
-                status = "افزایش"
-            elif diff < 0:
-                status = "کاهش"
-            else:
-                status = "بدون تغییر"
-
-            results.append({
-                "شرح کار": item,
-                "مبلغ قبلی": old,
-                "مبلغ جدید": new,
-                "تفاوت": diff,
-                "وضعیت": status
-            })
+        # ---- مقایسه (موتور مشترک؛ تکراری‌ها جمع زده یا با شماره‌ی تکرار جفت می‌شوند) ----
+        aligned = compare_engine.compare(
+            compare_engine.merge_keys(df_prev[desc_prev]), df_prev[desc_prev],
+            compare_engine.to_numbers(df_prev[amount_prev]),
+            compare_engine.merge_keys(df_current[desc_curr]), df_current[desc_curr],
+            compare_engine.to_numbers(df_current[amount_curr]),
+            mode=align,
+        )
+        results = compare_engine.display_rows(aligned)
 
         return {
-            "summary": {
-                "previous_sum": total_prev,
-                "current_sum": total_curr,
-                "difference": total_curr - total_prev,
-                "progress_percent": round(((total_curr - total_prev) / (total_prev or 1)) * 100, 2)
-            },
+            "summary": compare_engine.summarize(aligned),
             "items_compared": len(results),
-            "data": results
+            "alignment": aligned.attrs["alignment"],
+            "data": results.to_dict(orient="records")
         }
 
     except Exception as e:
@@ -1,20 +1,73 @@
 # main.py
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import Depends, FastAPI, UploadFile, File, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import pandas as pd
-import io
+import asyncio
+import hashlib
+import logging
 import os
-import traceback
+import tempfile
+import time
 from datetime import datetime
 import uvicorn
 import re
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+from concurrent.futures.process import BrokenProcessPool
 from difflib import get_close_matches
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.text_normalizer import normalize_text
+from app.services.chapters import MAX_DEPTH as MAX_ROLLUP_DEPTH, chapter_codes, rollup
+from app.models.project import Project
+from app.schemas.column_template import ColumnMapping, ColumnTemplateCreate, ColumnTemplateResponse
+from app.schemas.project import SnapshotResponse
+from app.services.column_templates import FIELDS, column_templates
+from app.services.compare_engine import (
+    ALIGN_MODES, CODE_KEY_PREFIX, EMPTY_KEY_PREFIX, MATCH_COL, MATCH_MODES, changes, code_first_keys, compact_text,
+    compare, code_keys, display_rows, match_strategy, merge_keys, summarize, to_float64, to_numbers,
+)
+from app.services.fuzzy_match import DEFAULT_THRESHOLD, MATCH_COLUMNS, reconcile
+from app.services.job_store import CLEANUP_INTERVAL_SECONDS, JobCancelled, job_store
+from app.services.memory_budget import MemoryMeter, checkpoint
+from app.services import memory_budget
+from app.services import metrics
+from app.services.metrics import TimingMiddleware, stage
+from app.services.multi_period import CHANGE_COL, TITLE_COL, align_periods, period_summaries, series_rows
+from app.services import report_export
+from app.services.result_writer import MEDIA_TYPES, OUTPUT_FORMATS, write_result
+from app.services.snapshot_store import SnapshotFrame, snapshot_store
+from app.services.statement_cache import file_digest, result_key, spool_upload, statement_cache
+from app.services.statement_reader import StatementReadError, read_statement, stream_size, workbook_sheets
+from app.services.worker_pool import BoundedPool, JobError, JobTimeout, PoolSaturated
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    """
+    شروع: جدول‌های snapshot، حذف دوره‌ای کارهای منقضی و ساخت processهای poolها؛
+    پایان: توقف حذف دوره‌ای و بستن poolها
+    """
+    snapshot_store.init_db()
+    cleanup = asyncio.create_task(_cleanup_expired_jobs())
+    try:
+        await _warm_pools()
+        yield
+    finally:
+        cleanup.cancel()
+        compare_pool.shutdown()
+        job_pool.shutdown()
 
 app = FastAPI(
     title="Metreyar API - مقایسه صورت وضعیت (هوشمند)",
     version="1.0.0",
-    description="مقایسه دو فایل صورت وضعیت عمرانی — تشخیص فازی ستون‌ها، محاسبه اتوماتیک مبلغ"
+    description="مقایسه دو فایل صورت وضعیت عمرانی — تشخیص فازی ستون‌ها، محاسبه اتوماتیک مبلغ",
+    lifespan=_lifespan,
 )
 
 # CORS (برای فرانت)
@@ -24,111 +77,151 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # فرانت (cross-origin) هدر Server-Timing را فقط وقتی expose شده باشد می‌خواند
+    expose_headers=["Server-Timing"],
 )
+# مدت درخواست‌ها و مراحل خط لوله: هدر Server-Timing و هیستوگرام‌های /metrics
+app.add_middleware(TimingMiddleware, app_name="compare")
 
 # ---------- تنظیمات ----------
 MAX_FILE_BYTES = 30 * 1024 * 1024  # 30 MB
+STREAM_CHUNK_BYTES = 64 * 1024
+MAX_PERIODS = 24                   # حداکثر تعداد صورت وضعیت در مقایسه‌ی چنددوره‌ای
 # --------------------------------
 
+# کلیدهای sort_by → ستون جدول خروجی؛ پیشوند "-" یعنی نزولی
+SORT_COLUMNS = {
+    "title": "شرح کار",
+    "previous": "مبلغ قبلی",
+    "current": "مبلغ جدید",
+    "difference": "تفاوت",
+    "status": "وضعیت",
+    "match": MATCH_COL,
+}
+MULTI_SORT_COLUMNS = {
+    "title": TITLE_COL,
+    "change": CHANGE_COL,
+}
+
+def _init_compare_worker():
+    # هر process تازه شمارنده‌های cache را از صفر شروع می‌کند (با fork کپی شمارنده‌های پروسه‌ی اصلی بودند)
+    statement_cache.take_counters()
+
+# خواندن و مقایسه‌ی فایل‌ها CPU-bound است و بیرون از event loop اجرا می‌شود
+compare_pool = BoundedPool(
+    workers=settings.COMPARE_WORKERS,
+    max_queue=settings.COMPARE_QUEUE_SIZE,
+    timeout=settings.COMPARE_JOB_TIMEOUT_SECONDS,
+    initializer=_init_compare_worker,
+)
+# کارهای پس‌زمینه (مقایسه‌ی غیرهم‌زمان، گزارش xlsx/pdf) طولانی‌ترند و pool جدا دارند تا جای مقایسه‌های هم‌زمان را نگیرند
+job_pool = BoundedPool(
+    workers=settings.JOB_WORKERS,
+    max_queue=settings.JOB_QUEUE_SIZE,
+    timeout=settings.JOB_TIMEOUT_SECONDS,
+    initializer=_init_compare_worker,
+)
+# taskهای پس‌زمینه؛ event loop فقط ارجاع ضعیف نگه می‌دارد
+_background_tasks = set()
+
+def _pool_gauges() -> dict:
+    values = {}
+    for name, pool in (("compare", compare_pool), ("jobs", job_pool)):
+        stats = pool.stats()
+        values[(name, "running")] = stats["running"]
+        values[(name, "queued")] = stats["queue_depth"]
+    return values
+
+metrics.registry.gauge("metreyar_pool_jobs", "کارهای در حال اجرا و منتظر در صف هر pool", ("pool", "state"), _pool_gauges)
+metrics.registry.gauge("metreyar_process_rss_megabytes", "RSS پروسه‌ی اصلی (مگابایت)", (),
+                       lambda: {(): memory_budget.rss_mb()})
+
 def _normalize_col_name(col: str) -> str:
-    s = str(col)
-    s = s.replace("‌", "")  # نیم فاصله
-    s = s.replace("_", " ")
-    s = re.sub(r"[^\w\s\u0600-\u06FF]", " ", s)  # حذف کاراکترهای عجیب (حفظ حروف فارسی)
-    s = s.strip().lower()
-    s = re.sub(r"\s+", " ", s)
-    return s
+    return normalize_text(col, underscore_as_space=True)
 
 def _normalize_text_for_key(s: str) -> str:
-    if pd.isna(s):
-        return ""
-    t = str(s)
-    t = t.replace("‌", "")  # نیم فاصله
-    t = t.lower().strip()
-    # حذف کاراکترهای غیر حرف/فاصله (اعداد را نگه نداریم یا کنار بگذاریم)
-    t = re.sub(r"[^\w\u0600-\u06FF\s]", " ", t)
-    t = re.sub(r"\s+", " ", t).strip()
-    return t
+    return normalize_text(s)
 
 def _to_number_series(ser: pd.Series) -> pd.Series:
-    """تبدیل ستون شامل عدد (ممکن است با ویرگول/کامای هزار جداکننده) به float/int"""
-    return pd.to_numeric(
-        ser.astype(str)
-           .str.replace(r"[,\s]", "", regex=True)
-           .str.replace("−", "-", regex=False)
-           .replace(["", "nan", "None"], "0"),
-        errors="coerce"
-    ).fillna(0)
-
-def _read_file_to_df(file: UploadFile) -> pd.DataFrame:
+    """تبدیل ستون شامل عدد (ممکن است با ویرگول/کامای هزار جداکننده یا ارقام فارسی) به float/int"""
+    return to_numbers(ser)
+
+def _check_upload_size(file: UploadFile) -> None:
     filename = file.filename or ""
-    ext = filename.lower().split(".")[-1] if "." in filename else ""
-    contents = file.file.read()
-    if not contents or len(contents) == 0:
+    size = stream_size(file.file)
+    if size == 0:
         raise HTTPException(status_code=400, detail=f"فایل {filename} خالی است.")
-    if len(contents) > MAX_FILE_BYTES:
+    if size > MAX_FILE_BYTES:
         raise HTTPException(status_code=400, detail=f"حجم فایل بیش از حد مجاز است ({MAX_FILE_BYTES} بایت).")
 
+def _read_file_to_df(file: UploadFile, sheet: Optional[str] = None) -> pd.DataFrame:
+    """
+    خواندن جریانی فایل آپلود شده (sheet: یک برگه‌ی فایل Excel، پیش‌فرض اولین برگه)؛ ستون‌ها روی
+    سرستون و چند سطر اول تشخیص داده می‌شوند و فقط ستون‌هایی که detect_columns_smart لازم دارد
+    در DataFrame ساخته می‌شوند.
+    """
+    filename = file.filename or ""
+    _check_upload_size(file)
+
+    col_map = {}
+
+    def _select(sample: pd.DataFrame):
+        with stage("detect"):
+            col_map.update(_resolve_columns(sample))
+        if col_map["amount"]:
+            # مقدار و فی فقط برای محاسبه‌ی مبلغ (وقتی ستون مبلغ نیست) لازم‌اند و اصلاً خوانده نمی‌شوند
+            col_map["qty"] = col_map["unit"] = None
+        return [c for c in col_map.values() if c]
+
     try:
-        if ext in ("csv",):
-            df = pd.read_csv(io.BytesIO(contents), encoding="utf-8", engine="python")
-        elif ext in ("xlsx", "xlsm", "xls"):
-            if ext in ("xlsx", "xlsm"):
-                # openpyxl معمولاً در requirements نصب می‌شود
-                df = pd.read_excel(io.BytesIO(contents), engine="openpyxl")
-            else:  # ext == 'xls'
-                try:
-                    df = pd.read_excel(io.BytesIO(contents), engine="xlrd")
-                except Exception:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="فایل .xls نیاز به نصب کتابخانه 'xlrd' دارد یا لطفاً آن را به .xlsx تبدیل کنید."
-                    )
-        else:
-            try:
-                df = pd.read_excel(io.BytesIO(contents))
-            except Exception:
-                raise HTTPException(status_code=400, detail=f"فرمت فایل {filename} پشتیبانی نمی‌شود.")
-    except HTTPException:
+        file.file.seek(0)
+        with stage("parse", nbytes=stream_size(file.file)) as parsed:
+            df = read_statement(file.file, filename, select_columns=_select, sheet=sheet)
+            parsed.rows = 0 if df is None else len(df)
+    except (HTTPException, JobError):
         raise
+    except StatementReadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"خطا در خواندن فایل {filename}: {str(e)}")
 
     if df is None or df.empty:
         raise HTTPException(status_code=400, detail=f"فایل {filename} داده‌ای ندارد یا ساختارش نامناسب است.")
     df.columns = [str(c).strip() for c in df.columns]
+    # نگاشت تشخیص داده‌شده همراه DataFrame می‌ماند تا detect_columns_smart دوباره تشخیص ندهد
+    df.attrs["column_map"] = col_map
     return df
 
-def detect_columns_smart(df: pd.DataFrame) -> dict:
-    """
-    تشخیص هوشمند ستون‌ها:
-      - description  : شرح/شرح کار/عنوان/آیتم
-      - amount       : مبلغ / جمع / total / price
-      - qty          : مقدار / تعداد / qty
-      - unit         : فی / نرخ / unit price
-    اگر amount پیدا نشد اما qty و unit_price هست: مبلغ محاسبه می‌شود.
-    """
-    col_map = {"description": None, "amount": None, "qty": None, "unit": None}
-    normalized = {_normalize_col_name(c): c for c in df.columns}
+# الگوهای نام ستون‌ها؛ برای هر فیلد یک regex از پیش کامپایل‌شده (به جای حلقه‌ی الگو × ستون)
+COLUMN_PATTERNS = {
+    "description": ["شرح", "عنوان", "آیتم", "شرح کار", "subject", "description", "item", "work", "شرح_عملیات"],
+    "amount": ["مبلغ", "جمع", "total", "amount", "price", "sum", "مبلغکل", "قیمت", "مبلغ_کل"],
+    "qty": ["مقدار", "تعداد", "qty", "quantity", "حجم", "مقدار_کار"],
+    "unit": ["فی", "نرخ", "unitprice", "unit price", "rate", "priceunit", "قیمت_واحد"],
+    # کد فهرست بها؛ «ردیف» تنها شماره‌ی سطر است و بین دوره‌ها جابه‌جا می‌شود، پس کد حساب نمی‌شود
+    "code": ["کد فهرست", "کد", "شماره فهرست", "ردیف فهرست", "code", "itemcode", "item code"],
+}
+# فیلدهایی که با شباهت تقریبی نام (مرحله‌ی ۲) تشخیص داده نمی‌شوند؛ کد اشتباه یعنی جفت اشتباه
+_EXACT_ONLY_FIELDS = ("code",)
+_COLUMN_PATTERN_RES = {
+    key: re.compile("|".join(re.escape(p) for p in pats)) for key, pats in COLUMN_PATTERNS.items()
+}
+_NON_NUMERIC_RE = re.compile(r"[^\d\.\,\-]")
 
-    patterns = {
-        "description": ["شرح", "عنوان", "آیتم", "شرح کار", "subject", "description", "item", "work", "شرح_عملیات"],
-        "amount": ["مبلغ", "جمع", "total", "amount", "price", "sum", "مبلغکل", "قیمت", "مبلغ_کل"],
-        "qty": ["مقدار", "تعداد", "qty", "quantity", "حجم", "مقدار_کار"],
-        "unit": ["فی", "نرخ", "unitprice", "unit price", "rate", "priceunit", "قیمت_واحد"]
-    }
+def _detect_columns(df: pd.DataFrame, normalized: dict) -> dict:
+    """مراحل تشخیص برای سرستون ناشناخته؛ normalized: نام نرمال‌شده → نام اصلی"""
+    col_map = dict.fromkeys(COLUMN_PATTERNS)
 
     # مرحله ۱: تطابق مستقیم روی نام‌های نرمال شده
     for norm_name, orig in normalized.items():
-        for key, pats in patterns.items():
-            if any(p in norm_name for p in pats):
-                if col_map[key] is None:
-                    col_map[key] = orig
+        for key, pattern_re in _COLUMN_PATTERN_RES.items():
+            if col_map[key] is None and pattern_re.search(norm_name):
+                col_map[key] = orig
 
     # مرحله ۲: fuzzy match برای نام‌های نزدیک
     names = list(normalized.keys())
-    for key, pats in patterns.items():
-        if col_map[key] is None:
+    for key, pats in COLUMN_PATTERNS.items():
+        if col_map[key] is None and key not in _EXACT_ONLY_FIELDS:
             for p in pats:
                 matches = get_close_matches(p, names, n=1, cutoff=0.6)
                 if matches:
@@ -139,14 +232,49 @@ def detect_columns_smart(df: pd.DataFrame) -> dict:
     if not col_map["description"]:
         for c in df.columns:
             sample = df[c].astype(str).head(10).str.strip()
-            non_numeric_count = sample.apply(lambda x: bool(re.search(r"[^\d\.\,\-]", x))).sum()
-            if non_numeric_count >= 1:
+            if sample.str.contains(_NON_NUMERIC_RE, na=False).any():
                 col_map["description"] = c
                 break
 
+    return col_map
+
+def _resolve_columns(df: pd.DataFrame) -> dict:
+    """
+    تشخیص هوشمند ستون‌ها (بدون تغییر DataFrame؛ روی نمونه‌ی چند سطری هم کار می‌کند):
+      - description  : شرح/شرح کار/عنوان/آیتم
+      - amount       : مبلغ / جمع / total / price
+      - qty          : مقدار / تعداد / qty
+      - unit         : فی / نرخ / unit price
+      - code         : کد فهرست بها (اختیاری؛ برای تطبیق کد-محور)
+    اگر اثرانگشت سرستون در رجیستری قالب‌ها باشد نگاشت ذخیره‌شده بدون تشخیص استفاده می‌شود؛
+    در غیر این صورت نتیجه‌ی تشخیص برای دفعه‌های بعد یاد گرفته می‌شود.
+    """
+    headers = [_normalize_col_name(c) for c in df.columns]
+    normalized = dict(zip(headers, df.columns))
+
+    known = column_templates.lookup(headers)
+    if known and known.get("description") in normalized:
+        return {k: normalized.get(known.get(k)) if known.get(k) else None for k in FIELDS}
+
+    col_map = _detect_columns(df, normalized)
     if not col_map["description"]:
         raise HTTPException(status_code=400, detail=f"ستون شرح/عنوان پیدا نشد. ستون‌ها: {list(df.columns)}")
 
+    column_templates.learn(headers, {k: _normalize_col_name(v) if v else None for k, v in col_map.items()})
+    return col_map
+
+def detect_columns_smart(df: pd.DataFrame) -> dict:
+    """
+    نگاشت ستون‌ها (description/amount/qty/unit)؛ اگر DataFrame از _read_file_to_df آمده باشد
+    نگاشتِ تشخیص داده‌شده هنگام خواندن استفاده می‌شود.
+    اگر amount پیدا نشد اما qty و unit_price هست: مبلغ محاسبه می‌شود.
+    """
+    known = df.attrs.get("column_map") or {}
+    if known.get("description") and all(c in df.columns for c in known.values() if c):
+        col_map = dict(known)
+    else:
+        col_map = _resolve_columns(df)
+
     # مرحله ۴: اگر amount نبود ولی qty و unit وجود داشت → محاسبه کن
     if not col_map["amount"]:
         if col_map["qty"] and col_map["unit"]:
@@ -160,134 +288,1151 @@ def detect_columns_smart(df: pd.DataFrame) -> dict:
     return col_map
 
 def build_merge_key_column(df: pd.DataFrame, desc_col: str, new_col_name: str = "__merge_key__") -> pd.Series:
-    """ایجاد ستون کلید ادغام بر پایه شرح (نرمال‌سازی)"""
-    keys = df[desc_col].astype(str).apply(_normalize_text_for_key)
-    keys = keys.fillna("").astype(str)
-    # اگر خالی بود، مقدار یکتا براش بساز
-    empty_mask = keys.str.strip() == ""
-    if empty_mask.any():
-        # برای یکتایی از ایندکس استفاده می‌کنیم
-        keys.loc[empty_mask] = keys.loc[empty_mask].index.map(lambda i: f"__empty__{i}")
-    df[new_col_name] = keys
+    """ایجاد ستون کلید ادغام بر پایه شرح (نرمال‌سازی برداری)"""
+    df[new_col_name] = merge_keys(df[desc_col])
     return df[new_col_name]
 
+def _load_statement(file: UploadFile, digest: str, sheet: Optional[str] = None) -> pd.DataFrame:
+    """
+    صورت وضعیت آماده‌ی مقایسه: ستون شرح، مبلغ عددی، کلید ادغام (__merge_key__) و اگر ستون
+    کد فهرست بها باشد کد نرمال‌شده (__code_key__) و کد کامل برای تشخیص فصل (__chapter__)؛ نگاشت ستون‌ها در attrs["column_map"].
+    sheet: فقط همین برگه‌ی فایل Excel. اگر همین محتوا قبلاً دیده شده از cache خوانده می‌شود.
+    """
+    if sheet is not None:
+        digest = f"{digest}-{hashlib.sha256(sheet.encode('utf-8')).hexdigest()[:16]}"
+    if settings.LOW_MEMORY_MODE:
+        # frame حالت کم‌حافظه (_compact_statement) ستون‌های دیگری دارد؛ ورودی cache جدا
+        digest = f"{digest}-compact"
+    cached = statement_cache.get_frame(digest)
+    if cached is not None:
+        return cached
+
+    df = _read_file_to_df(file, sheet)
+    checkpoint("read")
+    # مبلغ عددی، کلید ادغام از شرح نرمال‌شده و کد/فصل فهرست بها
+    with stage("normalize", rows=len(df)):
+        col_map = detect_columns_smart(df)
+        desc, amount, code = col_map["description"], col_map["amount"], col_map.get("code")
+        if settings.LOW_MEMORY_MODE:
+            df = _compact_statement(df, desc, amount, code)
+        else:
+            codes = code_keys(df[code]) if code else None
+            chapters = chapter_codes(df[code]) if code else None
+            df = df[list(dict.fromkeys((desc, amount)))].copy()
+            df[amount] = _to_number_series(df[amount])
+            # شرح با نوع‌های مختلف (عدد/متن) در parquet ذخیره نمی‌شود؛ نمایش و کلید هم از str استفاده می‌کنند
+            df[desc] = df[desc].where(df[desc].isna(), df[desc].astype(str))
+            build_merge_key_column(df, desc)
+            if codes is not None:
+                df["__code_key__"] = codes
+                df["__chapter__"] = chapters
+    df.attrs["column_map"] = col_map
+    checkpoint("prepare")
+    statement_cache.put_frame(digest, df)
+    return df
+
+def _compact_statement(raw: pd.DataFrame, desc: str, amount: str, code: Optional[str]) -> pd.DataFrame:
+    """
+    حالت کم‌حافظه‌ی _load_statement: فقط ستون‌های لازم، مستقیم از DataFrame خام و بدون کپی‌های
+    میانی copy/astype(str)/fillna؛ شرح فشرده (compact_text)، مبلغ مستقیم float64 و نرمال‌سازی
+    کلیدها بدون cache بین درخواست‌ها.
+    """
+    descriptions = compact_text(raw[desc])
+    columns = {desc: descriptions, amount: to_float64(raw[amount])}
+    columns["__merge_key__"] = merge_keys(descriptions, use_cache=False)
+    if code:
+        columns["__code_key__"] = code_keys(raw[code])
+        columns["__chapter__"] = chapter_codes(raw[code])
+    return pd.DataFrame(columns, copy=False)
+
+def _fuzzy_records(matches: pd.DataFrame, offset: int, limit: int) -> list:
+    page = matches.iloc[offset:offset + limit]
+    return [
+        {
+            "previous_key": p, "current_key": c, "score": float(sc),
+            "previous_title": "" if pd.isna(pt) else str(pt),
+            "current_title": "" if pd.isna(ct) else str(ct),
+        }
+        for p, c, sc, pt, ct in zip(page["previous_key"], page["current_key"], page["score"],
+                                    page["previous_title"], page["current_title"])
+    ]
+
+def _change_records(changes: pd.DataFrame, offset: int, limit: int) -> list:
+    page = changes.iloc[offset:offset + limit]
+    return [
+        {"key": str(k), "title": "" if pd.isna(t) else str(t), "amount": float(a)}
+        for k, t, a in zip(page["key"], page["title"], page["amount"])
+    ]
+
+def _build_comparison(
+    df_prev: pd.DataFrame,
+    df_curr: pd.DataFrame,
+    changes_offset: int,
+    changes_limit: int,
+    fuzzy: bool,
+    fuzzy_threshold: float,
+    align: str = "aggregate",
+    match: str = "auto",
+    rollup_depth: int = 0,
+) -> tuple:
+    """
+    مقایسه‌ی دو صورت وضعیت آماده (خروجی _load_statement).
+    match=auto: اگر هر دو فایل ستون کد فهرست بها دارند جفت کردن اول با کد و فقط برای سطرهای
+    بدون کد با شرح؛ match=text: فقط شرح.
+    rollup_depth>0: سرجمع فصل‌ها (۲: همراه زیرفصل‌ها) از پیشوند کد فهرست بها در meta["chapters"].
+    فایل چندبرگه‌ای (ستون __sheet__، خروجی _combine_sheets): ستون برگه در جدول نمایش و برگه‌های
+    خوانده‌شده و کنارگذاشته‌ی هر فایل در meta["sheets"].
+    خروجی: (meta، جدول نمایش)؛ meta همه‌ی کلیدهای پاسخ است به جز data.
+    """
+    prev_map = df_prev.attrs["column_map"]
+    curr_map = df_curr.attrs["column_map"]
+
+    prev_keys, curr_keys = df_prev["__merge_key__"], df_curr["__merge_key__"]
+    prev_coded = curr_coded = ()
+    by_code = match == "auto" and "__code_key__" in df_prev and "__code_key__" in df_curr
+    if by_code:
+        prev_keys, curr_keys = code_first_keys(df_prev["__code_key__"], prev_keys,
+                                               df_curr["__code_key__"], curr_keys)
+        prev_coded = df_prev["__code_key__"][df_prev["__code_key__"] != ""]
+        curr_coded = df_curr["__code_key__"][df_curr["__code_key__"] != ""]
+    prev_columns = (df_prev[prev_map["description"]], df_prev[prev_map["amount"]])
+    curr_columns = (curr_keys, df_curr[curr_map["description"]], df_curr[curr_map["amount"]])
+    groups = {}
+    if rollup_depth:
+        # فایل بدون ستون کد: همه‌ی آیتم‌هایش «بدون فصل»
+        groups = {
+            "prev_groups": df_prev["__chapter__"] if "__chapter__" in df_prev else pd.Series("", index=df_prev.index, dtype=object),
+            "curr_groups": df_curr["__chapter__"] if "__chapter__" in df_curr else pd.Series("", index=df_curr.index, dtype=object),
+        }
+    if "__sheet__" in df_prev or "__sheet__" in df_curr:
+        groups["prev_sheets"] = df_prev["__sheet__"] if "__sheet__" in df_prev else pd.Series("", index=df_prev.index, dtype=object)
+        groups["curr_sheets"] = df_curr["__sheet__"] if "__sheet__" in df_curr else pd.Series("", index=df_curr.index, dtype=object)
+    # آیتم‌های تکراری هر دوره جمع زده (یا با شماره‌ی تکرار جدا) و دو دوره روی کلید نرمال‌شده هم‌تراز می‌شوند
+    with stage("merge") as merged:
+        aligned = compare(prev_keys, *prev_columns, *curr_columns, mode=align, **groups)
+        merged.rows = len(aligned)
+
+    # تطبیق فازی (اختیاری) روی کلیدهایی که در ادغام دقیق جفت نشدند
+    fuzzy_df = pd.DataFrame(columns=MATCH_COLUMNS + ["previous_title", "current_title"])
+    if fuzzy:
+        # فقط رخداد اول هر کلید؛ کلیدی که رخداد اولش جفت نشده اصلاً در دوره‌ی دیگر نیست
+        first = aligned["occurrence"] == 1
+        unmatched_prev = aligned.index[first & (aligned["side"] == "left_only")]
+        unmatched_curr = aligned.index[first & (aligned["side"] == "right_only")]
+        # کلید کد با شباهت نوشتاری جفت نمی‌شود؛ کد متفاوت یعنی آیتم دیگری از فهرست بها
+        with stage("fuzzy", rows=len(unmatched_prev) + len(unmatched_curr)):
+            fuzzy_df = reconcile(
+                [k for k in unmatched_prev if not k.startswith((EMPTY_KEY_PREFIX, CODE_KEY_PREFIX))],
+                [k for k in unmatched_curr if not k.startswith((EMPTY_KEY_PREFIX, CODE_KEY_PREFIX))],
+                threshold=fuzzy_threshold,
+            )
+        # کلیدهای جفت‌نشده فقط در یک دوره‌اند، پس title همان شرح همان دوره است
+        fuzzy_df["previous_title"] = fuzzy_df["previous_key"].map(aligned["title"])
+        fuzzy_df["current_title"] = fuzzy_df["current_key"].map(aligned["title"])
+        if len(fuzzy_df):
+            # کلید قبلی جفت‌شده را به کلید جدید تغییر بده و دوباره هم‌تراز کن
+            remap = pd.Series(fuzzy_df["current_key"].values, index=fuzzy_df["previous_key"].values)
+            keys = prev_keys.astype(object)
+            prev_keys = keys.map(remap).fillna(keys)
+            with stage("merge"):
+                aligned = compare(prev_keys, *prev_columns, *curr_columns, mode=align, **groups)
+
+    with stage("summarize", rows=len(aligned)):
+        aligned["match"] = match_strategy(aligned, prev_coded, curr_coded, fuzzy_df["current_key"])
+        match_counts = aligned["match"].value_counts()
+        added_df = changes(aligned, "right_only")
+        removed_df = changes(aligned, "left_only")
+        display = display_rows(aligned)
+
+    result = {
+        "message": "success",
+        "summary": summarize(aligned),
+        "items_compared": int(len(aligned)),
+        "added_count": int(len(added_df)),
+        "removed_count": int(len(removed_df)),
+        "changes_offset": changes_offset,
+        "changes_limit": changes_limit,
+        "added_samples": _change_records(added_df, changes_offset, changes_limit),
+        "removed_samples": _change_records(removed_df, changes_offset, changes_limit),
+        "fuzzy_matched_count": int(len(fuzzy_df)),
+        "fuzzy_matches": _fuzzy_records(fuzzy_df, changes_offset, changes_limit),
+        "alignment": aligned.attrs["alignment"],
+        "match_strategy": "code" if by_code else "text",
+        "match_counts": {
+            "code": int(match_counts.get("کد", 0)),
+            "text": int(match_counts.get("شرح", 0)),
+            "fuzzy": int(match_counts.get("فازی", 0)),
+        },
+    }
+    if "sheets" in df_prev.attrs or "sheets" in df_curr.attrs:
+        result["sheets"] = {"previous": df_prev.attrs.get("sheets"), "current": df_curr.attrs.get("sheets")}
+    checkpoint("compare")
+    if rollup_depth:
+        result["rollup_depth"] = rollup_depth
+        with stage("rollup", rows=len(aligned)):
+            result["chapters"] = rollup(aligned, rollup_depth)
+
+    return result, display
+
+def _page_rows(display: pd.DataFrame, offset: int, limit, sort_by, columns: dict = SORT_COLUMNS) -> pd.DataFrame:
+    """مرتب‌سازی (اختیاری، پایدار) و برش صفحه‌ی درخواستی از جدول نمایش"""
+    if sort_by:
+        column = columns[sort_by.lstrip("-")]
+        display = display.sort_values(column, ascending=not sort_by.startswith("-"), kind="stable")
+    end = None if limit is None else offset + limit
+    return display.iloc[offset:end]
+
+def _load_upload(upload: tuple, sheet: Optional[str] = None) -> pd.DataFrame:
+    """_load_statement روی یک فایل spool‌شده (مسیر، نام فایل، hash)"""
+    path, filename, digest = upload
+    with open(path, "rb") as f:
+        return _load_statement(UploadFile(file=f, filename=filename), digest, sheet)
+
+def _upload_sheets(upload: tuple, sheets: Optional[List[str]] = None) -> list:
+    """
+    برگه‌هایی از فایل spool‌شده که خوانده می‌شوند: برگه‌های قابل مشاهده‌ی فایل Excel (یا فقط
+    برگه‌های sheets که در فایل هستند)؛ [None] برای CSV و فایل بدون فهرست برگه.
+    """
+    path, filename, _ = upload
+    with open(path, "rb") as f:
+        names = workbook_sheets(f, filename)
+    if sheets and names:
+        names = [n for n in names if n in sheets]
+        if not names:
+            raise HTTPException(status_code=400, detail=f"برگه‌های انتخاب‌شده ({'، '.join(sheets)}) در فایل {filename} نیستند.")
+    return names or [None]
+
+def _combine_sheets(names: list, parts: list) -> pd.DataFrame:
+    """
+    صورت وضعیت یک فایل از برگه‌های آماده‌شده‌اش؛ parts هم‌ترتیب names، برای هر برگه frame یا خطا.
+    برگه‌ای که جدول صورت وضعیت ندارد (خطای 400: خالی، بدون ستون شرح) کنار گذاشته می‌شود و اگر
+    هیچ برگه‌ای نماند خطای اولین برگه. ستون‌های شرح و مبلغ هم‌نام برگه‌ی اول می‌شوند، __sheet__ نام
+    برگه‌ی هر سطر است و کلید شرح‌های خالی با شماره‌ی سطر کل فایل دوباره ساخته می‌شود.
+    """
+    for part in parts:
+        if isinstance(part, BaseException) and (len(names) == 1 or getattr(part, "status_code", None) != 400):
+            raise part
+    if len(names) == 1:
+        return parts[0]
+    read = [(name, df) for name, df in zip(names, parts) if not isinstance(df, BaseException)]
+    if not read:
+        raise parts[0]
+
+    col_map = dict(read[0][1].attrs["column_map"])
+    desc, amount = col_map["description"], col_map["amount"]
+    coded = any("__code_key__" in df for _, df in read)
+    frames = []
+    for name, df in read:
+        sheet_map = df.attrs["column_map"]
+        columns = {desc: df[sheet_map["description"]], amount: df[sheet_map["amount"]], "__merge_key__": df["__merge_key__"]}
+        if coded:
+            for column in ("__code_key__", "__chapter__"):
+                columns[column] = df[column] if column in df else pd.Series("", index=df.index, dtype=object)
+        columns["__sheet__"] = pd.Series(name, index=df.index, dtype=object)
+        frames.append(pd.DataFrame(columns))
+    combined = pd.concat(frames, ignore_index=True)
+
+    keys = combined["__merge_key__"].astype(object)
+    empty = keys.str.startswith(EMPTY_KEY_PREFIX).to_numpy(dtype=bool)
+    if empty.any():
+        keys[empty] = EMPTY_KEY_PREFIX + combined.index[empty].astype(str)
+    combined["__merge_key__"] = keys
+    if settings.LOW_MEMORY_MODE:
+        # دسته‌های categorical برگه‌ها با هم فرق دارند و concat آن‌ها را object می‌کند
+        for column in (desc, "__merge_key__", "__sheet__"):
+            combined[column] = compact_text(combined[column])
+    combined.attrs["column_map"] = col_map
+    combined.attrs["sheets"] = {
+        "read": [name for name, _ in read],
+        "skipped": [name for name, df in zip(names, parts) if isinstance(df, BaseException)],
+    }
+    return combined
+
+def _load_statement_file(statement, sheets: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    صورت وضعیت آماده‌ی یک فایل spool‌شده با همه‌ی برگه‌هایش (پشت سر هم، داخل همین worker)؛
+    frame آماده (مثلاً خروجی _prepare_statements) همان‌طور برمی‌گردد و snapshot پروژه از فایلش خوانده می‌شود.
+    """
+    if isinstance(statement, pd.DataFrame):
+        return statement
+    if isinstance(statement, SnapshotFrame):
+        return statement.load()
+    names = _upload_sheets(statement, sheets)
+    parts = []
+    for name in names:
+        try:
+            parts.append(_load_upload(statement, name))
+        except (HTTPException, JobError) as e:
+            parts.append(e)
+    return _combine_sheets(names, parts)
+
+def _server_error(e: Exception, error=HTTPException):
+    """خطای پیش‌بینی‌نشده: لاگ کامل با traceback (deploy logs) و پاسخ ۵۰۰؛ error: HTTPException یا JobError داخل worker"""
+    logger.exception("خطای سرور")
+    return error(500, f"خطای سرور: {str(e)}")
+
+def _compare_uploads(prev: tuple, curr: tuple, options: dict) -> tuple:
+    """خواندن دو فایل spool‌شده (یا frame آماده) و _build_comparison روی آن‌ها؛ options["sheets"]: برگه‌های خوانده‌شده"""
+    options = dict(options)
+    sheets = options.pop("sheets", None)
+    return _build_comparison(_load_statement_file(prev, sheets), _load_statement_file(curr, sheets), **options)
+
+def _compare_job(prev_upload, curr_upload, options: dict, output: dict) -> dict:
+    """
+    اجرا داخل compare_pool: هر upload یک (مسیر فایل spool‌شده، نام فایل، hash)، frame آماده‌ی
+    _prepare_statements یا SnapshotFrame است؛ output["meta"] (اختیاری) به خلاصه‌ی پاسخ اضافه می‌شود.
+    بدنه‌ی پاسخ با قالب output["format"] دسته‌دسته در output["path"] نوشته می‌شود و
+    شمارنده‌های cache همین process برگردانده می‌شوند؛ خطاها به JobError تبدیل می‌شوند
+    تا از process برگردند.
+    """
+    try:
+        with MemoryMeter() as meter:
+            meta, display = _compare_uploads(prev_upload, curr_upload, options)
+            meta.update(offset=output["offset"], limit=output["limit"], sort_by=output["sort_by"])
+            meta.update(output.get("meta") or {})
+            rows = _page_rows(display, output["offset"], output["limit"], output["sort_by"])
+            meta["memory"] = meter.report()
+            with stage("serialize", rows=len(rows)) as written, open(output["path"], "wb") as fh:
+                write_result(fh, meta, rows, output["format"])
+                written.bytes = fh.tell()
+            return statement_cache.take_counters()
+    except JobError:
+        raise
+    except HTTPException as e:
+        raise JobError(e.status_code, e.detail)
+    except Exception as e:
+        raise _server_error(e, JobError)
+
+def _prepare_job(upload: tuple, sheet: Optional[str] = None) -> tuple:
+    """اجرا داخل compare_pool: خواندن و ستون‌یابی یک فایل spool‌شده (مسیر، نام فایل، hash) یا یک برگه‌اش"""
+    try:
+        with MemoryMeter():
+            return _load_upload(upload, sheet), statement_cache.take_counters()
+    except JobError:
+        raise
+    except HTTPException as e:
+        raise JobError(e.status_code, e.detail)
+    except Exception as e:
+        raise _server_error(e, JobError)
+
+def _multi_period_job(frames: list, filenames: list, output: dict, match: str = "auto") -> dict:
+    """اجرا داخل compare_pool: هم‌ترازی دوره‌ها و نوشتن سری زمانی در output["path"]"""
+    try:
+        with MemoryMeter() as meter:
+            with stage("merge") as merged:
+                amounts, titles = align_periods(frames, match)
+                periods = period_summaries(amounts, filenames)
+                merged.rows = len(amounts)
+            first, last = periods[0]["total"], periods[-1]["total"]
+            meta = {
+                "message": "success",
+                "periods_count": len(periods),
+                "summary": {
+                    "first_sum": first,
+                    "last_sum": last,
+                    "difference": last - first,
+                    "progress_percent": round((last - first) / first * 100, 2) if first != 0 else None,
+                },
+                "periods": periods,
+                "items_count": int(len(amounts)),
+                "match_strategy": amounts.attrs["match_strategy"],
+                "offset": output["offset"],
+                "limit": output["limit"],
+                "sort_by": output["sort_by"],
+            }
+            rows = _page_rows(series_rows(amounts, titles), output["offset"], output["limit"],
+                              output["sort_by"], MULTI_SORT_COLUMNS)
+            meta["memory"] = meter.report()
+            with stage("serialize", rows=len(rows)) as written, open(output["path"], "wb") as fh:
+                write_result(fh, meta, rows, output["format"])
+                written.bytes = fh.tell()
+            return statement_cache.take_counters()
+    except JobError:
+        raise
+    except Exception as e:
+        raise _server_error(e, JobError)
+
+def _comparison_job(job_id: str, uploads: list, options: dict) -> tuple:
+    """
+    اجرا داخل job_pool: همان خط لوله‌ی compare-sooratvaziat. meta و جدول نمایش کامل در پوشه‌ی
+    کار ذخیره می‌شوند و صفحه‌های نتیجه در GET از همان خوانده می‌شوند.
+    خروجی: (شمارنده‌های cache، خلاصه‌ی نتیجه، زمان مراحل)
+    """
+    try:
+        with MemoryMeter() as meter:
+            job_store.start(job_id)
+            stages = {}
+            read = job_store.reporter(job_id, "read", 0, 70)
+            options = dict(options)
+            sheets = options.pop("sheets", None)
+            t0 = time.perf_counter()
+            frames = []
+            for i, upload in enumerate(uploads):
+                read(i, len(uploads))
+                frames.append(_load_statement_file(upload, sheets))
+            stages["read"] = round(time.perf_counter() - t0, 3)
+
+            job_store.reporter(job_id, "compare", 70, 90)(0, 1)
+            t0 = time.perf_counter()
+            meta, display = _build_comparison(*frames, **options)
+            stages["compare"] = round(time.perf_counter() - t0, 3)
+
+            job_store.reporter(job_id, "store", 90, 100)(0, 1)
+            t0 = time.perf_counter()
+            with stage("store", rows=len(display)):
+                job_store.write_frame(job_id, "rows", display)
+                meta["memory"] = meter.report()
+                job_store.write_json(job_id, "meta", meta)
+            stages["store"] = round(time.perf_counter() - t0, 3)
+            result = {"rows": int(len(display)), "summary": meta["summary"], "memory": meta["memory"]}
+            return statement_cache.take_counters(), result, stages
+    except JobError:
+        raise
+    except JobCancelled:
+        raise JobError(409, "کار لغو شد.")
+    except HTTPException as e:
+        raise JobError(e.status_code, e.detail)
+    except Exception as e:
+        raise _server_error(e, JobError)
+
+def _export_job(job_id: str, uploads: list, options: dict, output: dict) -> tuple:
+    """
+    اجرا داخل job_pool: مقایسه (۲۰٪ اول پیشرفت) و نوشتن گزارش با قالب output["format"]
+    در پوشه‌ی کار (بقیه‌ی پیشرفت، به ازای سطرهای نوشته‌شده).
+    خروجی: (شمارنده‌های cache، مشخصات فایل، زمان مراحل)
+    """
+    path = job_store.path(job_id, f"metreyar-compare-{job_id[:8]}.{output['format']}")
+    try:
+        with MemoryMeter() as meter:
+            job_store.start(job_id)
+            job_store.reporter(job_id, "compare", 0, 20)(0, 1)
+            t0 = time.perf_counter()
+            meta, display = _compare_uploads(*uploads, options)
+            compared = time.perf_counter()
+            rows = _page_rows(display, output["offset"], output["limit"], output["sort_by"])
+            with stage("export", rows=len(rows)) as written:
+                report_export.write_report(path, meta, rows, output["format"],
+                                           progress=job_store.reporter(job_id, "write", 20, 100))
+                written.bytes = os.path.getsize(path)
+            stages = {"compare": round(compared - t0, 3), "write": round(time.perf_counter() - compared, 3)}
+            result = {
+                "rows": int(len(rows)),
+                "size_bytes": os.path.getsize(path),
+                "media_type": report_export.MEDIA_TYPES[output["format"]],
+                "filename": os.path.basename(path),
+                "memory": meter.report(),
+            }
+            return statement_cache.take_counters(), result, stages
+    except JobError:
+        raise
+    except JobCancelled:
+        raise JobError(409, "کار لغو شد.")
+    except HTTPException as e:
+        raise JobError(e.status_code, e.detail)
+    except Exception as e:
+        raise _server_error(e, JobError)
+
+async def _prepare_statements(uploads: list, sheets: Optional[List[str]] = None) -> list:
+    """
+    خواندن موازی چند فایل spool‌شده (مسیر، نام فایل، hash) در compare_pool: هر برگه‌ی هر فایل یک
+    کار جدا است و حداکثر به تعداد workerهای pool کار هم‌زمان فرستاده می‌شود (بقیه‌ی ظرفیت صف برای
+    درخواست‌های دیگر). خروجی: صورت وضعیت آماده‌ی هر فایل به همان ترتیب.
+    """
+    names = [await run_in_threadpool(_upload_sheets, upload, sheets) for upload in uploads]
+    tasks = [(upload, sheet) for upload, sheet_names in zip(uploads, names) for sheet in sheet_names]
+    slots = asyncio.Semaphore(compare_pool.slots)
+
+    async def prepare(upload: tuple, sheet: Optional[str]):
+        async with slots:
+            return await compare_pool.run(_prepare_job, upload, sheet)
+
+    # return_exceptions تا همه تمام شوند و بعد spoolها پاک شوند؛ خطای برگه‌ها در _combine_sheets بررسی می‌شود
+    prepared = await asyncio.gather(*(prepare(*task) for task in tasks), return_exceptions=True)
+    for item in prepared:
+        if isinstance(item, BaseException) and not isinstance(item, JobError):
+            raise item
+    parts = []
+    for item in prepared:
+        if isinstance(item, BaseException):
+            parts.append(item)
+            continue
+        df, counters = item
+        statement_cache.merge_counters(counters)
+        parts.append(df)
+    frames = []
+    for sheet_names in names:
+        frames.append(_combine_sheets(sheet_names, parts[:len(sheet_names)]))
+        parts = parts[len(sheet_names):]
+    return frames
+
+def _job_http_error(e: Exception, pool: BoundedPool = compare_pool) -> HTTPException:
+    """تبدیل خطاهای compare_pool (یا job_pool) به پاسخ HTTP"""
+    if isinstance(e, PoolSaturated):
+        return HTTPException(
+            status_code=503,
+            detail="سرور در حال پردازش مقایسه‌های دیگر است؛ لطفاً کمی بعد دوباره تلاش کنید.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    if isinstance(e, JobTimeout):
+        return HTTPException(
+            status_code=504,
+            detail=f"مقایسه در زمان مجاز ({pool.timeout:g} ثانیه) تمام نشد.",
+        )
+    if isinstance(e, JobError):
+        return HTTPException(status_code=e.status_code, detail=e.detail)
+    # BrokenProcessPool
+    return HTTPException(
+        status_code=503,
+        detail="پردازش مقایسه به‌طور غیرمنتظره متوقف شد (احتمالاً کمبود حافظه)؛ دوباره تلاش کنید.",
+        headers={"Retry-After": "1"},
+    )
+
+_JOB_ERRORS = (PoolSaturated, JobTimeout, JobError, BrokenProcessPool)
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+@contextmanager
+def _temp_files(*paths: str):
+    """
+    فایل‌های موقت یک درخواست (ورودی‌های spool‌شده، بدنه‌ی پاسخ): فهرستی که در پایان (موفق یا خطا)
+    همه‌ی مسیرهایش حذف می‌شوند؛ فایلی که به پاسخ stream سپرده می‌شود از فهرست برداشته می‌شود.
+    """
+    temp = list(paths)
+    try:
+        yield temp
+    finally:
+        for path in temp:
+            _remove_file(path)
+
+SHEETS_QUERY = Query(None, alias="sheet",
+                     description="فقط این برگه‌های فایل Excel (قابل تکرار؛ پیش‌فرض: همه‌ی برگه‌های قابل مشاهده)")
+
+@dataclass
+class MatchParams:
+    """پارامترهای جفت کردن آیتم‌های دو دوره (query)؛ مشترک بین مقایسه، کار مقایسه و export"""
+    fuzzy: bool = Query(False, description="تطبیق فازی شرح‌هایی که دقیقاً یکی نیستند")
+    fuzzy_threshold: float = Query(DEFAULT_THRESHOLD, ge=0.3, le=1.0, description="حداقل شباهت برای تطبیق فازی")
+    align: str = Query("aggregate", pattern=f"^({'|'.join(ALIGN_MODES)})$",
+                       description="شرح‌های تکراری: aggregate جمع مبالغ هر کلید؛ ordinal جفت کردن n-امین تکرار دو دوره")
+    match: str = Query("auto", pattern=f"^({'|'.join(MATCH_MODES)})$",
+                       description="auto: جفت کردن با کد فهرست بها (اگر هر دو فایل دارند) و بعد شرح؛ text: فقط شرح")
+    sheets: Optional[List[str]] = SHEETS_QUERY
+
+    def options(self) -> dict:
+        """پارامترهای _compare_uploads (_build_comparison به‌اضافه‌ی sheets)"""
+        return asdict(self)
+
+@dataclass
+class ComparisonParams(MatchParams):
+    changes_offset: int = Query(0, ge=0, description="شروع صفحه‌ی آیتم‌های اضافه/حذف شده")
+    changes_limit: int = Query(50, ge=0, description="تعداد آیتم‌های اضافه/حذف شده در هر صفحه")
+    rollup_depth: int = Query(0, ge=0, le=MAX_ROLLUP_DEPTH,
+                              description="سرجمع فصل‌ها از پیشوند کد فهرست بها: ۰ بدون سرجمع، ۱ فصل، ۲ فصل و زیرفصل")
+
+@dataclass
+class RowWindow:
+    """بازه و ترتیب سطرهای data (query)"""
+    offset: int = Query(0, ge=0, description="شروع صفحه‌ی سطرهای data")
+    limit: Optional[int] = Query(None, ge=0, description="تعداد سطرهای data (پیش‌فرض: همه)")
+    sort_by: Optional[str] = Query(None, pattern=f"^-?({'|'.join(SORT_COLUMNS)})$",
+                                   description="مرتب‌سازی data؛ پیشوند - برای نزولی، مثلاً -difference")
+
+@dataclass
+class ResultPage(RowWindow):
+    """صفحه‌ی پاسخ مقایسه: بازه‌ی سطرها و قالب خروجی (query)"""
+    output_format: str = Query("json", alias="format", pattern=f"^({'|'.join(OUTPUT_FORMATS)})$",
+                               description="json: یک سند JSON؛ ndjson: خط اول خلاصه، سپس هر سطر در یک خط")
+    include_items: bool = Query(True, description="false: بدون سطرهای data (فقط خلاصه و سرجمع فصل‌ها، برای داشبورد)")
+
+    def output(self) -> dict:
+        """پارامترهای نوشتن پاسخ (write_result)"""
+        return dict(format=self.output_format, offset=self.offset,
+                    limit=self.limit if self.include_items else 0, sort_by=self.sort_by)
+
+@dataclass
+class JobResultPage(ResultPage):
+    limit: Optional[int] = Query(1000, ge=0, description="تعداد سطرهای data در هر صفحه")
+
+def _stream_body(fh, media_type: str, cache_status: Optional[str], remove_path: Optional[str] = None,
+                 filename: Optional[str] = None) -> StreamingResponse:
+    """
+    ارسال تکه‌تکه‌ی فایل بدنه‌ی پاسخ؛ فایل بعد از ارسال (یا قطع اتصال) بسته و در صورت نیاز حذف می‌شود.
+    filename: ارسال به‌صورت فایل قابل دانلود (Content-Disposition)
+    """
+    size = os.fstat(fh.fileno()).st_size
+    headers = {"Content-Length": str(size)}
+    if cache_status:
+        headers["X-Cache"] = cache_status
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    def _chunks():
+        try:
+            for chunk in iter(lambda: fh.read(STREAM_CHUNK_BYTES), b""):
+                yield chunk
+        finally:
+            fh.close()
+            if remove_path:
+                _remove_file(remove_path)
+
+    return StreamingResponse(_chunks(), media_type=media_type, headers=headers)
+
 @app.post("/api/v1/compare-sooratvaziat/")
 async def compare_sooratvaziat(
     previous_file: UploadFile = File(..., description="صورت وضعیت دوره قبل"),
-    current_file: UploadFile = File(..., description="صورت وضعیت دوره جدید")
+    current_file: UploadFile = File(..., description="صورت وضعیت دوره جدید"),
+    params: ComparisonParams = Depends(),
+    page: ResultPage = Depends(),
+):
+    """
+    مقایسه‌ی دو صورت وضعیت. فایل Excel چندبرگه‌ای (مثلاً هر فصل در یک برگه) با همه‌ی برگه‌هایش
+    خوانده می‌شود و ستون «برگه» به جدول اضافه می‌شود؛ برگه‌ی بدون جدول صورت وضعیت کنار گذاشته می‌شود.
+    """
+    options, output = params.options(), page.output()
+    sheets = params.sheets
+    media_type = MEDIA_TYPES[page.output_format]
+    with _temp_files() as temp:
+        try:
+            # کلید cache: hash محتوای دو فایل + پارامترهایی که روی خروجی اثر دارند
+            _check_upload_size(previous_file)
+            _check_upload_size(current_file)
+            with stage("digest", nbytes=stream_size(previous_file.file) + stream_size(current_file.file)):
+                prev_digest = await run_in_threadpool(file_digest, previous_file.file)
+                curr_digest = await run_in_threadpool(file_digest, current_file.file)
+            cache_key = result_key(prev_digest, curr_digest, **options, **output)
+            with stage("cache"):
+                cached = await run_in_threadpool(statement_cache.open_result, cache_key)
+            if cached is not None:
+                return _stream_body(cached, media_type, "HIT")
+
+            # فایل‌ها روی دیسک نوشته می‌شوند تا worker با مسیرشان کار کند (نه با کپی بایت‌ها)
+            with stage("spool"):
+                for upload in (previous_file, current_file):
+                    temp.append(await run_in_threadpool(spool_upload, upload.file))
+            statements = [
+                (temp[0], previous_file.filename or "", prev_digest),
+                (temp[1], current_file.filename or "", curr_digest),
+            ]
+            if compare_pool.slots > 1:
+                # دو فایل (و برگه‌هایشان) موازی در workerهای جدا خوانده می‌شوند؛ با یک worker خواندن
+                # داخل همان کار مقایسه می‌ماند تا frameها بی‌دلیل بین processها جابه‌جا نشوند
+                statements = await _prepare_statements(statements, sheets)
+            body_path = statement_cache.result_tmp_path()
+            temp.append(body_path)
+            cache_counters = await compare_pool.run(_compare_job, *statements, options, dict(output, path=body_path))
+            statement_cache.merge_counters(cache_counters)
+
+            # فایل قبل از انتقال به cache باز می‌شود؛ حذف بعدی ورودی (LRU) روی stream اثری ندارد
+            fh = open(body_path, "rb")
+            statement_cache.put_result_file(cache_key, body_path)
+            temp.remove(body_path)   # _stream_body بعد از ارسال حذفش می‌کند
+            return _stream_body(fh, media_type, "MISS", remove_path=body_path)
+
+        except HTTPException:
+            raise
+        except _JOB_ERRORS as e:
+            raise _job_http_error(e)
+        except Exception as e:
+            raise _server_error(e)
+
+@app.post("/api/v1/compare-sooratvaziat/multi/")
+async def compare_sooratvaziat_multi(
+    files: List[UploadFile] = File(..., description="صورت وضعیت‌ها به ترتیب دوره (قدیمی‌ترین اول)"),
+    output_format: str = Query("json", alias="format", pattern=f"^({'|'.join(OUTPUT_FORMATS)})$",
+                               description="json: یک سند JSON؛ ndjson: خط اول خلاصه، سپس هر آیتم در یک خط"),
+    offset: int = Query(0, ge=0, description="شروع صفحه‌ی آیتم‌ها"),
+    limit: Optional[int] = Query(None, ge=0, description="تعداد آیتم‌ها (پیش‌فرض: همه)"),
+    sort_by: Optional[str] = Query(None, pattern=f"^-?({'|'.join(MULTI_SORT_COLUMNS)})$",
+                                   description="مرتب‌سازی آیتم‌ها؛ پیشوند - برای نزولی، مثلاً -change"),
+    match: str = Query("auto", pattern=f"^({'|'.join(MATCH_MODES)})$",
+                       description="auto: جفت کردن با کد فهرست بها (اگر همه‌ی فایل‌ها دارند) و بعد شرح؛ text: فقط شرح"),
+    sheets: Optional[List[str]] = SHEETS_QUERY,
 ):
+    """
+    مقایسه‌ی چند دوره در یک درخواست: هر فایل یک بار (و موازی) خوانده می‌شود، همه‌ی دوره‌ها
+    با یک join چندطرفه روی کلید ادغام هم‌تراز می‌شوند و برای هر آیتم سری مبالغ دوره‌ها،
+    و برای هر دوره جمع و تغییر نسبت به دوره‌ی قبل برگردانده می‌شود.
+    """
+    if len(files) < 2:
+        raise HTTPException(status_code=400, detail="حداقل دو صورت وضعیت لازم است.")
+    if len(files) > MAX_PERIODS:
+        raise HTTPException(status_code=400, detail=f"حداکثر {MAX_PERIODS} صورت وضعیت در هر درخواست مجاز است.")
+
+    output = dict(format=output_format, offset=offset, limit=limit, sort_by=sort_by)
+    media_type = MEDIA_TYPES[output_format]
+    filenames = [f.filename or "" for f in files]
+    with _temp_files() as temp:
+        try:
+            for f in files:
+                _check_upload_size(f)
+            with stage("digest", nbytes=sum(stream_size(f.file) for f in files)):
+                digests = [await run_in_threadpool(file_digest, f.file) for f in files]
+            cache_key = result_key(*digests, kind="multi-period", sheets=sheets, match=match, **output)
+            with stage("cache"):
+                cached = await run_in_threadpool(statement_cache.open_result, cache_key)
+            if cached is not None:
+                return _stream_body(cached, media_type, "HIT")
+
+            with stage("spool"):
+                for f in files:
+                    temp.append(await run_in_threadpool(spool_upload, f.file))
+            # همه‌ی فایل‌ها (و برگه‌هایشان) موازی در pool خوانده می‌شوند
+            frames = await _prepare_statements(list(zip(temp, filenames, digests)), sheets)
+
+            body_path = statement_cache.result_tmp_path()
+            temp.append(body_path)
+            counters = await compare_pool.run(_multi_period_job, frames, filenames, dict(output, path=body_path),
+                                              match)
+            statement_cache.merge_counters(counters)
+
+            fh = open(body_path, "rb")
+            statement_cache.put_result_file(cache_key, body_path)
+            temp.remove(body_path)   # _stream_body بعد از ارسال حذفش می‌کند
+            return _stream_body(fh, media_type, "MISS", remove_path=body_path)
+
+        except HTTPException:
+            raise
+        except _JOB_ERRORS as e:
+            raise _job_http_error(e)
+        except Exception as e:
+            raise _server_error(e)
+
+def _job_response(state: dict, **urls: str) -> dict:
+    """وضعیت قابل نمایش کار پس‌زمینه (بدون مسیرهای داخلی) به همراه آدرس‌های پیگیری"""
+    return {
+        "job_id": state["id"],
+        "kind": state["kind"],
+        "status": state["status"],
+        "progress": state["progress"],
+        "timing": state["timing"],
+        "created_at": state["created_at"],
+        "updated_at": state["updated_at"],
+        "expires_at": state["expires_at"],
+        "params": state["params"],
+        "result": state["result"],
+        "error": state["error"],
+        **urls,
+    }
+
+def _get_job(job_id: str, kind: str) -> dict:
+    state = job_store.get(job_id)
+    if state is None or state["kind"] != kind:
+        raise HTTPException(status_code=404, detail="کار پیدا نشد (یا منقضی شده است).")
+    return state
+
+def _finished_job(job_id: str, kind: str) -> dict:
+    """وضعیت کار تمام‌شده؛ کار ناموفق با همان خطای خودش و کار نیمه‌تمام با 409"""
+    state = _get_job(job_id, kind)
+    if state["status"] == "failed":
+        raise HTTPException(status_code=state["error"]["status_code"], detail=state["error"]["detail"])
+    if state["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"نتیجه هنوز آماده نیست (وضعیت: {state['status']}).")
+    return state
+
+async def _run_job(job_id: str, pending, spooled: list) -> None:
+    """انتظار برای کار در job_pool و ثبت نتیجه یا خطا در وضعیت کار؛ ورودی‌های spool‌شده بعد از کار حذف می‌شوند"""
+    with _temp_files(*spooled):
+        try:
+            try:
+                counters, result, stages = await pending
+                statement_cache.merge_counters(counters)
+                job_store.finish(job_id, result, stages)
+            except Exception as e:
+                if isinstance(e, _JOB_ERRORS):
+                    err = _job_http_error(e, job_pool)
+                else:
+                    err = _server_error(e)
+                job_store.fail(job_id, err.status_code, err.detail)
+            except asyncio.CancelledError:
+                # توقف سرور؛ کارِ pool هم لغو می‌شود و وضعیت نباید تا پایان ttl «running» بماند
+                job_store.fail(job_id, 503, "سرور در حین اجرای کار متوقف شد؛ دوباره تلاش کنید.")
+                raise
+        except JobCancelled:
+            # کار در این فاصله حذف شده (DELETE)
+            return
+
+async def _start_job(kind: str, files: List[UploadFile], params: dict, fn, *args) -> str:
+    """
+    ثبت کار پس‌زمینه: فایل‌ها در پوشه‌ی کار spool و کار همین حالا در صف job_pool پذیرفته
+    (یا با PoolSaturated رد و پاک) می‌شود. fn(job_id, uploads, *args) در worker اجرا می‌شود؛
+    uploads برای هر فایل (مسیر، نام فایل، hash) است. خروجی: شناسه‌ی کار
+    """
+    for f in files:
+        _check_upload_size(f)
+    digests = [await run_in_threadpool(file_digest, f.file) for f in files]
+    filenames = [f.filename or "" for f in files]
+    job_id = job_store.create(kind, filenames=filenames, **params)["id"]
+    started = False
     try:
-        # خواندن فایل‌ها
-        df_prev = _read_file_to_df(previous_file)
-        df_curr = _read_file_to_df(current_file)
-
-        # تشخیص ستون‌ها بصورت هوشمند
-        prev_map = detect_columns_smart(df_prev)
-        curr_map = detect_columns_smart(df_curr)
-
-        prev_desc = prev_map["description"]
-        prev_amount = prev_map["amount"]
-        curr_desc = curr_map["description"]
-        curr_amount = curr_map["amount"]
-
-        # تبدیل مقادیر مبلغ به عدد
-        df_prev[prev_amount] = _to_number_series(df_prev[prev_amount])
-        df_curr[curr_amount] = _to_number_series(df_curr[curr_amount])
-
-        # مجموع‌ها
-        total_prev = float(df_prev[prev_amount].sum())
-        total_curr = float(df_curr[curr_amount].sum())
-        diff = total_curr - total_prev
-        percent = round((diff / total_prev * 100), 2) if total_prev != 0 else None
-
-        # ساخت کلید ادغام نرمال‌شده
-        build_merge_key_column(df_prev, prev_desc, "__key_prev__")
-        build_merge_key_column(df_curr, curr_desc, "__key_curr__")
-
-        # ادغام بر اساس کلیدهای نرمال‌شده
-        merged = pd.merge(
-            df_prev[[prev_desc, prev_amount, "__key_prev__"]],
-            df_curr[[curr_desc, curr_amount, "__key_curr__"]],
-            how="outer",
-            left_on="__key_prev__",
-            right_on="__key_curr__",
-            suffixes=("_prev", "_curr")
-        ).fillna(0)
-
-        # کشف نام‌های واقعی ستون مبلغ در جدول merged
-        prev_amount_col = prev_amount + "_prev" if (prev_amount + "_prev") in merged.columns else prev_amount
-        curr_amount_col = curr_amount + "_curr" if (curr_amount + "_curr") in merged.columns else curr_amount
-
-        # محاسبه تفاوت و وضعیت
-        merged["تفاوت"] = merged[curr_amount_col].astype(float) - merged[prev_amount_col].astype(float)
-        merged["وضعیت"] = merged["تفاوت"].apply(lambda x: "افزایش" if x > 0 else ("کاهش" if x < 0 else "بدون تغییر"))
-
-        # انتخاب شرح نهایی برای نمایش (ترجیح شرح دوره جدید)
-        if curr_desc in merged.columns:
-            merged["شرح_نهایی"] = merged[curr_desc].replace({0: ""}).astype(str)
-        elif prev_desc in merged.columns:
-            merged["شرح_نهایی"] = merged[prev_desc].replace({0: ""}).astype(str)
-        else:
-            merged["شرح_نهایی"] = merged.get("__key_prev__", merged.get("__key_curr__", "")).astype(str)
-
-        # نمایش مرتب‌شده
-        merged_display = merged[["شرح_نهایی", prev_amount_col, curr_amount_col, "تفاوت", "وضعیت"]].copy()
-        merged_display = merged_display.rename(columns={
-            "شرح_نهایی": "شرح کار",
-            prev_amount_col: "مبلغ قبلی",
-            curr_amount_col: "مبلغ جدید"
-        })
-
-        # پیدا کردن آیتم‌های اضافه/حذف
-        prev_keys = set(df_prev["__key_prev__"].astype(str).unique())
-        curr_keys = set(df_curr["__key_curr__"].astype(str).unique())
-        added_keys = sorted(list(curr_keys - prev_keys))
-        removed_keys = sorted(list(prev_keys - curr_keys))
-
-        added = []
-        removed = []
-        for k in added_keys[:50]:
-            row = df_curr[df_curr["__key_curr__"] == k]
-            if not row.empty:
-                added.append({
-                    "key": k,
-                    "title": str(row[curr_desc].astype(str).iloc[0]),
-                    "amount": float(_to_number_series(row[curr_amount]).iloc[0])
-                })
-        for k in removed_keys[:50]:
-            row = df_prev[df_prev["__key_prev__"] == k]
-            if not row.empty:
-                removed.append({
-                    "key": k,
-                    "title": str(row[prev_desc].astype(str).iloc[0]),
-                    "amount": float(_to_number_series(row[prev_amount]).iloc[0])
-                })
-
-        result = {
-            "message": "success",
-            "summary": {
-                "previous_sum": total_prev,
-                "current_sum": total_curr,
-                "difference": diff,
-                "progress_percent": percent
-            },
-            "items_compared": int(len(merged_display)),
-            "added_count": len(added_keys),
-            "removed_count": len(removed_keys),
-            "added_samples": added,
-            "removed_samples": removed,
-            "data": merged_display.fillna("").to_dict(orient="records")
-        }
+        uploads = []
+        for f, name, digest in zip(files, filenames, digests):
+            path = await run_in_threadpool(spool_upload, f.file, "", job_store.path(job_id, ""))
+            uploads.append((path, name, digest))
+        pending = job_pool.submit(fn, job_id, uploads, *args)
+        task = asyncio.create_task(_run_job(job_id, pending, [u[0] for u in uploads]))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        started = True
+        return job_id
+    finally:
+        if not started:
+            job_store.delete(job_id)
+
+def _write_job_page(job_id: str, output: dict) -> None:
+    """صفحه‌ی درخواستی نتیجه‌ی کار مقایسه در output["path"] (اجرا در threadpool)"""
+    meta = job_store.read_json(job_id, "meta")
+    display = job_store.read_frame(job_id, "rows")
+    end = None if output["limit"] is None else output["offset"] + output["limit"]
+    meta.update(
+        offset=output["offset"], limit=output["limit"], sort_by=output["sort_by"],
+        next_offset=end if end is not None and end < len(display) else None,
+    )
+    rows = _page_rows(display, output["offset"], output["limit"], output["sort_by"])
+    with open(output["path"], "wb") as fh:
+        write_result(fh, meta, rows, output["format"])
+
+@app.post("/api/v1/compare-sooratvaziat/jobs", status_code=202)
+async def create_comparison_job(
+    request: Request,
+    previous_file: UploadFile = File(..., description="صورت وضعیت دوره قبل"),
+    current_file: UploadFile = File(..., description="صورت وضعیت دوره جدید"),
+    params: ComparisonParams = Depends(),
+):
+    """
+    نسخه‌ی غیرهم‌زمان compare-sooratvaziat برای فایل‌های بزرگ (فراتر از timeout درخواست).
+    پاسخ فوری (202) شناسه‌ی کار است؛ وضعیت و زمان‌ها با GET .../jobs/{job_id} و نتیجه
+    (صفحه‌به‌صفحه، با همان شکل پاسخ compare-sooratvaziat) با GET .../jobs/{job_id}/result.
+    """
+    options = params.options()
+    try:
+        job_id = await _start_job("compare", [previous_file, current_file], options, _comparison_job, options)
+        return _comparison_job_response(job_store.get(job_id), request)
+    except HTTPException:
+        raise
+    except _JOB_ERRORS as e:
+        raise _job_http_error(e, job_pool)
+    except Exception as e:
+        raise _server_error(e)
+
+def _comparison_job_response(state: dict, request: Request) -> dict:
+    job_id = state["id"]
+    return _job_response(
+        state,
+        status_url=str(request.url_for("get_comparison_job", job_id=job_id)),
+        result_url=str(request.url_for("get_comparison_job_result", job_id=job_id)),
+    )
+
+@app.get("/api/v1/compare-sooratvaziat/jobs/{job_id}")
+async def get_comparison_job(job_id: str, request: Request):
+    """وضعیت کار مقایسه: queued/running/done/failed، مرحله و درصد پیشرفت، زمان انتظار و اجرا و زمان هر مرحله"""
+    return _comparison_job_response(_get_job(job_id, "compare"), request)
+
+@app.get("/api/v1/compare-sooratvaziat/jobs/{job_id}/result")
+async def get_comparison_job_result(
+    job_id: str,
+    page: JobResultPage = Depends(),
+):
+    """یک صفحه از نتیجه با همان شکل پاسخ compare-sooratvaziat؛ next_offset شروع صفحه‌ی بعد است (یا null)"""
+    _finished_job(job_id, "compare")
+    fd, body_path = tempfile.mkstemp(prefix="page-", suffix=".tmp", dir=job_store.path(job_id, ""))
+    os.close(fd)
+    with _temp_files(body_path) as temp:
+        try:
+            await run_in_threadpool(_write_job_page, job_id, dict(page.output(), path=body_path))
+            fh = open(body_path, "rb")
+        except OSError:
+            raise HTTPException(status_code=404, detail="نتیجه‌ی کار پیدا نشد (یا منقضی شده است).")
+        temp.remove(body_path)
+    # فایل صفحه بعد از ارسال حذف می‌شود؛ روی لینوکس حذف فایل باز مشکلی ندارد
+    return _stream_body(fh, MEDIA_TYPES[page.output_format], None, remove_path=body_path)
 
-        return JSONResponse(content=result, status_code=200)
+@app.delete("/api/v1/compare-sooratvaziat/jobs/{job_id}")
+async def delete_comparison_job(job_id: str):
+    """حذف کار و فایل‌هایش؛ کار در حال اجرا در اولین ثبت پیشرفت متوقف می‌شود"""
+    _get_job(job_id, "compare")
+    job_store.delete(job_id)
+    return {"message": "deleted", "job_id": job_id}
 
+@app.post("/api/v1/exports", status_code=202)
+async def create_export(
+    request: Request,
+    previous_file: UploadFile = File(..., description="صورت وضعیت دوره قبل"),
+    current_file: UploadFile = File(..., description="صورت وضعیت دوره جدید"),
+    export_format: str = Query("xlsx", alias="format", pattern=f"^({'|'.join(report_export.EXPORT_FORMATS)})$",
+                               description="xlsx: اکسل (برگه‌ی خلاصه و جدول)؛ pdf: جدول صفحه‌بندی‌شده"),
+    params: MatchParams = Depends(),
+    rows: RowWindow = Depends(),
+):
+    """
+    ساخت گزارش مقایسه (xlsx/pdf) در پس‌زمینه. پاسخ فوری (202) شناسه‌ی کار است؛ پیشرفت با
+    GET /api/v1/exports/{job_id} و فایل آماده با GET /api/v1/exports/{job_id}/download گرفته می‌شود.
+    """
+    if export_format == "pdf":
+        reason = report_export.pdf_unavailable_reason()
+        if reason:
+            raise HTTPException(status_code=503, detail=reason)
+
+    options = dict(params.options(), changes_offset=0, changes_limit=0)
+    output = dict(format=export_format, offset=rows.offset, limit=rows.limit, sort_by=rows.sort_by)
+    try:
+        job_id = await _start_job("export", [previous_file, current_file], dict(options, **output),
+                                  _export_job, options, output)
+        return _export_response(job_store.get(job_id), request)
     except HTTPException:
         raise
+    except _JOB_ERRORS as e:
+        raise _job_http_error(e, job_pool)
     except Exception as e:
-        # لاگ کامل خطا برای بررسی در deploy logs
-        print("🔥 SERVER ERROR:")
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"خطای سرور: {str(e)}")
+        raise _server_error(e)
+
+def _export_response(state: dict, request: Request) -> dict:
+    job_id = state["id"]
+    return _job_response(
+        state,
+        status_url=str(request.url_for("get_export", job_id=job_id)),
+        download_url=str(request.url_for("download_export", job_id=job_id)),
+    )
+
+@app.get("/api/v1/exports/{job_id}")
+async def get_export(job_id: str, request: Request):
+    """وضعیت کار export: queued/running/done/failed، مرحله و درصد پیشرفت، زمان‌ها، و در پایان مشخصات فایل یا خطا"""
+    return _export_response(_get_job(job_id, "export"), request)
+
+@app.get("/api/v1/exports/{job_id}/download")
+async def download_export(job_id: str):
+    """ارسال تکه‌تکه‌ی گزارش آماده از دیسک"""
+    result = _finished_job(job_id, "export")["result"]
+    try:
+        fh = open(job_store.path(job_id, result["filename"]), "rb")
+    except OSError:
+        raise HTTPException(status_code=404, detail="فایل گزارش پیدا نشد (یا منقضی شده است).")
+    return _stream_body(fh, result["media_type"], None, filename=result["filename"])
+
+@app.delete("/api/v1/exports/{job_id}")
+async def delete_export(job_id: str):
+    """حذف کار و فایل گزارش؛ کار در حال اجرا در اولین ثبت پیشرفت متوقف می‌شود"""
+    _get_job(job_id, "export")
+    job_store.delete(job_id)
+    return {"message": "deleted", "job_id": job_id}
+
+@app.get("/api/v1/jobs/stats")
+async def jobs_stats():
+    """وضعیت کارهای پس‌زمینه: صف job_pool و تعداد کارهای روی دیسک به تفکیک وضعیت"""
+    return {"pool": job_pool.stats(), "jobs": await run_in_threadpool(job_store.stats)}
+
+def _get_project(db: Session, project_id: int) -> Project:
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if project is None:
+        raise HTTPException(status_code=404, detail="پروژه پیدا نشد.")
+    return project
+
+def _snapshot_meta(snapshot) -> Optional[dict]:
+    """مشخصات snapshot برای خلاصه‌ی پاسخ مقایسه (جمع مبالغ همان مقدار ثبت‌شده، بدون خواندن جدول)"""
+    if snapshot is None:
+        return None
+    return SnapshotResponse.model_validate(snapshot).model_dump(mode="json")
+
+async def _save_snapshot(db: Session, project: Project, upload: tuple, sheets: Optional[List[str]]) -> tuple:
+    """خواندن فایل spool‌شده (مسیر، نام فایل، hash) در compare_pool و ثبتش به‌عنوان دوره‌ی بعد؛ خروجی: (snapshot، frame)"""
+    frame = (await _prepare_statements([upload], sheets))[0]
+    with stage("store", rows=len(frame)):
+        snapshot = await run_in_threadpool(snapshot_store.add, db, project, frame, upload[1], upload[2])
+    return snapshot, frame
+
+@app.get("/api/v1/projects/{project_id}/snapshots", response_model=List[SnapshotResponse])
+def list_snapshots(project_id: int, db: Session = Depends(get_db)):
+    """صورت وضعیت‌های ذخیره‌شده‌ی پروژه به ترتیب دوره"""
+    _get_project(db, project_id)
+    return snapshot_store.list(db, project_id)
+
+@app.post("/api/v1/projects/{project_id}/snapshots", response_model=SnapshotResponse)
+async def create_snapshot(
+    project_id: int,
+    file: UploadFile = File(..., description="صورت وضعیت دوره"),
+    sheets: Optional[List[str]] = SHEETS_QUERY,
+    db: Session = Depends(get_db),
+):
+    """
+    ثبت صورت وضعیت یک دوره‌ی پروژه: فایل خوانده و ستون‌یابی و به‌صورت جدول ستونی ذخیره می‌شود تا
+    مقایسه‌ی دوره‌ی بعد (POST .../compare) فقط فایل جدید را لازم داشته باشد.
+    فایلی که قبلاً برای همین پروژه ثبت شده (همان hash) دوباره ذخیره نمی‌شود.
+    """
+    project = await run_in_threadpool(_get_project, db, project_id)
+    with _temp_files() as temp:
+        try:
+            _check_upload_size(file)
+            with stage("digest", nbytes=stream_size(file.file)):
+                digest = await run_in_threadpool(file_digest, file.file)
+            existing = await run_in_threadpool(snapshot_store.find, db, project_id, digest)
+            if existing is not None:
+                return existing
+            with stage("spool"):
+                temp.append(await run_in_threadpool(spool_upload, file.file))
+            snapshot, _ = await _save_snapshot(db, project, (temp[0], file.filename or "", digest), sheets)
+            return snapshot
+        except HTTPException:
+            raise
+        except _JOB_ERRORS as e:
+            raise _job_http_error(e)
+        except Exception as e:
+            raise _server_error(e)
+
+@app.delete("/api/v1/projects/{project_id}/snapshots/{snapshot_id}")
+def delete_snapshot(project_id: int, snapshot_id: int, db: Session = Depends(get_db)):
+    snapshot = snapshot_store.get(db, project_id, snapshot_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="صورت وضعیت ذخیره‌شده پیدا نشد.")
+    snapshot_store.delete(db, snapshot)
+    return {"message": "deleted", "snapshot_id": snapshot_id}
+
+@app.post("/api/v1/projects/{project_id}/compare")
+async def compare_with_snapshot(
+    project_id: int,
+    current_file: UploadFile = File(..., description="صورت وضعیت دوره جدید"),
+    snapshot_id: Optional[int] = Query(None, description="صورت وضعیت ذخیره‌شده‌ی مبنا (پیش‌فرض: دوره‌ی قبل از این فایل)"),
+    save: bool = Query(True, description="ثبت فایل جدید به‌عنوان دوره‌ی بعدی پروژه (اگر قبلاً ثبت نشده)"),
+    params: ComparisonParams = Depends(),
+    page: ResultPage = Depends(),
+    db: Session = Depends(get_db),
+):
+    """
+    مقایسه‌ی صورت وضعیت جدید با صورت وضعیت ذخیره‌شده‌ی دوره‌ی قبل پروژه: فقط فایل جدید آپلود و
+    خوانده می‌شود. پاسخ همان شکل compare-sooratvaziat است به‌اضافه‌ی snapshot (مبنا) و
+    saved_snapshot (دوره‌ی ثبت‌شده برای همین فایل).
+    """
+    project = await run_in_threadpool(_get_project, db, project_id)
+    options, output = params.options(), page.output()
+    sheets = options.pop("sheets")   # جدا از options: برگه‌های فایل جدید، نه جدول مبنا
+    media_type = MEDIA_TYPES[page.output_format]
+    with _temp_files() as temp:
+        try:
+            _check_upload_size(current_file)
+            with stage("digest", nbytes=stream_size(current_file.file)):
+                digest = await run_in_threadpool(file_digest, current_file.file)
+            if snapshot_id is not None:
+                baseline = await run_in_threadpool(snapshot_store.get, db, project_id, snapshot_id)
+                if baseline is None:
+                    raise HTTPException(status_code=404, detail="صورت وضعیت ذخیره‌شده پیدا نشد.")
+            else:
+                baseline = await run_in_threadpool(snapshot_store.previous, db, project_id, digest)
+                if baseline is None:
+                    raise HTTPException(status_code=409, detail="صورت وضعیت دوره‌ی قبل برای این پروژه ثبت نشده است؛ "
+                                                                "ابتدا آن را با POST .../snapshots ذخیره کنید.")
+            saved = await run_in_threadpool(snapshot_store.find, db, project_id, digest)
+            if not save or saved is not None:
+                # کلید cache: جدول مبنا (با شناسه‌اش) + فایل جدید + پارامترها؛ با ثبت دوره‌ی جدید، کلید بعد از ثبت ساخته می‌شود
+                cache_key = result_key(baseline.digest, digest, kind="snapshot", snapshot=baseline.id,
+                                       saved=saved.id if saved else None, sheets=sheets, **options, **output)
+                with stage("cache"):
+                    cached = await run_in_threadpool(statement_cache.open_result, cache_key)
+                if cached is not None:
+                    return _stream_body(cached, media_type, "HIT")
+
+            with stage("spool"):
+                temp.append(await run_in_threadpool(spool_upload, current_file.file))
+            current = (temp[0], current_file.filename or "", digest)
+            if save and saved is None:
+                saved, current = await _save_snapshot(db, project, current, sheets)
+                # commit ثبت، مبنا را expire کرده؛ بارگذاری دوباره این‌جا و نه با lazy load روی event loop
+                await run_in_threadpool(db.refresh, baseline)
+            elif compare_pool.slots > 1:
+                current = (await _prepare_statements([current], sheets))[0]
+            cache_key = result_key(baseline.digest, digest, kind="snapshot", snapshot=baseline.id,
+                                   saved=saved.id if saved else None, sheets=sheets, **options, **output)
+            body_path = statement_cache.result_tmp_path()
+            temp.append(body_path)
+            meta = {"snapshot": _snapshot_meta(baseline), "saved_snapshot": _snapshot_meta(saved)}
+            cache_counters = await compare_pool.run(
+                _compare_job, snapshot_store.frame(baseline), current, dict(options, sheets=sheets),
+                dict(output, path=body_path, meta=meta),
+            )
+            statement_cache.merge_counters(cache_counters)
+
+            fh = open(body_path, "rb")
+            statement_cache.put_result_file(cache_key, body_path)
+            temp.remove(body_path)   # _stream_body بعد از ارسال حذفش می‌کند
+            return _stream_body(fh, media_type, "MISS", remove_path=body_path)
+
+        except HTTPException:
+            raise
+        except _JOB_ERRORS as e:
+            raise _job_http_error(e)
+        except Exception as e:
+            raise _server_error(e)
+
+def _template_mapping(headers: List[str], body: ColumnMapping) -> dict:
+    """نگاشت ورودی API با نام‌های نرمال‌شده؛ هر ستون باید در سرستون قالب باشد"""
+    mapping = {}
+    for field in FIELDS:
+        value = getattr(body, field)
+        norm = _normalize_col_name(value) if value else None
+        if norm is not None and norm not in headers:
+            raise HTTPException(status_code=400, detail=f"ستون «{value}» در سرستون قالب نیست. ستون‌ها: {headers}")
+        mapping[field] = norm
+    return mapping
+
+@app.get("/api/v1/column-templates", response_model=List[ColumnTemplateResponse])
+async def list_column_templates():
+    """قالب‌های شناخته‌شده‌ی سرستون (learned: یادگرفته‌شده، manual: تعریف‌شده از API)"""
+    return column_templates.list()
+
+@app.post("/api/v1/column-templates", response_model=ColumnTemplateResponse)
+async def create_column_template(body: ColumnTemplateCreate):
+    """
+    تعریف نگاشت ستون‌ها برای یک قالب. headers همان سرستون فایل به ترتیب است
+    (خانه‌ی خالی سرستون با نام "Unnamed: <شماره ستون>")؛ نگاشت دستی جایگزین نگاشت یادگرفته‌شده می‌شود.
+    """
+    headers = [_normalize_col_name(h) for h in body.headers]
+    template = column_templates.put(headers, _template_mapping(headers, body))
+    # frameها و نتایج cache‌شده با نگاشت قبلی ساخته شده‌اند
+    statement_cache.clear()
+    return template
+
+@app.put("/api/v1/column-templates/{fingerprint}", response_model=ColumnTemplateResponse)
+async def update_column_template(fingerprint: str, body: ColumnMapping):
+    existing = column_templates.get(fingerprint)
+    if existing is None:
+        raise HTTPException(status_code=404, detail="قالب پیدا نشد.")
+    template = column_templates.put(existing["headers"], _template_mapping(existing["headers"], body))
+    statement_cache.clear()
+    return template
+
+@app.delete("/api/v1/column-templates/{fingerprint}")
+async def delete_column_template(fingerprint: str):
+    """حذف قالب؛ آپلود بعدی همین سرستون دوباره تشخیص داده و یاد گرفته می‌شود"""
+    if not column_templates.delete(fingerprint):
+        raise HTTPException(status_code=404, detail="قالب پیدا نشد.")
+    statement_cache.clear()
+    return {"message": "deleted", "fingerprint": fingerprint}
+
+@app.get("/api/v1/cache/stats")
+async def cache_stats():
+    """وضعیت cache صورت وضعیت‌ها: تعداد/حجم ورودی‌ها و شمارنده‌های hit/miss"""
+    return statement_cache.stats()
+
+@app.get("/api/v1/pool/stats")
+async def pool_stats():
+    """وضعیت صف مقایسه‌ها: در حال اجرا، عمق صف، زمان انتظار و اجرا، ردشده‌ها و timeoutها و حافظه‌ی پروسه‌ی اصلی"""
+    return {**compare_pool.stats(), "memory": memory_budget.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """متریک‌های همین process با قالب Prometheus: مدت درخواست‌ها، مراحل خط لوله، صف‌ها و حافظه"""
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+async def _cleanup_expired_jobs():
+    """حذف دوره‌ای کارهای منقضی (ttl) حتی وقتی کار جدیدی ثبت نمی‌شود"""
+    while True:
+        await run_in_threadpool(job_store.cleanup, True)
+        await asyncio.sleep(CLEANUP_INTERVAL_SECONDS)
+
+async def _warm_pools():
+    """processهای pool پیش از اولین درخواست ساخته می‌شوند (forkserver و import در هر process چند ثانیه است)"""
+    await asyncio.gather(run_in_threadpool(compare_pool.warm), run_in_threadpool(job_pool.warm))
 
 @app.get("/api/v1/health")
 async def health_check():
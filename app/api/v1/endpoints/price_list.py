@@ -1,15 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from app.core.database import get_db
-from app.services.price_service import PriceService
+from app.services.formula_engine import FormulaError, formula_cache
+from app.services.price_catalog import price_catalog
+from app.services.price_import import MAX_IMPORT_BYTES, PriceImportError, import_price_list
+from app.services.price_search import price_search
+from app.services.statement_reader import StatementReadError, stream_size
+from app.services.price_service import MAX_BATCH_LINES, PriceService
 from app.models.price_list import PriceItem, Formula, CoefficientTable
 
 router = APIRouter()
 
+# ---------- تنظیمات ----------
+MAX_PAGE_SIZE = 1000   # حداکثر limit در فهرست آیتم‌ها
+# --------------------------------
+
 @router.get("/price-items", response_model=List[Dict[str, Any]])
-def get_price_items(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    items = db.query(PriceItem).offset(skip).limit(limit).all()
+def get_price_items(
+    response: Response,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="کد آخرین آیتم صفحه‌ی قبل (هدر X-Next-Cursor)"),
+    category: Optional[str] = None,
+    sub_category: Optional[str] = None,
+    q: Optional[str] = Query(None, description="جستجو در نام و شرح (پیشوندی، همه‌ی کلمه‌ها)"),
+    skip: int = Query(0, ge=0, description="روش قدیمی؛ برای صفحه‌های عمیق cursor سریع‌تر است"),
+    db: Session = Depends(get_db),
+):
+    """
+    آیتم‌های فهرست بها به ترتیب کد با صفحه‌بندی keyset: اگر صفحه‌ی بعدی باشد کد آخرین آیتم در
+    هدر X-Next-Cursor می‌آید و درخواست بعدی با cursor همان مقدار، بدون offset، از بعد از آن ادامه می‌دهد.
+    """
+    price_search.ensure(db)
+    query = db.query(PriceItem)
+    if category is not None:
+        query = query.filter(PriceItem.category == category)
+    if sub_category is not None:
+        query = query.filter(PriceItem.sub_category == sub_category)
+    if q:
+        query = price_search.apply(query, q)
+    if cursor:
+        query = query.filter(PriceItem.code > cursor)
+    query = query.order_by(PriceItem.code)
+    if skip:
+        query = query.offset(skip)
+    # یک آیتم بیشتر: وجود صفحه‌ی بعد بدون کوئری count
+    items = query.limit(limit + 1).all()
+    if len(items) > limit:
+        items = items[:limit]
+        response.headers["X-Next-Cursor"] = items[-1].code
     return [
         {
             "id": item.id,
@@ -24,6 +64,30 @@ def get_price_items(skip: int = 0, limit: int = 100, db: Session = Depends(get_d
         for item in items
     ]
 
+@router.post("/import")
+def import_price_items(file: UploadFile = File(...), dry_run: bool = False, db: Session = Depends(get_db)):
+    """
+    ورود فایل فهرست بها (xlsx/xls/csv): آیتم‌ها بر اساس کد درج یا به‌روز و برگه‌های ضرایب به جدول ضرایب
+    هم‌نام برگه منتقل می‌شوند. پاسخ: تعداد جدید/به‌روزشده/ردشده، سطرهای ردشده با علت و سرعت ورود.
+    dry_run: فقط اعتبارسنجی، بدون نوشتن.
+    """
+    filename = file.filename or ""
+    size = stream_size(file.file)
+    if size == 0:
+        raise HTTPException(status_code=400, detail=f"فایل {filename} خالی است.")
+    if size > MAX_IMPORT_BYTES:
+        raise HTTPException(status_code=400, detail=f"حجم فایل بیش از حد مجاز است ({MAX_IMPORT_BYTES} بایت).")
+    try:
+        report = import_price_list(db, file.file, filename, dry_run=dry_run)
+    except (StatementReadError, PriceImportError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not report["valid"] and not report["coefficient_tables"]:
+        raise HTTPException(status_code=400, detail={
+            "message": f"در فایل {filename} آیتم معتبری پیدا نشد (ستون‌های کد، شرح و بهای واحد لازم‌اند).",
+            "report": report,
+        })
+    return {"success": True, **report}
+
 @router.post("/calculate")
 def calculate_price(calculation_data: dict, db: Session = Depends(get_db)):
     try:
@@ -42,6 +106,24 @@ def calculate_price(calculation_data: dict, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+class CalculationLine(BaseModel):
+    item_code: str
+    quantities: Dict[str, Any] = {}
+
+class BatchCalculationRequest(BaseModel):
+    lines: List[CalculationLine]
+
+@router.post("/calculate/batch")
+def calculate_batch(request: BatchCalculationRequest, db: Session = Depends(get_db)):
+    """
+    قیمت چند سطر (مثلاً کل BOQ) در یک درخواست؛ پاسخ: نتیجه یا خطای هر سطر به ترتیب ورودی
+    (index) و جمع کل سطرهای بدون خطا. خطای یک سطر بقیه را متوقف نمی‌کند.
+    """
+    if len(request.lines) > MAX_BATCH_LINES:
+        raise HTTPException(status_code=400, detail=f"حداکثر {MAX_BATCH_LINES} سطر در هر درخواست مجاز است.")
+    result = PriceService.calculate_batch([(line.item_code, line.quantities) for line in request.lines], db)
+    return {"success": True, **result}
+
 @router.get("/coefficients/{table_name}/{key}")
 def get_coefficient(table_name: str, key: str, db: Session = Depends(get_db)):
     coefficient = PriceService.get_coefficient(table_name, key, db)
@@ -50,7 +132,29 @@ def get_coefficient(table_name: str, key: str, db: Session = Depends(get_db)):
     
     return {"table": table_name, "key": key, "value": coefficient}
 
+@router.get("/catalog/stats")
+def catalog_stats():
+    """وضعیت فهرست بهای درون‌حافظه‌ای (نسخه، اندازه، hit/miss) و cache فرمول‌های کامپایل‌شده"""
+    return {"catalog": price_catalog.stats(), "formulas": formula_cache.stats()}
+
+@router.post("/catalog/reload")
+def reload_catalog(db: Session = Depends(get_db)):
+    """خواندن دوباره‌ی فهرست بها، جدول‌های ضرایب و ایندکس جستجو (مثلاً بعد از تغییر پایگاه داده از بیرون این process)"""
+    price_catalog.invalidate()
+    if price_catalog.enabled:
+        price_catalog.load(db)
+    price_search.ensure(db, rebuild=True)
+    return price_catalog.stats()
+
 @router.get("/formulas")
 def get_formulas(db: Session = Depends(get_db)):
-    formulas = db.query(Formula).all()
-    return [{"id": f.id, "name": f.name, "expression": f.expression} for f in formulas]
+    """فرمول‌ها با متغیرهایشان؛ فرمول نامعتبر با پیام خطای کامپایل"""
+    result = []
+    for f in db.query(Formula).all():
+        entry = {"id": f.id, "name": f.name, "expression": f.expression}
+        try:
+            entry["variables"] = list(PriceService.compile_formula(f).variables)
+        except FormulaError as e:
+            entry["error"] = str(e)
+        result.append(entry)
+    return result
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from typing import List
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -28,6 +29,42 @@ class Settings(BaseSettings):
         "https://metreyar-flutter-web.onrender.com",  # احتمالی
     ]
     
+    # Cache صورت وضعیت‌های خوانده‌شده و نتایج مقایسه (روی دیسک)
+    STATEMENT_CACHE_ENABLED: bool = os.getenv("STATEMENT_CACHE_ENABLED", "1") not in ("0", "false", "False")
+    STATEMENT_CACHE_DIR: str = os.getenv("STATEMENT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "metreyar_cache"))
+    STATEMENT_CACHE_MAX_MB: int = int(os.getenv("STATEMENT_CACHE_MAX_MB", "512"))
+    
+    # اجرای مقایسه در process pool (صفر: اجرا در یک thread بدون process جدا)
+    COMPARE_WORKERS: int = int(os.getenv("COMPARE_WORKERS", "2"))
+    COMPARE_QUEUE_SIZE: int = int(os.getenv("COMPARE_QUEUE_SIZE", "8"))
+    COMPARE_JOB_TIMEOUT_SECONDS: float = float(os.getenv("COMPARE_JOB_TIMEOUT_SECONDS", "120"))
+    
+    # حالت کم‌حافظه (مثلاً پلن 512 مگابایتی): ستون‌های متنی فشرده (categorical برای object)، مبلغ float64،
+    # نرمال‌سازی بدون cache سراسری و برگرداندن حافظه‌ی آزادشده به سیستم‌عامل بین مراحل
+    LOW_MEMORY_MODE: bool = os.getenv("LOW_MEMORY_MODE", "0") in ("1", "true", "True")
+    # سقف RSS هر worker هنگام خواندن و مقایسه (مگابایت)؛ عبور از آن خطای 413 می‌دهد. صفر: بدون سقف
+    MEMORY_BUDGET_MB: int = int(os.getenv("MEMORY_BUDGET_MB", "0"))
+
+    # کارهای پس‌زمینه (مقایسه‌ی غیرهم‌زمان و ساخت گزارش xlsx/pdf): وضعیت، ورودی‌ها و نتیجه روی دیسک
+    # و حذف ttl ثانیه بعد از آخرین تغییر (بزرگ‌تر از JOB_TIMEOUT_SECONDS)؛ اجرا در process pool جدا از مقایسه‌های هم‌زمان
+    JOB_DIR: str = os.getenv("JOB_DIR", os.path.join(tempfile.gettempdir(), "metreyar_jobs"))
+    JOB_TTL_SECONDS: float = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "1"))
+    JOB_QUEUE_SIZE: int = int(os.getenv("JOB_QUEUE_SIZE", "8"))
+    JOB_TIMEOUT_SECONDS: float = float(os.getenv("JOB_TIMEOUT_SECONDS", "900"))
+    # داده‌ی ماندگار سرویس (snapshotهای پروژه، قالب‌های سرستون)؛ بیرون از پوشه‌ی کد. در production روی دیسک ماندگار تنظیم شود
+    DATA_DIR: str = os.getenv("DATA_DIR", os.path.join(tempfile.gettempdir(), "metreyar_data"))
+    # قالب‌های شناخته‌شده‌ی سرستون (یادگرفته‌شده یا تعریف‌شده از API)
+    COLUMN_TEMPLATES_PATH: str = os.getenv("COLUMN_TEMPLATES_PATH", os.path.join(DATA_DIR, "column_templates.json"))
+    # صورت وضعیت ذخیره‌شده‌ی دوره‌های هر پروژه برای مقایسه‌ی افزایشی (جدول ستونی)
+    SNAPSHOT_DIR: str = os.getenv("SNAPSHOT_DIR", os.path.join(DATA_DIR, "snapshots"))
+    # فهرست بها و جدول‌های ضرایب در حافظه‌ی هر process (قیمت‌گذاری بدون کوئری)؛ با نوشتن از همین process
+    # یا POST /price-list/catalog/reload دوباره خوانده می‌شود. REFRESH: هر چند ثانیه بررسی مهر نسخه (صفر: خاموش)
+    CATALOG_INDEX_ENABLED: bool = os.getenv("CATALOG_INDEX_ENABLED", "1") not in ("0", "false", "False")
+    CATALOG_REFRESH_SECONDS: float = float(os.getenv("CATALOG_REFRESH_SECONDS", "0"))
+    # فونت TTF با حروف فارسی برای PDF (خالی: جستجو در فونت‌های سیستم، مثلاً DejaVu Sans)
+    EXPORT_PDF_FONT: str = os.getenv("EXPORT_PDF_FONT", "")
+
     class Config:
         case_sensitive = True
 
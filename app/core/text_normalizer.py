@@ -0,0 +1,116 @@
+"""
+نرمال‌سازی دسته‌ای متن فارسی برای کلید ادغام و نام ستون‌ها.
+
+به جای اجرای چند regex برای هر سطر (Series.apply)، مقادیر یکتای ستون پشت سر هم
+(با جداکننده‌ی خط جدید) به یک رشته‌ی بزرگ تبدیل می‌شوند و جدول جایگزینی
+از پیش ساخته، lower و regex فقط یک بار روی همان رشته اجرا می‌شوند.
+نتیجه‌ی مقادیر یکتا بین درخواست‌ها هم cache می‌شود (شرح‌های صورت وضعیت ماه قبل
+معمولاً دوباره آپلود می‌شوند).
+"""
+from functools import lru_cache
+import re
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# ---------- تنظیمات ----------
+NORMALIZE_CACHE_SIZE = 200_000   # حداکثر تعداد مقدار یکتای نگه‌داشته‌شده در cache
+NORMALIZE_BATCH_SIZE = 20_000    # مقادیر هر متن به‌هم‌چسبیده؛ حافظه‌ی موقت کپی‌های replace را محدود می‌کند
+# --------------------------------
+
+_FOLD = {
+    # حروف عربی → فارسی
+    "ي": "ی", "ى": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه",
+    "أ": "ا", "إ": "ا", "ٱ": "ا", "ؤ": "و",
+    # علائمی که در بازه‌ی U+0600..U+06FF هستند ولی جداکننده‌اند
+    "،": " ", "؛": " ", "؟": " ", "٬": " ", "٫": ".",
+}
+_FOLD.update({chr(0x06F0 + i): str(i) for i in range(10)})   # ارقام فارسی
+_FOLD.update({chr(0x0660 + i): str(i) for i in range(10)})   # ارقام عربی
+_DROP = [chr(c) for c in range(0x064B, 0x0660)] + [
+    "\u0670",   # الف کوچک بالای حرف
+    "\u0640",   # کشیده (ـ)
+    "\u200c",   # نیم فاصله
+    "\u200d", "\u200e", "\u200f", "\ufeff",
+]
+# جدول جایگزینی: (کاراکتر، جایگزین)؛ فقط کاراکترهایی که در متن هستند اعمال می‌شوند
+FOLD_TABLE = tuple(_FOLD.items()) + tuple((ch, "") for ch in _DROP)
+_COL_FOLD_TABLE = FOLD_TABLE + (("_", " "),)
+# اعداد متنی: ارقام فارسی/عربی → لاتین، جداکننده‌ی هزارگان حذف، ممیز فارسی → نقطه (برای str.translate)
+NUMBER_TABLE = str.maketrans(
+    {**{chr(0x06F0 + i): str(i) for i in range(10)}, **{chr(0x0660 + i): str(i) for i in range(10)},
+     "٬": "", "٫": "."}
+)
+
+# \s شامل \n است، پس جداکننده‌ی سطرها دست نمی‌خورد
+_NON_WORD_RE = re.compile(r"[^\w\u0600-\u06FF\s]+")
+# همه‌ی فاصله‌های یونیکد (nbsp، tab و ...) به جز خط جدید که جداکننده است
+_OTHER_SPACES = tuple(chr(c) for c in range(0x3001) if chr(c).isspace() and chr(c) not in " \n")
+
+_key_cache: Dict[str, str] = {}
+
+
+def normalize_batch(values: List[str], underscore_as_space: bool = False) -> List[str]:
+    """نرمال‌سازی یک لیست رشته در یک گذر روی متن به‌هم‌چسبیده"""
+    if not values:
+        return []
+    text = "\n".join(values)
+    if text.count("\n") != len(values) - 1:
+        # بعضی خانه‌ها چندخطی‌اند؛ خط جدیدِ داخل مقدار فاصله حساب می‌شود
+        text = "\n".join(v.replace("\n", " ") for v in values)
+    for ch, repl in (_COL_FOLD_TABLE if underscore_as_space else FOLD_TABLE):
+        if ch in text:
+            text = text.replace(ch, repl)
+    text = _NON_WORD_RE.sub(" ", text.lower())
+    for ch in _OTHER_SPACES:
+        if ch in text:
+            text = text.replace(ch, " ")
+    while "  " in text:
+        text = text.replace("  ", " ")
+    text = text.replace(" \n", "\n").replace("\n ", "\n").strip(" ")
+    return text.split("\n")
+
+
+@lru_cache(maxsize=4096)
+def _normalize_one(s: str, underscore_as_space: bool) -> str:
+    return normalize_batch([s], underscore_as_space)[0]
+
+
+def normalize_text(s, underscore_as_space: bool = False) -> str:
+    """نرمال‌سازی یک مقدار تکی (نام ستون‌ها، الگوها و ...) با همان موتور دسته‌ای"""
+    if s is None or (not isinstance(s, str) and pd.isna(s)):
+        return ""
+    return _normalize_one(str(s), underscore_as_space)
+
+
+def normalize_series(ser: pd.Series, use_cache: bool = True) -> pd.Series:
+    """
+    نرمال‌سازی یک ستون برای ساخت کلید ادغام.
+    هر مقدار یکتا فقط یک بار نرمال می‌شود؛ NA به رشته‌ی خالی تبدیل می‌شود.
+    use_cache=False: بدون خواندن و پر کردن cache بین درخواست‌ها (حالت کم‌حافظه)
+    """
+    codes, uniques = pd.factorize(ser, use_na_sentinel=True)
+    uniques = [u if isinstance(u, str) else str(u) for u in uniques.tolist()]
+
+    cache = _key_cache if use_cache else {}
+    normalized = np.array([cache.get(u) for u in uniques] + [""], dtype=object)
+    missing = [i for i, v in enumerate(normalized[:-1]) if v is None]
+    if missing:
+        todo = [uniques[i] for i in missing]
+        fresh = []
+        for start in range(0, len(todo), NORMALIZE_BATCH_SIZE):
+            fresh.extend(normalize_batch(todo[start:start + NORMALIZE_BATCH_SIZE]))
+        normalized[missing] = fresh
+        if use_cache:
+            if len(_key_cache) + len(fresh) > NORMALIZE_CACHE_SIZE:
+                _key_cache.clear()
+            _key_cache.update(zip(todo, fresh))
+
+    # کد -1 (NA) به آخرین عنصر، یعنی رشته‌ی خالی، اشاره می‌کند
+    return pd.Series(normalized[codes], index=ser.index, dtype=object)
+
+
+def clear_cache() -> None:
+    _key_cache.clear()
+    _normalize_one.cache_clear()
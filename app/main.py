@@ -1,6 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.api.v1.endpoints.compare import router as compare_router
+from app.api.v1.endpoints.price_list import router as price_list_router
+from app.services import metrics
 
 app = FastAPI(title="Metreyar API", version="3.1.0")
 
@@ -11,10 +14,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Next-Cursor"],
 )
 
+# -------------- Metrics ---------------
+app.add_middleware(metrics.TimingMiddleware, app_name="api")
+
 # -------------- Routes ----------------
 app.include_router(compare_router, prefix="/api/v1")
+app.include_router(price_list_router, prefix="/api/v1/price-list", tags=["price-list"])
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.get("/")
 def home():
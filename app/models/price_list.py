@@ -1,8 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, Text, JSON, Index
 from app.core.database import Base
 
 class PriceItem(Base):
     __tablename__ = "price_items"
+    # فیلتر دسته/زیردسته همراه ترتیب کد (صفحه‌بندی keyset)
+    __table_args__ = (
+        Index("ix_price_items_category_code", "category", "code"),
+        Index("ix_price_items_sub_category_code", "sub_category", "code"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String, unique=True, index=True)
@@ -29,6 +34,6 @@ class CoefficientTable(Base):
     __tablename__ = "coefficient_tables"
     
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True)
     table_data = Column(JSON)  # داده‌های جدول
     applicable_to = Column(String)  # موارد کاربرد
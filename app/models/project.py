@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, JSON, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -13,3 +13,24 @@ class Project(Base):
     total_cost = Column(Float, default=0.0)
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    snapshots = relationship("StatementSnapshot", back_populates="project", order_by="StatementSnapshot.period",
+                             cascade="all, delete-orphan")
+
+class StatementSnapshot(Base):
+    """صورت وضعیت خوانده‌شده‌ی یک دوره‌ی پروژه؛ جدول ستونی (کلید، کد، مبلغ) در فایل path زیر SNAPSHOT_DIR"""
+    __tablename__ = "statement_snapshots"
+    __table_args__ = (UniqueConstraint("project_id", "period"),)
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
+    period = Column(Integer, nullable=False)  # شماره‌ی دوره در پروژه (۱، ۲، ...)
+    filename = Column(String)
+    digest = Column(String, nullable=False, index=True)  # hash محتوای فایل آپلودشده
+    sheets = Column(JSON)  # برگه‌های خوانده‌شده و کنارگذاشته (فایل چندبرگه‌ای)
+    column_map = Column(JSON, nullable=False)
+    path = Column(String, nullable=False)
+    rows = Column(Integer, default=0)
+    coded_rows = Column(Integer, default=0)  # سطرهای دارای کد فهرست بها
+    total = Column(Float, default=0.0)  # جمع مبالغ؛ جمع دوره‌ی قبل در مقایسه بدون خواندن جدول
+    size_bytes = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    project = relationship("Project", back_populates="snapshots")
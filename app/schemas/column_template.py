@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class ColumnMapping(BaseModel):
+    """نام ستون‌ها (همان‌طور که در سرستون فایل آمده یا نرمال‌شده)"""
+    description: str
+    amount: Optional[str] = None
+    qty: Optional[str] = None
+    unit: Optional[str] = None
+    code: Optional[str] = None   # کد فهرست بها
+
+class ColumnTemplateCreate(ColumnMapping):
+    headers: List[str]
+
+class ColumnTemplateResponse(BaseModel):
+    fingerprint: str
+    headers: List[str]
+    mapping: dict
+    source: str
+    updated_at: str
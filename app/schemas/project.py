@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional
+from datetime import datetime
 
 class ProjectCreate(BaseModel):
     name: str
@@ -12,3 +13,20 @@ class ProjectResponse(BaseModel):
 
 class Config:
     orm_mode = True
+
+class SnapshotResponse(BaseModel):
+    """صورت وضعیت ذخیره‌شده‌ی یک دوره‌ی پروژه"""
+    id: int
+    project_id: int
+    period: int
+    filename: Optional[str] = None
+    digest: str
+    sheets: Optional[dict] = None
+    rows: int
+    coded_rows: int
+    total: float
+    size_bytes: int
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,93 @@
+"""
+سرجمع فصل‌ها (و زیرفصل‌ها) برای مقایسه‌ی صورت وضعیت.
+
+فصل از پیشوند کد فهرست بها تشخیص داده می‌شود: کد استاندارد شش رقمی است (دو رقم فصل، دو رقم
+زیرفصل، دو رقم ردیف). کدی که Excel به عدد تبدیل کرده صفرهای ابتدایی‌اش را از دست داده
+(010203 → 10203) و دوباره تا شش رقم صفر می‌گیرد؛ کد با جداکننده (01-02-03 یا 1.2.3) هر بخشش
+دو رقمی می‌شود. سرجمع‌ها با factorize و bincount روی ستون گروه جدول هم‌ترازشده حساب می‌شوند.
+"""
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from app.core.text_normalizer import NUMBER_TABLE
+
+# ---------- تنظیمات ----------
+CODE_DIGITS = 6
+LEVELS = (2, 4)          # طول پیشوند کد در هر سطح: فصل، زیرفصل
+# --------------------------------
+
+MAX_DEPTH = len(LEVELS)
+
+
+def chapter_codes(codes: pd.Series) -> pd.Series:
+    """کد کامل با صفرهای ابتدایی (مبنای پیشوند فصل)؛ سطر بدون کد رشته‌ی خالی"""
+    text = codes.where(codes.notna(), "").astype(str).str.strip()
+    non_ascii = text.str.contains(r"[^\x00-\x7f]", regex=True).to_numpy()
+    if non_ascii.any():
+        text = text.where(~non_ascii, text[non_ascii].str.translate(NUMBER_TABLE))
+    text = text.str.replace(r"\.0+$", "", regex=True)
+    separated = text.str.contains(r"[^0-9A-Za-z]", regex=True).to_numpy()
+    out = text.str.zfill(CODE_DIGITS).where(text != "", "")
+    if separated.any():
+        parts = text[separated].str.findall(r"[0-9A-Za-z]+")
+        out[separated] = ["".join(p.zfill(2) for p in items) for items in parts]
+    out = out.str.upper()
+    return pd.Series(out.to_numpy(dtype=object), index=codes.index, dtype=object)
+
+
+def _level_totals(group_codes: np.ndarray, groups: np.ndarray, prefix: int, previous: np.ndarray,
+                  current: np.ndarray, added: np.ndarray, removed: np.ndarray) -> List[dict]:
+    # پیشوند فقط روی کدهای یکتا بریده می‌شود و سطرها با همان factorize به گروه پیشوند می‌روند
+    prefix_codes, uniques = pd.factorize(np.array([g[:prefix] for g in groups.tolist()], dtype=object))
+    codes = prefix_codes[group_codes]
+    n = len(uniques)
+    prev_sum = np.bincount(codes, weights=previous, minlength=n)
+    curr_sum = np.bincount(codes, weights=current, minlength=n)
+    items = np.bincount(codes, minlength=n)
+    added_count = np.bincount(codes, weights=added, minlength=n)
+    removed_count = np.bincount(codes, weights=removed, minlength=n)
+    # مرتب بر اساس کد؛ آیتم‌های بدون کد آخر
+    order = sorted(range(n), key=lambda i: (uniques[i] == "", uniques[i]))
+    records = []
+    for i in order:
+        p, c = float(prev_sum[i]), float(curr_sum[i])
+        records.append({
+            "chapter": uniques[i] or None,
+            "previous": p,
+            "current": c,
+            "difference": c - p,
+            "progress_percent": round((c - p) / p * 100, 2) if p != 0 else None,
+            "items": int(items[i]),
+            "added": int(added_count[i]),
+            "removed": int(removed_count[i]),
+        })
+    return records
+
+
+def rollup(aligned: pd.DataFrame, depth: int = 1) -> List[dict]:
+    """
+    سرجمع مبالغ دوره‌ی قبل/جدید، تفاوت و تعداد آیتم‌های هر فصل از ستون group جدول هم‌ترازشده
+    (خروجی compare با groups کد کامل). depth=2: زیرفصل‌های هر فصل در children.
+    آیتم‌های بدون کد در گروه chapter=None.
+    """
+    groups = aligned["group"].to_numpy(dtype=object) if "group" in aligned else np.full(len(aligned), "", dtype=object)
+    group_codes, unique_groups = pd.factorize(groups)
+    side = aligned["side"].to_numpy()
+    columns = (
+        aligned["previous"].to_numpy(dtype=float),
+        aligned["current"].to_numpy(dtype=float),
+        (side == "right_only").astype(float),
+        (side == "left_only").astype(float),
+    )
+    levels = [_level_totals(group_codes, unique_groups, prefix, *columns) for prefix in LEVELS[:max(1, min(depth, MAX_DEPTH))]]
+    chapters = levels[0]
+    for parent_level, child_level, prefix in zip(levels, levels[1:], LEVELS):
+        children = {}
+        for record in child_level:
+            if record["chapter"] is not None:
+                children.setdefault(record["chapter"][:prefix], []).append(record)
+        for record in parent_level:
+            record["children"] = children.get(record["chapter"], []) if record["chapter"] is not None else []
+    return chapters
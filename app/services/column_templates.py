@@ -0,0 +1,154 @@
+"""
+رجیستری قالب‌های صورت وضعیت بر اساس اثرانگشت (fingerprint) سرستون.
+
+پیمانکارها معمولاً از چند قالب ثابت استفاده می‌کنند. اثرانگشت = hash نام‌های نرمال‌شده‌ی
+سرستون به ترتیب؛ برای هر اثرانگشت نگاشت description/amount/qty/unit/code (با نام نرمال‌شده‌ی
+ستون) نگه داشته می‌شود تا قالب‌های شناخته‌شده اصلاً از مراحل تشخیص ستون عبور نکنند.
+
+  - learned : بعد از اولین تشخیص موفق خودکار اضافه می‌شود (روی قالب موجود نمی‌نویسد، مگر
+              قالب یادگرفته‌شده‌ای که فیلدهای جدیدتر FIELDS را ندارد)
+  - manual  : از API تعریف یا اصلاح شده و به یادگیری خودکار اولویت دارد
+
+رجیستری یک فایل JSON است؛ چند پروسه (workerهای مقایسه) از آن استفاده می‌کنند و هر پروسه
+با تغییر mtime فایل دوباره آن را می‌خواند. هر نوشتن زیر قفل فایل (<path>.lock) آخرین نسخه‌ی فایل را
+می‌خواند و تغییر را روی آن اعمال می‌کند تا قالب ثبت‌شده در پروسه‌ی دیگر گم نشود.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Sequence
+
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: فقط قفل داخل پروسه
+    fcntl = None
+
+FIELDS = ("description", "amount", "qty", "unit", "code")
+
+
+def header_fingerprint(headers: Sequence[str]) -> str:
+    """اثرانگشت سرستون؛ headers باید نرمال‌شده باشند"""
+    return hashlib.sha1("\x1f".join(headers).encode("utf-8")).hexdigest()[:16]
+
+
+def _outdated(template: dict) -> bool:
+    """قالب یادگرفته‌شده قبل از اضافه شدن فیلدی به FIELDS؛ دوباره تشخیص و یاد گرفته می‌شود"""
+    return template["source"] == "learned" and not all(k in template["mapping"] for k in FIELDS)
+
+
+class TemplateRegistry:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._templates: Dict[str, dict] = {}
+        self._mtime: Optional[int] = None
+
+    def _reload_locked(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            self._templates, self._mtime = {}, None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._templates = json.load(f).get("templates", {})
+        except (OSError, ValueError, AttributeError):
+            # فایل خراب یا در حال نوشتن؛ نسخه‌ی قبلی حافظه می‌ماند
+            return
+        self._mtime = mtime
+
+    @contextmanager
+    def _writing(self):
+        """
+        قفل thread و قفل فایل بین پروسه‌ها برای یک تغییر؛ داخل آن _templates همان محتوای فعلی فایل است
+        (نه نسخه‌ی حافظه‌ی این پروسه) و تغییر با _save_locked نوشته می‌شود.
+        """
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(f"{self.path}.lock", "a") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)   # با بستن فایل آزاد می‌شود
+                self._mtime = None
+                self._reload_locked()
+                yield
+
+    def _save_locked(self) -> None:
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"templates": self._templates}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def _put_locked(self, headers: List[str], mapping: dict, source: str) -> dict:
+        fingerprint = header_fingerprint(headers)
+        template = {
+            "fingerprint": fingerprint,
+            "headers": list(headers),
+            "mapping": {k: mapping.get(k) for k in FIELDS},
+            "source": source,
+            "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self._templates[fingerprint] = template
+        self._save_locked()
+        return template
+
+    def lookup(self, headers: Sequence[str]) -> Optional[dict]:
+        """نگاشت ذخیره‌شده (نام‌های نرمال‌شده) برای این سرستون، یا None"""
+        with self._lock:
+            self._reload_locked()
+            template = self._templates.get(header_fingerprint(headers))
+            if template is None or _outdated(template):
+                return None
+            return dict(template["mapping"])
+
+    def _known_locked(self, headers: Sequence[str]) -> bool:
+        existing = self._templates.get(header_fingerprint(headers))
+        return existing is not None and not _outdated(existing)
+
+    def learn(self, headers: Sequence[str], mapping: dict) -> None:
+        """ثبت نتیجه‌ی تشخیص خودکار؛ قالب موجود (مخصوصاً manual) عوض نمی‌شود"""
+        with self._lock:
+            self._reload_locked()
+            if self._known_locked(headers):
+                return
+        try:
+            with self._writing():
+                # پروسه‌ی دیگری شاید همین حالا قالب را ثبت کرده باشد
+                if not self._known_locked(headers):
+                    self._put_locked(list(headers), mapping, "learned")
+        except OSError:
+            # رجیستری فقط شتاب‌دهنده است؛ خطای نوشتن نباید مقایسه را خراب کند
+            pass
+
+    def put(self, headers: Sequence[str], mapping: dict) -> dict:
+        """تعریف یا جایگزینی دستی قالب"""
+        with self._writing():
+            return self._put_locked(list(headers), mapping, "manual")
+
+    def get(self, fingerprint: str) -> Optional[dict]:
+        with self._lock:
+            self._reload_locked()
+            template = self._templates.get(fingerprint)
+            return dict(template) if template else None
+
+    def delete(self, fingerprint: str) -> bool:
+        with self._writing():
+            if self._templates.pop(fingerprint, None) is None:
+                return False
+            self._save_locked()
+            return True
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            self._reload_locked()
+            return [dict(t) for t in self._templates.values()]
+
+
+column_templates = TemplateRegistry(settings.COLUMN_TEMPLATES_PATH)
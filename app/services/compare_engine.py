@@ -0,0 +1,401 @@
+"""
+موتور مشترک مقایسه‌ی دو صورت وضعیت (اپ مستقل main.py و روتر compare.py).
+
+  - کلید هر سطر شرح نرمال‌شده است (یا کد فهرست بها در تطبیق کد-محور، code_first_keys) و مبالغ
+    متنی (جداکننده‌ی هزارگان، ارقام فارسی) عدد می‌شوند
+  - آیتم‌های تکراری یک دوره (کلید یکسان) قبل از هم‌ترازی جمع زده می‌شوند (groupby-sum با bincount)؛
+    نه فقط آخرین سطر می‌ماند (dict) و نه merge ضرب دکارتی می‌سازد
+  - هم‌ترازی با کدهای یک factorize روی کلیدهای هر دو دوره، به ترتیب اولین ظهور (دوره‌ی قبل،
+    بعد آیتم‌های جدید)
+  - تفاوت و وضعیت با عملیات آرایه‌ای (np.select) به جای apply
+
+حالت‌های هم‌ترازی (ALIGN_MODES):
+  - aggregate : یک سطر برای هر کلید؛ مبالغ تکراری‌های هر دوره جمع زده می‌شوند
+  - ordinal   : کلید (شرح نرمال‌شده، شماره‌ی تکرار)؛ n-امین «بتن ریزی» دوره‌ی قبل با n-امین
+                دوره‌ی جدید جفت می‌شود (مثلاً همان آیتم زیر فصل‌های مختلف)
+در هر دو حالت تعداد سطرها حداکثر مجموع سطرهای دو فایل است. گزارش alignment (در attrs)
+اندازه‌ای را که ادغام سطربه‌سطر (many-to-many merge) می‌ساخت از روی شمارش کلیدها و پیش از
+هر ادغامی حساب و ریسک انفجار سطرها را علامت می‌زند.
+"""
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.core.text_normalizer import NUMBER_TABLE, normalize_series
+
+# ستون‌های جدول نمایش (سطرهای data در پاسخ)
+TITLE_COL = "شرح کار"
+PREVIOUS_COL = "مبلغ قبلی"
+CURRENT_COL = "مبلغ جدید"
+DIFFERENCE_COL = "تفاوت"
+STATUS_COL = "وضعیت"
+MATCH_COL = "مبنای تطبیق"
+SHEET_COL = "برگه"
+DISPLAY_COLUMNS = [TITLE_COL, PREVIOUS_COL, CURRENT_COL, DIFFERENCE_COL, STATUS_COL]
+
+ALIGN_MODES = ("aggregate", "ordinal")
+EXPLOSION_FACTOR = 2      # ادغام سطربه‌سطر بیش از این ضریبِ سطرهای ورودی = ریسک انفجار
+STATUS_LABELS = ("افزایش", "کاهش", "بدون تغییر")
+SIDE_LABELS = ("both", "left_only", "right_only")
+MATCH_MODES = ("auto", "text")   # auto: اول کد فهرست بها (اگر هر دو فایل ستون کد دارند)، بعد شرح
+MATCH_LABELS = ("", "فازی", "کد", "شرح")
+# دسته‌های ستون‌های categorical حالت کم‌حافظه: رشته‌ی فشرده‌ی pandas (arrow اگر نصب باشد)، نه شیء پایتونی؛
+# نام "str" از pandas 3 (requirements.txt)
+TEXT_DTYPE = "str"
+EMPTY_KEY_PREFIX = "__empty__"
+CURRENT_EMPTY_SUFFIX = ":current"   # کلید سطر خالی دوره‌ی جدید وقتی همان ایندکس در دوره‌ی قبل هم خالی است
+CODE_KEY_PREFIX = "__code__"
+
+
+def to_numbers(ser: pd.Series) -> pd.Series:
+    """تبدیل ستون شامل عدد (ممکن است با ویرگول/کامای هزار جداکننده یا ارقام فارسی) به float/int"""
+    return pd.to_numeric(
+        ser.astype(str)
+           .str.translate(NUMBER_TABLE)
+           .str.replace(r"[,\s]", "", regex=True)
+           .str.replace("−", "-", regex=False)
+           .replace(["", "nan", "None"], "0"),
+        errors="coerce"
+    ).fillna(0)
+
+
+def to_float64(ser: pd.Series) -> pd.Series:
+    """
+    مثل to_numbers با خروجی همیشه float64 و بدون تبدیل کل ستون به متن: عددها (از جمله متن
+    عددی ساده) مستقیم تبدیل می‌شوند و فقط بقیه (جداکننده‌ی هزارگان، ارقام فارسی) از مسیر متنی.
+    """
+    # copy: آرایه‌ی pandas (copy-on-write) فقط‌خواندنی است؛ نتیجه‌ی موقت to_numeric بلافاصله آزاد می‌شود
+    values = pd.to_numeric(ser, errors="coerce").to_numpy(dtype="float64", na_value=np.nan, copy=True)
+    textual = np.isnan(values) & ser.notna().to_numpy()
+    if textual.any():
+        values[textual] = to_numbers(ser[textual]).to_numpy(dtype="float64")
+    values[np.isnan(values)] = 0.0
+    return pd.Series(values, index=ser.index)
+
+
+def compact_text(ser: pd.Series) -> pd.Series:
+    """
+    ستون متنی فشرده (هر مقدار غیر NA به str) بدون کپی سطربه‌سطر: ستون رشته‌ای pandas همان‌طور
+    می‌ماند (با pyarrow خودش فشرده است و categorical کردنش برای هر مقدار شیء پایتونی می‌سازد)؛
+    ستون object (مثلاً شرح‌های عدد و متن، یا pandas بدون pyarrow) categorical می‌شود تا هر مقدار
+    یکتا یک بار ذخیره شود.
+    """
+    if isinstance(ser.dtype, pd.StringDtype):
+        return ser
+    codes, uniques = pd.factorize(ser, use_na_sentinel=True)
+    texts = np.array([u if isinstance(u, str) else str(u) for u in uniques.tolist()], dtype=object)
+    # 1 و "1" بعد از str یکی می‌شوند؛ دسته‌ها باید یکتا باشند
+    text_codes, categories = pd.factorize(texts)
+    if len(categories) < len(texts):
+        codes = np.where(codes >= 0, text_codes[np.maximum(codes, 0)], -1)
+    cat = pd.Categorical.from_codes(codes, categories=pd.Index(categories, dtype=TEXT_DTYPE))
+    return pd.Series(cat, index=ser.index)
+
+
+def merge_keys(descriptions: pd.Series, use_cache: bool = True) -> pd.Series:
+    """
+    کلید ادغام از شرح (نرمال‌سازی برداری)؛ شرح خالی کلید یکتا با ایندکس سطر می‌گیرد.
+    سطرهای هم‌کلید یک شیء رشته‌ی مشترک دارند. use_cache: مثل normalize_series
+    """
+    if isinstance(descriptions.dtype, pd.CategoricalDtype):
+        return _categorical_merge_keys(descriptions, use_cache)
+    keys = normalize_series(descriptions, use_cache)
+    empty_mask = keys == ""
+    if empty_mask.any():
+        fallback = EMPTY_KEY_PREFIX + pd.Series(descriptions.index.astype(str), index=descriptions.index)
+        keys = keys.where(~empty_mask, fallback)
+    return keys
+
+
+def _categorical_merge_keys(descriptions: pd.Series, use_cache: bool) -> pd.Series:
+    """merge_keys روی شرح categorical: نرمال‌سازی فقط روی دسته‌ها و خروجی هم categorical"""
+    categories = pd.Series(descriptions.cat.categories.to_numpy(dtype=object), dtype=object)
+    key_codes, keys = pd.factorize(normalize_series(categories, use_cache).to_numpy(dtype=object))
+    codes = descriptions.cat.codes.to_numpy()
+    row_codes = np.where(codes >= 0, key_codes[np.maximum(codes, 0)] if len(key_codes) else -1, -1)
+    empty_key = np.flatnonzero(keys == "")
+    empty_mask = (row_codes < 0) | np.isin(row_codes, empty_key)
+    if empty_mask.any():
+        fallback = (EMPTY_KEY_PREFIX + descriptions.index[empty_mask].astype(str)).to_numpy(dtype=object)
+        row_codes[empty_mask] = len(keys) + np.arange(len(fallback))
+        keys = np.concatenate([keys, fallback])
+    cat = pd.Categorical.from_codes(row_codes, categories=pd.Index(keys, dtype=TEXT_DTYPE))
+    if len(empty_key):
+        cat = cat.remove_unused_categories()
+    return pd.Series(cat, index=descriptions.index)
+
+
+def code_keys(codes: pd.Series) -> pd.Series:
+    """
+    کلید ادغام از کد فهرست بها: CODE_KEY_PREFIX + کد نرمال‌شده (ارقام لاتین، فقط حرف و رقم، بدون
+    صفرهای ابتدایی؛ ۰۱۰۲۰۳، 01-02-03 و عدد 10203.0 یکی می‌شوند)؛ سطر بدون کد رشته‌ی خالی.
+    """
+    text = codes.where(codes.notna(), "").astype(str)
+    # translate روی هر مقدار پایتونی اجرا می‌شود؛ فقط سطرهایی که ارقام فارسی/عربی دارند
+    non_ascii = text.str.contains(r"[^\x00-\x7f]", regex=True).to_numpy()
+    if non_ascii.any():
+        text = text.where(~non_ascii, text[non_ascii].str.translate(NUMBER_TABLE))
+    # «.0» پایانی (عددی که float خوانده شده) و هر نویسه‌ی غیر حرف/رقم در یک گذر حذف می‌شوند
+    text = text.str.replace(r"\.0+$|[^0-9A-Za-z]", "", regex=True).str.lstrip("0").str.upper()
+    keys = (CODE_KEY_PREFIX + text).where(text != "", "")
+    return pd.Series(keys.to_numpy(dtype=object), index=codes.index, dtype=object)
+
+
+def code_first_keys(prev_code_keys: pd.Series, prev_text_keys: pd.Series,
+                    curr_code_keys: pd.Series, curr_text_keys: pd.Series) -> tuple:
+    """
+    کلید ادغام کد-محور (کلیدهای کد خروجی code_keys، کلیدهای متنی خروجی merge_keys):
+      - سطر کددار: کلید کد
+      - سطر بدون کد: اگر شرح نرمال‌شده‌اش در یک سطر کددار (هر کدام از دو دوره) آمده همان کلید کد،
+        وگرنه کلید متنی
+    خروجی: (کلیدهای دوره‌ی قبل، کلیدهای دوره‌ی جدید)
+    """
+    return tuple(period_code_first_keys([prev_code_keys, curr_code_keys], [prev_text_keys, curr_text_keys]))
+
+
+def period_code_first_keys(code_keys_list: Sequence[pd.Series],
+                           text_keys_list: Sequence[pd.Series]) -> List[pd.Series]:
+    """
+    code_first_keys برای چند دوره به ترتیب: سطر بدون کد، کلید کد اولین سطر کددار با همان شرح
+    (دوره‌ی قدیمی‌تر مقدم) را می‌گیرد. خروجی: کلیدهای هر دوره به همان ترتیب
+    """
+    keys = [c.to_numpy(dtype=object).copy() for c in code_keys_list]
+    texts = [t.to_numpy(dtype=object) for t in text_keys_list]
+    missing = [k == "" for k in keys]
+
+    if any(m.any() for m in missing):
+        missing_text = np.concatenate([t[m] for t, m in zip(texts, missing)])
+        # فقط سطرهای کدداری که شرحشان در سطرهای بدون کد آمده؛ عضویت در set پایتون (hash رشته‌ها cache است).
+        # کلید شرح خالی فقط ایندکس سطر است و کدی از سطر دیگری نمی‌گیرد
+        wanted = set(missing_text[~empty_key_mask(missing_text)].tolist())
+        coded_text = np.concatenate([t[~m] for t, m in zip(texts, missing)])
+        coded_keys = np.concatenate([k[~m] for k, m in zip(keys, missing)])
+        relevant = np.fromiter((t in wanted for t in coded_text), dtype=bool, count=len(coded_text))
+        # اولین سطر کددار با هر شرح (دوره‌ی قدیمی‌تر مقدم است)
+        lookup = dict(zip(coded_text[relevant][::-1].tolist(), coded_keys[relevant][::-1].tolist()))
+        for k, t, m in zip(keys, texts, missing):
+            if m.any():
+                k[m] = np.array([lookup.get(x, x) for x in t[m].tolist()], dtype=object)
+
+    return [pd.Series(k, index=t.index, dtype=object) for k, t in zip(keys, text_keys_list)]
+
+
+def match_strategy(aligned: pd.DataFrame, prev_coded_keys=(), curr_coded_keys=(), fuzzy_keys=()) -> pd.Series:
+    """
+    مبنای جفت شدن هر سطر هم‌ترازشده: «کد» اگر در هر دو دوره سطر کددار با همین کلید هست،
+    «فازی» اگر با تطبیق فازی جفت شده، «شرح» برای بقیه‌ی جفت‌ها و خالی برای آیتم‌های یک‌طرفه.
+    """
+    index = aligned.index
+    paired = aligned["side"].to_numpy() == "both"
+    by_code = (index.isin(pd.unique(np.asarray(prev_coded_keys, dtype=object)))
+               & index.isin(pd.unique(np.asarray(curr_coded_keys, dtype=object))))
+    fuzzy = index.isin(list(fuzzy_keys))
+    return _labels([~paired, fuzzy, by_code], MATCH_LABELS, index)
+
+
+def _labels(conditions: list, labels: tuple, index: pd.Index) -> pd.Series:
+    """برچسب اولین شرط برقرار (آخرین برچسب پیش‌فرض)؛ ستون object تا pandas آن را به str تبدیل نکند"""
+    codes = np.select(conditions, range(len(conditions)), len(conditions))
+    return pd.Series(np.array(labels, dtype=object)[codes], index=index, dtype=object)
+
+
+def _first_positions(codes: np.ndarray, valid: np.ndarray, n: int) -> np.ndarray:
+    """اولین سطر معتبر هر کد (-1 اگر هیچ سطر معتبری نباشد)"""
+    first = np.full(n, -1, dtype=np.int64)
+    positions = np.flatnonzero(valid)
+    # انتساب معکوس: برای کد تکراری آخرین انتساب (یعنی اولین سطر) می‌ماند
+    first[codes[positions[::-1]]] = positions[::-1]
+    return first
+
+
+def _period_totals(codes: np.ndarray, titles: pd.Series, amounts: pd.Series, n: int) -> tuple:
+    """جمع مبلغ، تعداد سطر و اولین شرح غیرخالی هر کد در یک دوره"""
+    amount = np.bincount(codes, weights=np.nan_to_num(amounts.to_numpy(dtype=float)), minlength=n)
+    count = np.bincount(codes, minlength=n)
+    first = _first_positions(codes, titles.notna().to_numpy(), n)
+    # copy: ستون object با copy-on-write آرایه‌ی فقط‌خواندنی می‌دهد
+    title = titles.iloc[np.maximum(first, 0)].to_numpy(dtype=object, copy=True) if len(titles) else np.full(n, None)
+    title[first < 0] = None
+    return amount, count, title
+
+
+def _first_groups(codes: np.ndarray, groups: pd.Series, n: int) -> np.ndarray:
+    """اولین گروه غیرخالی هر کد در یک دوره (رشته‌ی خالی اگر نباشد)"""
+    values = groups.to_numpy(dtype=object)
+    first = _first_positions(codes, values != "", n)
+    out = values[np.maximum(first, 0)] if len(values) else np.full(n, "", dtype=object)
+    out[first < 0] = ""
+    return out
+
+
+def empty_key_mask(keys) -> np.ndarray:
+    """سطرهای با کلید شرح خالی (EMPTY_KEY_PREFIX + ایندکس سطر)"""
+    keys = np.asarray(keys, dtype=object)
+    return np.fromiter((isinstance(k, str) and k.startswith(EMPTY_KEY_PREFIX) for k in keys),
+                       dtype=bool, count=len(keys))
+
+
+def _split_empty_keys(codes: np.ndarray, uniques: np.ndarray, n_prev: int) -> tuple:
+    """
+    کلید شرح خالی فقط ایندکس سطر است؛ سطرهای خالی هم‌ایندکس دو فایل ربطی به هم ندارند. سطر دوره‌ی
+    جدید با چنین کلید مشترکی کد جدا (کلید + CURRENT_EMPTY_SUFFIX) می‌گیرد تا حذف و اضافه گزارش شود.
+    """
+    n = len(uniques)
+    shared = (np.bincount(codes[:n_prev], minlength=n) > 0) & (np.bincount(codes[n_prev:], minlength=n) > 0)
+    shared[shared] = empty_key_mask(uniques[shared])
+    split = np.flatnonzero(shared)
+    if not len(split):
+        return codes, uniques
+    remap = np.arange(n)
+    remap[split] = n + np.arange(len(split))
+    codes = np.concatenate([codes[:n_prev], remap[codes[n_prev:]]])
+    moved = np.array([f"{k}{CURRENT_EMPTY_SUFFIX}" for k in uniques[split].tolist()], dtype=object)
+    return codes, np.concatenate([np.asarray(uniques, dtype=object), moved])
+
+
+def _ordinals(codes: np.ndarray) -> np.ndarray:
+    """شماره‌ی تکرار هر سطر در بین سطرهای هم‌کد (۰ برای اولین رخداد)"""
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    group_start = np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+    ordinals = np.empty_like(codes)
+    ordinals[order] = np.arange(len(codes)) - group_start
+    return ordinals
+
+
+def _ordinal_codes(codes: np.ndarray, uniques: np.ndarray, n_prev: int) -> tuple:
+    """
+    کد (کلید، شماره‌ی تکرار)؛ شماره‌ی تکرار در هر دوره جدا شمرده می‌شود.
+    برچسب رخداد اول همان کلید است و رخدادهای بعدی «کلید #n» می‌گیرند.
+    """
+    n = len(uniques)
+    ordinals = np.concatenate([_ordinals(codes[:n_prev]), _ordinals(codes[n_prev:])])
+    new_codes, composite = pd.factorize(ordinals.astype(np.int64) * n + codes)
+    labels = uniques[composite % n].astype(object)
+    occurrence = composite // n + 1
+    for i in np.flatnonzero(occurrence > 1):
+        labels[i] = f"{labels[i]} #{occurrence[i]}"
+    return new_codes, labels, occurrence
+
+
+def alignment_report(prev_count: np.ndarray, curr_count: np.ndarray, mode: str, aligned_rows: int) -> dict:
+    """
+    سطرهایی که ادغام سطربه‌سطر روی همین کلیدها می‌ساخت (ضرب تعداد تکرارها در دو دوره)؛
+    prev_count/curr_count تعداد سطرهای هر کلید در هر دوره است.
+    """
+    input_rows = int(prev_count.sum() + curr_count.sum())
+    merge_rows = int(np.maximum(prev_count, 1) @ np.maximum(curr_count, 1)
+                     - ((prev_count == 0) & (curr_count == 0)).sum())
+    return {
+        "mode": mode,
+        "duplicate_keys": int(((prev_count > 1) | (curr_count > 1)).sum()),
+        "max_repeats": int(max(prev_count.max(initial=0), curr_count.max(initial=0))),
+        "row_by_row_merge_rows": merge_rows,
+        "aligned_rows": aligned_rows,
+        "explosion_risk": merge_rows > EXPLOSION_FACTOR * max(input_rows, 1),
+    }
+
+
+def compare(prev_keys: pd.Series, prev_titles: pd.Series, prev_amounts: pd.Series,
+            curr_keys: pd.Series, curr_titles: pd.Series, curr_amounts: pd.Series,
+            mode: str = "aggregate", prev_groups: pd.Series = None, curr_groups: pd.Series = None,
+            prev_sheets: pd.Series = None, curr_sheets: pd.Series = None) -> pd.DataFrame:
+    """
+    هم‌ترازی دو دوره؛ یک سطر برای هر کلید (یا هر (کلید، شماره‌ی تکرار) در حالت ordinal) با index
+    کلید و ستون‌های:
+      title (شرح دوره‌ی جدید، برای حذف‌شده‌ها شرح دوره‌ی قبل)، previous، current، difference، status،
+      previous_count / current_count (تعداد سطرهای جمع‌شده در هر دوره)، occurrence (شماره‌ی تکرار؛ ۱ در aggregate)
+      و side مثل indicator در merge: both / left_only / right_only
+    با prev_groups/curr_groups (مثلاً کد کامل فهرست بها برای سرجمع فصل‌ها؛ رشته‌ی خالی یعنی بدون
+    گروه) ستون group هم اضافه می‌شود: اولین گروه غیرخالی هر کلید، با اولویت دوره‌ی جدید.
+    prev_sheets/curr_sheets (نام برگه‌ی Excel هر سطر) به همان ترتیب ستون sheet را می‌سازند.
+    سطرهای با شرح خالی (کلید EMPTY_KEY_PREFIX) جفت نمی‌شوند و حذف/اضافه‌شده حساب می‌شوند.
+    گزارش تکراری‌ها و ریسک انفجار در attrs["alignment"].
+    """
+    if mode not in ALIGN_MODES:
+        raise ValueError(f"unknown align mode: {mode}")
+    n_prev = len(prev_keys)
+    # یک factorize روی کلیدهای هر دو دوره و بعد bincount روی کدهای عددی؛
+    # ترتیب کدها اولین ظهور است، یعنی آیتم‌های دوره‌ی قبل و بعد آیتم‌های جدید
+    codes, uniques = pd.factorize(np.concatenate([
+        prev_keys.to_numpy(dtype=object), curr_keys.to_numpy(dtype=object),
+    ]))
+    codes, uniques = _split_empty_keys(codes, uniques, n_prev)
+    n = len(uniques)
+    key_prev_count = np.bincount(codes[:n_prev], minlength=n)
+    key_curr_count = np.bincount(codes[n_prev:], minlength=n)
+    occurrence = np.ones(n, dtype=np.int64)
+    if mode == "ordinal":
+        codes, uniques, occurrence = _ordinal_codes(codes, uniques, n_prev)
+        n = len(uniques)
+
+    previous, prev_count, prev_title = _period_totals(codes[:n_prev], prev_titles, prev_amounts, n)
+    current, curr_count, curr_title = _period_totals(codes[n_prev:], curr_titles, curr_amounts, n)
+    in_prev = prev_count > 0
+    in_curr = curr_count > 0
+    difference = current - previous
+
+    index = pd.Index(uniques, dtype=object, name="key")
+    aligned = pd.DataFrame({
+        "title": pd.Series(np.where(in_curr, curr_title, prev_title), index=index, dtype=object),
+        "previous": previous,
+        "current": current,
+        "difference": difference,
+        "status": _labels([difference > 0, difference < 0], STATUS_LABELS, index),
+        "side": _labels([in_prev & in_curr, in_prev], SIDE_LABELS, index),
+        "previous_count": prev_count,
+        "current_count": curr_count,
+        "occurrence": occurrence,
+    }, index=index)
+    if prev_groups is not None and curr_groups is not None:
+        prev_group = _first_groups(codes[:n_prev], prev_groups, n)
+        curr_group = _first_groups(codes[n_prev:], curr_groups, n)
+        aligned["group"] = pd.Series(np.where(curr_group != "", curr_group, prev_group), index=index, dtype=object)
+    if prev_sheets is not None and curr_sheets is not None:
+        prev_sheet = _first_groups(codes[:n_prev], prev_sheets, n)
+        curr_sheet = _first_groups(codes[n_prev:], curr_sheets, n)
+        aligned["sheet"] = pd.Series(np.where(curr_sheet != "", curr_sheet, prev_sheet), index=index, dtype=object)
+    aligned.attrs["alignment"] = alignment_report(key_prev_count, key_curr_count, mode, n)
+    return aligned
+
+
+def summarize(aligned: pd.DataFrame) -> dict:
+    total_prev = float(aligned["previous"].sum())
+    total_curr = float(aligned["current"].sum())
+    diff = total_curr - total_prev
+    return {
+        "previous_sum": total_prev,
+        "current_sum": total_curr,
+        "difference": diff,
+        "progress_percent": round((diff / total_prev * 100), 2) if total_prev != 0 else None,
+    }
+
+
+def display_rows(aligned: pd.DataFrame) -> pd.DataFrame:
+    """جدول نمایش با نام ستون‌های فارسی (بدون NaN)؛ ستون مبنای تطبیق و برگه اگر محاسبه شده باشند"""
+    titles = aligned["title"].to_numpy(dtype=object).copy()
+    missing = pd.isna(titles)
+    titles[missing] = ""
+    if not all(isinstance(t, str) for t in titles):
+        titles = np.array([str(t) for t in titles], dtype=object)
+    return pd.DataFrame({
+        TITLE_COL: pd.Series(titles, dtype=object),
+        PREVIOUS_COL: aligned["previous"].to_numpy(),
+        CURRENT_COL: aligned["current"].to_numpy(),
+        DIFFERENCE_COL: aligned["difference"].to_numpy(),
+        STATUS_COL: pd.Series(aligned["status"].to_numpy(dtype=object), dtype=object),
+        **({MATCH_COL: pd.Series(aligned["match"].to_numpy(dtype=object), dtype=object)}
+           if "match" in aligned else {}),
+        **({SHEET_COL: pd.Series(aligned["sheet"].to_numpy(dtype=object), dtype=object)}
+           if "sheet" in aligned else {}),
+    })
+
+
+def changes(aligned: pd.DataFrame, side: str) -> pd.DataFrame:
+    """آیتم‌های فقط در یک دوره (key، title، amount)، مرتب بر اساس کلید"""
+    rows = aligned[aligned["side"] == side]
+    amount = rows["current"] if side == "right_only" else rows["previous"]
+    out = pd.DataFrame({"key": rows.index.to_numpy(), "title": rows["title"].to_numpy(), "amount": amount.to_numpy()})
+    return out.sort_values("key", kind="stable").reset_index(drop=True)
@@ -0,0 +1,381 @@
+"""
+موتور فرمول قیمت (PriceItem.formula و Formula.expression).
+
+فرمول یک عبارت حسابی است با متغیرهای {نام} (مقدار از quantities درخواست و parameters آیتم) و
+توابع و ثابت‌های math، مثلاً math.ceil({طول} / 2) * {ضخامت}. هر فرمول یک بار به AST تجزیه و
+بررسی می‌شود؛ فقط عدد، متغیر، عملگرهای حسابی و مقایسه، and/or/not، «a if c else b» و
+math.<تابع یا ثابت> مجاز است و هر نام یا ساختار دیگری همان موقع با FormulaError رد می‌شود.
+خروجی یک تابع پایتون (lambda با متغیرها به‌عنوان آرگومان) است که در هر محاسبه بدون تجزیه‌ی
+دوباره صدا زده می‌شود. برای محاسبه‌ی دسته‌ای (evaluate_many) همان درخت یک بار به نسخه‌ی NumPy
+تبدیل می‌شود (math.* → ufunc، a if c else b → np.where، and/or/not و مقایسه‌ی زنجیره‌ای → عملگرهای
+منطقی عنصربه‌عنصر) و فرمول یک بار روی آرایه‌ی مقادیر همه‌ی سطرها اجرا می‌شود.
+
+فرمول‌های کامپایل‌شده در FormulaCache با کلید (نوع، شناسه، نسخه) نگه داشته می‌شوند؛ نسخه خود متن
+فرمول است تا ویرایش فرمول در پایگاه داده بدون پاک کردن cache کامپایل دوباره بخواهد (hash رشته
+در خود رشته نگه داشته می‌شود، پس ساختن کلید در هر درخواست هزینه‌ای ندارد).
+"""
+import ast
+import math
+import re
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# ---------- تنظیمات ----------
+CACHE_SIZE = 4096              # تعداد فرمول کامپایل‌شده در حافظه (LRU)
+MAX_FORMULA_LENGTH = 2000      # نویسه
+MAX_EXPONENT = 1000            # سقف توان در **؛ جلوی عددهای غول‌آسا و قفل شدن worker را می‌گیرد
+# --------------------------------
+
+_VARIABLE_RE = re.compile(r"\{([^{}]+)\}")
+_VAR_PREFIX = "_var_"
+# توابع و ثابت‌های مجاز math؛ توابع کند روی عدد صحیح بزرگ (factorial، comb، ...) عمداً نیستند
+MATH_NAMES = frozenset((
+    "ceil", "floor", "trunc", "fabs", "sqrt", "exp", "log", "log10", "log2", "pow", "hypot",
+    "sin", "cos", "tan", "asin", "acos", "atan", "atan2", "degrees", "radians",
+    "pi", "e", "tau", "inf",
+))
+_BIN_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_UNARY_OPS = (ast.UAdd, ast.USub, ast.Not)
+_COMPARE_OPS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+Number = Union[int, float]
+_MISSING = object()
+_NUMERIC_TYPES = {int, float}
+
+
+class FormulaError(ValueError):
+    """فرمول نامعتبر (هنگام کامپایل) یا خطای محاسبه (متغیر بدون مقدار، تقسیم بر صفر، ...)"""
+
+
+def _pow(base: Number, exponent: Number) -> Number:
+    if abs(exponent) > MAX_EXPONENT:
+        raise FormulaError(f"توان {exponent} بیش از حد مجاز است.")
+    # با float (مثل np.power در _vpow)؛ با int توان‌های تو در تو ((a**999)**999) عدد چند میلیون‌بیتی می‌سازند
+    try:
+        result = float(base) ** float(exponent)
+    except OverflowError:
+        raise FormulaError(f"حاصل {base} به توان {exponent} بیش از حد بزرگ است.")
+    if isinstance(result, complex):
+        raise FormulaError(f"توان {exponent} از عدد منفی {base} عدد حقیقی نیست.")
+    return result
+
+
+def _vpow(base: np.ndarray, exponent: np.ndarray) -> np.ndarray:
+    # توان بیش از سقف برای همان سطرها NaN (خطای سطر) می‌شود
+    return np.where(np.abs(exponent) <= MAX_EXPONENT, np.power(base, np.minimum(exponent, MAX_EXPONENT)), np.nan)
+
+
+def _vand(*values: np.ndarray) -> np.ndarray:
+    # مثل and پایتون: اولین مقدار نادرست، وگرنه آخرین مقدار
+    result = values[-1]
+    for value in reversed(values[:-1]):
+        result = np.where(value, result, value)
+    return result
+
+
+def _vor(*values: np.ndarray) -> np.ndarray:
+    result = values[-1]
+    for value in reversed(values[:-1]):
+        result = np.where(value, value, result)
+    return result
+
+
+def _vlog(x: np.ndarray, base: Optional[np.ndarray] = None) -> np.ndarray:
+    return np.log(x) if base is None else np.log(x) / np.log(base)
+
+
+# همتای NumPy توابع MATH_NAMES
+_NP_MATH = SimpleNamespace(
+    ceil=np.ceil, floor=np.floor, trunc=np.trunc, fabs=np.fabs, sqrt=np.sqrt, exp=np.exp, log=_vlog,
+    log10=np.log10, log2=np.log2, pow=np.power, hypot=np.hypot,
+    sin=np.sin, cos=np.cos, tan=np.tan, asin=np.arcsin, acos=np.arccos, atan=np.arctan, atan2=np.arctan2,
+    degrees=np.degrees, radians=np.radians,
+    pi=math.pi, e=math.e, tau=math.tau, inf=math.inf,
+)
+
+
+def _call(name: str, args: list, node: ast.AST) -> ast.Call:
+    return ast.copy_location(ast.Call(ast.Name(name, ast.Load()), args, []), node)
+
+
+class _Vectorizer(ast.NodeTransformer):
+    """درخت بررسی‌شده (خروجی _Validator) → عبارت عنصربه‌عنصر روی آرایه‌های NumPy"""
+
+    def visit_Constant(self, node):
+        # عدد صحیح پایتون در NumPy int64 می‌شود: 2 ** -1 خطا، 2 ** 70 سرریز بی‌صدا؛ مثل _pow همه float
+        return ast.copy_location(ast.Constant(float(node.value)), node)
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if isinstance(node.func, ast.Name) and node.func.id == "_pow":
+            node.func.id = "_vpow"
+        return node
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        return _call("_vwhere", [node.test, node.body, node.orelse], node)
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        return _call("_vand" if isinstance(node.op, ast.And) else "_vor", node.values, node)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return _call("_vnot", [node.operand], node)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        # a < b < c → (a < b) & (b < c)
+        operands = [node.left] + node.comparators
+        pairs = [ast.Compare(operands[i], [op], [operands[i + 1]]) for i, op in enumerate(node.ops)]
+        return _call("_vand", pairs, node)
+
+
+_VECTOR_SCOPE = {"__builtins__": {}, "math": _NP_MATH, "_vpow": _vpow, "_vand": _vand, "_vor": _vor,
+                 "_vwhere": np.where, "_vnot": np.logical_not}
+
+
+def _as_function(body: ast.expr, arity: int, scope: dict):
+    """عبارت با متغیرهای _var_0.._var_n → تابع پایتون با همان تعداد آرگومان"""
+    args = ast.arguments(posonlyargs=[], args=[ast.arg(f"{_VAR_PREFIX}{i}") for i in range(arity)],
+                         kwonlyargs=[], kw_defaults=[], defaults=[])
+    wrapper = ast.fix_missing_locations(ast.Expression(ast.Lambda(args, body)))
+    return eval(compile(wrapper, "<formula>", "eval"), dict(scope))
+
+
+def _number(name: str, value) -> Number:
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    raise FormulaError(f"مقدار متغیر «{name}» عددی نیست: {value!r}")
+
+
+class _Validator(ast.NodeTransformer):
+    """بررسی گره‌ها با فهرست مجاز و تبدیل a ** b به _pow(a, b)"""
+
+    def __init__(self, variables: frozenset):
+        self.variables = variables
+
+    def generic_visit(self, node):
+        raise FormulaError(f"ساختار «{type(node).__name__}» در فرمول مجاز نیست.")
+
+    def visit_Expression(self, node):
+        node.body = self.visit(node.body)
+        return node
+
+    def visit_Constant(self, node):
+        if type(node.value) not in (int, float, bool):
+            raise FormulaError(f"مقدار {node.value!r} در فرمول مجاز نیست؛ فقط عدد.")
+        return node
+
+    def visit_Name(self, node):
+        if node.id not in self.variables:
+            raise FormulaError(f"نام «{node.id}» در فرمول شناخته‌شده نیست؛ متغیرها به شکل {{نام}} نوشته می‌شوند.")
+        return node
+
+    def visit_Attribute(self, node):
+        if not (isinstance(node.value, ast.Name) and node.value.id == "math" and node.attr in MATH_NAMES):
+            raise FormulaError(f"«.{node.attr}» در فرمول مجاز نیست؛ فقط توابع و ثابت‌های math.")
+        return node
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Attribute) or node.keywords:
+            callee = getattr(node.func, "attr", None) or getattr(node.func, "id", "")
+            raise FormulaError(f"فراخوانی «{callee}» مجاز نیست؛ فقط math.<تابع>(...) بدون آرگومان نام‌دار.")
+        node.func = self.visit(node.func)
+        if not callable(getattr(math, node.func.attr)):
+            raise FormulaError(f"math.{node.func.attr} تابع نیست.")
+        node.args = [self.visit(arg) for arg in node.args]
+        return node
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _BIN_OPS):
+            raise FormulaError(f"عملگر «{type(node.op).__name__}» در فرمول مجاز نیست.")
+        left, right = self.visit(node.left), self.visit(node.right)
+        if isinstance(node.op, ast.Pow):
+            return ast.copy_location(ast.Call(ast.Name("_pow", ast.Load()), [left, right], []), node)
+        node.left, node.right = left, right
+        return node
+
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, _UNARY_OPS):
+            raise FormulaError(f"عملگر «{type(node.op).__name__}» در فرمول مجاز نیست.")
+        node.operand = self.visit(node.operand)
+        return node
+
+    def visit_Compare(self, node):
+        if not all(isinstance(op, _COMPARE_OPS) for op in node.ops):
+            raise FormulaError("فقط مقایسه‌ی عددی (== != < <= > >=) در فرمول مجاز است.")
+        node.left = self.visit(node.left)
+        node.comparators = [self.visit(c) for c in node.comparators]
+        return node
+
+    def visit_BoolOp(self, node):
+        node.values = [self.visit(v) for v in node.values]
+        return node
+
+    def visit_IfExp(self, node):
+        node.test, node.body, node.orelse = self.visit(node.test), self.visit(node.body), self.visit(node.orelse)
+        return node
+
+
+class CompiledFormula:
+    """فرمول بررسی‌شده و کامپایل‌شده؛ variables نام متغیرهای {نام} به ترتیب اولین ظهور"""
+
+    __slots__ = ("source", "variables", "tree", "_fn", "_vector_fn")
+
+    def __init__(self, source: str, variables: Tuple[str, ...], tree: ast.Expression):
+        self.source = source
+        self.variables = variables
+        self.tree = tree
+        self._fn = _as_function(tree.body, len(variables), {"__builtins__": {}, "math": math, "_pow": _pow})
+        self._vector_fn = None
+
+    def evaluate(self, values: Dict[str, object]) -> Number:
+        """محاسبه با مقدار متغیرها (عدد یا رشته‌ی عددی)؛ متغیر اضافه نادیده گرفته می‌شود"""
+        args = []
+        for name in self.variables:
+            value = values.get(name, _MISSING)
+            if type(value) not in (int, float):
+                if value is _MISSING:
+                    raise FormulaError(f"متغیر «{name}» مقدار ندارد.")
+                value = _number(name, value)
+            args.append(value)
+        try:
+            return self._fn(*args)
+        except FormulaError:
+            raise
+        except (ArithmeticError, ValueError, TypeError) as e:
+            raise FormulaError(f"خطا در محاسبه فرمول: {e}")
+
+    def evaluate_arrays(self, columns: Sequence[np.ndarray]) -> np.ndarray:
+        """
+        محاسبه‌ی عنصربه‌عنصر روی آرایه‌های float64 هم‌طول، هم‌ترتیب variables (بدون متغیر: columns=[]
+        و نتیجه یک مقدار)؛ سطری که نتیجه‌اش عدد متناهی نیست (تقسیم بر صفر، ریشه‌ی منفی، ...) NaN یا inf می‌شود.
+        """
+        if self._vector_fn is None:
+            body = _Vectorizer().visit(ast.parse(ast.unparse(self.tree), mode="eval")).body
+            self._vector_fn = _as_function(body, len(self.variables), _VECTOR_SCOPE)
+        with np.errstate(all="ignore"):
+            return np.asarray(self._vector_fn(*columns), dtype=np.float64)
+
+    def evaluate_many(self, rows: Sequence[Dict[str, object]]) -> Tuple[np.ndarray, List[Optional[str]]]:
+        """
+        محاسبه‌ی دسته‌ای: مقدار متغیرهای هر سطر از dict همان سطر. خروجی: (نتیجه‌ها، خطای هر سطر)؛
+        نتیجه‌ی سطر دارای خطا NaN است.
+        """
+        n = len(rows)
+        errors: List[Optional[str]] = [None] * n
+        columns = []
+        for name in self.variables:
+            raw = [values.get(name, _MISSING) for values in rows]
+            if set(map(type, raw)) <= _NUMERIC_TYPES:
+                columns.append(np.array(raw, dtype=np.float64))
+                continue
+            # مقدار ناموجود یا رشته‌ای: تبدیل و خطای سطر به سطر
+            column = np.empty(n, dtype=np.float64)
+            for i, value in enumerate(raw):
+                if type(value) not in (int, float):
+                    if value is _MISSING:
+                        errors[i] = errors[i] or f"متغیر «{name}» مقدار ندارد."
+                        value = np.nan
+                    else:
+                        try:
+                            value = _number(name, value)
+                        except FormulaError as e:
+                            errors[i] = errors[i] or str(e)
+                            value = np.nan
+                column[i] = value
+            columns.append(column)
+        try:
+            results = np.broadcast_to(self.evaluate_arrays(columns), (n,)).copy()
+        except (ArithmeticError, ValueError, TypeError) as e:
+            # خطایی که عنصربه‌عنصر نیست (مثل evaluate، FormulaError) برای همه‌ی سطرها
+            message = f"خطا در محاسبه فرمول: {e}"
+            return np.full(n, np.nan), [error or message for error in errors]
+        invalid = ~np.isfinite(results)
+        for i in np.flatnonzero(invalid):
+            if errors[i] is None:
+                errors[i] = "خطا در محاسبه فرمول: نتیجه عدد متناهی نیست (تقسیم بر صفر یا ورودی خارج از دامنه)."
+        results[invalid] = np.nan
+        return results, errors
+
+
+def compile_formula(source: str) -> CompiledFormula:
+    """تجزیه و بررسی فرمول؛ FormulaError برای نحو نادرست یا نام و ساختار غیرمجاز"""
+    if not source or not source.strip():
+        raise FormulaError("فرمول خالی است.")
+    if len(source) > MAX_FORMULA_LENGTH:
+        raise FormulaError(f"فرمول بیش از {MAX_FORMULA_LENGTH} نویسه است.")
+    variables: Dict[str, str] = {}
+
+    def _placeholder(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in variables:
+            variables[name] = f"{_VAR_PREFIX}{len(variables)}"
+        return variables[name]
+
+    text = _VARIABLE_RE.sub(_placeholder, source)
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as e:
+        raise FormulaError(f"نحو فرمول نادرست است: {e.msg}")
+    tree = ast.fix_missing_locations(_Validator(frozenset(variables.values())).visit(tree))
+    return CompiledFormula(source, tuple(variables), tree)
+
+
+class FormulaCache:
+    """فرمول‌های کامپایل‌شده با کلید (نوع، شناسه، نسخه)؛ فرمول نامعتبر هم با خطایش نگه داشته می‌شود"""
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, Union[CompiledFormula, FormulaError]]" = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0}
+
+    def get(self, kind: str, key: Hashable, source: str) -> CompiledFormula:
+        cache_key = (kind, key, source)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                self._counters["hits"] += 1
+        if entry is None:
+            try:
+                entry = compile_formula(source)
+            except FormulaError as e:
+                entry = e
+            with self._lock:
+                self._counters["misses"] += 1
+                self._entries[cache_key] = entry
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        if isinstance(entry, FormulaError):
+            raise FormulaError(str(entry))
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "size": self.size, **self._counters}
+
+
+formula_cache = FormulaCache()
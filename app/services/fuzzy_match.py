@@ -0,0 +1,126 @@
+"""
+تطبیق فازی آیتم‌هایی که بعد از ادغام دقیق جفت نشده‌اند.
+
+کلیدهای نرمال‌شده (خروجی build_merge_key_column) به مجموعه‌ی n-gram حرفی تبدیل
+می‌شوند و شباهت با ضریب Jaccard سنجیده می‌شود. برای اینکه همه‌ی جفت‌ها مقایسه نشوند
+یک ایندکس blocking از نوع MinHash LSH روی همین n-gramها ساخته می‌شود: امضای هر کلید
+به چند باند تقسیم می‌شود و فقط کلیدهایی که دست‌کم در یک باند هم‌سطل‌اند کاندید
+هستند. احتمال هم‌سطل شدن با شباهت به‌شدت بالا می‌رود، پس جفت‌های شبیه تقریباً همیشه
+پیدا می‌شوند و تعداد مقایسه‌های دقیق (و زمان اجرا) تقریباً خطی می‌ماند.
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+# ---------- تنظیمات ----------
+NGRAM_SIZE = 3
+DEFAULT_THRESHOLD = 0.6
+NUM_BANDS = 20           # تعداد باندهای LSH
+BAND_ROWS = 3            # تعداد مقدار MinHash در هر باند
+MAX_BUCKET_SIZE = 64     # سطل‌های بزرگ‌تر (متن‌های خیلی کلی) در blocking استفاده نمی‌شوند
+MAX_CANDIDATES = 10      # حداکثر کاندید بررسی‌شده برای هر کلید قبلی
+# --------------------------------
+
+MATCH_COLUMNS = ["previous_key", "current_key", "score"]
+
+_rng = np.random.default_rng(20240601)
+# ضرایب hash ضربی-شیفتی (ضریب فرد ۶۴ بیتی)؛ ضرب uint64 در numpy خودش سرریز را می‌پیچاند
+_HASH_A = _rng.integers(1, 2**63, size=NUM_BANDS * BAND_ROWS, dtype=np.uint64) | np.uint64(1)
+_HASH_B = _rng.integers(0, 2**63, size=NUM_BANDS * BAND_ROWS, dtype=np.uint64)
+_BAND_MIX = _rng.integers(1, 2**63, size=BAND_ROWS, dtype=np.uint64) | np.uint64(1)
+
+
+def char_ngrams(text: str, n: int = NGRAM_SIZE) -> frozenset:
+    """مجموعه‌ی n-gramهای حرفی؛ ابتدا و انتهای متن با فاصله پر می‌شود تا کلمات کوتاه هم n-gram داشته باشند"""
+    padded = f" {text} "
+    if len(padded) <= n:
+        return frozenset((padded,))
+    return frozenset(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def _minhash_bands(grams: List[frozenset], gram_ids: Dict[str, int]) -> np.ndarray:
+    """کلید سطل هر سند در هر باند: آرایه‌ی (تعداد سند × NUM_BANDS)"""
+    sizes = np.fromiter((len(g) for g in grams), dtype=np.int64, count=len(grams))
+    ids = np.fromiter((gram_ids[g] for gs in grams for g in gs), dtype=np.uint64, count=int(sizes.sum()))
+    starts = np.r_[0, np.cumsum(sizes)[:-1]]
+    signature = np.empty((len(grams), NUM_BANDS * BAND_ROWS), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for h in range(NUM_BANDS * BAND_ROWS):
+            signature[:, h] = np.minimum.reduceat(_HASH_A[h] * ids + _HASH_B[h], starts)
+        bands = signature.reshape(len(grams), NUM_BANDS, BAND_ROWS) * _BAND_MIX
+    return np.bitwise_xor.reduce(bands, axis=2)
+
+
+def _bucket_frame(bands: np.ndarray) -> pd.DataFrame:
+    docs, band_no = np.indices(bands.shape)
+    return pd.DataFrame({"band": band_no.ravel(), "bucket": bands.ravel(), "doc": docs.ravel()})
+
+
+def reconcile(
+    previous_keys: Sequence[str],
+    current_keys: Sequence[str],
+    threshold: float = DEFAULT_THRESHOLD,
+    n: int = NGRAM_SIZE,
+) -> pd.DataFrame:
+    """
+    جفت کردن یک‌به‌یک کلیدهای قبلی و جدید با شباهت Jaccard روی n-gramها.
+    خروجی: DataFrame با ستون‌های previous_key / current_key / score (نزولی بر اساس score).
+    """
+    prev = [k for k in dict.fromkeys(previous_keys) if k]
+    curr = [k for k in dict.fromkeys(current_keys) if k]
+    if not prev or not curr:
+        return pd.DataFrame(columns=MATCH_COLUMNS)
+
+    prev_grams = [char_ngrams(k, n) for k in prev]
+    curr_grams = [char_ngrams(k, n) for k in curr]
+    gram_ids: Dict[str, int] = {}
+    for grams in (prev_grams, curr_grams):
+        for gs in grams:
+            for g in gs:
+                gram_ids.setdefault(g, len(gram_ids))
+
+    buckets_prev = _bucket_frame(_minhash_bands(prev_grams, gram_ids))
+    buckets_curr = _bucket_frame(_minhash_bands(curr_grams, gram_ids))
+    # سطل‌های خیلی بزرگ کنار گذاشته می‌شوند تا تعداد جفت‌ها خطی بماند
+    for frame in (buckets_prev, buckets_curr):
+        size = frame.groupby(["band", "bucket"], sort=False)["doc"].transform("size")
+        frame.drop(frame.index[size > MAX_BUCKET_SIZE], inplace=True)
+    pairs = pd.merge(buckets_prev, buckets_curr, on=["band", "bucket"], suffixes=("_prev", "_curr"))
+    if pairs.empty:
+        return pd.DataFrame(columns=MATCH_COLUMNS)
+
+    # برای هر کلید قبلی فقط چند کاندید با بیشترین باند مشترک بررسی دقیق می‌شوند
+    shared = pairs.groupby(["doc_prev", "doc_curr"], sort=False).size().rename("shared").reset_index()
+    candidates = (
+        shared.sort_values(["doc_prev", "shared"], ascending=[True, False], kind="stable")
+              .groupby("doc_prev", sort=False)
+              .head(MAX_CANDIDATES)
+    )
+
+    # فیلتر طول: اگر Jaccard >= t باشد، t <= |B|/|A| <= 1/t
+    len_prev = np.array([len(g) for g in prev_grams])
+    len_curr = np.array([len(g) for g in curr_grams])
+    i = candidates["doc_prev"].to_numpy()
+    j = candidates["doc_curr"].to_numpy()
+    a, b = len_prev[i], len_curr[j]
+    ok = (b >= threshold * a) & (a >= threshold * b)
+    i, j, a, b = i[ok], j[ok], a[ok], b[ok]
+
+    inter = np.fromiter((len(prev_grams[x] & curr_grams[y]) for x, y in zip(i.tolist(), j.tolist())),
+                        dtype=np.int64, count=len(i))
+    score = inter / (a + b - inter)
+    ok = score >= threshold
+    i, j, score = i[ok], j[ok], score[ok]
+
+    # انتخاب حریصانه‌ی یک‌به‌یک: بیشترین شباهت اول
+    order = np.lexsort((j, i, -score))
+    used_prev, used_curr, matches = set(), set(), []
+    for x, y, sc in zip(i[order].tolist(), j[order].tolist(), score[order].tolist()):
+        if x in used_prev or y in used_curr:
+            continue
+        used_prev.add(x)
+        used_curr.add(y)
+        matches.append((prev[x], curr[y], round(sc, 4)))
+
+    return pd.DataFrame(matches, columns=MATCH_COLUMNS)
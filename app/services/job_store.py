@@ -0,0 +1,221 @@
+"""
+وضعیت کارهای پس‌زمینه (مثلاً ساخت گزارش xlsx/pdf) روی دیسک محلی.
+
+هر کار یک پوشه دارد: state.json (وضعیت، پیشرفت، زمان‌ها، خطا) و فایل‌های ورودی/خروجی
+همان کار (مثلاً جدول نتیجه به‌صورت parquet). وضعیت فایل-محور است تا worker داخل process
+pool هم بتواند پیشرفت را ثبت کند و همه‌ی پروسه‌ها یک دید داشته باشند؛ نوشتن state با فایل
+موقت و os.replace اتمی است. کارها ttl ثانیه بعد از آخرین تغییر وضعیت (همراه فایل‌هایشان)
+حذف می‌شوند؛ کار نیمه‌تمامی که بعد از restart رها شده هم همین‌طور.
+
+چرخه‌ی یک کار: create (queued) → start در worker (running) → reporter برای پیشرفت →
+finish (done) یا fail (failed) در پروسه‌ی اصلی.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from typing import Optional
+
+import pandas as pd
+
+from app.core.config import settings
+
+try:  # parquet نیاز به pyarrow دارد؛ اگر نصب نبود جدول‌ها با pickle ذخیره می‌شوند
+    import pyarrow  # noqa: F401
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+    # pickle کندتر و حجیم‌تر از parquet است؛ در requirements.txt هست و نبودنش یعنی نصب ناقص
+    logging.getLogger(__name__).warning("pyarrow نصب نیست؛ نتایج کارهای پس‌زمینه با pickle ذخیره می‌شوند (کندتر و حجیم‌تر).")
+
+# ---------- تنظیمات ----------
+PROGRESS_INTERVAL_SECONDS = 0.5   # ثبت پیشرفت حداکثر هر چند ثانیه یک بار
+CLEANUP_INTERVAL_SECONDS = 60
+# --------------------------------
+
+TERMINAL_STATUSES = ("done", "failed")
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class JobCancelled(Exception):
+    """کار قبلاً (مثلاً با timeout) پایان‌یافته علامت خورده؛ worker ادامه نمی‌دهد"""
+
+
+class JobStore:
+    def __init__(self, directory: str, ttl_seconds: float):
+        self.directory = directory
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._cleaned_at = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _dir(self, job_id: str) -> str:
+        return os.path.join(self.directory, job_id)
+
+    def path(self, job_id: str, name: str) -> str:
+        """مسیر یک فایل داخل پوشه‌ی کار"""
+        return os.path.join(self._dir(job_id), name)
+
+    def _write(self, state: dict) -> None:
+        path = self.path(state["id"], "state.json")
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def create(self, kind: str, **params) -> dict:
+        self.cleanup()
+        now = time.time()
+        state = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": "queued",
+            "created_at": now,
+            "updated_at": now,
+            "progress": {"stage": "queued", "done": 0, "total": 0, "percent": 0.0},
+            "started_at": None,
+            "finished_at": None,
+            "stages": {},
+            "params": params,
+            "result": None,
+            "error": None,
+        }
+        os.makedirs(self._dir(state["id"]))
+        self._write(state)
+        return state
+
+    def get(self, job_id: str) -> Optional[dict]:
+        # شناسه از URL می‌آید؛ فقط hex معتبر به مسیر فایل تبدیل می‌شود
+        if not _JOB_ID_RE.match(job_id):
+            return None
+        try:
+            with open(self.path(job_id, "state.json"), encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        state["expires_at"] = state["updated_at"] + self.ttl
+        state["timing"] = self._timing(state)
+        return state
+
+    @staticmethod
+    def _timing(state: dict) -> dict:
+        """زمان انتظار در صف، زمان اجرا (تا الان یا تا پایان) و زمان مراحلی که worker ثبت کرده"""
+        started, finished = state.get("started_at"), state.get("finished_at")
+        now = time.time()
+        queued_until = started or finished or now
+        return {
+            "queued_seconds": round(queued_until - state["created_at"], 3),
+            "run_seconds": round((finished or now) - started, 3) if started else None,
+            "stages": state.get("stages", {}),
+        }
+
+    def update(self, job_id: str, **fields) -> dict:
+        """
+        تغییر وضعیت کار. کاری که پایان‌یافته علامت خورده (done/failed) دیگر از worker
+        به‌روز نمی‌شود (JobCancelled)؛ مثلاً کاری که پروسه‌ی اصلی با timeout شکست‌خورده ثبت کرده.
+        """
+        state = self.get(job_id)
+        if state is None:
+            raise JobCancelled(job_id)
+        if state["status"] in TERMINAL_STATUSES and fields.get("status") not in TERMINAL_STATUSES:
+            raise JobCancelled(job_id)
+        state.pop("expires_at", None)
+        state.pop("timing", None)
+        state.update(fields, updated_at=time.time())
+        self._write(state)
+        return state
+
+    def start(self, job_id: str) -> None:
+        """اجرا داخل worker، قبل از شروع کار"""
+        self.update(job_id, status="running", started_at=time.time())
+
+    def finish(self, job_id: str, result: dict, stages: Optional[dict] = None) -> dict:
+        fields = {"stages": stages} if stages is not None else {}
+        # آخرین مرحله‌ی worker ممکن است پیش از ۱۰۰٪ ثبت شده باشد (ثبت پیشرفت محدود است)
+        progress = {"stage": "done", "done": 1, "total": 1, "percent": 100.0}
+        return self.update(job_id, status="done", finished_at=time.time(), result=result, progress=progress, **fields)
+
+    def fail(self, job_id: str, status_code: int, detail: str) -> dict:
+        return self.update(job_id, status="failed", finished_at=time.time(),
+                           error={"status_code": status_code, "detail": detail})
+
+    # ---------- فایل‌های کار ----------
+    def write_frame(self, job_id: str, name: str, df: pd.DataFrame) -> None:
+        path = self.path(job_id, f"{name}.{'parquet' if _HAS_PYARROW else 'pkl'}")
+        if _HAS_PYARROW:
+            df.to_parquet(path, index=False)
+        else:
+            df.to_pickle(path)
+
+    def read_frame(self, job_id: str, name: str) -> pd.DataFrame:
+        path = self.path(job_id, f"{name}.{'parquet' if _HAS_PYARROW else 'pkl'}")
+        return pd.read_parquet(path) if _HAS_PYARROW else pd.read_pickle(path)
+
+    def write_json(self, job_id: str, name: str, obj) -> None:
+        with open(self.path(job_id, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False)
+
+    def read_json(self, job_id: str, name: str):
+        with open(self.path(job_id, f"{name}.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def delete(self, job_id: str) -> bool:
+        if not _JOB_ID_RE.match(job_id) or not os.path.isdir(self._dir(job_id)):
+            return False
+        shutil.rmtree(self._dir(job_id), ignore_errors=True)
+        return True
+
+    def reporter(self, job_id: str, stage: str, start: float = 0.0, end: float = 100.0):
+        """
+        تابع progress(done, total) برای یک مرحله؛ درصد کل کار بین start و end پخش می‌شود.
+        ثبت روی دیسک حداکثر هر PROGRESS_INTERVAL_SECONDS یک بار (و همیشه در پایان مرحله).
+        """
+        last = [0.0]
+
+        def progress(done: int, total: int) -> None:
+            now = time.monotonic()
+            if done < total and now - last[0] < PROGRESS_INTERVAL_SECONDS:
+                return
+            last[0] = now
+            percent = start + (end - start) * (done / total if total else 1.0)
+            self.update(job_id, status="running",
+                        progress={"stage": stage, "done": done, "total": total, "percent": round(percent, 1)})
+
+        return progress
+
+    def cleanup(self, force: bool = False) -> int:
+        """حذف کارهایی که ttl از آخرین تغییرشان گذشته؛ حداکثر هر CLEANUP_INTERVAL_SECONDS یک بار"""
+        now = time.time()
+        with self._lock:
+            if not force and time.monotonic() - self._cleaned_at < CLEANUP_INTERVAL_SECONDS:
+                return 0
+            self._cleaned_at = time.monotonic()
+        removed = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir() or not _JOB_ID_RE.match(entry.name):
+                continue
+            try:
+                updated = os.path.getmtime(os.path.join(entry.path, "state.json"))
+            except OSError:
+                # پوشه‌ای که state ندارد (ساخت نیمه‌کاره)
+                updated = entry.stat().st_mtime
+            if now - updated > self.ttl:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        counts = dict.fromkeys(("queued", "running") + TERMINAL_STATUSES, 0)
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and _JOB_ID_RE.match(entry.name):
+                state = self.get(entry.name)
+                if state is not None:
+                    counts[state["status"]] = counts.get(state["status"], 0) + 1
+        return {"directory": self.directory, "ttl_seconds": self.ttl, **counts}
+
+
+job_store = JobStore(settings.JOB_DIR, settings.JOB_TTL_SECONDS)
@@ -0,0 +1,152 @@
+"""
+مصرف حافظه‌ی پروسه (RSS) و سقف آن برای پردازش صورت وضعیت‌ها.
+
+هر کار سنگین (خواندن و مقایسه در worker) داخل یک MemoryMeter اجرا می‌شود: در ابتدای کار
+اوج RSS پروسه صفر می‌شود (/proc/self/clear_refs در لینوکس) و در نقطه‌های بررسی (checkpoint،
+مثلاً هر چند هزار سطر خواندن فایل و بین مراحل) RSS فعلی با سقف MEMORY_BUDGET_MB مقایسه
+می‌شود؛ عبور از سقف کار را با MemoryBudgetExceeded (413) متوقف می‌کند، پیش از آنکه سیستم‌عامل
+کل سرور را با OOM بکشد. report() اوج واقعی مصرف و RSS هر مرحله را برمی‌گرداند.
+در حالت کم‌حافظه هر checkpoint اول حافظه‌ی آزادشده‌ی pyarrow و malloc را به سیستم‌عامل
+برمی‌گرداند؛ وگرنه RSS حافظه‌ی آزاد ولی نگه‌داشته‌شده را هم می‌شمارد و مرحله‌ی بعد روی آن بالا می‌رود.
+
+سقف روی RSS کل پروسه است: در حالت process pool همان worker، و با COMPARE_WORKERS=0 کل سرور.
+"""
+import ctypes
+import os
+import resource
+import sys
+import threading
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.services.worker_pool import JobError
+
+try:  # pyarrow اختیاری است؛ pool حافظه‌اش بلوک‌های آزادشده را نگه می‌دارد
+    import pyarrow
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+
+try:  # malloc_trim فقط در glibc
+    _malloc_trim = ctypes.CDLL("libc.so.6").malloc_trim
+except (OSError, AttributeError):
+    _malloc_trim = None
+
+# ---------- تنظیمات ----------
+CHECK_EVERY_ROWS = 20_000       # فاصله‌ی بررسی سقف حین خواندن سطرها
+# --------------------------------
+
+_PAGE_MB = os.sysconf("SC_PAGE_SIZE") / 1024 / 1024 if hasattr(os, "sysconf") else 0.0
+_local = threading.local()
+
+
+class MemoryBudgetExceeded(JobError):
+    """مصرف حافظه از MEMORY_BUDGET_MB گذشت (status_code 413)"""
+
+
+def rss_mb() -> Optional[float]:
+    """RSS فعلی پروسه (None اگر در این سیستم‌عامل قابل خواندن نیست)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_MB
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_mb() -> float:
+    """اوج RSS پروسه از آخرین reset_peak (یا از شروع پروسه)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss در لینوکس کیلوبایت و در macOS بایت است
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def release_memory() -> None:
+    """برگرداندن حافظه‌ی آزادشده (pool pyarrow و heap مربوط به malloc) به سیستم‌عامل"""
+    if _HAS_PYARROW:
+        pyarrow.default_memory_pool().release_unused()
+    if _malloc_trim is not None:
+        _malloc_trim(0)
+
+
+def reset_peak() -> bool:
+    """صفر کردن اوج RSS پروسه (لینوکس ۴+)؛ False اگر پشتیبانی نشود"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class MemoryMeter:
+    """
+    اندازه‌گیری حافظه‌ی یک کار؛ با with روی thread جاری فعال می‌شود تا checkpoint در
+    لایه‌های پایین‌تر (مثلاً خواننده‌ی فایل) بدون پاس دادن meter کار کند.
+    """
+
+    def __init__(self, budget_mb: int = settings.MEMORY_BUDGET_MB):
+        self.budget_mb = budget_mb
+        self.peak_reset = False
+        self.start_mb: Optional[float] = None
+        self.stages: Dict[str, float] = {}
+
+    def __enter__(self) -> "MemoryMeter":
+        self.peak_reset = reset_peak()
+        self.start_mb = rss_mb()
+        self._outer = getattr(_local, "meter", None)
+        _local.meter = self
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _local.meter = self._outer
+
+    def check(self, stage: str) -> None:
+        if settings.LOW_MEMORY_MODE:
+            release_memory()
+        current = rss_mb()
+        if current is None:
+            return
+        self.stages[stage] = round(max(current, self.stages.get(stage, 0.0)), 1)
+        if self.budget_mb and current > self.budget_mb:
+            raise MemoryBudgetExceeded(
+                413,
+                f"حافظه‌ی لازم برای پردازش این فایل‌ها بیش از سقف مجاز است "
+                f"({current:.0f} از {self.budget_mb} مگابایت، مرحله‌ی {stage})؛ "
+                f"فایل کوچک‌تری بفرستید یا بعداً دوباره تلاش کنید.",
+            )
+
+    def report(self) -> dict:
+        """خلاصه‌ی مصرف برای پاسخ: سقف، RSS شروع، اوج (از شروع کار اگر reset ممکن بود) و RSS هر مرحله"""
+        return {
+            "low_memory": settings.LOW_MEMORY_MODE,
+            "budget_mb": self.budget_mb or None,
+            "start_rss_mb": None if self.start_mb is None else round(self.start_mb, 1),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "peak_since": "job" if self.peak_reset else "process",
+            "stages": dict(self.stages),
+        }
+
+
+def checkpoint(stage: str) -> None:
+    """بررسی سقف حافظه برای meter فعال thread جاری (بدون meter کاری نمی‌کند)"""
+    meter = getattr(_local, "meter", None)
+    if meter is not None:
+        meter.check(stage)
+
+
+def stats() -> dict:
+    """حافظه‌ی پروسه‌ی اصلی برای endpointهای وضعیت"""
+    current = rss_mb()
+    return {
+        "low_memory": settings.LOW_MEMORY_MODE,
+        "budget_mb": settings.MEMORY_BUDGET_MB or None,
+        "rss_mb": None if current is None else round(current, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
@@ -0,0 +1,301 @@
+"""
+زمان‌سنجی مراحل خط لوله‌ی مقایسه و متریک‌های Prometheus.
+
+هر مرحله‌ی پرهزینه (خواندن فایل، تشخیص ستون‌ها، نرمال‌سازی کلیدها، ادغام، نوشتن پاسخ، ...)
+داخل stage(name) اجرا می‌شود و مدت، تعداد سطر و حجم (بایت) آن در StageTimer فعال جمع می‌شود:
+  - درخواست HTTP: TimingMiddleware برای هر درخواست یک StageTimer دارد؛ مراحل در هدر
+    Server-Timing پاسخ می‌آیند و بعد از ارسال پاسخ در هیستوگرام‌ها ثبت می‌شوند
+  - کارهای BoundedPool: هر کار StageTimer خودش را دارد و مراحلش همراه نتیجه از worker
+    برمی‌گردد (record_stages) و به timer درخواست اضافه می‌شود
+بدون timer فعال (مثلاً کار پس‌زمینه‌ای که بعد از پاسخ درخواست تمام می‌شود) مرحله مستقیم در
+هیستوگرام‌ها ثبت می‌شود. مرحله‌ها ممکن است تودرتو باشند (parse شامل detect است).
+
+render() متن قالب Prometheus برای endpoint /metrics است؛ متریک‌ها مال همین process هستند.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import MutableHeaders
+
+# ---------- تنظیمات ----------
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+CONTENT_TYPE = "text/plain; version=0.0.4"  # charset را PlainTextResponse اضافه می‌کند
+# --------------------------------
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Histogram(_Metric):
+    """هیستوگرام تجمعی با bucketهای ثابت"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # برچسب‌ها → [تعداد هر bucket ...، جمع مقادیر، تعداد کل]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        bounds = ['le="%s"' % _number(b) for b in self.buckets] + ['le="+Inf"']
+        for labels, series in items:
+            counts = series[:len(self.buckets)] + [series[-1]]
+            for bound, count in zip(bounds, counts):
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, bound)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items)
+        return lines
+
+
+class Gauge(_Metric):
+    """مقدار لحظه‌ای که هنگام render از collect() خوانده می‌شود: برچسب‌ها → مقدار"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str],
+                 collect: Callable[[], Dict[Tuple[str, ...], float]]):
+        super().__init__(name, help_text, labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        lines.extend(f"{self.name}{_labels(self.labelnames, k)} {_number(v)}"
+                     for k, v in sorted(self.collect().items()) if v is not None)
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _add(self, metric: _Metric) -> _Metric:
+        # ماژولی که دوباره import شود (مثلاً reload در توسعه) همان متریک قبلی را می‌گیرد
+        return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str],
+              collect: Callable[[], Dict[Tuple[str, ...], float]]) -> Gauge:
+        return self._add(Gauge(name, help_text, labelnames, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    "metreyar_http_request_duration_seconds", "مدت درخواست HTTP تا ارسال آخرین بایت پاسخ",
+    ("app", "method", "route", "status"),
+)
+STAGE_SECONDS = registry.histogram(
+    "metreyar_stage_duration_seconds", "مدت هر مرحله‌ی خط لوله در یک درخواست یا کار", ("stage",),
+)
+STAGE_ROWS = registry.counter("metreyar_stage_rows_total", "سطرهای پردازش‌شده در هر مرحله", ("stage",))
+STAGE_BYTES = registry.counter("metreyar_stage_bytes_total", "بایت‌های خوانده/نوشته‌شده در هر مرحله", ("stage",))
+
+
+# ---------------------------------------------------
+#  زمان‌سنجی مراحل
+# ---------------------------------------------------
+class Stage:
+    """مشخصات مرحله‌ی در حال اجرا؛ rows و bytes را می‌شود داخل بلوک stage پر کرد"""
+    __slots__ = ("rows", "bytes")
+
+    def __init__(self, rows: Optional[int] = None, nbytes: Optional[int] = None):
+        self.rows = rows
+        self.bytes = nbytes
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("metreyar_stage_timer", default=None)
+
+
+class StageTimer:
+    """
+    مراحل یک درخواست یا کار: نام → {seconds، rows، bytes}؛ تکرار یک مرحله جمع زده می‌شود.
+    با with در context جاری فعال می‌شود (contextvar؛ به run_in_threadpool و taskها هم می‌رسد).
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, dict] = {}
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "StageTimer":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _current.reset(self._token)
+        # taskهایی که context را کپی کرده‌اند بعد از این دیگر در این timer ثبت نمی‌کنند
+        self.closed = True
+
+    def add(self, name: str, seconds: float, rows: Optional[int] = None, nbytes: Optional[int] = None) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "rows": None, "bytes": None})
+            entry["seconds"] += seconds
+            if rows is not None:
+                entry["rows"] = (entry["rows"] or 0) + rows
+            if nbytes is not None:
+                entry["bytes"] = (entry["bytes"] or 0) + nbytes
+
+    def merge(self, stages: Dict[str, dict]) -> None:
+        for name, entry in stages.items():
+            self.add(name, entry["seconds"], entry.get("rows"), entry.get("bytes"))
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """مقدار هدر Server-Timing (میلی‌ثانیه)؛ total: مدت کل تا این لحظه"""
+        with self._lock:
+            items = list(self.stages.items())
+        parts = []
+        for name, entry in items:
+            part = f"{name};dur={entry['seconds'] * 1000:.1f}"
+            desc = " ".join(f"{k}={entry[k]}" for k in ("rows", "bytes") if entry[k] is not None)
+            if desc:
+                part += f';desc="{desc}"'
+            parts.append(part)
+        if total is not None:
+            parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def observe_stages(stages: Dict[str, dict]) -> None:
+    """ثبت مراحل در هیستوگرام مدت و شمارنده‌های سطر/بایت"""
+    for name, entry in stages.items():
+        STAGE_SECONDS.observe(entry["seconds"], name)
+        if entry.get("rows") is not None:
+            STAGE_ROWS.inc(entry["rows"], name)
+        if entry.get("bytes") is not None:
+            STAGE_BYTES.inc(entry["bytes"], name)
+
+
+def _active() -> Optional[StageTimer]:
+    timer = _current.get()
+    return None if timer is None or timer.closed else timer
+
+
+def record_stages(stages: Dict[str, dict]) -> None:
+    """مراحل برگشته از یک worker: به timer فعال اضافه، و اگر نیست مستقیم ثبت می‌شوند"""
+    timer = _active()
+    if timer is not None:
+        timer.merge(stages)
+    else:
+        observe_stages(stages)
+
+
+@contextmanager
+def stage(name: str, rows: Optional[int] = None, nbytes: Optional[int] = None) -> Iterator[Stage]:
+    """زمان‌سنجی یک مرحله؛ مرحله‌ای که با خطا تمام شود هم ثبت می‌شود"""
+    info = Stage(rows, nbytes)
+    t0 = time.perf_counter()
+    try:
+        yield info
+    finally:
+        entry = {"seconds": time.perf_counter() - t0, "rows": info.rows, "bytes": info.bytes}
+        record_stages({name: entry})
+
+
+# ---------------------------------------------------
+#  middleware درخواست‌ها
+# ---------------------------------------------------
+class TimingMiddleware:
+    """
+    مدت هر درخواست (تا آخرین تکه‌ی پاسخ، حتی پاسخ جریانی) در metreyar_http_request_duration_seconds
+    با برچسب الگوی مسیر (نه مسیر واقعی، تا شناسه‌ی کارها برچسب جدا نسازند) و مراحل ثبت‌شده
+    همراه total تا شروع پاسخ در هدر Server-Timing.
+    """
+
+    def __init__(self, app, app_name: str = "api"):
+        self.app = app
+        self.app_name = app_name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = [500]  # پاسخ خطای ServerErrorMiddleware بیرون از این middleware فرستاده می‌شود
+        timer = StageTimer()
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                MutableHeaders(scope=message).append("Server-Timing", timer.server_timing(time.perf_counter() - t0))
+            await send(message)
+
+        try:
+            with timer:
+                await self.app(scope, receive, _send)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, self.app_name, scope["method"], route, str(status[0]))
+            observe_stages(timer.stages)
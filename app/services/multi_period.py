@@ -0,0 +1,110 @@
+"""
+هم‌ترازی چند صورت وضعیت (دوره‌های پشت سر هم یک قرارداد) در یک گذر.
+
+به جای N-1 ادغام دوبه‌دو، سطرهای همه‌ی دوره‌ها با شماره‌ی دوره پشت سر هم قرار می‌گیرند
+و با یک groupby روی (کلید ادغام، دوره) به جدول «کلید × دوره» تبدیل می‌شوند. آیتم‌های
+تکراری یک دوره (کلید یکسان) جمع زده می‌شوند؛ دوره‌ای که آیتم در آن نیست NaN می‌ماند.
+کلید ادغام مثل مقایسه‌ی دوتایی کد-محور است (period_code_first_keys) اگر همه‌ی فایل‌ها ستون کد دارند.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.compare_engine import MATCH_MODES, empty_key_mask, period_code_first_keys
+
+# ستون‌های جدول سری زمانی (سطرهای data در پاسخ)
+TITLE_COL = "شرح کار"
+AMOUNTS_COL = "مبالغ"
+DELTAS_COL = "تغییرات"
+CHANGE_COL = "تغییر کل"
+STATUS_COL = "وضعیت"
+
+
+def align_periods(frames: Sequence[pd.DataFrame], match: str = "auto") -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    frames: صورت وضعیت‌های آماده (ستون __merge_key__، در صورت وجود __code_key__، و attrs["column_map"])
+    به ترتیب دوره. match مثل مقایسه‌ی دوتایی (MATCH_MODES).
+    خروجی: (مبالغ با index کلید و ستون شماره‌ی دوره، عنوان هر کلید از آخرین دوره‌ای که در آن آمده)؛
+    مبنای تطبیق ("code" یا "text") در amounts.attrs["match_strategy"]
+    """
+    if match not in MATCH_MODES:
+        raise ValueError(f"unknown match mode: {match}")
+    keys = [df["__merge_key__"] for df in frames]
+    by_code = match == "auto" and all("__code_key__" in df for df in frames)
+    if by_code:
+        keys = period_code_first_keys([df["__code_key__"] for df in frames], keys)
+
+    parts = []
+    for period, (df, key) in enumerate(zip(frames, keys)):
+        col_map = df.attrs["column_map"]
+        key = key.to_numpy(dtype=object, copy=True)
+        if period:
+            # کلید شرح خالی فقط ایندکس سطر است؛ سطرهای خالی هم‌ایندکس دوره‌ها جفت نمی‌شوند
+            empty = empty_key_mask(key)
+            key[empty] = [f"{k}:{period + 1}" for k in key[empty].tolist()]
+        parts.append(pd.DataFrame({
+            "key": key,
+            "title": df[col_map["description"]].to_numpy(dtype=object),
+            "amount": df[col_map["amount"]].to_numpy(dtype=float),
+            "period": period,
+        }))
+    rows = pd.concat(parts, ignore_index=True)
+
+    # ترتیب کلیدها: اولین ظهور (آیتم‌های دوره‌ی اول، بعد آیتم‌های اضافه‌شده به ترتیب)
+    order = pd.unique(rows["key"])
+    amounts = (
+        rows.groupby(["key", "period"], sort=False)["amount"].sum()
+            .unstack("period")
+            .reindex(index=order, columns=range(len(frames)))
+    )
+    # عنوان: اولین رخداد در آخرین دوره‌ای که کلید دارد (مثل ترجیح شرح دوره‌ی جدید در مقایسه‌ی دوتایی)
+    latest = rows.sort_values("period", ascending=False, kind="stable").drop_duplicates("key")
+    titles = pd.Series(latest["title"].to_numpy(), index=latest["key"].to_numpy()).reindex(order)
+    amounts.attrs["match_strategy"] = "code" if by_code else "text"
+    return amounts, titles
+
+
+def period_summaries(amounts: pd.DataFrame, filenames: Optional[List[str]] = None) -> List[dict]:
+    """جمع هر دوره، تغییر نسبت به دوره‌ی قبل و تعداد آیتم‌های اضافه/حذف‌شده"""
+    m = amounts.to_numpy()
+    present = ~np.isnan(m)
+    totals = np.nansum(m, axis=0).tolist()
+    out = []
+    for i in range(m.shape[1]):
+        entry = {
+            "period": i + 1,
+            "filename": filenames[i] if filenames else None,
+            "total": totals[i],
+            "items": int(present[:, i].sum()),
+            "delta": None,
+            "progress_percent": None,
+            "added_count": None,
+            "removed_count": None,
+        }
+        if i > 0:
+            delta = totals[i] - totals[i - 1]
+            entry["delta"] = delta
+            entry["progress_percent"] = round(delta / totals[i - 1] * 100, 2) if totals[i - 1] != 0 else None
+            entry["added_count"] = int((present[:, i] & ~present[:, i - 1]).sum())
+            entry["removed_count"] = int((~present[:, i] & present[:, i - 1]).sum())
+        out.append(entry)
+    return out
+
+
+def series_rows(amounts: pd.DataFrame, titles: pd.Series) -> pd.DataFrame:
+    """
+    یک سطر برای هر آیتم: مبالغ همه‌ی دوره‌ها (null برای دوره‌ای که آیتم ندارد)،
+    تغییر هر دوره نسبت به دوره‌ی قبل و تغییر کل از دوره‌ی اول تا آخر (نبودن = صفر).
+    """
+    m = amounts.to_numpy()
+    filled = np.nan_to_num(m)
+    deltas = np.diff(filled, axis=1)
+    change = filled[:, -1] - filled[:, 0]
+    return pd.DataFrame({
+        TITLE_COL: titles.fillna("").astype(str).to_numpy(),
+        AMOUNTS_COL: np.where(np.isnan(m), None, m).tolist(),
+        DELTAS_COL: deltas.tolist(),
+        CHANGE_COL: change,
+        STATUS_COL: np.select([change > 0, change < 0], ["افزایش", "کاهش"], "بدون تغییر"),
+    })
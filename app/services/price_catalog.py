@@ -0,0 +1,199 @@
+"""
+فهرست بهای درون‌حافظه‌ای (کد → آیتم، نام جدول ضرایب → dict) برای مسیرهای پرتکرار قیمت‌گذاری.
+
+فهرست بها سالی یک بار عوض می‌شود ولی calculate_item_price و get_coefficient در هر فراخوانی
+کوئری می‌زدند (و table_data هر بار از JSON خوانده می‌شد). این‌جا کل price_items و coefficient_tables
+در اولین استفاده با دو کوئری خوانده و در dictهای همین process نگه داشته می‌شوند؛ بعد از آن
+جستجوها بدون SQL هستند. بی‌اعتبار شدن:
+  - هر نوشتن PriceItem/CoefficientTable با Session همین process: after_flush تغییر را علامت می‌زند و
+    پاک کردن در after_commit است (پیش از commit بارگذاری دوباره همان سطرهای قبلی را می‌خواند)؛
+    rollback همان Session هم فهرست را پاک می‌کند
+  - POST /price-list/catalog/reload (مثلاً بعد از ورود فهرست بهای جدید از process دیگر)
+  - اگر CATALOG_REFRESH_SECONDS مثبت باشد: حداکثر هر چند ثانیه مهر نسخه (تعداد و بیشترین id دو جدول)
+    با پایگاه داده مقایسه می‌شود؛ افزودن و حذف در processهای دیگر را می‌بیند، ویرایش سطر موجود را نه
+با CATALOG_INDEX_ENABLED=0 همه‌ی جستجوها مستقیم از پایگاه داده هستند.
+"""
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.price_list import CoefficientTable, PriceItem
+from app.services import metrics
+from app.services.metrics import stage
+
+# ---------- تنظیمات ----------
+LOOKUP_CHUNK = 500   # کدهای هر کوئری IN وقتی فهرست خاموش است (سقف پارامترهای SQLite)
+# --------------------------------
+
+
+class CatalogItem(NamedTuple):
+    """ستون‌های PriceItem که قیمت‌گذاری لازم دارد؛ جدا از Session (مثل شیء ORM خوانده می‌شود)"""
+    id: int
+    code: str
+    unit_price: Optional[float]
+    formula: Optional[str]
+    parameters: Optional[dict]
+
+
+class PriceCatalog:
+    def __init__(self, enabled: bool = True, refresh_seconds: float = 0.0):
+        self.enabled = enabled
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._items: Optional[Dict[str, CatalogItem]] = None
+        self._tables: Dict[str, dict] = {}
+        self._stamp = None
+        self._checked_at = 0.0
+        self._loaded_at = None
+        self._version = 0  # با هر بارگذاری یکی زیاد می‌شود
+        self._generation = 0  # با هر invalidate یکی زیاد می‌شود
+        self._counters = {"hits": 0, "misses": 0, "loads": 0, "invalidations": 0}
+
+    # ---------- بارگذاری ----------
+    @staticmethod
+    def _read_stamp(db: Session) -> tuple:
+        """مهر نسخه‌ی فهرست: تعداد و بیشترین id هر دو جدول (یک کوئری)"""
+        columns = [agg(model.id) for model in (PriceItem, CoefficientTable) for agg in (func.count, func.max)]
+        return tuple(db.query(*(select(c).scalar_subquery() for c in columns)).one())
+
+    def load(self, db: Session) -> tuple:
+        """خواندن کامل فهرست بها و جدول‌های ضرایب؛ جایگزینی اتمی dictهای قبلی. خروجی: (آیتم‌ها، جدول‌ها)"""
+        with self._lock:
+            generation = self._generation
+        with stage("price_catalog_load") as st:
+            stamp = self._read_stamp(db)
+            items = {
+                code: CatalogItem(id_, code, unit_price, formula, parameters)
+                for id_, code, unit_price, formula, parameters in db.query(
+                    PriceItem.id, PriceItem.code, PriceItem.unit_price, PriceItem.formula, PriceItem.parameters)
+                if code is not None
+            }
+            tables = {}
+            # مثل query(...).first(): اگر چند جدول هم‌نام باشند اولی (کوچک‌ترین id)
+            for name, data in (db.query(CoefficientTable.name, CoefficientTable.table_data)
+                               .order_by(CoefficientTable.id)):
+                tables.setdefault(name, data or {})
+            st.rows = len(items) + len(tables)
+        with self._lock:
+            if generation != self._generation:
+                # invalidate حین خواندن: ممکن است سطرهای پیش از commit خوانده شده باشند؛ نگه داشته نمی‌شود
+                return items, tables
+            self._items, self._tables, self._stamp = items, tables, stamp
+            self._checked_at = time.monotonic()
+            self._loaded_at = time.time()
+            self._version += 1
+            self._counters["loads"] += 1
+        return items, tables
+
+    def invalidate(self) -> None:
+        """بارگذاری دوباره در جستجوی بعدی"""
+        with self._lock:
+            if self._items is not None:
+                self._counters["invalidations"] += 1
+            self._items = None
+            self._generation += 1
+
+    def _ensure(self, db: Session) -> tuple:
+        """(آیتم‌ها، جدول‌ها)ی معتبر؛ invalidate هم‌زمان از thread دیگر روی همین نسخه اثر ندارد"""
+        with self._lock:
+            items, tables = self._items, self._tables
+        if items is None:
+            return self.load(db)
+        if self.refresh_seconds > 0 and time.monotonic() - self._checked_at >= self.refresh_seconds:
+            stamp = self._read_stamp(db)
+            self._checked_at = time.monotonic()
+            if stamp != self._stamp:
+                return self.load(db)
+        return items, tables
+
+    def _count(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self._counters["hits"] += hits
+            self._counters["misses"] += misses
+
+    # ---------- جستجو ----------
+    def item(self, db: Session, code: str):
+        """آیتم با این کد (CatalogItem، یا PriceItem وقتی فهرست خاموش است)؛ None اگر نباشد"""
+        if not self.enabled:
+            return db.query(PriceItem).filter(PriceItem.code == code).first()
+        item = self._ensure(db)[0].get(code)
+        self._count(item is not None, item is None)
+        return item
+
+    def items(self, db: Session, codes: Iterable[str]) -> dict:
+        """آیتم‌های موجود از میان codes: کد → آیتم"""
+        codes = sorted(set(codes))
+        if not self.enabled:
+            found = {}
+            for start in range(0, len(codes), LOOKUP_CHUNK):
+                for item in db.query(PriceItem).filter(PriceItem.code.in_(codes[start:start + LOOKUP_CHUNK])):
+                    found[item.code] = item
+            return found
+        index = self._ensure(db)[0]
+        found = {code: index[code] for code in codes if code in index}
+        self._count(len(found), len(codes) - len(found))
+        return found
+
+    def coefficients(self, db: Session, table_name: str) -> Optional[dict]:
+        """table_data جدول ضرایب با این نام (dict)؛ None اگر نباشد"""
+        if not self.enabled:
+            table = db.query(CoefficientTable).filter(CoefficientTable.name == table_name).first()
+            return table.table_data if table else None
+        data = self._ensure(db)[1].get(table_name)
+        self._count(data is not None, data is None)
+        return data
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "loaded": self._items is not None,
+                "version": self._version,
+                "loaded_at": self._loaded_at,
+                "items": len(self._items) if self._items is not None else 0,
+                "tables": len(self._tables) if self._items is not None else 0,
+                "refresh_seconds": self.refresh_seconds,
+                **self._counters,
+            }
+
+
+price_catalog = PriceCatalog(settings.CATALOG_INDEX_ENABLED, settings.CATALOG_REFRESH_SECONDS)
+
+_CATALOG_MODELS = (PriceItem, CoefficientTable)
+
+
+_DIRTY_KEY = "price_catalog_dirty"
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_catalog_write(session, flush_context):
+    # new/dirty/deleted در after_flush هنوز وضعیت پیش از flush را دارند
+    if any(isinstance(obj, _CATALOG_MODELS) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info[_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop(_DIRTY_KEY, False):
+        price_catalog.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _invalidate_on_rollback(session):
+    # فقط Sessionی که سطر فهرست را flush کرده بود؛ close هر درخواست هم rollback است
+    if session.info.pop(_DIRTY_KEY, False):
+        price_catalog.invalidate()
+
+
+def _catalog_gauges() -> dict:
+    s = price_catalog.stats()
+    return {("hits",): s["hits"], ("misses",): s["misses"], ("loads",): s["loads"],
+            ("items",): s["items"], ("tables",): s["tables"]}
+
+
+metrics.registry.gauge("metreyar_price_catalog", "فهرست بهای درون‌حافظه‌ای: جستجوهای موفق/ناموفق، بارگذاری‌ها و اندازه",
+                       ("kind",), _catalog_gauges)
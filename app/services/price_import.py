@@ -0,0 +1,285 @@
+"""
+ورود دسته‌ای فهرست بها (فایل Excel/CSV رسمی سالانه) به price_items و coefficient_tables.
+
+فایل با همان خواننده‌ی جریانی صورت وضعیت‌ها (statement_reader) خوانده می‌شود و فقط ستون‌های
+شناخته‌شده ساخته می‌شوند. هر برگه‌ی Excel جدا بررسی می‌شود:
+  - برگه‌ی آیتم‌ها: ستون کد، شرح و بها (واحد، فصل، زیرفصل و شرح کامل اختیاری‌اند)
+  - برگه‌ی ضرایب: ستون ضریب (و عنوان؛ پیش‌فرض اولین ستون دیگر) بدون ستون کد؛ جدول ضرایبی به نام برگه
+  - بقیه‌ی برگه‌ها کنار گذاشته و گزارش می‌شوند
+اعتبارسنجی ستونی (pandas) است و سطر نامعتبر (کد/شرح خالی، بهای نامعتبر یا منفی، کد تکراری در فایل)
+با شماره‌ی سطرش رد می‌شود. سطرهای معتبر در دسته‌های IMPORT_BATCH با INSERT ... ON CONFLICT (code)
+DO UPDATE نوشته می‌شوند؛ فقط ستون‌هایی که در فایل هستند به‌روز می‌شوند (فرمول و پارامترهای آیتم
+موجود دست نمی‌خورند). کل ورود یک تراکنش است. نوشتن Core رویداد after_flush ندارد، پس ایندکس جستجوی
+هر دسته همان‌جا به‌روز و فهرست درون‌حافظه‌ای بعد از commit بی‌اعتبار می‌شود.
+"""
+import re
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from app.core.text_normalizer import NUMBER_TABLE, normalize_text
+from app.models.price_list import CoefficientTable, PriceItem
+from app.services.chapters import CODE_DIGITS, LEVELS
+from app.services.metrics import stage
+from app.services.price_catalog import price_catalog
+from app.services.price_search import price_search
+from app.services.statement_reader import file_extension, read_statement, workbook_sheets
+
+# ---------- تنظیمات ----------
+IMPORT_BATCH = 1_000          # سطرهای هر دستور INSERT (۷ پارامتر در سطر؛ زیر سقف پارامترهای SQLite)
+MAX_IMPORT_BYTES = 100 * 1024 * 1024
+MAX_REJECTED_REPORT = 1_000   # حداکثر سطر ردشده‌ی فهرست‌شده در گزارش (تعداد کل جدا می‌آید)
+DEFAULT_UNIT = "عدد"          # price_items.unit خالی نمی‌تواند باشد
+# --------------------------------
+
+# الگوهای سرستون فهرست بها (روی نام نرمال‌شده)؛ فیلدها به این ترتیب ستون برمی‌دارند، پس «شرح کامل»
+# قبل از «شرح»، «بهای واحد» قبل از «واحد» و «زیرفصل» قبل از «فصل»
+IMPORT_COLUMN_PATTERNS = {
+    "code": ["کد", "شماره فهرست", "شماره ردیف", "ردیف فهرست", "شماره", "code"],
+    "description": ["شرح کامل", "توضیحات", "شرح تفصیلی", "description"],
+    "unit_price": ["بها واحد", "بهای واحد", "قیمت واحد", "فی", "بها", "قیمت", "مبلغ", "unit price", "price"],
+    "name": ["شرح", "عنوان", "نام", "name", "title"],
+    "unit": ["واحد", "unit"],
+    "sub_category": ["زیرفصل", "زیر فصل", "زیرگروه", "sub category", "subcategory"],
+    "category": ["فصل", "گروه", "category"],
+}
+COEFFICIENT_COLUMN_PATTERNS = {
+    "key": ["شرح", "عنوان", "نوع", "شرایط", "key", "title"],
+    "value": ["ضریب", "مقدار", "value", "coefficient", "factor"],
+}
+_ITEM_FIELDS = ("name", "unit", "unit_price", "category", "sub_category", "description")
+_PATTERNS = {
+    group: {key: [normalize_text(p) for p in pats] for key, pats in patterns.items()}
+    for group, patterns in (("items", IMPORT_COLUMN_PATTERNS), ("coefficients", COEFFICIENT_COLUMN_PATTERNS))
+}
+_PATTERN_RES = {
+    group: {key: re.compile("|".join(re.escape(p) for p in pats)) for key, pats in patterns.items()}
+    for group, patterns in _PATTERNS.items()
+}
+
+
+class PriceImportError(ValueError):
+    """خطای ورود فهرست بها (پیام آن برای نمایش به کاربر مناسب است)"""
+
+
+def _match_columns(columns: List[str], group: str) -> Dict[str, Optional[str]]:
+    """
+    فیلد → نام ستون؛ هر ستون حداکثر به یک فیلد. اول نام‌های دقیقاً برابر با یک الگو («واحد»)،
+    بعد نام‌هایی که الگو را دارند («بهای واحد (ریال)»)
+    """
+    normalized = {col: normalize_text(col, underscore_as_space=True) for col in columns}
+    col_map = dict.fromkeys(_PATTERNS[group])
+    used = set()
+    for exact in (True, False):
+        for key, pattern in _PATTERN_RES[group].items():
+            if col_map[key]:
+                continue
+            for col, name in normalized.items():
+                if col in used:
+                    continue
+                if (name in _PATTERNS[group][key]) if exact else pattern.search(name):
+                    col_map[key] = col
+                    used.add(col)
+                    break
+    return col_map
+
+
+def _detect(columns: List[str]) -> tuple:
+    """نوع برگه («items»، «coefficients» یا None) و نگاشت ستون‌هایش"""
+    items = _match_columns(columns, "items")
+    if items["code"] and items["name"] and items["unit_price"]:
+        return "items", items
+    coefficients = _match_columns(columns, "coefficients")
+    if coefficients["value"] and not coefficients["key"]:
+        # عنوان ضریب (استان، نوع خاک، ...) سرستون ثابتی ندارد: اولین ستون دیگر
+        coefficients["key"] = next((c for c in columns if c != coefficients["value"]), None)
+    if not items["code"] and coefficients["key"] and coefficients["value"]:
+        return "coefficients", coefficients
+    return None, items
+
+
+def _numbers(ser: pd.Series) -> pd.Series:
+    """عدد با ارقام فارسی و جداکننده‌ی هزارگان؛ خانه‌ی خالی یا نامعتبر NaN (نه صفر، برخلاف to_numbers)"""
+    text = ser.where(ser.notna(), "").astype(str).str.translate(NUMBER_TABLE)
+    text = text.str.replace(r"[,\s]", "", regex=True).str.replace("−", "-", regex=False)
+    return pd.to_numeric(text.where(text != "", None), errors="coerce")
+
+
+def _text(ser: pd.Series) -> pd.Series:
+    text = ser.where(ser.notna(), "").astype(str).str.strip()
+    return text.where(~text.isin(["nan", "None"]), "")
+
+
+def _item_codes(ser: pd.Series) -> pd.Series:
+    """
+    کد با ارقام لاتین؛ کد تمام‌رقمی کوتاه‌تر از CODE_DIGITS دوباره صفر می‌گیرد (مثل chapters): Excel
+    کد را عدد ذخیره می‌کند و صفرهای ابتدایی‌اش می‌افتد (۰۱۰۲۰۳ → 10203)
+    """
+    text = _text(ser).str.translate(NUMBER_TABLE).str.replace(r"\.0+$", "", regex=True)
+    short = text.str.fullmatch(r"\d+") & (text.str.len() < CODE_DIGITS)
+    return text.where(~short, text.str.zfill(CODE_DIGITS))
+
+
+def _validate_items(df: pd.DataFrame, col_map: dict, sheet: Optional[str], seen: set) -> tuple:
+    """(DataFrame سطرهای معتبر با ستون‌های price_items، سطرهای ردشده)؛ seen: کدهای برگه‌های قبلی"""
+    out = pd.DataFrame({"code": _item_codes(df[col_map["code"]])})
+    for field in _ITEM_FIELDS:
+        if col_map[field]:
+            out[field] = _numbers(df[col_map[field]]) if field == "unit_price" else _text(df[col_map[field]])
+    # واحد خالی (یا بدون ستون واحد) برای آیتم جدید؛ آیتم موجود واحدش را نگه می‌دارد (_upsert_items)
+    out["unit"] = out["unit"].where(out["unit"] != "", DEFAULT_UNIT) if "unit" in out else DEFAULT_UNIT
+    if not col_map["category"] and not col_map["sub_category"]:
+        # بدون ستون فصل: فصل و زیرفصل از پیشوند کد شش‌رقمی استاندارد
+        standard = out["code"].str.fullmatch(rf"\d{{{CODE_DIGITS}}}")
+        out["category"] = out["code"].str[:LEVELS[0]].where(standard, None)
+        out["sub_category"] = out["code"].str[:LEVELS[1]].where(standard, None)
+
+    errors = pd.Series("", index=out.index, dtype=object)
+    duplicated = out["code"].duplicated() | out["code"].isin(seen)
+    for mask, message in (
+        (duplicated, "کد تکراری در فایل"),
+        (out["unit_price"] < 0, "بهای منفی"),
+        (out["unit_price"].isna(), "بهای واحد نامعتبر یا خالی"),
+        (out["name"] == "", "شرح خالی"),
+        (out["code"] == "", "کد خالی"),
+    ):
+        # پیام مهم‌تر (آخر فهرست) جایگزین قبلی می‌شود
+        errors[mask.to_numpy(dtype=bool)] = message
+    bad = errors != ""
+    rejected = [
+        {"sheet": sheet, "row": int(i), "code": code or None, "error": error}
+        for i, code, error in zip(out.index[bad], out["code"][bad], errors[bad])
+    ]
+    valid = out[~bad]
+    seen.update(valid["code"])
+    return valid, rejected
+
+
+def _insert_statement(dialect: str):
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise PriceImportError(f"ورود دسته‌ای روی پایگاه داده‌ی {dialect} پشتیبانی نمی‌شود (فقط SQLite و PostgreSQL).")
+    return insert
+
+
+def _upsert_items(db: Session, items: pd.DataFrame, update_columns: List[str]) -> tuple:
+    """نوشتن دسته‌ای آیتم‌ها (update_columns: ستون‌هایی که آیتم موجود می‌گیرد)؛ خروجی: (جدید، به‌روزشده)"""
+    insert = _insert_statement(db.get_bind().dialect.name)
+    table = PriceItem.__table__
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.code],
+        set_={c: stmt.excluded[c] for c in update_columns},
+    )
+    records = items.astype(object).where(items.notna(), None).to_dict("records")
+    inserted = updated = 0
+    for start in range(0, len(records), IMPORT_BATCH):
+        batch = records[start:start + IMPORT_BATCH]
+        codes = [r["code"] for r in batch]
+        existing = db.query(PriceItem.code).filter(PriceItem.code.in_(codes)).count()
+        db.execute(stmt, batch)
+        price_search.index_codes(db, codes)
+        updated += existing
+        inserted += len(batch) - existing
+    return inserted, updated
+
+
+def _parse_coefficients(df: pd.DataFrame, col_map: dict, name: str) -> tuple:
+    """(عنوان → ضریب، سطرهای ردشده)"""
+    keys = _text(df[col_map["key"]])
+    values = _numbers(df[col_map["value"]])
+    bad = (keys == "") | values.isna()
+    rejected = [{"sheet": name, "row": int(i), "code": None, "error": "عنوان یا ضریب نامعتبر"}
+                for i in keys.index[bad]]
+    return dict(zip(keys[~bad], values[~bad].astype(float).tolist())), rejected
+
+
+def _save_coefficients(db: Session, name: str, data: dict) -> bool:
+    """جدول ضرایب به نام برگه (جایگزین جدول هم‌نام)؛ خروجی: جدول قبلی جایگزین شد یا نه"""
+    table = db.query(CoefficientTable).filter(CoefficientTable.name == name).order_by(CoefficientTable.id).first()
+    if table is None:
+        db.add(CoefficientTable(name=name, table_data=data))
+    else:
+        table.table_data = data
+    db.flush()
+    return table is not None
+
+
+def import_price_list(db: Session, stream, filename: str, dry_run: bool = False) -> dict:
+    """
+    ورود فایل فهرست بها از stream باینری seek‌پذیر. dry_run: فقط خواندن و اعتبارسنجی، بدون نوشتن.
+    خروجی: تعداد سطرها، جدید/به‌روزشده/ردشده، جدول‌های ضرایب، برگه‌های کنارگذاشته، مدت و سرعت.
+    """
+    if file_extension(filename) not in ("xlsx", "xlsm", "xls", "csv"):
+        raise PriceImportError(f"فرمت فایل {filename} پشتیبانی نمی‌شود (xlsx، xls یا csv).")
+    t0 = time.perf_counter()
+    sheets = workbook_sheets(stream, filename) or [None]
+    if not dry_run:
+        # جدول سایه‌ی جستجو باید پیش از نوشتن آماده باشد تا آیتم‌ها در همان تراکنش ایندکس شوند
+        price_search.ensure(db)
+    report = {"filename": filename, "dry_run": dry_run, "rows": 0, "valid": 0, "inserted": 0, "updated": 0,
+              "rejected": 0, "coefficient_tables": [], "skipped_sheets": [], "rejected_rows": []}
+    rejected: List[dict] = []
+    seen: set = set()
+    valid_frames = []   # (سطرهای معتبر برگه، ستون‌هایی که آیتم موجود از آن برگه می‌گیرد)
+    try:
+        for sheet in sheets:
+            found = {}
+
+            def _select(sample: pd.DataFrame):
+                kind, col_map = _detect([str(c).strip() for c in sample.columns])
+                found.update(kind=kind, col_map=col_map)
+                return [c for c in col_map.values() if c] if kind else list(sample.columns[:1])
+
+            stream.seek(0)
+            with stage("import_parse") as parsed:
+                df = read_statement(stream, filename, select_columns=_select, sheet=sheet, row_numbers=True)
+                parsed.rows = len(df)
+            df.columns = [str(c).strip() for c in df.columns]
+            if not found.get("kind") or df.empty:
+                report["skipped_sheets"].append(sheet or filename)
+                continue
+            report["rows"] += len(df)
+            if found["kind"] == "coefficients":
+                name = sheet or filename.rsplit(".", 1)[0]
+                data, bad = _parse_coefficients(df, found["col_map"], name)
+                replaced = None if dry_run else _save_coefficients(db, name, data)
+                report["coefficient_tables"].append({"name": name, "entries": len(data), "replaced": replaced})
+                rejected.extend(bad)
+                continue
+            with stage("import_validate", rows=len(df)):
+                valid, bad = _validate_items(df, found["col_map"], sheet, seen)
+            rejected.extend(bad)
+            # ستون‌های فصل ساخته‌شده از کد هم به‌روز می‌شوند؛ واحد پیش‌فرض فقط برای آیتم جدید است
+            update_columns = [c for c in valid.columns if c != "code" and (c != "unit" or found["col_map"]["unit"])]
+            valid_frames.append((valid, update_columns))
+
+        report["valid"] = sum(len(valid) for valid, _ in valid_frames)
+        if not dry_run:
+            for valid, update_columns in valid_frames:
+                with stage("import_upsert", rows=len(valid)):
+                    inserted, updated = _upsert_items(db, valid, update_columns)
+                report["inserted"] += inserted
+                report["updated"] += updated
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    if not dry_run and (report["valid"] or report["coefficient_tables"]):
+        price_catalog.invalidate()
+
+    seconds = time.perf_counter() - t0
+    report["rejected"] = len(rejected)
+    report["rejected_rows"] = rejected[:MAX_REJECTED_REPORT]
+    report["seconds"] = round(seconds, 3)
+    report["rows_per_second"] = round(report["rows"] / seconds) if seconds > 0 else None
+    return report
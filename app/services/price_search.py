@@ -0,0 +1,137 @@
+"""
+جستجوی متن کامل فارسی روی شرح آیتم‌های فهرست بها (name و description).
+
+روی SQLite با FTS5: جدول سایه‌ی price_items_fts (rowid = price_items.id) متن نرمال‌شده‌ی نام و شرح
+هر آیتم را نگه می‌دارد (همان نرمال‌سازی کلید ادغام: ی/ک عربی، ارقام، نیم‌فاصله و اعراب). عبارت
+جستجو هم همین‌طور نرمال و هر کلمه‌اش پیشوندی جستجو می‌شود ("بتن آرم" → بتن* AND آرم*).
+جدول سایه در اولین استفاده ساخته و اگر تعدادش با price_items نخواند دوباره پر می‌شود؛ بعد از آن
+هر نوشتن PriceItem با Session همین process (رویداد after_flush) در همان تراکنش به آن منتقل می‌شود.
+روی پایگاه داده‌ی دیگر (یا SQLite بدون FTS5) جستجو با LIKE روی name/description است (متن ذخیره‌شده نرمال نیست).
+"""
+import threading
+from typing import Iterable, List
+
+from sqlalchemy import event, or_, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Query, Session
+
+from app.core.text_normalizer import normalize_batch, normalize_text
+from app.models.price_list import PriceItem
+from app.services.metrics import stage
+
+# ---------- تنظیمات ----------
+FTS_TABLE = "price_items_fts"
+REBUILD_BATCH = 5_000   # آیتم‌های هر دسته هنگام پر کردن جدول سایه
+MAX_TERMS = 8           # حداکثر کلمه‌ی عبارت جستجو
+# --------------------------------
+
+ZWNJ = "\u200c"
+
+
+def _documents(rows: Iterable[tuple]) -> List[dict]:
+    """(id، نام، شرح) → سطرهای جدول سایه با متن نرمال‌شده"""
+    rows = list(rows)
+    texts = []
+    for _, name, description in rows:
+        body = f"{name or ''} {description or ''}"
+        # نیم‌فاصله در نرمال‌سازی حذف می‌شود (پلی‌اتیلن → پلیاتیلن)؛ شکل جدا هم ایندکس شود تا «پلی اتیلن» پیدا شود
+        texts.append(f"{body} {body.replace(ZWNJ, ' ')}" if ZWNJ in body else body)
+    texts = normalize_batch(texts)
+    return [{"id": row[0], "body": body} for row, body in zip(rows, texts)]
+
+
+def search_terms(q: str) -> List[str]:
+    """کلمه‌های نرمال‌شده‌ی عبارت جستجو"""
+    return normalize_text(q).split()[:MAX_TERMS]
+
+
+class PriceSearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = False
+        self.fts = False  # جدول سایه‌ی FTS5 در دسترس است
+
+    def ensure(self, db: Session, rebuild: bool = False) -> None:
+        """
+        ساخت ایندکس‌های price_items و جدول سایه (یک بار در هر process)؛ rebuild: پر کردن دوباره‌ی
+        جدول سایه حتی اگر آماده باشد (بعد از نوشتن بیرون از Session، مثل ورود دسته‌ای)
+        """
+        if self._ready and not rebuild:
+            return
+        with self._lock:
+            if self._ready and not (rebuild and self.fts):
+                return
+            first = not self._ready
+            bind = db.get_bind()
+            if first:
+                for index in PriceItem.__table__.indexes:
+                    # پایگاه داده‌ی موجود: create_all ایندکس‌های جدید جدول‌های ساخته‌شده را نمی‌سازد
+                    index.create(bind=bind, checkfirst=True)
+                if bind.dialect.name == "sqlite":
+                    try:
+                        db.execute(text(
+                            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(body, tokenize='unicode61')"))
+                        self.fts = True
+                    except OperationalError:  # SQLite بدون FTS5
+                        db.rollback()
+            if self.fts:
+                indexed = db.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar() if first else None
+                if rebuild or indexed != db.query(PriceItem.id).count():
+                    self.rebuild(db)
+            db.commit()
+            self._ready = True
+
+    def rebuild(self, db: Session) -> int:
+        """پر کردن دوباره‌ی جدول سایه از price_items؛ خروجی: تعداد آیتم‌ها"""
+        with stage("price_search_rebuild") as st:
+            db.execute(text(f"DELETE FROM {FTS_TABLE}"))
+            rows = db.query(PriceItem.id, PriceItem.name, PriceItem.description).all()
+            for start in range(0, len(rows), REBUILD_BATCH):
+                db.execute(text(f"INSERT INTO {FTS_TABLE} (rowid, body) VALUES (:id, :body)"),
+                           _documents(rows[start:start + REBUILD_BATCH]))
+            st.rows = len(rows)
+        return len(rows)
+
+    def index_codes(self, db: Session, codes: List[str]) -> None:
+        """به‌روزرسانی جدول سایه برای آیتم‌های این کدها (بعد از نوشتن Core در همان تراکنش)"""
+        if not self.fts or not codes:
+            return
+        rows = db.query(PriceItem.id, PriceItem.name, PriceItem.description).filter(PriceItem.code.in_(codes)).all()
+        db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), [{"id": row[0]} for row in rows])
+        if rows:
+            db.execute(text(f"INSERT INTO {FTS_TABLE} (rowid, body) VALUES (:id, :body)"), _documents(rows))
+
+    def apply(self, query: Query, q: str) -> Query:
+        """محدود کردن query آیتم‌ها به نتایج جستجوی q"""
+        terms = search_terms(q)
+        if not terms:
+            return query
+        if self.fts:
+            # هر کلمه داخل "" (بدون عملگرهای FTS5) و پیشوندی؛ کلمه‌ها با هم AND می‌شوند
+            match = " ".join('"{}"*'.format(t.replace('"', '""')) for t in terms)
+            ids = text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match").bindparams(match=match)
+            return query.filter(PriceItem.id.in_(ids))
+        for term in terms:
+            pattern = f"%{term}%"
+            query = query.filter(or_(PriceItem.name.ilike(pattern), PriceItem.description.ilike(pattern)))
+        return query
+
+
+price_search = PriceSearchIndex()
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_on_write(session, flush_context):
+    if not price_search.fts:
+        return
+    # new/dirty/deleted در after_flush هنوز وضعیت پیش از flush را دارند؛ idهای جدید تعیین شده‌اند
+    changed = [obj for obj in (*session.new, *session.dirty) if isinstance(obj, PriceItem)]
+    removed = [obj.id for obj in session.deleted if isinstance(obj, PriceItem)]
+    ids = [obj.id for obj in changed] + removed
+    if not ids:
+        return
+    conn = session.connection()
+    conn.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), [{"id": i} for i in ids])
+    if changed:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE} (rowid, body) VALUES (:id, :body)"),
+                     _documents((obj.id, obj.name, obj.description) for obj in changed))
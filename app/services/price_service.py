@@ -1,45 +1,116 @@
-import math
-import json
+from collections import defaultdict
+from typing import List, Tuple
+import numpy as np
 from sqlalchemy.orm import Session
-from app.models.price_list import PriceItem, Formula, CoefficientTable
+from app.models.price_list import PriceItem, Formula
+from app.services.formula_engine import CompiledFormula, FormulaError, compile_formula, formula_cache
+from app.services.metrics import stage
+from app.services.price_catalog import price_catalog
+
+# ---------- تنظیمات ----------
+MAX_BATCH_LINES = 20_000   # حداکثر سطر در هر درخواست محاسبه‌ی دسته‌ای
+# --------------------------------
+
+# قیمت آیتم بدون فرمول (فی × quantity، پیش‌فرض ۱)؛ محاسبه‌ی تکی و دسته‌ای هر دو از همین استفاده می‌کنند
+_SIMPLE_PRICE = compile_formula("{unit_price} * {quantity}")
+NO_UNIT_PRICE = "فی آیتم ثبت نشده است"
 
 class PriceService:
     
     @staticmethod
     def calculate_item_price(item_code: str, quantities: dict, db: Session):
-        item = db.query(PriceItem).filter(PriceItem.code == item_code).first()
+        with stage("price_lookup"):
+            item = price_catalog.item(db, item_code)
         if not item:
             return None
         
         if item.formula:
             # محاسبه با فرمول
-            return PriceService._calculate_with_formula(item, quantities)
+            with stage("price_formula"):
+                return PriceService._calculate_with_formula(item, quantities)
         else:
             # محاسبه ساده
-            return item.unit_price * quantities.get('quantity', 1)
+            if item.unit_price is None:
+                raise FormulaError(NO_UNIT_PRICE)
+            return _SIMPLE_PRICE.evaluate({"unit_price": item.unit_price, "quantity": quantities.get("quantity", 1)})
     
     @staticmethod
     def _calculate_with_formula(item: PriceItem, quantities: dict):
-        try:
-            # اجرای فرمول
-            formula = item.formula
-            variables = {**quantities, **(item.parameters or {})}
-            
-            # جایگزینی متغیرها در فرمول
-            for var_name, var_value in variables.items():
-                formula = formula.replace(f'{{{var_name}}}', str(var_value))
-            
-            # محاسبه نتیجه
-            result = eval(formula, {"__builtins__": None}, {"math": math})
-            return result
-            
-        except Exception as e:
-            raise ValueError(f"خطا در محاسبه فرمول: {e}")
+        # item: CatalogItem یا PriceItem (id، formula و parameters)
+        # فرمول هر آیتم یک بار کامپایل می‌شود (کلید: شناسه و نسخه‌ی متن فرمول)
+        compiled = formula_cache.get("price_item", item.id, item.formula)
+        return compiled.evaluate({**quantities, **(item.parameters or {})})
+
+    @staticmethod
+    def calculate_batch(lines: List[Tuple[str, dict]], db: Session) -> dict:
+        """
+        قیمت چند سطر (کد آیتم، مقادیر) در یک درخواست: همه‌ی آیتم‌ها یک جا از فهرست بها گرفته و سطرها
+        بر اساس فرمول گروه‌بندی می‌شوند؛ هر فرمول یک بار روی آرایه‌ی مقادیر همه‌ی سطرهایش محاسبه می‌شود.
+        خروجی: نتیجه یا خطای هر سطر (به ترتیب ورودی) و جمع کل سطرهای بدون خطا.
+        """
+        with stage("price_lookup", rows=len(lines)):
+            items = price_catalog.items(db, (code for code, _ in lines))
+
+        n = len(lines)
+        results = np.full(n, np.nan)
+        errors = [None] * n
+        formula_groups = defaultdict(list)
+        simple = []
+        for i, (code, _) in enumerate(lines):
+            item = items.get(code)
+            if item is None:
+                errors[i] = "آیتم یافت نشد"
+            elif item.formula:
+                formula_groups[item.formula].append(i)
+            elif item.unit_price is None:
+                errors[i] = NO_UNIT_PRICE
+            else:
+                simple.append(i)
+
+        with stage("price_formula", rows=n):
+            for formula, indices in formula_groups.items():
+                try:
+                    compiled = formula_cache.get("price_item", items[lines[indices[0]][0]].id, formula)
+                except FormulaError as e:
+                    for i in indices:
+                        errors[i] = str(e)
+                    continue
+                rows = [{**lines[i][1], **(items[lines[i][0]].parameters or {})} for i in indices]
+                values, row_errors = compiled.evaluate_many(rows)
+                results[indices] = values
+                for i, error in zip(indices, row_errors):
+                    errors[i] = error
+            if simple:
+                # بدون فرمول: فی × quantity (پیش‌فرض ۱)، مثل calculate_item_price
+                values, row_errors = _SIMPLE_PRICE.evaluate_many(
+                    [{"unit_price": items[lines[i][0]].unit_price, "quantity": lines[i][1].get("quantity", 1)}
+                     for i in simple])
+                results[simple] = values
+                for i, error in zip(simple, row_errors):
+                    errors[i] = error
+
+        ok = np.array([e is None for e in errors], dtype=bool)
+        return {
+            "count": n,
+            "errors_count": int(n - ok.sum()),
+            "total": float(results[ok].sum()),
+            "results": [
+                {"index": i, "item_code": code, "result": float(results[i])} if errors[i] is None
+                else {"index": i, "item_code": code, "error": errors[i]}
+                for i, (code, _) in enumerate(lines)
+            ],
+        }
+
+    @staticmethod
+    def compile_formula(formula: Formula) -> CompiledFormula:
+        """Formula.expression کامپایل‌شده (از cache)؛ FormulaError اگر نامعتبر باشد"""
+        return formula_cache.get("formula", formula.id, formula.expression)
     
     @staticmethod
     def get_coefficient(table_name: str, key: str, db: Session):
-        table = db.query(CoefficientTable).filter(CoefficientTable.name == table_name).first()
-        if not table or not table.table_data:
+        with stage("price_coefficient"):
+            table_data = price_catalog.coefficients(db, table_name)
+        if not table_data:
             return None
         
-        return table.table_data.get(key)
+        return table_data.get(key)
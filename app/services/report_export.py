@@ -0,0 +1,322 @@
+"""
+گزارش مقایسه‌ی صورت وضعیت در قالب xlsx و pdf (برای کارهای پس‌زمینه‌ی export).
+
+  - xlsx : openpyxl در حالت write_only؛ سطرها دسته‌دسته از آرایه‌های ستونی نوشته می‌شوند و
+           حافظه مستقل از تعداد سطرهاست. برگه‌ی «خلاصه» و برگه(های) «مقایسه» راست‌به‌چپ
+  - pdf  : reportlab canvas (بدون platypus Table که کل جدول را در حافظه چیدمان می‌کند؛ فقط
+           صفحه‌های فشرده‌شده تا save در حافظه می‌مانند)؛
+           A4 افقی، سرستون در هر صفحه، شماره‌ی «صفحه i از n». متن فارسی با arabic_reshaper و
+           python-bidi شکل‌دهی و با فونت TTF دارای حروف فارسی نوشته می‌شود
+
+progress(done, total) بعد از هر دسته/صفحه با تعداد سطرهای نوشته‌شده صدا زده می‌شود.
+"""
+import functools
+import os
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+from app.core.config import settings
+from app.services.compare_engine import MATCH_COL, SHEET_COL, STATUS_COL, TITLE_COL
+
+try:  # شکل‌دهی حروف فارسی در PDF؛ بدون این دو بسته خروجی pdf در دسترس نیست
+    import arabic_reshaper
+    try:  # python-bidi >= 0.5 (Rust)؛ نسخه‌های قدیمی فقط پیاده‌سازی پایتونی دارند
+        from bidi import get_display
+    except ImportError:
+        from bidi.algorithm import get_display
+    _HAS_SHAPING = True
+except ImportError:
+    _HAS_SHAPING = False
+
+# ---------- تنظیمات ----------
+EXPORT_FORMATS = ("xlsx", "pdf")
+MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+}
+BATCH_ROWS = 5000
+MAX_SHEET_ROWS = 1_048_575         # سقف سطرهای یک برگه‌ی Excel (بدون سرستون)
+PDF_FONT_CANDIDATES = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+)
+PDF_FONT_SIZE = 8
+PDF_ROW_HEIGHT = 13
+PDF_MARGIN = 36
+# --------------------------------
+
+REPORT_TITLE = "گزارش مقایسه صورت وضعیت"
+PDF_FONT_NAME = "MetreyarPersian"
+
+# برچسب کلیدهای meta در برگه/صفحه‌ی خلاصه
+SUMMARY_LABELS = (
+    (("summary", "previous_sum"), "جمع دوره قبل"),
+    (("summary", "current_sum"), "جمع دوره جدید"),
+    (("summary", "difference"), "تفاوت"),
+    (("summary", "progress_percent"), "درصد پیشرفت"),
+    (("items_compared",), "تعداد آیتم‌ها"),
+    (("added_count",), "آیتم‌های اضافه‌شده"),
+    (("removed_count",), "آیتم‌های حذف‌شده"),
+    (("fuzzy_matched_count",), "تطبیق فازی"),
+    (("match_strategy",), "مبنای تطبیق"),
+    (("alignment", "mode"), "شرح‌های تکراری"),
+)
+# مقادیر متنی meta که در گزارش فارسی نوشته می‌شوند
+VALUE_LABELS = {"code": "کد فهرست بها", "text": "شرح", "aggregate": "جمع تکراری‌ها", "ordinal": "ترتیب تکرار"}
+_LABEL_COLUMNS = (STATUS_COL, MATCH_COL, SHEET_COL)
+
+Progress = Optional[Callable[[int, int], None]]
+
+
+def summary_items(meta: dict) -> List[tuple]:
+    """(برچسب، مقدار) برای کلیدهای موجود در meta"""
+    items = []
+    for path, label in SUMMARY_LABELS:
+        value = meta
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if value is not None:
+            items.append((label, VALUE_LABELS.get(value, value) if isinstance(value, str) else value))
+    return items
+
+
+def _column_batches(rows: pd.DataFrame, batch_rows: int):
+    """سطرها به‌صورت tuple، دسته‌دسته از آرایه‌های ستونی"""
+    names = list(rows.columns)
+    for start in range(0, len(rows), batch_rows):
+        chunk = rows.iloc[start:start + batch_rows]
+        yield list(zip(*(chunk[c].tolist() for c in names)))
+
+
+# ==========================
+#  xlsx
+# ==========================
+def write_xlsx(path: str, meta: dict, rows: pd.DataFrame, progress: Progress = None,
+               batch_rows: int = BATCH_ROWS) -> None:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    bold = Font(bold=True)
+
+    summary = wb.create_sheet("خلاصه")
+    summary.sheet_view.rightToLeft = True
+    summary.column_dimensions["A"].width = 24
+    summary.column_dimensions["B"].width = 22
+    title = WriteOnlyCell(summary, value=REPORT_TITLE)
+    title.font = bold
+    summary.append([title])
+    for label, value in summary_items(meta):
+        summary.append([label, value])
+
+    names = list(rows.columns)
+    total = len(rows)
+
+    def _sheet(number: int):
+        ws = wb.create_sheet("مقایسه" if number == 1 else f"مقایسه {number}")
+        ws.sheet_view.rightToLeft = True
+        ws.freeze_panes = "A2"
+        for i, name in enumerate(names, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = 60 if name == TITLE_COL else 16
+        header = []
+        for name in names:
+            cell = WriteOnlyCell(ws, value=name)
+            cell.font = bold
+            header.append(cell)
+        ws.append(header)
+        return ws
+
+    sheets = 1
+    ws = _sheet(sheets)
+    in_sheet = done = 0
+    for batch in _column_batches(rows, batch_rows):
+        for values in batch:
+            if in_sheet == MAX_SHEET_ROWS:
+                sheets += 1
+                ws = _sheet(sheets)
+                in_sheet = 0
+            ws.append(values)
+            in_sheet += 1
+        done += len(batch)
+        if progress and done < total:
+            progress(done, total)
+    wb.save(path)
+    if progress:
+        progress(total, total)
+
+
+# ==========================
+#  pdf
+# ==========================
+@functools.lru_cache(maxsize=1)
+def _pdf_font_path() -> Optional[str]:
+    candidates = (settings.EXPORT_PDF_FONT,) if settings.EXPORT_PDF_FONT else PDF_FONT_CANDIDATES
+    for path in candidates:
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def pdf_unavailable_reason() -> Optional[str]:
+    """پیام خطا اگر ساخت PDF فارسی در این محیط ممکن نیست، وگرنه None"""
+    if not _HAS_SHAPING:
+        return "ساخت PDF به بسته‌های arabic-reshaper و python-bidi نیاز دارد."
+    if _pdf_font_path() is None:
+        return "فونت فارسی برای PDF پیدا نشد؛ مسیر یک فونت TTF را در EXPORT_PDF_FONT تنظیم کنید."
+    return None
+
+
+@functools.lru_cache(maxsize=1)
+def _register_pdf_font() -> str:
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, _pdf_font_path()))
+    return PDF_FONT_NAME
+
+
+@functools.lru_cache(maxsize=512)
+def _label(text: str) -> str:
+    """متن‌های تکراری (سرستون، وضعیت، مبنای تطبیق) یک بار شکل‌دهی می‌شوند"""
+    return _visual(text)
+
+
+@functools.lru_cache(maxsize=65536)
+def _shape_word(word: str) -> str:
+    return arabic_reshaper.reshape(word)
+
+
+def _visual(text: str) -> str:
+    """
+    ترتیب نمایشی (چپ‌به‌راست) متن فارسی با حروف چسبیده. اتصال حروف از فاصله رد نمی‌شود،
+    پس شکل‌دهی کلمه‌به‌کلمه و با cache است (واژگان شرح‌ها محدود و تکراری است).
+    """
+    return get_display(" ".join(_shape_word(w) for w in text.split(" ")))
+
+
+def _fit(text: str, width: float, font: str, size: float) -> str:
+    """متن نمایشی که در width جا شود؛ متن بلند از انتها کوتاه و «…» اضافه می‌شود"""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    visual = _visual(text)
+    measured = stringWidth(visual, font, size)
+    if measured <= width:
+        return visual
+    n = max(1, int(len(text) * width / measured))
+    while n > 1:
+        visual = _visual(text[:n].rstrip() + "…")
+        if stringWidth(visual, font, size) <= width:
+            return visual
+        n -= max(1, n // 10)
+    return _visual("…")
+
+
+def _format_number(value) -> str:
+    if value is None or value != value:
+        return ""
+    return f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}"
+
+
+def write_pdf(path: str, meta: dict, rows: pd.DataFrame, progress: Progress = None) -> None:
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfgen import canvas
+
+    font = _register_pdf_font()
+    page_w, page_h = landscape(A4)
+    table_w = page_w - 2 * PDF_MARGIN
+    names = list(rows.columns)
+    total = len(rows)
+
+    # چیدمان راست‌به‌چپ: ستون اول (شرح کار) سمت راست؛ شرح هر چه از بقیه بماند
+    widths = [0.0 if n == TITLE_COL else (60.0 if n in _LABEL_COLUMNS else 90.0) for n in names]
+    if TITLE_COL in names:
+        widths[names.index(TITLE_COL)] = table_w - sum(widths)
+    rights = []
+    x = page_w - PDF_MARGIN
+    for w in widths:
+        rights.append(x)
+        x -= w
+    numeric = [pd.api.types.is_numeric_dtype(rows[n]) for n in names]
+
+    summary = summary_items(meta)
+    summary_h = 28 + len(summary) * 14 + 10
+    body_h = page_h - 2 * PDF_MARGIN - 20   # پاورقی
+    first_rows = max(1, int((body_h - summary_h) // PDF_ROW_HEIGHT) - 1)
+    page_rows = int(body_h // PDF_ROW_HEIGHT) - 1
+    pages = 1 + max(0, -(-(total - first_rows) // page_rows))
+    generated = datetime.now().strftime("%Y-%m-%d %H:%M")
+
+    c = canvas.Canvas(path, pagesize=(page_w, page_h), pageCompression=1)
+    c.setTitle(REPORT_TITLE)
+
+    def _header(y: float) -> float:
+        c.setFillGray(0.85)
+        c.rect(PDF_MARGIN, y - PDF_ROW_HEIGHT + 3, table_w, PDF_ROW_HEIGHT, stroke=0, fill=1)
+        c.setFillGray(0)
+        for name, right, w in zip(names, rights, widths):
+            c.drawRightString(right - 3, y - PDF_ROW_HEIGHT + 6, _fit(name, w - 6, font, PDF_FONT_SIZE))
+        return y - PDF_ROW_HEIGHT
+
+    def _footer(page: int) -> None:
+        c.setFont(font, 7)
+        c.drawCentredString(page_w / 2, PDF_MARGIN - 12, _visual(f"صفحه {page} از {pages}"))
+        c.drawString(PDF_MARGIN, PDF_MARGIN - 12, generated)
+        c.setFont(font, PDF_FONT_SIZE)
+
+    y = page_h - PDF_MARGIN
+    c.setFont(font, 14)
+    c.drawRightString(page_w - PDF_MARGIN, y - 14, _visual(REPORT_TITLE))
+    y -= 28
+    c.setFont(font, 9)
+    for label, value in summary:
+        text = _format_number(value) if isinstance(value, (int, float)) else _visual(str(value))
+        c.drawRightString(page_w - PDF_MARGIN, y - 10, _visual(label))
+        c.drawRightString(page_w - PDF_MARGIN - 130, y - 10, text)
+        y -= 14
+    y -= 10
+    c.setFont(font, PDF_FONT_SIZE)
+    y = _header(y)
+
+    page, on_page, limit, done = 1, 0, first_rows, 0
+    for batch in _column_batches(rows, BATCH_ROWS):
+        for values in batch:
+            if on_page == limit:
+                _footer(page)
+                c.showPage()
+                c.setFont(font, PDF_FONT_SIZE)
+                page, on_page, limit = page + 1, 0, page_rows
+                y = _header(page_h - PDF_MARGIN)
+                if progress:
+                    progress(done, total)
+            if on_page % 2:
+                c.setFillGray(0.95)
+                c.rect(PDF_MARGIN, y - PDF_ROW_HEIGHT + 3, table_w, PDF_ROW_HEIGHT, stroke=0, fill=1)
+                c.setFillGray(0)
+            for value, right, w, is_number, name in zip(values, rights, widths, numeric, names):
+                if is_number:
+                    text = _format_number(value)
+                elif name in _LABEL_COLUMNS:
+                    text = _label(str(value))
+                else:
+                    text = _fit(str(value), w - 6, font, PDF_FONT_SIZE)
+                c.drawRightString(right - 3, y - PDF_ROW_HEIGHT + 6, text)
+            y -= PDF_ROW_HEIGHT
+            on_page += 1
+            done += 1
+    _footer(page)
+    c.showPage()
+    c.save()
+    if progress:
+        progress(done, total)
+
+
+WRITERS = {"xlsx": write_xlsx, "pdf": write_pdf}
+
+
+def write_report(path: str, meta: dict, rows: pd.DataFrame, fmt: str, progress: Progress = None) -> None:
+    WRITERS[fmt](path, meta, rows, progress=progress)
@@ -0,0 +1,70 @@
+"""
+نوشتن خروجی مقایسه به‌صورت دسته‌ای (batch) مستقیم از ستون‌های DataFrame.
+
+به جای to_dict(orient="records") روی کل جدول و ساخت یک رشته‌ی JSON بزرگ، سطرها
+دسته‌دسته از آرایه‌های ستونی ساخته، با encoder سریع (orjson، در صورت نصب) سریال
+و در یک فایل/stream نوشته می‌شوند؛ حافظه‌ی اضافه فقط به اندازه‌ی یک دسته است.
+
+قالب‌ها:
+  - json   : همان سند قبلی؛ {"message": ..., "summary": ..., ..., "data": [سطرها]}
+  - ndjson : سطر اول همان سند بدون data، و بعد هر سطر جدول در یک خط
+"""
+import json
+from typing import BinaryIO, Iterator, List
+
+import pandas as pd
+
+try:  # orjson اختیاری است؛ اگر نصب نبود از json استاندارد استفاده می‌شود
+    import orjson
+    _HAS_ORJSON = True
+except ImportError:
+    _HAS_ORJSON = False
+
+# ---------- تنظیمات ----------
+BATCH_ROWS = 5000
+OUTPUT_FORMATS = ("json", "ndjson")
+MEDIA_TYPES = {"json": "application/json", "ndjson": "application/x-ndjson"}
+# --------------------------------
+
+
+def dumps(obj) -> bytes:
+    """JSON فشرده و UTF-8 (مثل JSONResponse)؛ NaN در json استاندارد خطا و در orjson null می‌شود"""
+    if _HAS_ORJSON:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _dumps_lines(rows: List[dict]) -> bytes:
+    if _HAS_ORJSON:
+        return b"".join(orjson.dumps(r, option=orjson.OPT_APPEND_NEWLINE) for r in rows)
+    return b"".join(dumps(r) + b"\n" for r in rows)
+
+
+def iter_row_batches(rows: pd.DataFrame, batch_rows: int = BATCH_ROWS) -> Iterator[List[dict]]:
+    """سطرها به‌صورت dict، دسته‌دسته؛ tolist نوع‌های پایتونی (int/float/str) را مثل to_dict نگه می‌دارد"""
+    names = list(rows.columns)
+    for start in range(0, len(rows), batch_rows):
+        chunk = rows.iloc[start:start + batch_rows]
+        columns = [chunk[c].tolist() for c in names]
+        yield [dict(zip(names, values)) for values in zip(*columns)]
+
+
+def write_result(fh: BinaryIO, meta: dict, rows: pd.DataFrame, fmt: str = "json",
+                 batch_rows: int = BATCH_ROWS) -> None:
+    """نوشتن meta (همه‌ی کلیدهای پاسخ به جز data) و سطرها در fh با قالب fmt"""
+    if fmt == "ndjson":
+        fh.write(dumps(meta) + b"\n")
+        for batch in iter_row_batches(rows, batch_rows):
+            fh.write(_dumps_lines(batch))
+        return
+
+    head = dumps(meta)
+    # سند JSON: meta بدون آکولاد پایانی، سپس "data" که آرایه‌اش دسته‌دسته نوشته می‌شود
+    fh.write(head[:-1] + (b',"data":[' if len(head) > 2 else b'"data":['))
+    first = True
+    for batch in iter_row_batches(rows, batch_rows):
+        if not batch:
+            continue
+        fh.write((b"" if first else b",") + dumps(batch)[1:-1])
+        first = False
+    fh.write(b"]}")
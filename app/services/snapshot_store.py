@@ -0,0 +1,187 @@
+"""
+صورت وضعیت ذخیره‌شده‌ی هر دوره‌ی پروژه (snapshot) برای مقایسه‌ی افزایشی.
+
+هر صورت وضعیتی که برای یک Project ثبت می‌شود بعد از خواندن و ستون‌یابی فقط با ستون‌های لازم
+برای مقایسه (شرح، مبلغ، کلید ادغام، کد فهرست بها، فصل و برگه) به‌صورت ستونی در
+SNAPSHOT_DIR/<project_id>/ نوشته می‌شود (parquet؛ بدون pyarrow با pickle) و مشخصاتش (دوره، hash
+فایل، نگاشت ستون‌ها، تعداد سطر و جمع مبالغ) در جدول statement_snapshots. مقایسه‌ی دوره‌ی بعد
+فقط فایل جدید را آپلود و می‌خواند و با snapshot دوره‌ی قبل مقایسه می‌کند.
+"""
+import logging
+import os
+import threading
+from typing import List, NamedTuple, Optional
+
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import Base, engine
+from app.models.project import Project, StatementSnapshot
+from app.models.user import User
+
+try:  # parquet نیاز به pyarrow دارد؛ اگر نصب نبود جدول‌ها با pickle ذخیره می‌شوند
+    import pyarrow  # noqa: F401
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+    # pickle کندتر و حجیم‌تر از parquet است؛ در requirements.txt هست و نبودنش یعنی نصب ناقص
+    logging.getLogger(__name__).warning("pyarrow نصب نیست؛ snapshotهای پروژه با pickle ذخیره می‌شوند (کندتر و حجیم‌تر).")
+
+_EXT = "parquet" if _HAS_PYARROW else "pkl"
+# ستون‌های داخلی که همراه شرح و مبلغ نگه داشته می‌شوند (اگر در صورت وضعیت باشند)
+SNAPSHOT_COLUMNS = ("__merge_key__", "__code_key__", "__chapter__", "__sheet__")
+ADD_RETRIES = 5   # تلاش برای گرفتن شماره‌ی دوره وقتی آپلود هم‌زمان همان دوره را زودتر ثبت کرده
+
+
+class SnapshotFrame(NamedTuple):
+    """ارجاع قابل pickle به جدول یک snapshot؛ داخل worker مقایسه با load() خوانده می‌شود"""
+    path: str
+    column_map: dict
+    sheets: Optional[dict] = None
+
+    def load(self) -> pd.DataFrame:
+        """همان شکل خروجی _load_statement: نگاشت ستون‌ها (و برگه‌ها) در attrs"""
+        df = pd.read_parquet(self.path) if _HAS_PYARROW else pd.read_pickle(self.path)
+        df.attrs = {"column_map": dict(self.column_map)}
+        if self.sheets:
+            df.attrs["sheets"] = self.sheets
+        return df
+
+
+class SnapshotStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._tables_ready = False
+
+    def init_db(self) -> None:
+        """ساخت جدول‌های پروژه و snapshot اگر هنوز در پایگاه داده نیستند"""
+        with self._lock:
+            if not self._tables_ready:
+                tables = [User.__table__, Project.__table__, StatementSnapshot.__table__]
+                Base.metadata.create_all(bind=engine, tables=tables)
+                self._tables_ready = True
+
+    def _write(self, project_id: int, digest: str, df: pd.DataFrame) -> tuple:
+        """نوشتن اتمی جدول snapshot؛ خروجی: (مسیر، حجم)"""
+        directory = os.path.join(self.directory, str(project_id))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{digest}.{_EXT}")
+        col_map = df.attrs["column_map"]
+        columns = [col_map["description"], col_map["amount"]] + [c for c in SNAPSHOT_COLUMNS if c in df]
+        frame = df[columns].reset_index(drop=True)
+        # نگاشت ستون‌ها در پایگاه داده است؛ attrs در metadata فایل parquet نوشته نشود
+        frame.attrs = {}
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if _HAS_PYARROW:
+            frame.to_parquet(tmp, index=False)
+        else:
+            frame.to_pickle(tmp)
+        os.replace(tmp, path)
+        return path, os.path.getsize(path)
+
+    def add(self, db: Session, project: Project, df: pd.DataFrame, filename: str, digest: str) -> StatementSnapshot:
+        """
+        ثبت صورت وضعیت آماده (خروجی _load_statement) به‌عنوان دوره‌ی بعدی پروژه.
+        شماره‌ی دوره (max + 1) با insert اتمی نیست: اگر آپلود هم‌زمانی همان دوره را زودتر ثبت کند
+        UniqueConstraint خطا می‌دهد و دوره‌ی بعدی امتحان می‌شود؛ اگر همان فایل (همان hash) ثبت شده
+        باشد همان snapshot برگردانده می‌شود.
+        """
+        col_map = dict(df.attrs["column_map"])
+        path, size = self._write(project.id, digest, df)
+        stats = dict(
+            rows=int(len(df)),
+            coded_rows=int((df["__code_key__"] != "").sum()) if "__code_key__" in df else 0,
+            total=float(pd.to_numeric(df[col_map["amount"]], errors="coerce").fillna(0).sum()),
+            size_bytes=size,
+        )
+        try:
+            for attempt in range(ADD_RETRIES):
+                if attempt:
+                    existing = self.find(db, project.id, digest)
+                    if existing is not None:
+                        return existing
+                last = (db.query(func.max(StatementSnapshot.period))
+                        .filter(StatementSnapshot.project_id == project.id).scalar())
+                snapshot = StatementSnapshot(
+                    project_id=project.id,
+                    period=(last or 0) + 1,
+                    filename=filename,
+                    digest=digest,
+                    sheets=df.attrs.get("sheets"),
+                    column_map=col_map,
+                    path=path,
+                    **stats,
+                )
+                db.add(snapshot)
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                    if attempt == ADD_RETRIES - 1:
+                        raise
+                    continue
+                db.refresh(snapshot)
+                return snapshot
+        except Exception:
+            db.rollback()
+            self._remove_unreferenced(db, path)
+            raise
+
+    @staticmethod
+    def _remove_unreferenced(db: Session, path: str) -> None:
+        """حذف جدول نوشته‌شده برای insert ناموفق؛ فایل هم‌نام (همان hash) ممکن است مال snapshot دیگری باشد"""
+        if db.query(StatementSnapshot.id).filter(StatementSnapshot.path == path).first() is not None:
+            return
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def list(db: Session, project_id: int) -> List[StatementSnapshot]:
+        return (db.query(StatementSnapshot).filter(StatementSnapshot.project_id == project_id)
+                .order_by(StatementSnapshot.period).all())
+
+    @staticmethod
+    def get(db: Session, project_id: int, snapshot_id: int) -> Optional[StatementSnapshot]:
+        return (db.query(StatementSnapshot)
+                .filter(StatementSnapshot.project_id == project_id, StatementSnapshot.id == snapshot_id).first())
+
+    @staticmethod
+    def find(db: Session, project_id: int, digest: str) -> Optional[StatementSnapshot]:
+        """snapshot همین فایل (همان hash) در پروژه، اگر قبلاً ثبت شده"""
+        return (db.query(StatementSnapshot)
+                .filter(StatementSnapshot.project_id == project_id, StatementSnapshot.digest == digest)
+                .order_by(StatementSnapshot.period.desc()).first())
+
+    def previous(self, db: Session, project_id: int, digest: str) -> Optional[StatementSnapshot]:
+        """
+        مبنای مقایسه‌ی فایل با این hash: اگر خود فایل قبلاً ثبت شده دوره‌ی پیش از آن،
+        وگرنه آخرین دوره‌ی پروژه
+        """
+        query = db.query(StatementSnapshot).filter(StatementSnapshot.project_id == project_id)
+        own = self.find(db, project_id, digest)
+        if own is not None:
+            query = query.filter(StatementSnapshot.period < own.period)
+        return query.order_by(StatementSnapshot.period.desc()).first()
+
+    @staticmethod
+    def frame(snapshot: StatementSnapshot) -> SnapshotFrame:
+        return SnapshotFrame(snapshot.path, dict(snapshot.column_map), snapshot.sheets)
+
+    @staticmethod
+    def delete(db: Session, snapshot: StatementSnapshot) -> None:
+        path = snapshot.path
+        db.delete(snapshot)
+        db.commit()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+snapshot_store = SnapshotStore(settings.SNAPSHOT_DIR)
@@ -0,0 +1,285 @@
+"""
+Cache محتوا-محور (content-addressed) صورت وضعیت‌ها روی دیسک.
+
+کلید هر فایل، sha256 بایت‌های آن است؛ پس آپلود دوباره‌ی همان فایل (حتی با نام دیگر)
+دوباره خوانده و ستون‌یابی نمی‌شود:
+  - frame-…  : DataFrame خوانده‌شده و ستون‌یابی‌شده (parquet؛ بدون pyarrow با pickle)
+  - result-… : بدنه‌ی نهایی پاسخ مقایسه (json/ndjson) برای یک جفت hash و پارامترهای درخواست
+حجم کل پوشه محدود است و ورودی‌هایی که از همه دیرتر استفاده شده‌اند (LRU) حذف می‌شوند.
+چند پروسه (workerهای مقایسه) می‌توانند هم‌زمان از یک پوشه استفاده کنند: ایندکس هر پروسه
+فقط یک دید محلی است و قبل از حذف و به‌صورت دوره‌ای از روی خود پوشه بازسازی می‌شود.
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Callable, Dict, Optional
+
+import pandas as pd
+
+from app.core.config import settings
+
+try:  # parquet نیاز به pyarrow دارد؛ اگر نصب نبود frameها با pickle ذخیره می‌شوند
+    import pyarrow  # noqa: F401
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+    # pickle کندتر و حجیم‌تر از parquet است؛ در requirements.txt هست و نبودنش یعنی نصب ناقص
+    logging.getLogger(__name__).warning("pyarrow نصب نیست؛ cache صورت وضعیت‌ها با pickle ذخیره می‌شوند (کندتر و حجیم‌تر).")
+
+# ---------- تنظیمات ----------
+CACHE_FORMAT_VERSION = 5          # با تغییر ساختار frame یا payload افزایش یابد
+HASH_CHUNK_BYTES = 1024 * 1024
+RESCAN_SECONDS = 60               # ایندکس هر پروسه هر چند وقت یک بار با پوشه هماهنگ می‌شود
+# --------------------------------
+
+_FRAME_EXT = "parquet" if _HAS_PYARROW else "pkl"
+
+
+def spool_upload(stream, suffix: str = "", directory: Optional[str] = None) -> str:
+    """
+    کپی تکه‌تکه‌ی یک فایل آپلودی در یک فایل موقت روی دیسک (برای ارسال مسیر به worker)؛
+    directory: پوشه‌ی مقصد (پیش‌فرض: پوشه‌ی موقت سیستم)
+    """
+    pos = stream.tell()
+    stream.seek(0)
+    fd, path = tempfile.mkstemp(prefix="metreyar_upload_", suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: stream.read(HASH_CHUNK_BYTES), b""):
+                out.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    finally:
+        stream.seek(pos)
+    return path
+
+
+def file_digest(stream) -> str:
+    """sha256 محتوای یک فایل باینری seek‌پذیر (تکه‌تکه، بدون خواندن کامل در حافظه)"""
+    pos = stream.tell()
+    stream.seek(0)
+    h = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_BYTES), b""):
+        h.update(chunk)
+    stream.seek(pos)
+    return h.hexdigest()
+
+
+def result_key(*digests: str, **params) -> str:
+    """کلید نتیجه‌ی مقایسه: hash فایل‌ها به ترتیب + پارامترهایی که روی خروجی اثر دارند"""
+    raw = json.dumps([CACHE_FORMAT_VERSION, digests, params], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class StatementCache:
+    def __init__(self, directory: str, max_bytes: int, enabled: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()   # نام فایل → حجم؛ قدیمی‌ترین اول
+        self._size = 0
+        self._scanned_at = 0.0
+        self._counters: Dict[str, int] = {
+            "frame_hits": 0, "frame_misses": 0,
+            "result_hits": 0, "result_misses": 0,
+            "evictions": 0,
+        }
+        if enabled:
+            try:
+                os.makedirs(directory, exist_ok=True)
+                self._scan()
+            except OSError:
+                self.enabled = False
+
+    # ---------- ایندکس LRU ----------
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _scan(self) -> None:
+        """بازسازی ایندکس از روی فایل‌های موجود (بعد از restart یا نوشتن پروسه‌های دیگر)، مرتب بر اساس زمان استفاده"""
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                found.append((st.st_mtime, entry.name, st.st_size))
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self._scanned_at = time.monotonic()
+            for _, name, size in sorted(found):
+                self._entries[name] = size
+                self._size += size
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        while self._size > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._size -= size
+            self._counters["evictions"] += 1
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+
+    def _forget(self, name: str) -> None:
+        with self._lock:
+            self._size -= self._entries.pop(name, 0)
+        try:
+            os.remove(self._path(name))
+        except OSError:
+            pass
+
+    def _lookup(self, name: str) -> Optional[str]:
+        path = self._path(name)
+        try:
+            os.utime(path, None)   # زمان آخرین استفاده برای ترتیب LRU بین پروسه‌ها و بعد از restart
+            size = os.path.getsize(path)
+        except OSError:
+            # وجود ندارد یا توسط پروسه‌ی دیگری حذف شده
+            with self._lock:
+                self._size -= self._entries.pop(name, 0)
+            return None
+        with self._lock:
+            # ورودی‌ای که پروسه‌ی دیگری نوشته هم به ایندکس اضافه می‌شود
+            self._size += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+        return path
+
+    def _store(self, name: str, write: Callable[[str], None]) -> None:
+        path = self._path(name)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+            size = os.path.getsize(path)
+        except Exception:
+            # cache نباید باعث خطای درخواست شود
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._size += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            stale = time.monotonic() - self._scanned_at > RESCAN_SECONDS
+            over = self._size > self.max_bytes
+        if stale or over:
+            self._scan()
+
+    def _count(self, kind: str, hit: bool) -> None:
+        with self._lock:
+            self._counters[f"{kind}_{'hits' if hit else 'misses'}"] += 1
+
+    # ---------- frameهای ستون‌یابی‌شده ----------
+    def get_frame(self, digest: str) -> Optional[pd.DataFrame]:
+        if not self.enabled:
+            return None
+        name = f"frame-v{CACHE_FORMAT_VERSION}-{digest}.{_FRAME_EXT}"
+        path = self._lookup(name)
+        df = None
+        if path is not None:
+            try:
+                df = pd.read_parquet(path) if _HAS_PYARROW else pd.read_pickle(path)
+            except Exception:
+                self._forget(name)
+        self._count("frame", df is not None)
+        return df
+
+    def put_frame(self, digest: str, df: pd.DataFrame) -> None:
+        """df.attrs (مثلاً column_map) هم همراه frame ذخیره می‌شود"""
+        if not self.enabled:
+            return
+        name = f"frame-v{CACHE_FORMAT_VERSION}-{digest}.{_FRAME_EXT}"
+        if _HAS_PYARROW:
+            self._store(name, lambda p: df.to_parquet(p, index=False))
+        else:
+            self._store(name, lambda p: df.to_pickle(p))
+
+    # ---------- نتیجه‌ی نهایی مقایسه ----------
+    def open_result(self, key: str) -> Optional[BinaryIO]:
+        """فایل بدنه‌ی پاسخ (باز برای خواندن)؛ حذف بعدی ورودی، خواندن فایلِ باز را خراب نمی‌کند"""
+        if not self.enabled:
+            return None
+        name = f"result-{key}.json"
+        path = self._lookup(name)
+        fh = None
+        if path is not None:
+            try:
+                fh = open(path, "rb")
+            except OSError:
+                self._forget(name)
+        self._count("result", fh is not None)
+        return fh
+
+    def result_tmp_path(self) -> str:
+        """مسیر موقت برای نوشتن بدنه‌ی پاسخ؛ در همان پوشه‌ی cache تا put_result_file فقط rename باشد"""
+        directory = self.directory if self.enabled else None
+        fd, path = tempfile.mkstemp(prefix="result-", suffix=".tmp", dir=directory)
+        os.close(fd)
+        return path
+
+    def put_result_file(self, key: str, tmp_path: str) -> None:
+        """
+        انتقال (rename) فایل نوشته‌شده به cache. اگر cache غیرفعال باشد یا انتقال نشود
+        فایل موقت سر جایش می‌ماند و پاک کردنش با صدا زننده است.
+        """
+        if not self.enabled:
+            return
+        self._store(f"result-{key}.json", lambda p: os.replace(tmp_path, p))
+
+    # ---------- مدیریت ----------
+    def take_counters(self) -> Dict[str, int]:
+        """شمارنده‌ها را برمی‌گرداند و صفر می‌کند (در worker، برای ارسال به پروسه‌ی اصلی)"""
+        with self._lock:
+            taken = dict(self._counters)
+            for k in self._counters:
+                self._counters[k] = 0
+        return taken
+
+    def merge_counters(self, counters: Dict[str, int]) -> None:
+        with self._lock:
+            for k, v in counters.items():
+                self._counters[k] = self._counters.get(k, 0) + v
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "directory": self.directory,
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                **self._counters,
+            }
+
+    def clear(self) -> None:
+        """حذف همه‌ی ورودی‌ها، از جمله آن‌هایی که پروسه‌های دیگر نوشته‌اند و در ایندکس این پروسه نیستند"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        if not self.enabled:
+            return
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(("frame-", "result-")) and not entry.name.endswith(".tmp"):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+statement_cache = StatementCache(
+    settings.STATEMENT_CACHE_DIR,
+    settings.STATEMENT_CACHE_MAX_MB * 1024 * 1024,
+    enabled=settings.STATEMENT_CACHE_ENABLED,
+)
@@ -0,0 +1,380 @@
+"""
+خواندن جریانی (streaming) فایل‌های صورت وضعیت.
+
+به جای خواندن کل فایل در حافظه و ساخت DataFrame کامل، سطرها به‌صورت
+جریانی خوانده می‌شوند (openpyxl در حالت read_only و موتور C/pyarrow برای CSV)،
+سطر سرستون در چند سطر اول پیدا می‌شود و فقط ستون‌هایی که لازم است نگه داشته می‌شوند.
+در فایل Excel چندبرگه‌ای هر برگه جدا خوانده می‌شود (read_statement با sheet)؛ فهرست برگه‌ها
+بدون باز کردن کل workbook از workbook.xml خوانده می‌شود (workbook_sheets).
+"""
+import codecs
+import csv
+import itertools
+import os
+import zipfile
+from xml.etree import ElementTree
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from app.services.memory_budget import CHECK_EVERY_ROWS, checkpoint
+
+try:  # موتور pyarrow اختیاری است؛ اگر نصب نبود از موتور C استفاده می‌شود
+    import pyarrow
+    import pyarrow.csv as pa_csv
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+
+# ---------- تنظیمات ----------
+HEADER_SCAN_ROWS = 15          # چند سطر اول برای پیدا کردن سطر سرستون
+SAMPLE_ROWS = 10               # تعداد سطر نمونه برای تشخیص ستون‌ها
+CSV_SNIFF_BYTES = 64 * 1024    # حجم ابتدای CSV برای تشخیص encoding و سرستون
+CSV_ENCODINGS = ("utf-8-sig", "cp1256")
+# --------------------------------
+
+ColumnSelector = Callable[[pd.DataFrame], Optional[Sequence[str]]]
+
+
+class StatementReadError(ValueError):
+    """خطای خواندن فایل صورت وضعیت (پیام آن برای نمایش به کاربر مناسب است)"""
+
+
+def file_extension(filename: str) -> str:
+    return filename.lower().split(".")[-1] if "." in filename else ""
+
+
+def stream_size(stream) -> int:
+    """حجم یک فایل باینری seek‌پذیر بدون خواندن محتوای آن"""
+    pos = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(pos)
+    return size
+
+
+def _is_blank(v: Any) -> bool:
+    if v is None:
+        return True
+    if isinstance(v, float) and v != v:  # NaN
+        return True
+    return isinstance(v, str) and v.strip() == ""
+
+
+def _is_numeric_cell(v: Any) -> bool:
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return True
+    s = str(v).strip().replace(",", "").replace("٬", "")
+    try:
+        float(s)
+        return True
+    except ValueError:
+        return False
+
+
+def find_header_row(rows: Sequence[Sequence[Any]]) -> int:
+    """
+    اندیس سطر سرستون در سطرهای ابتدایی فایل.
+    اولین سطری که حداقل دو خانه‌ی متنی (غیر عددی) دارد و تعداد خانه‌های پرش
+    دست‌کم نصف عریض‌ترین سطر است؛ عنوان‌های بالای جدول (معمولاً یک خانه‌ی ادغام‌شده)
+    به این ترتیب رد می‌شوند. اگر چیزی پیدا نشد سطر اول.
+    """
+    filled = [[v for v in r if not _is_blank(v)] for r in rows]
+    widest = max((len(f) for f in filled), default=0)
+    for i, cells in enumerate(filled):
+        if len(cells) < 2 or len(cells) * 2 < widest:
+            continue
+        if all(not _is_numeric_cell(v) for v in cells):
+            return i
+    return 0
+
+
+def header_names(cells: Sequence[Any]) -> List[str]:
+    """نام ستون‌ها مثل pandas: خانه‌ی خالی → Unnamed: i و نام تکراری → name.1"""
+    names: List[str] = []
+    seen: Dict[str, int] = {}
+    for i, v in enumerate(cells):
+        name = f"Unnamed: {i}" if _is_blank(v) else str(v).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _pick(row: Sequence[Any], idx: int) -> Any:
+    return row[idx] if idx < len(row) else None
+
+
+def _selected_indices(names: List[str], sample: pd.DataFrame, select_columns: Optional[ColumnSelector]) -> List[int]:
+    if select_columns is None:
+        return list(range(len(names)))
+    wanted = select_columns(sample)
+    if not wanted:
+        return list(range(len(names)))
+    wanted = set(wanted)
+    return [i for i, n in enumerate(names) if n in wanted]
+
+
+def _sample_frame(names: List[str], rows: Sequence[Sequence[Any]]) -> pd.DataFrame:
+    return pd.DataFrame(
+        [[_pick(r, i) for i in range(len(names))] for r in rows],
+        columns=names,
+        dtype=object,
+    )
+
+
+def _drop_blank_rows(df: pd.DataFrame, first_row: Optional[int] = None) -> pd.DataFrame:
+    """first_row: شماره‌ی سطر فایلِ سطر اول df؛ اگر داده شود اندیس نتیجه شماره‌ی سطر فایل است"""
+    df = df.dropna(how="all")
+    if first_row is None:
+        return df.reset_index(drop=True)
+    df.index = df.index + first_row
+    return df
+
+
+# ---------------------------------------------------
+#  Excel (xlsx/xlsm) — openpyxl در حالت read_only
+# ---------------------------------------------------
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _xlsx_sheets(stream) -> List[str]:
+    """
+    نام برگه‌های کاری قابل مشاهده به ترتیب workbook؛ chartsheet و برگه‌ی مخفی (hidden/veryHidden،
+    معمولاً جدول‌های کمکی) حذف می‌شوند. فقط workbook.xml و rels آن خوانده می‌شوند، نه sharedStrings.
+    """
+    pos = stream.tell()
+    try:
+        with zipfile.ZipFile(stream) as archive:
+            workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+            rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    finally:
+        stream.seek(pos)
+    worksheet_ids = {
+        r.get("Id") for r in rels if _local_name(r.tag) == "Relationship" and r.get("Type", "").endswith("/worksheet")
+    }
+    names = []
+    for el in workbook.iter():
+        if _local_name(el.tag) != "sheet" or el.get("state") in ("hidden", "veryHidden"):
+            continue
+        rel_id = next((v for k, v in el.attrib.items() if _local_name(k) == "id"), None)
+        if rel_id in worksheet_ids:
+            names.append(el.get("name"))
+    return names
+
+
+def _read_xlsx(stream, select_columns: Optional[ColumnSelector], sheet: Optional[str] = None,
+               row_numbers: bool = False) -> pd.DataFrame:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        if sheet is None:
+            ws = wb.worksheets[0]
+        elif sheet in wb.sheetnames:
+            ws = wb[sheet]
+        else:
+            raise StatementReadError(f"برگه‌ی «{sheet}» در فایل نیست.")
+        # dimension ذخیره‌شده در بعضی فایل‌ها غلط است؛ بگذاریم openpyxl خودش تا انتها بخواند
+        ws.reset_dimensions()
+        rows = ws.iter_rows(values_only=True)
+
+        head: List[tuple] = []
+        for row in rows:
+            head.append(row)
+            if len(head) >= HEADER_SCAN_ROWS + SAMPLE_ROWS:
+                break
+        if not head:
+            return pd.DataFrame()
+
+        h = find_header_row(head[:HEADER_SCAN_ROWS])
+        names = header_names(head[h])
+        width = max(len(names), max(len(r) for r in head))
+        if width > len(names):
+            names = header_names(list(head[h]) + [None] * (width - len(names)))
+        body = head[h + 1:]
+
+        keep = _selected_indices(names, _sample_frame(names, body[:SAMPLE_ROWS]), select_columns)
+        columns: List[List[Any]] = [[] for _ in keep]
+        line_numbers: List[int] = []
+
+        def _append(row, line):
+            values = [_pick(row, i) for i in keep]
+            if all(_is_blank(v) for v in values):
+                return
+            for col, v in zip(columns, values):
+                col.append(v)
+            if row_numbers:
+                line_numbers.append(line)
+
+        # iter_rows سطرهای خالی وسط برگه را هم (خالی) می‌دهد؛ شماره‌ی سطر Excel همان شماره‌ی ترتیب است
+        for line, row in enumerate(body, h + 2):
+            _append(row, line)
+        # سقف حافظه (اگر تعیین شده) حین خواندن هم بررسی می‌شود، نه فقط بعد از ساخت کل ستون‌ها
+        for n, row in enumerate(rows, 1):
+            _append(row, len(head) + n)
+            if n % CHECK_EVERY_ROWS == 0:
+                checkpoint("read")
+    finally:
+        wb.close()
+
+    return pd.DataFrame({names[i]: col for i, col in zip(keep, columns)}, columns=[names[i] for i in keep],
+                        index=line_numbers if row_numbers else None)
+
+
+# ---------------------------------------------------
+#  CSV — تشخیص encoding و موتور C/pyarrow
+# ---------------------------------------------------
+def detect_csv_encoding(stream) -> str:
+    """UTF-8 (با یا بدون BOM) یا cp1256 (ویندوز فارسی)"""
+    pos = stream.tell()
+    head = stream.read(CSV_SNIFF_BYTES)
+    stream.seek(pos)
+    for enc in CSV_ENCODINGS:
+        try:
+            # decoder افزایشی تا کاراکتر چندبایتی بریده‌شده در انتهای نمونه خطا ندهد
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    raise StatementReadError("encoding فایل CSV قابل تشخیص نیست (فقط UTF-8 و Windows-1256 پشتیبانی می‌شود).")
+
+
+def _read_csv_arrow(stream, skip_rows: int, keep: List[int], width: int, encoding: str) -> pd.DataFrame:
+    """
+    خواندن CSV با pyarrow.csv و نوع string صریح برای همه‌ی ستون‌ها؛ pd.read_csv(engine="pyarrow")
+    با dtype=str اول مقدار را عدد می‌کند و بعد متن (010101 → 10101 و 0012.50 → 12.5).
+    سطر با تعداد خانه‌ی متفاوت خطا می‌دهد و خواننده به موتور C برمی‌گردد.
+    """
+    columns = [f"f{i}" for i in range(width)]
+    table = pa_csv.read_csv(
+        stream,
+        read_options=pa_csv.ReadOptions(skip_rows=skip_rows, column_names=columns, encoding=encoding),
+        parse_options=pa_csv.ParseOptions(ignore_empty_lines=False),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={c: pyarrow.string() for c in columns},
+            include_columns=[columns[i] for i in sorted(keep)],
+            strings_can_be_null=True,
+        ),
+    )
+    return table.to_pandas()
+
+
+def _read_csv(stream, select_columns: Optional[ColumnSelector], row_numbers: bool = False) -> pd.DataFrame:
+    encoding = detect_csv_encoding(stream)
+
+    pos = stream.tell()
+    raw = stream.read(CSV_SNIFF_BYTES)
+    stream.seek(pos)
+    lines = codecs.getincrementaldecoder(encoding)().decode(raw, final=False).splitlines()
+    if len(raw) == CSV_SNIFF_BYTES:
+        lines = lines[:-1]  # سطر آخر نمونه ممکن است بریده شده باشد
+    # سطرهای عنوان بالای جدول تعداد خانه‌ی متفاوتی دارند؛ csv.reader سطرهای ناهم‌طول را می‌پذیرد.
+    # خانه‌ی نقل‌قول‌دار چندخطی یک رکورد چند سطر فایل است؛ line_num پایان هر رکورد را نگه می‌دارد
+    reader = csv.reader(lines)
+    head, line_ends = [], []
+    for record in itertools.islice(reader, HEADER_SCAN_ROWS + SAMPLE_ROWS):
+        head.append([v or None for v in record])
+        line_ends.append(reader.line_num)
+    if not head:
+        return pd.DataFrame()
+
+    h = find_header_row(head[:HEADER_SCAN_ROWS])
+    header_lines = line_ends[h]  # سطرهای فایل تا پایان سرستون
+    names = header_names(head[h])
+    keep = _selected_indices(names, _sample_frame(names, head[h + 1:h + 1 + SAMPLE_ROWS]), select_columns)
+
+    # سطر خالی نگه داشته و بعد حذف می‌شود تا شماره‌ی سطر فایل از ترتیب سطرها معلوم باشد.
+    # skip_rows در pyarrow سطر فایل می‌شمارد و skiprows موتور C رکورد CSV
+    df = None
+    if _HAS_PYARROW:
+        try:
+            df = _read_csv_arrow(stream, header_lines, keep, len(names), encoding)
+        except Exception:
+            stream.seek(pos)
+            df = None
+    if df is None:
+        df = pd.read_csv(stream, engine="c", header=None, skiprows=h + 1, usecols=keep, dtype=str,
+                         encoding=encoding, skip_blank_lines=False)
+
+    df.columns = [names[i] for i in sorted(keep)][:len(df.columns)]
+    return _drop_blank_rows(df, header_lines + 1 if row_numbers else None)
+
+
+# ---------------------------------------------------
+#  xls و سایر فرمت‌ها — خواندن کامل با pandas
+# ---------------------------------------------------
+def _read_whole(stream, select_columns: Optional[ColumnSelector], sheet: Optional[str] = None,
+                row_numbers: bool = False, **kwargs) -> pd.DataFrame:
+    raw = pd.read_excel(stream, header=None, sheet_name=0 if sheet is None else sheet, **kwargs)
+    if raw.empty:
+        return raw
+    top = raw.head(HEADER_SCAN_ROWS).astype(object)
+    h = find_header_row(top.where(top.notna(), None).values.tolist())
+    names = header_names(raw.iloc[h].tolist())
+    body = raw.iloc[h + 1:].reset_index(drop=True)
+    body.columns = names
+    sample = body.head(SAMPLE_ROWS).astype(object).where(body.head(SAMPLE_ROWS).notna(), None)
+    keep = _selected_indices(names, sample, select_columns)
+    return _drop_blank_rows(body[[names[i] for i in keep]], h + 2 if row_numbers else None)
+
+
+def _require_xlrd() -> None:
+    try:
+        import xlrd  # noqa: F401
+    except ImportError:
+        raise StatementReadError(
+            "فایل .xls نیاز به نصب کتابخانه 'xlrd' دارد یا لطفاً آن را به .xlsx تبدیل کنید."
+        )
+
+
+def workbook_sheets(stream, filename: str) -> List[str]:
+    """
+    برگه‌های قابل خواندن یک فایل Excel به ترتیب؛ فهرست خالی برای CSV و فرمت‌های تک‌جدولی
+    (و فایلی که فهرست برگه‌هایش خوانده نمی‌شود؛ خطای آن هنگام read_statement گزارش می‌شود).
+    """
+    ext = file_extension(filename)
+    try:
+        if ext in ("xlsx", "xlsm"):
+            return _xlsx_sheets(stream)
+        if ext == "xls":
+            _require_xlrd()
+            pos = stream.tell()
+            try:
+                return list(pd.ExcelFile(stream, engine="xlrd").sheet_names)
+            finally:
+                stream.seek(pos)
+    except Exception:
+        # فایل خراب یا ساختار غیرمعمول؛ مثل فایل تک‌برگه خوانده می‌شود
+        return []
+    return []
+
+
+def read_statement(stream, filename: str, select_columns: Optional[ColumnSelector] = None,
+                   sheet: Optional[str] = None, row_numbers: bool = False) -> pd.DataFrame:
+    """
+    خواندن یک فایل صورت وضعیت از یک stream باینری seek‌پذیر.
+
+    select_columns روی یک DataFrame نمونه (سرستون + چند سطر اول) صدا زده می‌شود و
+    نام ستون‌هایی را برمی‌گرداند که باید نگه داشته شوند؛ بقیه‌ی ستون‌ها اصلاً
+    در حافظه ساخته نمی‌شوند. sheet: نام برگه در فایل Excel (پیش‌فرض: اولین برگه).
+    row_numbers: اندیس DataFrame شماره‌ی سطر هر ردیف در فایل باشد (از ۱، با سرستون و سطرهای خالی؛
+    برای گزارش خطای سطر) به‌جای 0..n-1.
+    خطاهای قابل نمایش به کاربر StatementReadError هستند.
+    """
+    ext = file_extension(filename)
+    if ext == "csv":
+        return _read_csv(stream, select_columns, row_numbers)
+    if ext in ("xlsx", "xlsm"):
+        return _read_xlsx(stream, select_columns, sheet, row_numbers)
+    if ext == "xls":
+        _require_xlrd()
+        return _read_whole(stream, select_columns, sheet, row_numbers, engine="xlrd")
+    try:
+        return _read_whole(stream, select_columns, sheet, row_numbers)
+    except Exception:
+        raise StatementReadError(f"فرمت فایل {filename} پشتیبانی نمی‌شود.")
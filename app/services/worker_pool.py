@@ -0,0 +1,291 @@
+"""
+اجرای کارهای سنگین CPU (خواندن و مقایسه‌ی صورت وضعیت) بیرون از event loop.
+
+کارها در یک process pool با صف محدود اجرا می‌شوند تا یک آپلود بزرگ کل worker
+uvicorn (و health check) را قفل نکند:
+  - اگر تعداد کارهای در حال اجرا و منتظر به سقف برسد، کار جدید پذیرفته نمی‌شود
+    (PoolSaturated با زمان پیشنهادی Retry-After)
+  - هر کار timeout دارد (JobTimeout)؛ کاری که هنوز شروع نشده لغو می‌شود و process کارِ در حال
+    اجرا kill و با process تازه جایگزین می‌شود تا ظرفیت pool آزاد شود (در حالت thread ممکن نیست و
+    کار تا پایانش جا را نگه می‌دارد)
+  - هر slot یک ProcessPoolExecutor تک‌worker است تا kill یک کار بقیه‌ی کارهای در حال اجرا را
+    نشکند؛ صف و توزیع کارها روی slotها با یک thread pool هم‌اندازه
+  - processها با forkserver (یا spawn) ساخته می‌شوند، نه fork: fork پروسه‌ی uvicorn که thread و
+    engine پایگاه داده دارد ممکن است process فرزند را قفل کند. ساخت process و initializer (import
+    pandas و ...) چند ثانیه طول می‌کشد؛ warm() همه‌ی slotها را هنگام راه‌اندازی می‌سازد و جای process
+    kill‌شده بلافاصله process تازه ساخته می‌شود تا این زمان جزو انتظار کاری در صف نشود
+  - شمارنده‌ها: عمق صف، تعداد در حال اجرا، زمان انتظار در صف و زمان اجرا
+  - مراحل زمان‌سنجی‌شده داخل worker (app.services.metrics) همراه نتیجه برگردانده می‌شوند
+"""
+import asyncio
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services.metrics import StageTimer, record_stages
+
+# ---------- تنظیمات ----------
+DEFAULT_RETRY_AFTER = 5     # ثانیه؛ وقتی هنوز هیچ کاری تمام نشده و میانگین زمان اجرا معلوم نیست
+START_METHODS = ("forkserver", "spawn")   # اولین روش موجود روی سیستم‌عامل
+# --------------------------------
+
+
+class PoolSaturated(Exception):
+    """صف پر است؛ retry_after ثانیه‌ی پیشنهادی برای تلاش دوباره"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class JobTimeout(Exception):
+    """کار در زمان مجاز تمام نشد"""
+
+
+class JobError(Exception):
+    """
+    خطای قابل نمایش به کاربر که از داخل worker برمی‌گردد.
+    HTTPException استارلت قابل pickle نیست؛ کد وضعیت و پیام با این کلاس منتقل می‌شوند.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _timed_call(fn: Callable, args: Tuple) -> Tuple[float, Any, dict]:
+    # زمان شروع داخل worker ثبت می‌شود تا زمان انتظار در صف قابل محاسبه باشد؛
+    # مراحل زمان‌سنجی‌شده‌ی کار (metrics.stage) همراه نتیجه از process برمی‌گردند
+    started = time.time()
+    with StageTimer() as timer:
+        result = fn(*args)
+    return started, result, timer.stages
+
+
+def _ready() -> None:
+    """کار خالی برای بالا آوردن process یک slot (ProcessPoolExecutor process را با اولین کار می‌سازد)"""
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(next(m for m in START_METHODS if m in methods))
+
+
+def _kill_workers(executor: ProcessPoolExecutor) -> None:
+    """kill فوری processهای یک executor (کار در حال اجرا هم متوقف می‌شود)"""
+    kill = getattr(executor, "kill_workers", None)   # Python 3.14+
+    if kill is not None:
+        kill()
+        return
+    for process in list((executor._processes or {}).values()):
+        process.kill()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class BoundedPool:
+    def __init__(self, workers: int, max_queue: int, timeout: float,
+                 initializer: Optional[Callable[[], None]] = None):
+        """
+        workers: تعداد process؛ صفر یعنی اجرا در یک thread (بدون process جدا، برای توسعه و محیط‌های محدود)
+        max_queue: حداکثر کار منتظر علاوه بر کارهای در حال اجرا
+        timeout: حداکثر زمان هر کار از لحظه‌ی پذیرش (ثانیه)
+        initializer: فقط در حالت process، یک بار در هر process جدید اجرا می‌شود
+        """
+        self.workers = workers
+        self.initializer = initializer
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.slots = max(1, workers)
+        self._executor: Optional[Executor] = None   # حالت process: thread pool توزیع کارها روی slotها
+        self._idle: List[ProcessPoolExecutor] = []   # processهای تک‌worker آزاد
+        self._processes: set = set()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counters: Dict[str, float] = {
+            "submitted": 0, "completed": 0, "failed": 0, "cancelled": 0,
+            "rejected": 0, "timeouts": 0, "killed": 0,
+            "wait_seconds_total": 0.0, "wait_seconds_max": 0.0,
+            "run_seconds_total": 0.0,
+        }
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.workers > 0:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="compare-dispatch")
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="compare")
+            return self._executor
+
+    def _new_process(self) -> ProcessPoolExecutor:
+        process = ProcessPoolExecutor(max_workers=1, mp_context=_mp_context(), initializer=self.initializer)
+        with self._lock:
+            self._processes.add(process)
+        return process
+
+    def _start(self, processes: List[ProcessPoolExecutor]) -> None:
+        """بالا آوردن processها (موازی) و افزودن به slotهای آزاد"""
+        for future in [process.submit(_ready) for process in processes]:
+            future.result()
+        with self._lock:
+            self._idle.extend(p for p in processes if p in self._processes)
+
+    def warm(self) -> None:
+        """
+        ساخت process همه‌ی slotها از پیش (هنگام راه‌اندازی سرور)؛ بدون آن اولین کار هر slot چند ثانیه
+        منتظر ساخت process و initializer می‌ماند. در حالت thread کاری نمی‌کند.
+        """
+        if self.workers <= 0:
+            return
+        with self._lock:
+            missing = self.slots - len(self._processes)
+        self._start([self._new_process() for _ in range(missing)])
+
+    def _take_process(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._new_process()   # warm() صدا زده نشده یا ساخت جایگزین شکست خورده
+
+    def _release_process(self, process: ProcessPoolExecutor, healthy: bool) -> None:
+        with self._lock:
+            if healthy and process in self._processes:
+                self._idle.append(process)
+                return
+            replace = process in self._processes   # بعد از shutdown pool جایگزین لازم نیست
+            self._processes.discard(process)
+        if healthy:
+            process.shutdown(wait=False)   # بعد از shutdown pool
+            return
+        _kill_workers(process)
+        if replace:
+            # داخل thread توزیع و بعد از پاسخ خطای کار؛ کار بعدی process آماده می‌گیرد
+            replacement = self._new_process()
+            try:
+                self._start([replacement])
+            except BrokenProcessPool:
+                with self._lock:
+                    self._processes.discard(replacement)
+                replacement.shutdown(wait=False)
+
+    def _dispatch(self, fn: Callable, args: Tuple, submitted: float) -> tuple:
+        """
+        اجرای کار روی یک slot آزاد (داخل thread توزیع). کاری که تا مهلتش تمام نشود با process خودش
+        kill می‌شود؛ process که بعد از مردن worker (مثلاً کمبود حافظه) دیگر کار نمی‌پذیرد هم کنار می‌رود.
+        """
+        remaining = self.timeout - (time.time() - submitted)
+        if remaining <= 0:
+            raise JobTimeout()   # مهلت در صف تمام شد؛ اجرا نمی‌شود
+        process = self._take_process()
+        healthy = True
+        try:
+            future = process.submit(_timed_call, fn, args)
+            return future.result(timeout=remaining)
+        except FutureTimeout:
+            healthy = False
+            with self._lock:
+                self._counters["killed"] += 1
+            raise JobTimeout()
+        except BrokenProcessPool:
+            healthy = False
+            raise
+        finally:
+            self._release_process(process, healthy)
+
+    def _retry_after_locked(self) -> int:
+        done = self._counters["completed"]
+        if not done:
+            return DEFAULT_RETRY_AFTER
+        avg_run = self._counters["run_seconds_total"] / done
+        queued = max(0, self._in_flight - self.slots)
+        return max(1, math.ceil(avg_run * (queued + 1) / self.slots))
+
+    def _on_done(self, future: Future, submitted: float) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():
+                self._counters["cancelled"] += 1
+                return
+            if future.exception() is not None:
+                self._counters["failed"] += 1
+                return
+            started = future.result()[0]
+            wait = max(0.0, started - submitted)
+            self._counters["completed"] += 1
+            self._counters["wait_seconds_total"] += wait
+            self._counters["wait_seconds_max"] = max(self._counters["wait_seconds_max"], wait)
+            self._counters["run_seconds_total"] += max(0.0, time.time() - started)
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        اجرای fn(*args) در pool. fn و args باید قابل pickle باشند (تابع سطح ماژول).
+        خطاها: PoolSaturated، JobTimeout، و هر استثنایی که خود fn بدهد (مثلاً JobError).
+        """
+        return await self.submit(fn, *args)
+
+    def submit(self, fn: Callable, *args) -> Awaitable:
+        """
+        مثل run، ولی پذیرش در صف (و PoolSaturated) همین حالا انجام می‌شود و فقط انتظار برای
+        نتیجه به awaitable برگشتی سپرده می‌شود؛ برای کارهای پس‌زمینه که باید قبل از پاسخ
+        درخواست پذیرفته یا رد شوند. timeout از لحظه‌ی پذیرش حساب می‌شود.
+        """
+        with self._lock:
+            if self._in_flight >= self.slots + self.max_queue:
+                self._counters["rejected"] += 1
+                raise PoolSaturated(self._retry_after_locked())
+            self._in_flight += 1
+            self._counters["submitted"] += 1
+
+        submitted = time.time()
+        executor = self._get_executor()
+        if self.workers > 0:
+            future = executor.submit(self._dispatch, fn, args, submitted)
+        else:
+            future = executor.submit(_timed_call, fn, args)
+        future.add_done_callback(lambda f: self._on_done(f, submitted))
+        return self._result(future, submitted)
+
+    async def _result(self, future: Future, submitted: float) -> Any:
+        remaining = max(0.0, self.timeout - (time.time() - submitted))
+        try:
+            started, result, stages = await asyncio.wait_for(asyncio.wrap_future(future), remaining)
+        except (asyncio.TimeoutError, JobTimeout):
+            # کار هنوز در صف لغو می‌شود؛ کار در حال اجرا را thread توزیع در همان مهلت kill می‌کند
+            future.cancel()
+            with self._lock:
+                self._counters["timeouts"] += 1
+            raise JobTimeout()
+        # مراحل کار (به‌اضافه‌ی انتظار در صف) به timer درخواستی که منتظر این کار است اضافه می‌شوند
+        record_stages({"queue": {"seconds": max(0.0, started - submitted)}, **stages})
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            running = min(self._in_flight, self.slots)
+            done = self._counters["completed"]
+            return {
+                "mode": "process" if self.workers > 0 else "thread",
+                "workers": self.slots,
+                "max_queue": self.max_queue,
+                "timeout_seconds": self.timeout,
+                "running": running,
+                "queue_depth": self._in_flight - running,
+                **self._counters,
+                "wait_seconds_avg": self._counters["wait_seconds_total"] / done if done else 0.0,
+                "run_seconds_avg": self._counters["run_seconds_total"] / done if done else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            processes, self._processes, self._idle = self._processes, set(), []
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,58 @@
+"""
+بنچمارک cache صورت وضعیت‌ها: مقایسه‌ی سرد (بدون cache)، مقایسه با صورت وضعیت قبلیِ
+تکراری (frame از cache) و تکرار همان مقایسه (نتیجه از cache).
+
+اجرا از ریشه‌ی مخزن:
+    python -m benchmarks.bench_cache --rows 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+# cache در یک پوشه‌ی موقت و خالی؛ باید قبل از import برنامه تنظیم شود
+os.environ["STATEMENT_CACHE_DIR"] = tempfile.mkdtemp(prefix="metreyar_bench_cache_")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.api.v1.endpoints.main import app  # noqa: E402
+from app.services.statement_cache import statement_cache  # noqa: E402
+from benchmarks.bench_ingestion import make_xlsx  # noqa: E402
+
+URL = "/api/v1/compare-sooratvaziat/"
+
+
+def timed_post(client: TestClient, prev: bytes, curr: bytes):
+    files = {"previous_file": ("prev.xlsx", prev), "current_file": ("curr.xlsx", curr)}
+    t0 = time.perf_counter()
+    r = client.post(URL, files=files)
+    elapsed = time.perf_counter() - t0
+    r.raise_for_status()
+    return elapsed, r.headers.get("x-cache")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    prev = make_xlsx(args.rows)
+    curr = make_xlsx(args.rows + 500)
+    curr_next = make_xlsx(args.rows + 1000)
+    client = TestClient(app)
+
+    statement_cache.clear()
+    print(f"{args.rows} rows, cache dir {statement_cache.directory}")
+    for label, (p, c) in (
+        ("cold", (prev, curr)),
+        ("previous cached", (prev, curr_next)),
+        ("repeat", (prev, curr_next)),
+    ):
+        elapsed, header = timed_post(client, p, c)
+        print(f"  {label:<16} {elapsed * 1000:10.1f} ms   X-Cache {header}")
+    print(statement_cache.stats())
+    statement_cache.clear()
+
+
+if __name__ == "__main__":
+    main()
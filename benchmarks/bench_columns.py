@@ -0,0 +1,76 @@
+"""
+بنچمارک تشخیص ستون‌ها روی نمونه‌ی سرستون: روش قدیمی (حلقه‌ی الگو × ستون + difflib + regex
+سلول‌به‌سلول)، تشخیص با regexهای از پیش کامپایل‌شده، و قالب شناخته‌شده از رجیستری.
+
+اجرا از ریشه‌ی مخزن:
+    python -m benchmarks.bench_columns --repeat 2000
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+from difflib import get_close_matches
+
+# رجیستری در یک فایل موقت؛ باید قبل از import برنامه تنظیم شود
+os.environ["COLUMN_TEMPLATES_PATH"] = os.path.join(tempfile.mkdtemp(prefix="metreyar_bench_tpl_"), "t.json")
+
+import pandas as pd  # noqa: E402
+
+from app.api.v1.endpoints.main import (  # noqa: E402
+    COLUMN_PATTERNS, _detect_columns, _normalize_col_name, _resolve_columns,
+)
+
+HEADERS = ["ردیف", "کد فهرست بها", "واحد", "شرح عملیات اجرایی", "توضیحات", "پیمانکار", "تاریخ",
+           "شماره صورت", "ملاحظات", "مقدار کار", "بهای واحد", "بهای کل"]
+
+
+def legacy_detect(df: pd.DataFrame) -> dict:
+    # رفتار قبلی detect_columns_smart (مراحل ۱ تا ۳)
+    col_map = {"description": None, "amount": None, "qty": None, "unit": None}
+    normalized = {_normalize_col_name(c): c for c in df.columns}
+    for norm_name, orig in normalized.items():
+        for key, pats in COLUMN_PATTERNS.items():
+            if any(p in norm_name for p in pats):
+                if col_map[key] is None:
+                    col_map[key] = orig
+    names = list(normalized.keys())
+    for key, pats in COLUMN_PATTERNS.items():
+        if col_map[key] is None:
+            for p in pats:
+                matches = get_close_matches(p, names, n=1, cutoff=0.6)
+                if matches:
+                    col_map[key] = normalized[matches[0]]
+                    break
+    if not col_map["description"]:
+        for c in df.columns:
+            sample = df[c].astype(str).head(10).str.strip()
+            if sample.apply(lambda x: bool(re.search(r"[^\d\.\,\-]", x))).sum() >= 1:
+                col_map["description"] = c
+                break
+    return col_map
+
+
+def compiled_detect(df: pd.DataFrame) -> dict:
+    normalized = {_normalize_col_name(c): c for c in df.columns}
+    return _detect_columns(df, normalized)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    sample = pd.DataFrame([[i, "010203", "متر", f"عملیات {i}", "", "شرکت", "1403/01/01", 3, "", i, 1000, 1000 * i]
+                           for i in range(10)], columns=HEADERS, dtype=object)
+    _resolve_columns(sample)   # یادگیری قالب
+    for name, fn in (("legacy", legacy_detect), ("compiled", compiled_detect), ("registry", _resolve_columns)):
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            col_map = fn(sample)
+        elapsed = (time.perf_counter() - t0) / args.repeat
+        print(f"  {name:<9} {elapsed * 1e6:9.1f} us/upload   {col_map}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+بنچمارک موتور مشترک مقایسه (app/services/compare_engine.py) در برابر دو مسیر قبلی:
+  - dict : حلقه‌ی پایتونی روتر compare.py (dict(zip(...)) که از تکراری‌ها فقط آخرین سطر را نگه می‌دارد)
+  - merge: ادغام outer و apply وضعیت در main.py (تکراری‌ها ضرب دکارتی می‌شوند)
+  - engine: جمع تکراری‌ها و هم‌ترازی روی کدهای factorize (ordinal: جفت کردن n-امین تکرار)
+
+ورودی هر سه مرحله‌ی مقایسه است (کلید، شرح و مبلغ آماده)، نه خواندن فایل.
+
+اجرا از ریشه‌ی مخزن:
+    python -m benchmarks.bench_engine --rows 100000 --duplicate-ratio 0.3
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from app.services import compare_engine
+from benchmarks.statement_generator import generate_periods
+
+
+def make_frames(rows: int, duplicate_ratio: float):
+    previous, current = generate_periods(rows, seed=3, duplicate_ratio=duplicate_ratio, text_amount_ratio=0.0)
+    frames = []
+    for data in (previous, current):
+        df = pd.DataFrame({"desc": [r[2] for r in data], "amount": [float(r[4] * r[5]) for r in data]})
+        df["key"] = compare_engine.merge_keys(df["desc"])
+        frames.append(df)
+    return frames
+
+
+def legacy_dict(prev: pd.DataFrame, curr: pd.DataFrame) -> int:
+    prev_dict = dict(zip(prev["key"], prev["amount"]))
+    curr_dict = dict(zip(curr["key"], curr["amount"]))
+    results = []
+    for item in set(prev_dict) | set(curr_dict):
+        old = prev_dict.get(item, 0)
+        new = curr_dict.get(item, 0)
+        diff = new - old
+        status = "افزایش" if diff > 0 else ("کاهش" if diff < 0 else "بدون تغییر")
+        results.append({"شرح کار": item, "مبلغ قبلی": old, "مبلغ جدید": new, "تفاوت": diff, "وضعیت": status})
+    return len(results)
+
+
+def legacy_merge(prev: pd.DataFrame, curr: pd.DataFrame) -> int:
+    merged = pd.merge(prev, curr, how="outer", on="key", suffixes=("_prev", "_curr"), indicator=True)
+    side = merged.pop("_merge")
+    title = merged["desc_curr"].where(side != "left_only", merged["desc_prev"])
+    merged = merged.fillna(0)
+    merged["شرح_نهایی"] = title.fillna("").astype(str)
+    merged["تفاوت"] = merged["amount_curr"].astype(float) - merged["amount_prev"].astype(float)
+    merged["وضعیت"] = merged["تفاوت"].apply(lambda x: "افزایش" if x > 0 else ("کاهش" if x < 0 else "بدون تغییر"))
+    return len(merged)
+
+
+def engine(prev: pd.DataFrame, curr: pd.DataFrame, mode: str = "aggregate") -> int:
+    aligned = compare_engine.compare(prev["key"], prev["desc"], prev["amount"],
+                                     curr["key"], curr["desc"], curr["amount"], mode=mode)
+    return len(compare_engine.display_rows(aligned))
+
+
+def engine_ordinal(prev: pd.DataFrame, curr: pd.DataFrame) -> int:
+    return engine(prev, curr, "ordinal")
+
+
+def best_of(fn, repeat: int, *args):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        times.append(time.perf_counter() - t0)
+    return min(times), out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--duplicate-ratio", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9s} {'path':7s} {'ms':>9s} {'out rows':>9s}")
+    for rows in args.rows:
+        prev, curr = make_frames(rows, args.duplicate_ratio)
+        paths = (("dict", legacy_dict), ("merge", legacy_merge), ("engine", engine), ("ordinal", engine_ordinal))
+        for name, fn in paths:
+            elapsed, out = best_of(fn, args.repeat, prev, curr)
+            print(f"{rows:>9,d} {name:7s} {elapsed * 1000:9.1f} {out:>9,d}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
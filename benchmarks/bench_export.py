@@ -0,0 +1,65 @@
+"""
+بنچمارک ساخت گزارش مقایسه (app/services/report_export.py):
+  - xlsx pandas : DataFrame.to_excel (openpyxl معمولی؛ کل برگه در حافظه ساخته می‌شود)
+  - xlsx stream : write_xlsx در حالت write_only و دسته‌ای
+  - pdf  stream : write_pdf با canvas (صفحه‌به‌صفحه)
+
+زمان و اوج حافظه‌ی tracemalloc (در اجرای جدا) و حجم فایل اندازه‌گیری می‌شود؛ اوج حافظه‌ی
+xlsx stream نباید با تعداد سطرها رشد کند (pdf صفحه‌های فشرده‌شده را تا save نگه می‌دارد).
+
+اجرا از ریشه‌ی مخزن:
+    python -m benchmarks.bench_export --rows 10000 50000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from app.services import report_export
+from benchmarks.bench_output import META, make_display
+
+
+def pandas_xlsx(path, meta, rows, progress=None):
+    rows.to_excel(path, index=False, engine="openpyxl")
+
+
+PATHS = (
+    ("xlsx", "pandas", pandas_xlsx),
+    ("xlsx", "stream", report_export.write_xlsx),
+    ("pdf", "stream", report_export.write_pdf),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--no-memory", action="store_true", help="بدون اجرای جدای tracemalloc (کندتر است)")
+    args = parser.parse_args()
+
+    pdf_reason = report_export.pdf_unavailable_reason()
+    if pdf_reason:
+        print(f"pdf: {pdf_reason}")
+    workdir = tempfile.mkdtemp(prefix="metreyar_bench_export_")
+    print(f"{'rows':>9s} {'fmt':4s} {'path':7s} {'ms':>10s} {'peak MB':>8s} {'file MB':>8s}")
+    for n in args.rows:
+        display = make_display(n)
+        for fmt, name, write in PATHS:
+            if fmt == "pdf" and pdf_reason:
+                continue
+            path = os.path.join(workdir, f"{name}.{fmt}")
+            t0 = time.perf_counter()
+            write(path, META, display)
+            elapsed = time.perf_counter() - t0
+            peak = float("nan")
+            if not args.no_memory:
+                tracemalloc.start()
+                write(path, META, display)
+                peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+                tracemalloc.stop()
+            print(f"{n:>9,d} {fmt:4s} {name:7s} {elapsed * 1000:10.1f} {peak:8.1f} "
+                  f"{os.path.getsize(path) / 1024 / 1024:8.1f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
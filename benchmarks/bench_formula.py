@@ -0,0 +1,129 @@
+"""
+بنچمارک محاسبه‌ی فرمول قیمت (app/services/formula_engine.py) در برابر روش قبلی PriceService:
+جایگزینی متنی {متغیر} با str.replace و eval روی متن حاصل در هر درخواست.
+
+  - replace+eval : روش قبلی (تجزیه‌ی دوباره‌ی فرمول در هر محاسبه)
+  - cold         : compile_formula + evaluate (اولین درخواست هر فرمول)
+  - cached       : formula_cache.get + evaluate (درخواست‌های بعدی)
+
+و محاسبه‌ی دسته‌ای برای --lines سطر با مقادیر متفاوت:
+  - فرمول  : یک به یک با evaluate در برابر یک بار evaluate_many روی آرایه‌ها
+  - سرویس  : PriceService.calculate_item_price برای هر سطر در برابر PriceService.calculate_batch،
+             روی پایگاه داده‌ی SQLite موقت با --items آیتم؛ بدون فهرست بهای درون‌حافظه‌ای
+             (service-db: یک کوئری در هر سطر) و با آن (service: بدون کوئری، app/services/price_catalog.py)
+
+اجرا از ریشه‌ی مخزن:
+    python -m benchmarks.bench_formula --evals 20000 --lines 3000 30000
+"""
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+
+# پایگاه داده‌ی موقت برای بخش سرویس؛ قبل از import تنظیمات برنامه
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='metreyar_bench_formula_'), 'bench.db')}"
+
+from app.services.formula_engine import FormulaCache, compile_formula
+
+FORMULAS = {
+    "simple": ("{quantity} * {unit_price}", {"quantity": 12.5, "unit_price": 480000}),
+    "concrete": ("{length} * {width} * {thickness} * {unit_price} * (1 + {waste} / 100)",
+                 {"length": 12, "width": 4.5, "thickness": 0.15, "unit_price": 3200000, "waste": 5}),
+    "rebar": ("math.ceil({length} / {spacing} + 1) * {bar_length} * {weight} * {unit_price}"
+              " * (1.05 if {diameter} > 16 else 1.03)",
+              {"length": 24, "spacing": 0.2, "bar_length": 6, "weight": 0.888, "unit_price": 95000, "diameter": 12}),
+}
+
+
+def replace_eval(formula: str, variables: dict):
+    """همان روش قبلی _calculate_with_formula"""
+    for var_name, var_value in variables.items():
+        formula = formula.replace(f"{{{var_name}}}", str(var_value))
+    return eval(formula, {"__builtins__": None}, {"math": math})
+
+
+def _per_eval(fn, evals: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(evals):
+        fn()
+    return (time.perf_counter() - t0) / evals
+
+
+def bench_batch(lines: int, seed: int = 0):
+    rnd = random.Random(seed)
+    print(f"{'formula':10s} {'lines':>7s} {'per-line ms':>12s} {'batch ms':>9s} {'speedup':>8s}")
+    for name, (formula, variables) in FORMULAS.items():
+        compiled = compile_formula(formula)
+        rows = [{k: v * rnd.uniform(0.5, 1.5) if k != "diameter" else rnd.choice((10, 12, 18, 25))
+                 for k, v in variables.items()} for _ in range(lines)]
+        t0 = time.perf_counter()
+        single = [compiled.evaluate(row) for row in rows]
+        per_line = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        batch, errors = compiled.evaluate_many(rows)
+        many = time.perf_counter() - t0
+        assert not any(errors) and all(math.isclose(a, b) for a, b in zip(single, batch))
+        print(f"{name:10s} {lines:7d} {per_line * 1e3:12.2f} {many * 1e3:9.2f} {per_line / many:7.1f}x")
+
+
+def bench_service(lines: int, items: int, seed: int = 0):
+    from app.core.database import Base, SessionLocal, engine
+    from app.models.price_list import CoefficientTable, PriceItem
+    from app.services.price_catalog import price_catalog
+    from app.services.price_service import PriceService
+
+    Base.metadata.create_all(bind=engine, tables=[PriceItem.__table__, CoefficientTable.__table__])
+    rnd = random.Random(seed)
+    formulas = list(FORMULAS.values()) + [(None, {"quantity": 3})]
+    db = SessionLocal()
+    if db.query(PriceItem).count() < items:
+        for i in range(db.query(PriceItem).count(), items):
+            formula, variables = formulas[i % len(formulas)]
+            db.add(PriceItem(code=f"B{i}", name=f"item {i}", unit="m", unit_price=1000 + i, formula=formula,
+                             parameters={"unit_price": 1000 + i} if formula else None))
+        db.commit()
+    batch = []
+    for _ in range(lines):
+        i = rnd.randrange(items)
+        formula, variables = formulas[i % len(formulas)]
+        batch.append((f"B{i}", {k: v * rnd.uniform(0.5, 1.5) for k, v in variables.items() if k != "unit_price"}))
+
+    for name, enabled in (("service-db", False), ("service", True)):
+        price_catalog.enabled = enabled
+        price_catalog.load(db)  # بارگذاری فهرست خارج از زمان‌سنجی (مثل حالت پایدار سرور)
+        t0 = time.perf_counter()
+        single = [PriceService.calculate_item_price(code, quantities, db) for code, quantities in batch]
+        per_line = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        result = PriceService.calculate_batch(batch, db)
+        many = time.perf_counter() - t0
+        assert result["errors_count"] == 0 and math.isclose(result["total"], sum(single))
+        print(f"{name:10s} {lines:7d} {per_line * 1e3:12.2f} {many * 1e3:9.2f} {per_line / many:7.1f}x")
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--evals", type=int, default=20_000)
+    parser.add_argument("--lines", type=int, nargs="*", default=[3_000, 30_000])
+    parser.add_argument("--items", type=int, default=2_000, help="آیتم‌های فهرست بها در بخش سرویس")
+    args = parser.parse_args()
+
+    cache = FormulaCache()
+    print(f"{'formula':10s} {'replace+eval us':>16s} {'cold us':>9s} {'cached us':>10s} {'speedup':>8s}")
+    for i, (name, (formula, variables)) in enumerate(FORMULAS.items()):
+        assert math.isclose(replace_eval(formula, variables), compile_formula(formula).evaluate(variables))
+        old = _per_eval(lambda: replace_eval(formula, variables), args.evals)
+        cold = _per_eval(lambda: compile_formula(formula).evaluate(variables), args.evals)
+        cached = _per_eval(lambda: cache.get("price_item", i, formula).evaluate(variables), args.evals)
+        print(f"{name:10s} {old * 1e6:16.1f} {cold * 1e6:9.1f} {cached * 1e6:10.2f} {old / cached:7.1f}x")
+    for lines in args.lines:
+        print()
+        bench_batch(lines)
+        bench_service(lines, args.items)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+بنچمارک تطبیق فازی (app/services/fuzzy_match.py) روی آیتم‌های جفت‌نشده.
+
+نیمی از شرح‌های دوره‌ی جدید نسخه‌ی کمی تغییر یافته‌ی شرح قبلی‌اند (جابه‌جایی/حذف حرف،
+نیم‌فاصله، کلمه‌ی اضافه) و نیمی کاملاً جدید. برای مقایسه، difflib روی یک نمونه‌ی
+کوچک اجرا و زمانش به اندازه‌ی کامل برون‌یابی می‌شود.
+
+اجرا از ریشه‌ی مخزن:
+    python -m benchmarks.bench_fuzzy --sizes 5000 10000 20000 50000
+"""
+import argparse
+import difflib
+import random
+import time
+
+from app.core.text_normalizer import normalize_batch
+from app.services.fuzzy_match import DEFAULT_THRESHOLD, reconcile
+from benchmarks.statement_generator import DETAILS, description
+
+
+def _perturb(text: str, rnd: random.Random) -> str:
+    op = rnd.randint(0, 3)
+    if op == 0:  # حذف یک حرف
+        i = rnd.randrange(len(text))
+        return text[:i] + text[i + 1:]
+    if op == 1:  # جابه‌جایی دو حرف کنار هم
+        i = rnd.randrange(len(text) - 1)
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    if op == 2:  # نیم‌فاصله به جای فاصله
+        return text.replace(" ", "‌", 1)
+    return text + " " + rnd.choice(DETAILS).format(n=rnd.randint(1, 400))
+
+
+def make_keys(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    prev = [description(rnd) for _ in range(n)]
+    curr = [_perturb(p, rnd) if i % 2 == 0 else description(rnd) for i, p in enumerate(prev)]
+    return normalize_batch(prev), normalize_batch(curr)
+
+
+def bench_reconcile(n: int, threshold: float):
+    prev, curr = make_keys(n)
+    t0 = time.perf_counter()
+    matches = reconcile(prev, curr, threshold=threshold)
+    elapsed = time.perf_counter() - t0
+    return elapsed, len(matches)
+
+
+def bench_difflib(sample: int):
+    prev, curr = make_keys(sample)
+    t0 = time.perf_counter()
+    for a in prev:
+        sm = difflib.SequenceMatcher(None, a)
+        for b in curr:
+            sm.set_seq2(b)
+            sm.ratio()
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5_000, 10_000, 20_000, 50_000])
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--difflib-sample", type=int, default=300)
+    args = parser.parse_args()
+
+    sample = args.difflib_sample
+    per_pair = bench_difflib(sample) / (sample * sample)
+    print(f"difflib pairwise: {per_pair * 1e6:.1f} us/pair")
+
+    print(f"{'rows':>8} {'seconds':>9} {'us/row':>8} {'matched':>8} {'difflib (est.)':>15}")
+    for n in args.sizes:
+        elapsed, matched = bench_reconcile(n, args.threshold)
+        est = per_pair * n * n
+        print(f"{n:>8} {elapsed:>9.2f} {elapsed / n * 1e6:>8.1f} {matched:>8} {est / 3600:>13.1f} h")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+بنچمارک خواندن فایل صورت وضعیت: مسیر قدیمی (file.read + BytesIO + pd.read_excel/read_csv کامل)
+در برابر خواندن جریانی _read_file_to_df.
+
+اجرا از ریشه‌ی مخزن:
+    python -m benchmarks.bench_ingestion --rows 50000
+"""
+import argparse
+import io
+import random
+import time
+import tracemalloc
+
+import pandas as pd
+from fastapi import UploadFile
+from openpyxl import Workbook
+
+from app.api.v1.endpoints.main import _read_file_to_df
+
+EXTRA_COLUMNS = ["ردیف", "کد فهرست بها", "واحد", "توضیحات", "پیمانکار", "تاریخ", "شماره صورت", "ملاحظات"]
+WORDS = ["بتن", "ریزی", "حفاری", "آجرکاری", "گچ", "کاشی", "فونداسیون", "دیوار", "سقف", "لوله", "کشی", "عایق"]
+
+
+def _rows(n: int):
+    rnd = random.Random(42)
+    for i in range(n):
+        desc = " ".join(rnd.choice(WORDS) for _ in range(4))
+        qty = rnd.randint(1, 500)
+        unit = rnd.randint(1_000, 2_000_000)
+        yield [i + 1, f"{rnd.randint(1, 40):02d}{rnd.randint(1, 999):04d}", "متر مکعب", desc,
+               "توضیح " * 3, "شرکت نمونه", "1403/05/01", 12, "", qty, unit, qty * unit]
+
+
+def make_xlsx(n: int) -> bytes:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["صورت وضعیت شماره ۱۲"])
+    ws.append(EXTRA_COLUMNS[:3] + ["شرح کار"] + EXTRA_COLUMNS[3:] + ["مقدار", "فی", "مبلغ کل"])
+    for r in _rows(n):
+        ws.append(r)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def make_csv(n: int) -> bytes:
+    header = EXTRA_COLUMNS[:3] + ["شرح کار"] + EXTRA_COLUMNS[3:] + ["مقدار", "فی", "مبلغ کل"]
+    df = pd.DataFrame(list(_rows(n)), columns=header)
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def legacy_read(contents: bytes, ext: str) -> pd.DataFrame:
+    # رفتار قبلی _read_file_to_df
+    if ext == "csv":
+        return pd.read_csv(io.BytesIO(contents), encoding="utf-8", engine="python")
+    return pd.read_excel(io.BytesIO(contents), header=1, engine="openpyxl")
+
+
+def streaming_read(contents: bytes, ext: str) -> pd.DataFrame:
+    return _read_file_to_df(UploadFile(file=io.BytesIO(contents), filename=f"statement.{ext}"))
+
+
+def measure(fn, *args):
+    # زمان و حافظه در دو اجرای جدا؛ tracemalloc خودش کد پایتونی را چند برابر کند می‌کند
+    t0 = time.perf_counter()
+    df = fn(*args)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, df.shape
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    for ext, make in (("xlsx", make_xlsx), ("csv", make_csv)):
+        contents = make(args.rows)
+        print(f"\n{ext}: {args.rows} rows, {len(contents) / 1024 / 1024:.1f} MB")
+        for name, fn in (("legacy", legacy_read), ("streaming", streaming_read)):
+            # contents بیرون از اندازه‌گیری ساخته شده؛ فقط تخصیص‌های خودِ خواندن شمرده می‌شوند
+            elapsed, peak, shape = measure(fn, contents, ext)
+            print(f"  {name:<10} {elapsed:8.2f} s   peak {peak / 1024 / 1024:8.1f} MB   shape {shape}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+بنچمارک تطبیق کد-محور (کد فهرست بها و بعد شرح) در برابر تطبیق فقط با شرح.
+
+در دوره‌ی جدید شرح بخشی از آیتم‌ها کمی ویرایش شده (غلط تایپی، جزئیات اضافه) ولی کدشان همان
+است؛ تطبیق با شرح این آیتم‌ها را حذف‌شده + اضافه‌شده می‌بیند و تطبیق کد-محور جفتشان می‌کند.
+
+زمان‌ها جدا گزارش می‌شوند:
+  - keys    : ساخت کلید (نرمال‌سازی شرح / نرمال‌سازی کد)؛ در API یک بار هنگام بارگذاری و cache
+  - compare : هم‌ترازی دو دوره روی کلیدهای آماده (code_first_keys + compare برای کد-محور)
+
+اجرا از ریشه‌ی مخزن:
+    python -m benchmarks.bench_matching --rows 100000
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from app.services import compare_engine
+from benchmarks.bench_fuzzy import _perturb
+from benchmarks.statement_generator import generate_periods
+
+
+def make_frames(rows: int, edit_ratio: float, missing_code_ratio: float):
+    previous, current = generate_periods(rows, seed=5, text_amount_ratio=0.0, missing_code_ratio=missing_code_ratio)
+    rnd = random.Random(11)
+    frames = []
+    for period, data in enumerate((previous, current)):
+        descs = [r[2] for r in data]
+        if period == 1:
+            descs = [_perturb(d, rnd) if rnd.random() < edit_ratio else d for d in descs]
+        frames.append(pd.DataFrame({
+            "code": [r[1] for r in data],
+            "desc": descs,
+            "amount": [float(r[4] * r[5]) for r in data],
+        }))
+    return frames
+
+
+def best_of(fn, repeat: int):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times), out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--edit-ratio", type=float, default=0.1, help="سهم شرح‌های ویرایش‌شده در دوره‌ی جدید")
+    parser.add_argument("--missing-code-ratio", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9s} {'strategy':9s} {'keys ms':>9s} {'compare ms':>11s} {'paired':>8s} {'added':>7s} {'removed':>8s}")
+    for rows in args.rows:
+        prev, curr = make_frames(rows, args.edit_ratio, args.missing_code_ratio)
+
+        t_text_keys, (prev_text, curr_text) = best_of(
+            lambda: (compare_engine.merge_keys(prev["desc"]), compare_engine.merge_keys(curr["desc"])), args.repeat)
+        t_code_keys, (prev_codes, curr_codes) = best_of(
+            lambda: (compare_engine.code_keys(prev["code"]), compare_engine.code_keys(curr["code"])),
+            args.repeat)
+
+        def _text():
+            return compare_engine.compare(prev_text, prev["desc"], prev["amount"],
+                                          curr_text, curr["desc"], curr["amount"])
+
+        def _code():
+            prev_keys, curr_keys = compare_engine.code_first_keys(prev_codes, prev_text, curr_codes, curr_text)
+            return compare_engine.compare(prev_keys, prev["desc"], prev["amount"],
+                                          curr_keys, curr["desc"], curr["amount"])
+
+        # کد-محور برای سطرهای بدون کد به کلید متنی هم نیاز دارد
+        for name, keys_time, fn in (("text", t_text_keys, _text), ("code", t_text_keys + t_code_keys, _code)):
+            elapsed, aligned = best_of(fn, args.repeat)
+            sides = aligned["side"].value_counts()
+            print(f"{rows:>9,d} {name:9s} {keys_time * 1000:9.1f} {elapsed * 1000:11.1f} "
+                  f"{sides.get('both', 0):>8,d} {sides.get('right_only', 0):>7,d} {sides.get('left_only', 0):>8,d}",
+                  flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+بنچمارک حافظه‌ی خط لوله‌ی مقایسه در حالت عادی و کم‌حافظه (LOW_MEMORY_MODE):
+  - frame MB : حجم دو صورت وضعیت آماده (خروجی _load_statement، memory_usage(deep=True))
+  - peak MB  : اوج RSS پروسه در کل _compare_job (خواندن، مقایسه و نوشتن پاسخ)
+  - rss MB   : RSS بعد از هر مرحله (read/prepare/compare) از گزارش memory پاسخ
+
+هر اجرا در یک پروسه‌ی جدا انجام می‌شود تا اوج RSS و cacheهای داخلی دو حالت روی هم اثر نگذارند.
+با --budget سقف MEMORY_BUDGET_MB هم اعمال می‌شود (اجرای ردشده با 413 گزارش می‌شود).
+
+اجرا از ریشه‌ی مخزن:
+    python -m benchmarks.bench_memory --rows 50000 200000 --formats xlsx csv
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.statement_generator import statement_pair
+
+MODES = ("default", "low")
+
+
+def worker(prev_path: str, curr_path: str, fmt: str) -> None:
+    """اجرا در پروسه‌ی فرزند؛ یک خط JSON با نتیجه چاپ می‌کند"""
+    from app.api.v1.endpoints import main as main_app
+    from app.services.worker_pool import JobError
+
+    main_app.MAX_FILE_BYTES = sys.maxsize
+    body = prev_path + ".body"
+    output = dict(format="ndjson", offset=0, limit=None, sort_by=None, path=body)
+    options = dict(changes_offset=0, changes_limit=50, fuzzy=False, fuzzy_threshold=0.75)
+    t0 = time.perf_counter()
+    try:
+        main_app._compare_job((prev_path, f"prev.{fmt}", "bench-prev"), (curr_path, f"curr.{fmt}", "bench-curr"),
+                              options, output)
+    except JobError as e:
+        print(json.dumps({"status": e.status_code, "seconds": time.perf_counter() - t0}))
+        return
+    elapsed = time.perf_counter() - t0
+    with open(body, encoding="utf-8") as f:
+        meta = json.loads(f.readline())
+    os.remove(body)
+    frames = [main_app._load_upload((p, f"x.{fmt}", f"frame-{i}")) for i, p in enumerate((prev_path, curr_path))]
+    frame_mb = sum(df.memory_usage(deep=True).sum() for df in frames) / 1024 / 1024
+    print(json.dumps({"status": 200, "seconds": elapsed, "frame_mb": frame_mb, "memory": meta["memory"]}))
+
+
+def run_case(prev_path: str, curr_path: str, fmt: str, mode: str, budget: int) -> dict:
+    env = dict(
+        os.environ,
+        LOW_MEMORY_MODE="1" if mode == "low" else "0",
+        MEMORY_BUDGET_MB=str(budget),
+        STATEMENT_CACHE_ENABLED="0",
+        COLUMN_TEMPLATES_PATH=os.path.join(tempfile.mkdtemp(prefix="metreyar_bench_templates_"), "t.json"),
+    )
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_memory", "--worker", prev_path, curr_path, fmt],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[50_000, 200_000])
+    parser.add_argument("--formats", nargs="+", choices=["xlsx", "csv"], default=["xlsx", "csv"])
+    parser.add_argument("--budget", type=int, default=0, help="MEMORY_BUDGET_MB (صفر: بدون سقف)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--worker", nargs=3, metavar=("PREV", "CURR", "FMT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(*args.worker)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="metreyar_bench_memory_")
+    print(f"{'rows':>9s} {'fmt':5s} {'mode':8s} {'sec':>7s} {'frame MB':>9s} {'peak MB':>8s} "
+          f"{'read':>7s} {'prepare':>8s} {'compare':>8s}")
+    for rows in args.rows:
+        for fmt in args.formats:
+            paths = []
+            for name, data in zip(("prev", "curr"), statement_pair(rows, fmt, args.seed)):
+                paths.append(os.path.join(workdir, f"{name}-{rows}.{fmt}"))
+                with open(paths[-1], "wb") as f:
+                    f.write(data)
+            for mode in MODES:
+                r = run_case(*paths, fmt, mode, args.budget)
+                if r["status"] != 200:
+                    print(f"{rows:>9,d} {fmt:5s} {mode:8s} {r['seconds']:7.2f}  rejected ({r['status']})", flush=True)
+                    continue
+                stages = r["memory"]["stages"]
+                print(f"{rows:>9,d} {fmt:5s} {mode:8s} {r['seconds']:7.2f} {r['frame_mb']:9.1f} "
+                      f"{r['memory']['peak_rss_mb']:8.1f} {stages.get('read', 0):7.1f} "
+                      f"{stages.get('prepare', 0):8.1f} {stages.get('compare', 0):8.1f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
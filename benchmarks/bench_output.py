@@ -0,0 +1,85 @@
+"""
+بنچمارک سریال‌سازی خروجی مقایسه: مسیر قدیمی (to_dict(orient="records") روی کل جدول +
+JSONResponse) در برابر نوشتن دسته‌ای result_writer (json و ndjson).
+
+زمان تا اولین بایت (TTFB)، زمان کل و اوج حافظه (tracemalloc، در اجرای جدا) اندازه‌گیری می‌شود.
+
+اجرا از ریشه‌ی مخزن:
+    python -m benchmarks.bench_output --rows 100000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse
+
+from app.services.result_writer import write_result
+from benchmarks.statement_generator import description
+
+META = {"message": "success", "summary": {"previous_sum": 0.0, "current_sum": 0.0, "difference": 0.0}}
+
+
+class _Sink:
+    """مقصد نوشتن که فقط حجم و زمان اولین نوشتن را نگه می‌دارد (مثل socket)"""
+
+    def __init__(self, t0: float):
+        self.t0 = t0
+        self.first = None
+        self.size = 0
+
+    def write(self, b: bytes) -> None:
+        if self.first is None:
+            self.first = time.perf_counter() - self.t0
+        self.size += len(b)
+
+
+def make_display(n: int) -> pd.DataFrame:
+    rnd = random.Random(7)
+    prev = np.array([rnd.randint(0, 10**9) for _ in range(n)], dtype=float)
+    curr = prev + np.array([rnd.randint(-10**6, 10**6) for _ in range(n)], dtype=float)
+    diff = curr - prev
+    return pd.DataFrame({
+        "شرح کار": [description(rnd) for _ in range(n)],
+        "مبلغ قبلی": prev,
+        "مبلغ جدید": curr,
+        "تفاوت": diff,
+        "وضعیت": np.where(diff > 0, "افزایش", np.where(diff < 0, "کاهش", "بدون تغییر")),
+    })
+
+
+def legacy(display: pd.DataFrame, sink: _Sink) -> None:
+    body = JSONResponse(content=dict(META, data=display.fillna("").to_dict(orient="records"))).body
+    sink.write(body)
+
+
+def batched(fmt: str):
+    def _run(display: pd.DataFrame, sink: _Sink) -> None:
+        write_result(sink, META, display, fmt)
+    return _run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    display = make_display(args.rows)
+    print(f"{args.rows} rows")
+    for name, fn in (("legacy", legacy), ("json", batched("json")), ("ndjson", batched("ndjson"))):
+        t0 = time.perf_counter()
+        sink = _Sink(t0)
+        fn(display, sink)
+        total = time.perf_counter() - t0
+        tracemalloc.start()
+        fn(display, _Sink(time.perf_counter()))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  {name:<8} ttfb {sink.first * 1000:9.1f} ms   total {total * 1000:9.1f} ms   "
+              f"peak {peak / 1024 / 1024:7.1f} MB   body {sink.size / 1024 / 1024:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+بنچمارک مرحله‌به‌مرحله‌ی خط لوله‌ی مقایسه روی صورت وضعیت‌های مصنوعی (statement_generator)
+برای هر دو پیاده‌سازی:
+  - main     : app/api/v1/endpoints/main.py (خواندن جریانی، کلید نرمال‌شده، خروجی دسته‌ای)
+  - compare  : app/api/v1/endpoints/compare.py (روتر app/main.py؛ فقط xlsx با سرستون در سطر اول
+               و مبالغ عددی را می‌فهمد، پس ورودی همین شکل برایش ساخته می‌شود)
+
+برای هر مرحله بهترین زمان از --repeat اجرا و اوج حافظه‌ی tracemalloc (در اجرای جدا) ثبت
+می‌شود. گزارش JSON (--output) شامل commit و نسخه‌ها است و دو گزارش با --diff مقایسه می‌شوند؛
+اگر مرحله‌ای بیش از --threshold کندتر شده باشد کد خروج ۱ است.
+
+اجرا از ریشه‌ی مخزن:
+    python -m benchmarks.bench_pipeline --rows 1000 10000 100000 --output before.json
+    python -m benchmarks.bench_pipeline --diff before.json after.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+# cache خاموش (هر اجرا باید واقعاً پردازش کند) و رجیستری قالب‌ها در پوشه‌ی موقت؛ قبل از import برنامه
+os.environ["STATEMENT_CACHE_ENABLED"] = "0"
+os.environ["COLUMN_TEMPLATES_PATH"] = os.path.join(
+    tempfile.mkdtemp(prefix="metreyar_bench_templates_"), "column_templates.json"
+)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from fastapi import UploadFile  # noqa: E402
+
+from app.api.v1.endpoints import compare as compare_router  # noqa: E402
+from app.api.v1.endpoints import main as main_app  # noqa: E402
+from app.services.result_writer import write_result  # noqa: E402
+from benchmarks.statement_generator import statement_pair  # noqa: E402
+
+COMPARE_OPTIONS = dict(changes_offset=0, changes_limit=50, fuzzy=False, fuzzy_threshold=0.75)
+
+
+class _NullSink:
+    def write(self, b: bytes) -> None:
+        pass
+
+
+def _upload(data: bytes, fmt: str) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=f"statement.{fmt}")
+
+
+def measure(fn, repeat: int) -> dict:
+    # زمان و حافظه در اجراهای جدا؛ tracemalloc خودش کد پایتونی را چند برابر کند می‌کند
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": min(times), "seconds_median": float(np.median(times)), "peak_mb": peak / 1024 / 1024}
+
+
+def main_stages(prev: bytes, curr: bytes, fmt: str):
+    """(نام مرحله، تابع) برای main.py؛ ورودی هر مرحله یک بار از پیش آماده می‌شود"""
+    raw = main_app._read_file_to_df(_upload(prev, fmt))
+
+    def _detect():
+        return main_app.detect_columns_smart(raw.copy())
+
+    col_map = _detect()
+
+    def _amounts():
+        return main_app._to_number_series(raw[col_map["amount"]])
+
+    def _keys():
+        return main_app.build_merge_key_column(raw[[col_map["description"]]].copy(), col_map["description"])
+
+    frames = [main_app._load_statement(_upload(data, fmt), f"bench-{i}") for i, data in enumerate((prev, curr))]
+    meta, display = main_app._build_comparison(*frames, **COMPARE_OPTIONS)
+
+    workdir = tempfile.mkdtemp(prefix="metreyar_bench_pipeline_")
+    paths = []
+    for name, data in (("prev", prev), ("curr", curr)):
+        paths.append(os.path.join(workdir, f"{name}.{fmt}"))
+        with open(paths[-1], "wb") as f:
+            f.write(data)
+    output = dict(format="json", offset=0, limit=None, sort_by=None, path=os.path.join(workdir, "body.json"))
+
+    return [
+        ("read", lambda: main_app._read_file_to_df(_upload(prev, fmt))),
+        ("detect", _detect),
+        ("amounts", _amounts),
+        ("keys", _keys),
+        ("compare", lambda: main_app._build_comparison(*frames, **COMPARE_OPTIONS)),
+        ("serialize", lambda: write_result(_NullSink(), meta, display, "json")),
+        ("end_to_end", lambda: main_app._compare_job(
+            (paths[0], f"prev.{fmt}", "bench-prev"), (paths[1], f"curr.{fmt}", "bench-curr"),
+            COMPARE_OPTIONS, output,
+        )),
+    ]
+
+
+def compare_stages(prev: bytes, curr: bytes):
+    """(نام مرحله، تابع) برای compare.py"""
+    raw = pd.read_excel(io.BytesIO(prev))
+
+    def _end_to_end():
+        return asyncio.run(compare_router.compare_soorat_vaziat(_upload(prev, "xlsx"), _upload(curr, "xlsx")))
+
+    return [
+        ("read", lambda: pd.read_excel(io.BytesIO(prev))),
+        ("detect", lambda: compare_router.detect_columns(raw)),
+        ("end_to_end", _end_to_end),
+    ]
+
+
+def run(rows_list, formats, pipelines, repeat: int, seed: int) -> list:
+    results = []
+    for rows in rows_list:
+        for fmt in formats:
+            prev, curr = statement_pair(rows, fmt, seed)
+            cases = []
+            if "main" in pipelines:
+                cases.append(("main", fmt, prev, lambda p=prev, c=curr, f=fmt: main_stages(p, c, f)))
+            if "compare" in pipelines and fmt == "xlsx":
+                plain = statement_pair(rows, fmt, seed, with_title=False, text_amount_ratio=0.0)
+                cases.append(("compare", fmt, plain[0], lambda p=plain: compare_stages(*p)))
+            for pipeline, fmt_, data, build in cases:
+                for stage, fn in build():
+                    entry = {"pipeline": pipeline, "format": fmt_, "rows": rows, "stage": stage,
+                             "input_mb": len(data) / 1024 / 1024, **measure(fn, repeat)}
+                    results.append(entry)
+                    print(f"{pipeline:8s} {fmt_:5s} {rows:>9,d} {stage:11s} "
+                          f"{entry['seconds'] * 1000:10.1f} ms {entry['peak_mb']:9.1f} MB", flush=True)
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def diff_reports(old_path: str, new_path: str, threshold: float) -> int:
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    def _key(r):
+        return r["pipeline"], r["format"], r["rows"], r["stage"]
+
+    before = {_key(r): r for r in old["results"]}
+    print(f"{old['meta'].get('commit') or old_path} → {new['meta'].get('commit') or new_path}")
+    print(f"{'pipeline':8s} {'fmt':5s} {'rows':>9s} {'stage':11s} {'old ms':>10s} {'new ms':>10s} "
+          f"{'time':>7s} {'old MB':>8s} {'new MB':>8s}")
+    regressions = 0
+    for r in new["results"]:
+        o = before.get(_key(r))
+        if o is None:
+            continue
+        ratio = r["seconds"] / o["seconds"] if o["seconds"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions += 1
+            flag = "  ← کندتر"
+        print(f"{r['pipeline']:8s} {r['format']:5s} {r['rows']:>9,d} {r['stage']:11s} "
+              f"{o['seconds'] * 1000:10.1f} {r['seconds'] * 1000:10.1f} {ratio:6.2f}x "
+              f"{o['peak_mb']:8.1f} {r['peak_mb']:8.1f}{flag}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--formats", nargs="+", choices=["xlsx", "csv"], default=["xlsx", "csv"])
+    parser.add_argument("--pipelines", nargs="+", choices=["main", "compare"], default=["main", "compare"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="مسیر گزارش JSON")
+    parser.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"), help="مقایسه‌ی دو گزارش")
+    parser.add_argument("--threshold", type=float, default=0.2, help="کندی مجاز در --diff (۰٫۲ یعنی ۲۰٪)")
+    args = parser.parse_args()
+
+    if args.diff:
+        sys.exit(diff_reports(*args.diff, args.threshold))
+
+    # حد حجم آپلود مربوط به API است، نه خط لوله؛ فایل‌های بزرگ (تا ۱ میلیون سطر) هم سنجیده می‌شوند
+    main_app.MAX_FILE_BYTES = sys.maxsize
+
+    results = run(args.rows, args.formats, args.pipelines, args.repeat, args.seed)
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "diff")},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"گزارش: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
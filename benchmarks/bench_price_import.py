@@ -0,0 +1,117 @@
+"""
+بنچمارک ورود دسته‌ای فهرست بها (app/services/price_import.py) روی فایل مصنوعی --items آیتمی
+(شرح‌ها مثل statement_generator، کدهای عددی و بخشی از بهاها متنی با جداکننده‌ی هزارگان):
+  - import  : import_price_list روی xlsx و csv (درج اول و ورود دوباره‌ی همان فایل = به‌روزرسانی)
+              با مدت هر مرحله (خواندن، اعتبارسنجی، نوشتن)
+  - orm     : روش scripts/seed_data.py برای همان سطرهای خوانده‌شده: شیء PriceItem برای هر سطر
+              (با جستجوی کد برای به‌روزرسانی) و add، روی --orm-items سطر اول
+
+اجرا از ریشه‌ی مخزن:
+    python -m benchmarks.bench_price_import --items 50000
+"""
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+
+# پایگاه داده‌ی موقت؛ قبل از import تنظیمات برنامه
+_TMP = tempfile.mkdtemp(prefix="metreyar_bench_import_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP, 'bench.db')}"
+
+from openpyxl import Workbook  # noqa: E402
+
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.price_list import CoefficientTable, PriceItem  # noqa: E402
+from app.services.metrics import StageTimer  # noqa: E402
+from app.services.price_import import import_price_list  # noqa: E402
+from benchmarks.statement_generator import UNITS, description  # noqa: E402
+
+HEADER = ["شماره", "شرح مختصر", "واحد", "بهای واحد (ریال)"]
+
+
+def price_list_rows(n: int, seed: int = 0) -> list:
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        price = rnd.randint(1, 10 ** 7)
+        rows.append([10000 + i, description(rnd), rnd.choice(UNITS), price if i % 3 else f"{price:,}"])
+    return rows
+
+
+def xlsx_file(rows: list) -> str:
+    path = os.path.join(_TMP, "price_list.xlsx")
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("ابنیه")
+    ws.append(["فهرست بهای واحد پایه رشته ابنیه"])
+    ws.append(HEADER)
+    for row in rows:
+        ws.append(row)
+    coefficients = wb.create_sheet("ضریب منطقه‌ای")
+    coefficients.append(["استان", "ضریب"])
+    for i in range(31):
+        coefficients.append([f"استان {i}", 1 + i / 100])
+    wb.save(path)
+    return path
+
+
+def csv_file(rows: list) -> str:
+    path = os.path.join(_TMP, "price_list.csv")
+    with io.open(path, "w", encoding="utf-8-sig", newline="") as f:
+        f.write(",".join(HEADER) + "\n")
+        for code, name, unit, price in rows:
+            f.write(f'{code:06d},{name},{unit},"{price}"\n')
+    return path
+
+
+def run_import(path: str, label: str) -> None:
+    db = SessionLocal()
+    with StageTimer() as timer, open(path, "rb") as f:
+        report = import_price_list(db, f, path)
+    db.close()
+    stages = "  ".join(f"{name.replace('import_', '')}={entry['seconds']:.2f}s"
+                       for name, entry in timer.stages.items() if name.startswith("import_"))
+    print(f"{label:14s} {report['seconds']:7.2f}s {report['rows_per_second']:>9} rows/s  "
+          f"new={report['inserted']} updated={report['updated']} rejected={report['rejected']}  {stages}")
+
+
+def run_orm(rows: list) -> float:
+    """هر سطر یک شیء ORM (جستجوی کد، به‌روزرسانی یا add)؛ خروجی: سطر در ثانیه"""
+    db = SessionLocal()
+    t0 = time.perf_counter()
+    for code, name, unit, price in rows:
+        code = f"{code:06d}"
+        item = db.query(PriceItem).filter(PriceItem.code == code).first()
+        if item is None:
+            item = PriceItem(code=code)
+            db.add(item)
+        item.name, item.unit, item.unit_price = name, unit, float(str(price).replace(",", ""))
+    db.commit()
+    db.close()
+    return len(rows) / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--orm-items", type=int, default=5_000)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine, tables=[PriceItem.__table__, CoefficientTable.__table__])
+    rows = price_list_rows(args.items)
+    paths = {"xlsx": xlsx_file(rows), "csv": csv_file(rows)}
+    print(f"{args.items} آیتم: xlsx {os.path.getsize(paths['xlsx']) / 1e6:.1f} MB، "
+          f"csv {os.path.getsize(paths['csv']) / 1e6:.1f} MB\n")
+    for fmt, path in paths.items():
+        run_import(path, f"{fmt} insert" if fmt == "xlsx" else f"{fmt} update")
+    run_import(paths["xlsx"], "xlsx update")
+
+    with engine.begin() as conn:
+        conn.execute(PriceItem.__table__.delete())
+    print(f"\norm (seed_data) {run_orm(rows[:args.orm_items]):9.0f} rows/s  (insert, {args.orm_items} rows)")
+    print(f"orm (seed_data) {run_orm(rows[:args.orm_items]):9.0f} rows/s  (update)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+بنچمارک فهرست آیتم‌های فهرست بها (GET /price-list/price-items) روی --items آیتم مصنوعی در SQLite:
+  - صفحه‌ی عمیق : offset(skip) در برابر cursor (keyset روی کد) برای صفحه‌ی وسط و آخر
+  - فیلتر       : category (ایندکس category + code)
+  - جستجو       : عبارت‌های فارسی با FTS5 (جدول سایه‌ی نرمال‌شده) در برابر LIKE روی name/description؛
+                  شرح‌ها مثل statement_generator، بخشی با صفحه‌کلید عربی (ي/ك) که LIKE پیدا نمی‌کند
+
+زمان‌ها میانه‌ی --repeat درخواست از TestClient (شامل serialize پاسخ) هستند.
+
+اجرا از ریشه‌ی مخزن:
+    python -m benchmarks.bench_price_search --items 50000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+# پایگاه داده‌ی موقت؛ قبل از import تنظیمات برنامه
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='metreyar_bench_search_'), 'bench.db')}"
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.api.v1.endpoints.price_list import router  # noqa: E402
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.price_list import PriceItem  # noqa: E402
+from app.services.price_search import price_search  # noqa: E402
+from benchmarks.statement_generator import UNITS, description  # noqa: E402
+
+QUERIES = ["بتن", "ايزوگام", "لوله پلی", "تهیه و نصب کاشی", "عیار ۳۵۰", "xyz"]
+
+
+def populate(n: int, seed: int = 0) -> None:
+    Base.metadata.create_all(bind=engine, tables=[PriceItem.__table__])
+    rnd = random.Random(seed)
+    arabic = str.maketrans({"ی": "ي", "ک": "ك"})
+    rows = []
+    for i in range(n):
+        name = description(rnd, persian_digits=rnd.random() < 0.3)
+        rows.append({
+            "code": f"{i % 99 + 1:02d}{i:06d}", "name": name.translate(arabic) if rnd.random() < 0.2 else name,
+            "unit": rnd.choice(UNITS), "unit_price": rnd.randint(1, 10_000) * 1000.0,
+            "category": f"فصل {i % 30 + 1}", "sub_category": f"گروه {i % 300 + 1}",
+            "description": description(rnd) if rnd.random() < 0.3 else None,
+        })
+    with engine.begin() as conn:
+        conn.execute(PriceItem.__table__.insert(), rows)
+
+
+def timed(client: TestClient, params: dict, repeat: int):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        response = client.get("/price-list/price-items", params=params)
+        times.append(time.perf_counter() - t0)
+        assert response.status_code == 200, response.text
+    return statistics.median(times) * 1e3, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    populate(args.items)
+    app = FastAPI()
+    app.include_router(router, prefix="/price-list")
+    client = TestClient(app)
+    t0 = time.perf_counter()
+    client.get("/price-list/price-items", params={"limit": 1})  # ایندکس‌ها و جدول سایه
+    print(f"ساخت ایندکس جستجو: {(time.perf_counter() - t0) * 1e3:.0f} ms برای {args.items} آیتم (fts={price_search.fts})")
+
+    db = SessionLocal()
+    codes = [c for (c,) in db.query(PriceItem.code).order_by(PriceItem.code)]
+    db.close()
+    print(f"\n{'page':8s} {'offset ms':>10s} {'cursor ms':>10s}")
+    for label, skip in (("first", 0), ("middle", args.items // 2), ("last", args.items - args.limit)):
+        offset_ms, r1 = timed(client, {"limit": args.limit, "skip": skip}, args.repeat)
+        params = {"limit": args.limit, **({"cursor": codes[skip - 1]} if skip else {})}
+        cursor_ms, r2 = timed(client, params, args.repeat)
+        assert r1.json() == r2.json()
+        print(f"{label:8s} {offset_ms:10.2f} {cursor_ms:10.2f}")
+
+    ms, r = timed(client, {"limit": args.limit, "category": "فصل 7"}, args.repeat)
+    print(f"\ncategory filter: {ms:.2f} ms ({len(r.json())} items)")
+
+    print(f"\n{'query':18s} {'fts ms':>8s} {'hits':>6s} {'like ms':>8s} {'hits':>6s}")
+    for q in QUERIES:
+        price_search.fts = True
+        fts_ms, r1 = timed(client, {"limit": args.limit, "q": q}, args.repeat)
+        price_search.fts = False
+        like_ms, r2 = timed(client, {"limit": args.limit, "q": q}, args.repeat)
+        price_search.fts = True
+        print(f"{q:18s} {fts_ms:8.2f} {len(r1.json()):6d} {like_ms:8.2f} {len(r2.json()):6d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+تولید صورت وضعیت‌های مصنوعی و واقع‌نما (xlsx/csv) برای بنچمارک‌ها.
+
+ویژگی‌ها:
+  - شرح‌های قالبی عمرانی (عملیات + مصالح + جزئیات با عدد) و آیتم‌های تکراری
+  - کد فهرست بها (چند درصد سطرها بدون کد)، سطر عنوان بالای جدول، ارقام فارسی (ردیف، شرح و بخشی از مبالغ)، جداکننده‌ی هزارگان
+    (, یا ٬) در مبالغ متنی
+  - دو دوره: دوره‌ی جدید همان آیتم‌ها با پیشرفت مبلغ، چند آیتم حذف/اضافه و شرح‌هایی که
+    با صفحه‌کلید عربی (ي/ك) تایپ شده‌اند
+
+اجرا از ریشه‌ی مخزن (دو فایل previous/current در out-dir):
+    python -m benchmarks.statement_generator --rows 100000 --format xlsx --out-dir /tmp/statements
+"""
+import argparse
+import csv
+import io
+import os
+import random
+from typing import List, Optional, Sequence, Tuple
+
+from openpyxl import Workbook
+
+ACTIONS = ["تهیه و نصب", "اجرای", "تهیه مصالح و اجرای", "برچیدن", "تعمیر", "رنگ آمیزی", "حمل و نصب", "ساخت و نصب"]
+MATERIALS = [
+    "بتن", "آجرکاری", "گچ", "کاشی", "فونداسیون", "دیوار", "سقف", "لوله", "عایق رطوبتی", "میلگرد", "قالب بندی",
+    "موزاییک", "سنگ پلاک", "نما", "کف سازی", "پله", "درب فلزی", "پنجره آلومینیومی", "شیشه", "کابل", "تابلو برق",
+    "چراغ روشنایی", "موتورخانه", "کانال کولر", "لوله پلی اتیلن", "شیر فلکه", "رادیاتور", "سرامیک", "ایزوگام",
+    "تیرچه و بلوک", "اسکلت فلزی", "ورق گالوانیزه", "نرده", "جدول بتنی", "آسفالت", "زیرسازی", "خاکریزی",
+]
+DETAILS = [
+    "با ملات ماسه سیمان", "به ضخامت {n} سانتیمتر", "در ارتفاع تا {n} متر", "با عیار {n} کیلوگرم سیمان",
+    "قطر {n} میلیمتر", "نوع {n}", "در طبقات", "در زیرزمین", "با مصالح پیمانکار", "طبق نقشه شماره {n}",
+    "با رنگ روغنی", "به عرض {n} سانتیمتر", "فاصله حمل تا {n} کیلومتر", "درجه یک", "ساخت داخل",
+]
+UNITS = ["متر مکعب", "متر مربع", "متر طول", "کیلوگرم", "عدد", "دستگاه", "مقطوع"]
+HEADER = ["ردیف", "کد فهرست بها", "شرح کار", "واحد", "مقدار", "فی", "مبلغ کل", "توضیحات"]
+
+_PERSIAN_DIGITS = str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹")
+_ARABIC_KEYBOARD = str.maketrans({"ی": "ي", "ک": "ك"})
+
+
+def description(rnd: random.Random, persian_digits: bool = False) -> str:
+    parts = [rnd.choice(ACTIONS), rnd.choice(MATERIALS)]
+    for d in rnd.sample(DETAILS, rnd.randint(1, 3)):
+        parts.append(d.format(n=rnd.randint(1, 400)))
+    text = " ".join(parts)
+    return text.translate(_PERSIAN_DIGITS) if persian_digits else text
+
+
+def _code(rnd: random.Random) -> str:
+    """کد شش‌رقمی فهرست بها (دو رقم فصل + چهار رقم ردیف)"""
+    return f"{rnd.randint(1, 99):02d}{rnd.randint(1, 9999):04d}"
+
+
+def format_amount(value: int, rnd: random.Random, text_ratio: float) -> object:
+    """مبلغ عددی یا (با احتمال text_ratio) متنی با جداکننده‌ی هزارگان، گاهی با ارقام فارسی"""
+    if rnd.random() >= text_ratio:
+        return value
+    if rnd.random() < 0.5:
+        return f"{value:,}"
+    return f"{value:,}".replace(",", "٬").translate(_PERSIAN_DIGITS)
+
+
+def generate_periods(
+    rows: int,
+    seed: int = 0,
+    duplicate_ratio: float = 0.05,
+    churn_ratio: float = 0.05,
+    text_amount_ratio: float = 0.2,
+    missing_code_ratio: float = 0.05,
+) -> Tuple[List[list], List[list]]:
+    """
+    سطرهای دو دوره‌ی متوالی (بدون سرستون).
+    duplicate_ratio: سهم سطرهایی که شرح یک سطر قبلی را تکرار می‌کنند (همان آیتم در طبقه‌ی دیگر)
+    churn_ratio: سهم آیتم‌های حذف‌شده و (به همان تعداد) اضافه‌شده در دوره‌ی جدید
+    missing_code_ratio: سهم سطرهایی که کد فهرست بها ندارند (در هر دوره جدا)
+    """
+    rnd = random.Random(seed)
+    items = []
+    for i in range(rows):
+        if items and rnd.random() < duplicate_ratio:
+            desc, code, unit = rnd.choice(items)[:3]
+        else:
+            desc = description(rnd, persian_digits=rnd.random() < 0.3)
+            code = _code(rnd)
+            unit = rnd.choice(UNITS)
+        qty = rnd.randint(1, 5000)
+        price = rnd.randint(10, 5000) * 1000
+        items.append((desc, code, unit, qty, price))
+
+    def _row(i, desc, code, unit, qty, price):
+        if rnd.random() < missing_code_ratio:
+            code = ""
+        return [str(i + 1).translate(_PERSIAN_DIGITS), code, desc, unit, qty, price,
+                format_amount(qty * price, rnd, text_amount_ratio), ""]
+
+    previous = [_row(i, *item) for i, item in enumerate(items)]
+
+    current = []
+    for desc, code, unit, qty, price in items:
+        if rnd.random() < churn_ratio:
+            continue
+        if rnd.random() < 0.1:
+            desc = desc.translate(_ARABIC_KEYBOARD)
+        qty = int(qty * (1 + rnd.random() * 0.3))
+        current.append((desc, code, unit, qty, price))
+    while len(current) < rows:
+        current.append((description(rnd), _code(rnd), rnd.choice(UNITS),
+                        rnd.randint(1, 5000), rnd.randint(10, 5000) * 1000))
+    return previous, [_row(i, *item) for i, item in enumerate(current)]
+
+
+def xlsx_bytes(rows: Sequence[list], title: Optional[str] = "صورت وضعیت شماره ۱۲", header: Sequence[str] = HEADER) -> bytes:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    if title:
+        ws.append([title])
+    ws.append(list(header))
+    for r in rows:
+        ws.append(r)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def csv_bytes(rows: Sequence[list], title: Optional[str] = "صورت وضعیت شماره ۱۲", header: Sequence[str] = HEADER) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if title:
+        writer.writerow([title])
+    writer.writerow(list(header))
+    writer.writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+
+WRITERS = {"xlsx": xlsx_bytes, "csv": csv_bytes}
+
+
+def statement_pair(rows: int, fmt: str = "xlsx", seed: int = 0, with_title: bool = True,
+                   **kwargs) -> Tuple[bytes, bytes]:
+    """(فایل دوره‌ی قبل، فایل دوره‌ی جدید) با قالب fmt؛ with_title=False یعنی سرستون در سطر اول"""
+    previous, current = generate_periods(rows, seed=seed, **kwargs)
+    write = WRITERS[fmt]
+    if not with_title:
+        return write(previous, title=None), write(current, title=None)
+    return write(previous, title="صورت وضعیت شماره ۱۱"), write(current)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--format", choices=sorted(WRITERS), default="xlsx")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.05)
+    parser.add_argument("--churn-ratio", type=float, default=0.05)
+    parser.add_argument("--text-amount-ratio", type=float, default=0.2)
+    parser.add_argument("--missing-code-ratio", type=float, default=0.05)
+    parser.add_argument("--out-dir", default=".")
+    args = parser.parse_args()
+
+    previous, current = statement_pair(
+        args.rows, args.format, args.seed,
+        duplicate_ratio=args.duplicate_ratio, churn_ratio=args.churn_ratio,
+        text_amount_ratio=args.text_amount_ratio, missing_code_ratio=args.missing_code_ratio,
+    )
+    os.makedirs(args.out_dir, exist_ok=True)
+    for name, data in (("previous", previous), ("current", current)):
+        path = os.path.join(args.out_dir, f"{name}.{args.format}")
+        with open(path, "wb") as f:
+            f.write(data)
+        print(f"{path}: {len(data) / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+ورود فایل فهرست بها (xlsx/xls/csv) از خط فرمان؛ همان مسیر POST /price-list/import.
+
+اجرا از ریشه‌ی مخزن (پایگاه داده از DATABASE_URL):
+    python -m scripts.import_price_list fehrest-baha-1403.xlsx [--dry-run] [--show-rejected 20]
+"""
+import argparse
+import json
+import sys
+
+from app.core.database import Base, SessionLocal, engine
+from app.models.price_list import CoefficientTable, PriceItem
+from app.services.price_import import PriceImportError, import_price_list
+from app.services.statement_reader import StatementReadError
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--dry-run", action="store_true", help="فقط اعتبارسنجی، بدون نوشتن در پایگاه داده")
+    parser.add_argument("--show-rejected", type=int, default=20, help="چند سطر ردشده چاپ شود")
+    parser.add_argument("--json", action="store_true", help="گزارش کامل به‌صورت JSON")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine, tables=[PriceItem.__table__, CoefficientTable.__table__])
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as f:
+            report = import_price_list(db, f, args.path, dry_run=args.dry_run)
+    except (StatementReadError, PriceImportError) as e:
+        print(f"خطا: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+    print(f"{report['rows']} سطر در {report['seconds']} ثانیه ({report['rows_per_second']} سطر در ثانیه)"
+          f"{' — dry run' if report['dry_run'] else ''}")
+    print(f"  جدید: {report['inserted']}  به‌روزشده: {report['updated']}  ردشده: {report['rejected']}")
+    for table in report["coefficient_tables"]:
+        print(f"  جدول ضرایب «{table['name']}»: {table['entries']} ضریب")
+    if report["skipped_sheets"]:
+        print(f"  برگه‌های کنارگذاشته: {', '.join(map(str, report['skipped_sheets']))}")
+    for row in report["rejected_rows"][:args.show_rejected]:
+        print(f"  [{row['sheet'] or '-'}] سطر {row['row']} کد {row['code'] or '-'}: {row['error']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+from collections import OrderedDict
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.models.price_list  # noqa: F401  (ثبت جدول‌ها روی Base)
+import app.models.project  # noqa: F401
+import app.models.user  # noqa: F401
+from app.api.v1.endpoints import main
+from app.core.database import Base
+from app.services.column_templates import column_templates
+from app.services.job_store import job_store
+from app.services.price_catalog import price_catalog
+from app.services.price_search import price_search
+from app.services.snapshot_store import snapshot_store
+from app.services.statement_cache import statement_cache
+from app.services.worker_pool import BoundedPool
+
+
+@pytest.fixture
+def session_factory():
+    """پایگاه داده‌ی SQLite درون‌حافظه‌ای مشترک بین Sessionها (StaticPool)"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture(autouse=True)
+def _fresh_price_indexes():
+    """فهرست بها و جدول سایه‌ی جستجو یک بار در هر process ساخته می‌شوند؛ هر آزمون پایگاه داده‌ی تازه دارد"""
+    price_catalog.invalidate()
+    price_search._ready = price_search.fts = False
+    yield
+    price_catalog.invalidate()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_data_dir(tmp_path, monkeypatch):
+    """هیچ آزمونی در پوشه‌های پیش‌فرض سرویس (DATA_DIR ماندگار، cache صورت وضعیت‌ها و کارها) نمی‌نویسد"""
+    (tmp_path / "cache").mkdir()
+    (tmp_path / "jobs").mkdir()
+    monkeypatch.setattr(job_store, "directory", str(tmp_path / "jobs"))
+    monkeypatch.setattr(statement_cache, "directory", str(tmp_path / "cache"))
+    monkeypatch.setattr(statement_cache, "_entries", OrderedDict())
+    monkeypatch.setattr(statement_cache, "_size", 0)
+    monkeypatch.setattr(snapshot_store, "directory", str(tmp_path / "snapshots"))
+    monkeypatch.setattr(column_templates, "path", str(tmp_path / "column_templates.json"))
+    monkeypatch.setattr(column_templates, "_templates", {})
+    monkeypatch.setattr(column_templates, "_mtime", None)
+
+
+@pytest.fixture
+def app_client(monkeypatch):
+    """اپ مستقل مقایسه با poolهای thread (بدون process) و بدون ساخت جدول در پایگاه داده‌ی پیش‌فرض هنگام startup"""
+    monkeypatch.setattr(main, "compare_pool", BoundedPool(workers=0, max_queue=8, timeout=60))
+    monkeypatch.setattr(main, "job_pool", BoundedPool(workers=0, max_queue=8, timeout=60))
+    monkeypatch.setattr(snapshot_store, "_tables_ready", True)
+    with TestClient(main.app) as client:
+        yield client
@@ -0,0 +1,66 @@
+import pandas as pd
+
+from app.api.v1.endpoints.main import _build_comparison
+from app.services.chapters import chapter_codes, rollup
+from app.services.compare_engine import code_keys, compare, merge_keys
+
+
+def test_chapter_codes_restore_leading_zeros():
+    codes = pd.Series(["010203", 10203, 10203.0, "۰۱۰۲۰۳", "1-2-3", "01.02.03", "a10203", None, " "], dtype=object)
+    assert chapter_codes(codes).tolist() == ["010203"] * 6 + ["A10203", "", ""]
+
+
+def _period(rows):
+    codes, titles, amounts = (pd.Series(c, dtype=object) for c in zip(*rows))
+    return merge_keys(titles), titles, amounts.astype(float), chapter_codes(codes)
+
+
+def _aligned(prev_rows, curr_rows):
+    prev_keys, prev_titles, prev_amounts, prev_groups = _period(prev_rows)
+    curr_keys, curr_titles, curr_amounts, curr_groups = _period(curr_rows)
+    return compare(prev_keys, prev_titles, prev_amounts, curr_keys, curr_titles, curr_amounts,
+                   prev_groups=prev_groups, curr_groups=curr_groups)
+
+
+PREVIOUS = [("010101", "خاکبرداری", 100), ("010201", "خاکریزی", 50), ("020101", "بتن", 30), (None, "متفرقه", 5)]
+CURRENT = [("010101", "خاکبرداری", 150), ("010202", "تسطیح", 10), ("020101", "بتن", 30), (None, "متفرقه", 7)]
+
+
+def test_rollup_chapters_and_subchapters():
+    chapters = rollup(_aligned(PREVIOUS, CURRENT), depth=2)
+    assert [c["chapter"] for c in chapters] == ["01", "02", None]
+    first = chapters[0]
+    assert (first["previous"], first["current"], first["difference"]) == (150, 160, 10)
+    assert (first["items"], first["added"], first["removed"], first["progress_percent"]) == (3, 1, 1, 6.67)
+    assert [(c["chapter"], c["previous"], c["current"]) for c in first["children"]] == [
+        ("0101", 100, 150), ("0102", 50, 10),
+    ]
+    assert chapters[2]["children"] == [] and chapters[2]["difference"] == 2
+
+
+def test_rollup_depth_one_and_missing_groups():
+    aligned = _aligned(PREVIOUS, CURRENT)
+    assert "children" not in rollup(aligned, depth=1)[0]
+    ungrouped = rollup(aligned.drop(columns="group"))
+    assert len(ungrouped) == 1 and ungrouped[0]["chapter"] is None
+    assert (ungrouped[0]["previous"], ungrouped[0]["current"]) == (185, 197)
+
+
+def _statement(rows):
+    codes, titles, amounts = (pd.Series(c, dtype=object) for c in zip(*rows))
+    df = pd.DataFrame({"شرح کار": titles, "مبلغ": amounts.astype(float)})
+    df["__merge_key__"] = merge_keys(titles)
+    df["__code_key__"] = code_keys(codes)
+    df["__chapter__"] = chapter_codes(codes)
+    df.attrs["column_map"] = {"description": "شرح کار", "amount": "مبلغ"}
+    return df
+
+
+def test_comparison_meta_includes_rollup():
+    meta, _ = _build_comparison(_statement(PREVIOUS), _statement(CURRENT), changes_offset=0, changes_limit=10,
+                                fuzzy=False, fuzzy_threshold=0.6, rollup_depth=1)
+    assert meta["rollup_depth"] == 1
+    assert [(c["chapter"], c["difference"]) for c in meta["chapters"]] == [("01", 10), ("02", 0), (None, 2)]
+    meta, _ = _build_comparison(_statement(PREVIOUS), _statement(CURRENT), changes_offset=0, changes_limit=10,
+                                fuzzy=False, fuzzy_threshold=0.6)
+    assert "chapters" not in meta
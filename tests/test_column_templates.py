@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints.main import app
+from app.services.column_templates import FIELDS, TemplateRegistry, header_fingerprint
+
+URL = "/api/v1/column-templates"
+HEADERS = ["ردیف", "شرح کار", "مبلغ کل"]
+MAPPING = {"description": "شرح کار", "amount": "مبلغ کل"}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "templates.json")
+
+
+def test_learn_keeps_manual_template(path):
+    registry = TemplateRegistry(path)
+    registry.put(HEADERS, MAPPING)
+    registry.learn(HEADERS, {"description": "ردیف"})
+    assert registry.lookup(HEADERS)["description"] == "شرح کار"
+    assert registry.list()[0]["source"] == "manual"
+
+
+def test_learn_known_template_does_not_rewrite_file(path):
+    registry = TemplateRegistry(path)
+    registry.learn(HEADERS, MAPPING)
+    mtime = os.stat(path).st_mtime_ns
+    registry.learn(HEADERS, {"description": "ردیف"})
+    assert os.stat(path).st_mtime_ns == mtime
+    assert registry.lookup(HEADERS) == {k: MAPPING.get(k) for k in FIELDS}
+
+
+def test_learn_replaces_outdated_learned_template(path):
+    fingerprint = header_fingerprint(HEADERS)
+    old = {"fingerprint": fingerprint, "headers": HEADERS, "mapping": {"description": "شرح کار", "amount": None},
+           "source": "learned", "updated_at": "2024-01-01 00:00:00"}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"templates": {fingerprint: old}}, f)
+    registry = TemplateRegistry(path)
+    assert registry.lookup(HEADERS) is None
+    registry.learn(HEADERS, MAPPING)
+    assert registry.lookup(HEADERS)["amount"] == "مبلغ کل"
+
+
+def test_writes_from_other_processes_are_merged(path):
+    # دو رجیستری روی یک فایل مثل دو worker؛ هیچ‌کدام نسخه‌ی قدیمی حافظه‌اش را روی دیگری نمی‌نویسد
+    first, second = TemplateRegistry(path), TemplateRegistry(path)
+    first.list(), second.list()
+    first.put(HEADERS, MAPPING)
+    second.put(["شرح", "مبلغ"], {"description": "شرح"})
+    assert len(first.list()) == len(second.list()) == 2
+    second.delete(header_fingerprint(HEADERS))
+    first.learn(["کد", "شرح"], {"description": "شرح", "code": "کد"})
+    assert {t["headers"][0] for t in TemplateRegistry(path).list()} == {"شرح", "کد"}
+
+
+def test_concurrent_learns_are_all_kept(path):
+    registries = [TemplateRegistry(path) for _ in range(4)]
+
+    def learn(registry, worker):
+        for i in range(10):
+            registry.learn([f"ستون {worker}-{i}", "مبلغ"], {"description": f"ستون {worker}-{i}"})
+
+    threads = [threading.Thread(target=learn, args=(r, n)) for n, r in enumerate(registries)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(TemplateRegistry(path).list()) == 40
+
+
+def test_template_endpoints():
+    client = TestClient(app)
+    response = client.post(URL, json={"headers": HEADERS, **MAPPING})
+    assert response.status_code == 200
+    template = response.json()
+    assert (template["source"], template["mapping"]["amount"]) == ("manual", "مبلغ کل")
+    fingerprint = template["fingerprint"]
+    assert [t["fingerprint"] for t in client.get(URL).json()] == [fingerprint]
+
+    response = client.put(f"{URL}/{fingerprint}", json={"description": "ردیف", "amount": "مبلغ کل"})
+    assert response.json()["mapping"]["description"] == "ردیف"
+    assert client.post(URL, json={"headers": HEADERS, "description": "واحد"}).status_code == 400
+    assert client.put(f"{URL}/missing", json={"description": "شرح"}).status_code == 404
+
+    assert client.delete(f"{URL}/{fingerprint}").status_code == 200
+    assert client.delete(f"{URL}/{fingerprint}").status_code == 404
+    assert client.get(URL).json() == []
@@ -0,0 +1,141 @@
+import pandas as pd
+import pytest
+
+from app.api.v1.endpoints.main import _build_comparison
+from benchmarks.statement_generator import generate_periods
+from app.services.compare_engine import (
+    CODE_KEY_PREFIX, CURRENT_EMPTY_SUFFIX, EMPTY_KEY_PREFIX, changes, code_first_keys, code_keys, compare,
+    display_rows, merge_keys, summarize,
+)
+
+
+def _period(titles, amounts):
+    titles = pd.Series(titles, dtype=object)
+    return merge_keys(titles), titles, pd.Series(amounts, dtype=float)
+
+
+def _statement(titles, amounts):
+    df = pd.DataFrame({"شرح کار": pd.Series(titles, dtype=object), "مبلغ": pd.Series(amounts, dtype=float)})
+    df["__merge_key__"] = merge_keys(df["شرح کار"])
+    df.attrs["column_map"] = {"description": "شرح کار", "amount": "مبلغ"}
+    return df
+
+
+def test_merge_keys_normalize_persian_variants():
+    keys = merge_keys(pd.Series(["بتن ريزي", "بتن‌ریزی", "  بتن  ریزی ", None, ""], dtype=object))
+    assert keys[0] == keys[2] == "بتن ریزی"
+    assert keys[1] == "بتنریزی"
+    assert keys[3] == f"{EMPTY_KEY_PREFIX}3" and keys[4] == f"{EMPTY_KEY_PREFIX}4"
+
+
+def test_aggregate_sums_repeated_descriptions():
+    aligned = compare(*_period(["بتن", "بتن", "گچ"], [10, 5, 7]),
+                      *_period(["بتن", "آجر"], [20, 3]))
+    assert list(aligned.index) == ["بتن", "گچ", "آجر"]
+    row = aligned.loc["بتن"]
+    assert (row["previous"], row["current"], row["difference"]) == (15, 20, 5)
+    assert (row["previous_count"], row["current_count"], row["status"]) == (2, 1, "افزایش")
+    assert aligned["side"].tolist() == ["both", "left_only", "right_only"]
+    report = aligned.attrs["alignment"]
+    assert (report["mode"], report["duplicate_keys"], report["aligned_rows"]) == ("aggregate", 1, 3)
+
+
+def test_ordinal_pairs_nth_occurrences():
+    aligned = compare(*_period(["بتن", "بتن", "بتن"], [1, 2, 3]),
+                      *_period(["بتن", "بتن"], [10, 20]), mode="ordinal")
+    assert list(aligned.index) == ["بتن", "بتن #2", "بتن #3"]
+    assert aligned["previous"].tolist() == [1, 2, 3]
+    assert aligned["current"].tolist() == [10, 20, 0]
+    assert aligned["side"].tolist() == ["both", "both", "left_only"]
+    assert aligned["occurrence"].tolist() == [1, 2, 3]
+
+
+def test_row_by_row_merge_size_is_reported_without_merging():
+    aligned = compare(*_period(["بتن"] * 30, [1] * 30), *_period(["بتن"] * 30, [1] * 30))
+    report = aligned.attrs["alignment"]
+    assert report["row_by_row_merge_rows"] == 900 and report["explosion_risk"]
+    assert len(aligned) == 1
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        compare(*_period(["بتن"], [1]), *_period(["بتن"], [1]), mode="cartesian")
+
+
+def test_code_keys_normalize_formats():
+    keys = code_keys(pd.Series(["۰۱۰۲۰۳", "01-02-03", 10203.0, None, " "], dtype=object))
+    assert keys.tolist() == [f"{CODE_KEY_PREFIX}10203"] * 3 + ["", ""]
+
+
+def test_code_first_keys_uncoded_rows_adopt_code_of_same_description():
+    prev_codes = code_keys(pd.Series(["010101", None, None], dtype=object))
+    curr_codes = code_keys(pd.Series([None, "020202", None], dtype=object))
+    prev_text = merge_keys(pd.Series(["بتن", "گچ", "آجر"], dtype=object))
+    curr_text = merge_keys(pd.Series(["بتن", "گچ", "سیمان"], dtype=object))
+    prev_keys, curr_keys = code_first_keys(prev_codes, prev_text, curr_codes, curr_text)
+    assert prev_keys.tolist() == [f"{CODE_KEY_PREFIX}10101", f"{CODE_KEY_PREFIX}20202", "آجر"]
+    assert curr_keys.tolist() == [f"{CODE_KEY_PREFIX}10101", f"{CODE_KEY_PREFIX}20202", "سیمان"]
+
+
+def test_changes_and_display_rows():
+    aligned = compare(*_period(["گچ", "بتن"], [7, 1]), *_period(["بتن", "آجر", "سیمان"], [1, 3, 4]))
+    added = changes(aligned, "right_only")
+    assert added["key"].tolist() == ["آجر", "سیمان"] and added["amount"].tolist() == [3, 4]
+    assert changes(aligned, "left_only")["title"].tolist() == ["گچ"]
+    display = display_rows(aligned)
+    assert display["وضعیت"].tolist() == ["کاهش", "بدون تغییر", "افزایش", "افزایش"]
+    assert not display.isna().any().any()
+
+
+def test_changes_pagination():
+    prev = _statement([f"حذفی {i}" for i in range(5)] + ["بتن"], [1] * 5 + [10])
+    curr = _statement(["بتن"] + [f"جدید {i}" for i in range(7)], [12] + [2] * 7)
+    meta, display = _build_comparison(prev, curr, changes_offset=2, changes_limit=3, fuzzy=False, fuzzy_threshold=0.6)
+    assert (meta["added_count"], meta["removed_count"], meta["items_compared"]) == (7, 5, 13)
+    assert [r["key"] for r in meta["added_samples"]] == ["جدید 2", "جدید 3", "جدید 4"]
+    assert [r["key"] for r in meta["removed_samples"]] == ["حذفی 2", "حذفی 3", "حذفی 4"]
+    assert meta["summary"]["difference"] == 12 + 14 - 15
+    assert len(display) == 13
+
+    meta, _ = _build_comparison(prev, curr, changes_offset=6, changes_limit=3, fuzzy=False, fuzzy_threshold=0.6)
+    assert [r["key"] for r in meta["added_samples"]] == ["جدید 6"]
+    assert meta["removed_samples"] == []
+
+
+def test_blank_descriptions_are_not_paired():
+    prev = _period(["بتن", None, "گچ", ""], [10, 5, 7, 1])
+    curr = _period(["بتن", "", "گچ"], [10, 9, 7])
+    aligned = compare(*prev, *curr)
+    assert aligned.loc[f"{EMPTY_KEY_PREFIX}1", "side"] == "left_only"
+    assert aligned.loc[f"{EMPTY_KEY_PREFIX}1{CURRENT_EMPTY_SUFFIX}", "side"] == "right_only"
+    assert changes(aligned, "left_only")["amount"].tolist() == [5, 1]
+    assert changes(aligned, "right_only")["amount"].tolist() == [9]
+    assert summarize(aligned)["difference"] == 3
+
+    aligned = compare(*prev, *curr, mode="ordinal")
+    assert aligned["side"].tolist().count("both") == 2
+
+
+def test_blank_descriptions_do_not_adopt_codes():
+    prev_codes = code_keys(pd.Series(["010101", None], dtype=object))
+    curr_codes = code_keys(pd.Series([None, None], dtype=object))
+    prev_text = merge_keys(pd.Series(["بتن", ""], dtype=object))
+    curr_text = merge_keys(pd.Series(["", "بتن"], dtype=object))
+    _, curr_keys = code_first_keys(prev_codes, prev_text, curr_codes, curr_text)
+    assert curr_keys.tolist() == [f"{EMPTY_KEY_PREFIX}0", f"{CODE_KEY_PREFIX}10101"]
+
+
+def test_added_and_removed_match_generated_churn():
+    previous, current = generate_periods(3000, seed=7, duplicate_ratio=0.05, churn_ratio=0.05)
+    prev = _statement([r[2] for r in previous], [r[4] * r[5] for r in previous])
+    curr = _statement([r[2] for r in current], [r[4] * r[5] for r in current])
+    prev_keys, curr_keys = set(prev["__merge_key__"]), set(curr["__merge_key__"])
+    added, removed = sorted(curr_keys - prev_keys), sorted(prev_keys - curr_keys)
+    assert len(added) > 50 and len(removed) > 50
+
+    meta, display = _build_comparison(prev, curr, changes_offset=10, changes_limit=20, fuzzy=False,
+                                      fuzzy_threshold=0.6)
+    assert (meta["added_count"], meta["removed_count"]) == (len(added), len(removed))
+    assert [r["key"] for r in meta["added_samples"]] == added[10:30]
+    assert [r["key"] for r in meta["removed_samples"]] == removed[10:30]
+    assert len(display) == len(prev_keys | curr_keys)
@@ -0,0 +1,88 @@
+import time
+
+import numpy as np
+import pytest
+
+from app.services.formula_engine import MAX_EXPONENT, FormulaError, compile_formula
+
+
+def test_arithmetic_and_math():
+    f = compile_formula("{طول} * {عرض} + math.sqrt({a}) ** 2")
+    assert f.evaluate({"طول": 2, "عرض": "3", "a": 16}) == pytest.approx(22)
+
+
+def test_exponent_limit():
+    with pytest.raises(FormulaError):
+        compile_formula(f"{{a}} ** {MAX_EXPONENT + 1}").evaluate({"a": 2})
+
+
+@pytest.mark.parametrize("source", [
+    "(({a} ** 999) ** 999) ** 999",
+    "(((({a} ** 999) ** 999) ** 999) ** 999) ** 999",
+    "{a} ** 999 * {a} ** 999",
+])
+def test_nested_power_does_not_build_huge_integers(source):
+    # هر ** جدا زیر سقف است؛ با int عدد چند میلیون‌بیتی ساخته می‌شد و worker قفل می‌شد
+    t0 = time.perf_counter()
+    with pytest.raises(FormulaError):
+        compile_formula(source).evaluate({"a": 9})
+    assert time.perf_counter() - t0 < 1
+
+
+def test_huge_integer_variable():
+    with pytest.raises(FormulaError):
+        compile_formula("{a} ** 2").evaluate({"a": 10 ** 400})
+
+
+def test_vectorized_power_matches_scalar():
+    f = compile_formula("({a} ** 999) ** 999")
+    results, errors = f.evaluate_many([{"a": 1}, {"a": 9}])
+    assert results[0] == f.evaluate({"a": 1}) == 1
+    assert np.isnan(results[1]) and errors[1]
+
+
+@pytest.mark.parametrize("source", [
+    "{q} * 2 ** -1",
+    "{q} + 3 // 0",
+    "{q} % 0",
+    "{q} * 2 ** 70",
+    "{q} * 10 ** 20",
+    "{q} * 7 // 2 + 7 % 3",
+    "{q} if {q} > 2 and not False else -{q}",
+])
+@pytest.mark.parametrize("q", [0, 2, 3.5, -4])
+def test_evaluate_many_agrees_with_evaluate(source, q):
+    f = compile_formula(source)
+    results, errors = f.evaluate_many([{"q": q}])
+    try:
+        expected = f.evaluate({"q": q})
+    except FormulaError:
+        assert np.isnan(results[0]) and errors[0]
+    else:
+        assert errors[0] is None
+        assert results[0] == pytest.approx(expected)
+
+
+def test_negative_base_fractional_exponent():
+    with pytest.raises(FormulaError):
+        compile_formula("{a} ** 0.5").evaluate({"a": -4})
+
+
+@pytest.mark.parametrize("source", [
+    "__import__('os').system('true')",
+    "__builtins__",
+    "().__class__.__bases__[0].__subclasses__()",
+    "math.__dict__",
+    "math.__loader__",
+    "math.factorial(10)",
+    "{a}.__class__",
+    "(lambda: 1)()",
+    "[x for x in ()]",
+    "'abc'",
+    "open('/etc/passwd')",
+    "math.sqrt(x=4)",
+    "getattr(math, 'sqrt')(4)",
+])
+def test_rejected_constructs(source):
+    with pytest.raises(FormulaError):
+        compile_formula(source)
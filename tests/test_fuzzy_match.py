@@ -0,0 +1,38 @@
+from app.services.fuzzy_match import MATCH_COLUMNS, char_ngrams, reconcile
+
+
+def test_char_ngrams_pad_short_words():
+    assert char_ngrams("ab") == frozenset({" ab", "ab "})
+    assert char_ngrams("") == frozenset({"  "})
+
+
+def test_reconcile_pairs_similar_descriptions_one_to_one():
+    matches = reconcile(
+        ["بتن ریزی فونداسیون", "آجر چینی دیوار", "گچ کاری سقف"],
+        ["بتنریزی فونداسیون", "آجرچینی دیوار", "لوله کشی آب"],
+    )
+    assert list(matches.columns) == MATCH_COLUMNS
+    pairs = dict(zip(matches["previous_key"], matches["current_key"]))
+    assert pairs == {"بتن ریزی فونداسیون": "بتنریزی فونداسیون", "آجر چینی دیوار": "آجرچینی دیوار"}
+    assert matches["score"].is_monotonic_decreasing
+    assert (matches["score"] >= 0.6).all() and (matches["score"] < 1).all()
+
+
+def test_reconcile_best_match_wins_and_each_key_used_once():
+    matches = reconcile(["بتن ریزی سقف", "بتن ریزی سقف طبقه"], ["بتن ریزی سقف طبقه اول"])
+    assert len(matches) == 1
+    assert matches.iloc[0]["previous_key"] == "بتن ریزی سقف طبقه"
+
+
+def test_reconcile_threshold_and_empty_input():
+    assert reconcile(["بتن ریزی"], ["آجر چینی"]).empty
+    assert reconcile(["بتن ریزی دیوار"], ["بتن ریزی دیوارها"], threshold=1.0).empty
+    assert reconcile([], ["بتن"]).empty and reconcile(["", None], ["بتن"]).empty
+
+
+def test_reconcile_scales_by_blocking():
+    prev = [f"آیتم شماره {i} کار ساختمانی" for i in range(2000)]
+    curr = [f"آیتم شماره {i} کارهای ساختمانی" for i in range(2000)]
+    matches = reconcile(prev, curr)
+    assert len(matches) > 1900
+    assert all(p.split()[2] == c.split()[2] for p, c in zip(matches["previous_key"], matches["current_key"]))
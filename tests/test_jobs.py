@@ -0,0 +1,177 @@
+import csv
+import io
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+
+from app.api.v1.endpoints import main
+from app.services.job_store import job_store
+from app.services.worker_pool import BoundedPool
+
+JOBS = "/api/v1/compare-sooratvaziat/jobs"
+
+
+def _csv(rows):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["شرح", "مبلغ"])
+    writer.writerows(rows)
+    return out.getvalue().encode("utf-8-sig")
+
+
+PREVIOUS = _csv([("بتن ریزی", 100), ("گچ کاری", 50), ("آجر کاری", 30)])
+CURRENT = _csv([("بتن ریزی", 150), ("گچ کاری", 50), ("سیمان کاری", 20)])
+
+
+def _files(previous=PREVIOUS, current=CURRENT):
+    return {"previous_file": ("prev.csv", previous, "text/csv"), "current_file": ("curr.csv", current, "text/csv")}
+
+
+def _wait(app_client, url):
+    deadline = time.monotonic() + 30
+    while True:
+        state = app_client.get(url).json()
+        if state["status"] in ("done", "failed") or time.monotonic() > deadline:
+            return state
+        time.sleep(0.05)
+
+
+def test_comparison_job_lifecycle(app_client):
+    response = app_client.post(JOBS, files=_files(), params={"changes_limit": 1})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] in ("queued", "running", "done")
+    assert job["params"]["changes_limit"] == 1 and job["params"]["filenames"] == ["prev.csv", "curr.csv"]
+
+    state = _wait(app_client, job["status_url"])
+    assert state["status"] == "done" and state["progress"]["percent"] == 100
+    assert state["result"]["rows"] == 4
+    assert state["result"]["summary"]["difference"] == 150 + 50 + 20 - 180
+    # ورودی‌های spool‌شده بعد از کار حذف شده‌اند؛ صفحه‌های نتیجه هم بعد از ارسال
+    assert sorted(os.listdir(job_store.path(job["job_id"], ""))) == ["meta.json", "rows.parquet", "state.json"]
+
+    page = app_client.get(job["result_url"], params={"limit": 2, "sort_by": "-difference"}).json()
+    assert len(page["data"]) == 2 and page["next_offset"] == 2
+    assert len(page["added_samples"]) == 1
+    rest = app_client.get(job["result_url"], params={"offset": 2, "limit": 2}).json()
+    assert len(rest["data"]) == 2 and rest["next_offset"] is None
+    assert app_client.get(job["result_url"], params={"include_items": False}).json()["data"] == []
+    assert sorted(os.listdir(job_store.path(job["job_id"], ""))) == ["meta.json", "rows.parquet", "state.json"]
+
+    assert app_client.delete(f"{JOBS}/{job['job_id']}").status_code == 200
+    assert app_client.get(job["status_url"]).status_code == 404
+    assert app_client.get(job["result_url"]).status_code == 404
+    assert app_client.delete(f"{JOBS}/{job['job_id']}").status_code == 404
+
+
+def test_failed_job_reports_error_on_result(app_client):
+    job = app_client.post(JOBS, files=_files(current=_csv([]).replace("شرح".encode(), b"x"))).json()
+    state = _wait(app_client, job["status_url"])
+    assert state["status"] == "failed" and state["error"]["status_code"] == 400
+    response = app_client.get(job["result_url"])
+    assert response.status_code == 400 and response.json()["detail"] == state["error"]["detail"]
+
+
+def test_unknown_and_invalid_job_ids(app_client):
+    assert app_client.get(f"{JOBS}/{'0' * 32}").status_code == 404
+    assert app_client.get(f"{JOBS}/../etc").status_code == 404
+    assert app_client.post(JOBS, files=_files(), params={"align": "cartesian"}).status_code == 422
+
+
+def test_saturated_job_pool_rejects_and_cleans_up(app_client, monkeypatch):
+    monkeypatch.setattr(main, "job_pool", BoundedPool(workers=0, max_queue=-1, timeout=60))
+    response = app_client.post(JOBS, files=_files())
+    assert response.status_code == 503 and "Retry-After" in response.headers
+    assert job_store.stats()["queued"] == 0
+
+
+def test_sync_compare_takes_the_same_query_params(app_client):
+    response = app_client.post("/api/v1/compare-sooratvaziat/", files=_files(),
+                           params={"changes_limit": 1, "include_items": False, "format": "json"})
+    assert response.status_code == 200 and response.headers["X-Cache"] == "MISS"
+    body = response.json()
+    assert body["data"] == [] and len(body["added_samples"]) == 1
+    again = app_client.post("/api/v1/compare-sooratvaziat/", files=_files(),
+                        params={"changes_limit": 1, "include_items": False, "format": "json"})
+    assert again.headers["X-Cache"] == "HIT" and again.json() == body
+
+
+EXPORTS = "/api/v1/exports"
+
+
+def test_export_job_lifecycle(app_client):
+    response = app_client.post(EXPORTS, files=_files(), params={"format": "xlsx", "sort_by": "-difference", "limit": 3})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["kind"] == "export" and job["params"]["format"] == "xlsx"
+
+    state = _wait(app_client, job["status_url"])
+    assert state["status"] == "done" and state["progress"]["percent"] == 100
+    assert state["result"]["rows"] == 3 and state["result"]["filename"].endswith(".xlsx")
+    assert state["expires_at"] == pytest.approx(state["updated_at"] + job_store.ttl)
+
+    download = app_client.get(job["download_url"])
+    assert download.status_code == 200
+    assert download.headers["Content-Disposition"] == f'attachment; filename="{state["result"]["filename"]}"'
+    assert int(download.headers["Content-Length"]) == state["result"]["size_bytes"] == len(download.content)
+    wb = load_workbook(io.BytesIO(download.content), read_only=True)
+    assert wb.sheetnames == ["خلاصه", "مقایسه"]
+    assert len(list(wb["مقایسه"].values)) == 1 + 3   # سرستون و سه سطر اول به ترتیب -difference
+
+    # گزارش دانلودشده سر جایش می‌ماند تا حذف یا انقضا
+    assert app_client.get(job["download_url"]).status_code == 200
+    assert app_client.delete(f"{EXPORTS}/{job['job_id']}").status_code == 200
+    assert app_client.get(job["status_url"]).status_code == 404
+    assert app_client.get(job["download_url"]).status_code == 404
+
+
+def test_export_not_ready_and_wrong_kind(app_client):
+    job = app_client.post(JOBS, files=_files()).json()
+    _wait(app_client, job["status_url"])
+    # شناسه‌ی کار مقایسه زیر /exports پیدا نمی‌شود
+    assert app_client.get(f"{EXPORTS}/{job['job_id']}").status_code == 404
+    state = job_store.create("export")
+    assert app_client.get(f"{EXPORTS}/{state['id']}/download").status_code == 409
+
+
+def test_expired_export_is_removed(app_client, monkeypatch):
+    job = app_client.post(EXPORTS, files=_files()).json()
+    assert _wait(app_client, job["status_url"])["status"] == "done"
+    monkeypatch.setattr(job_store, "ttl", 0)
+    time.sleep(0.01)
+    assert job_store.cleanup(force=True) == 1
+    assert app_client.get(job["status_url"]).status_code == 404
+    assert app_client.get(job["download_url"]).status_code == 404
+    assert not os.path.exists(job_store.path(job["job_id"], ""))
+
+
+def test_pdf_export_without_font_is_unavailable(app_client, monkeypatch):
+    monkeypatch.setattr(main.report_export, "pdf_unavailable_reason", lambda: "فونت فارسی پیدا نشد")
+    response = app_client.post(EXPORTS, files=_files(), params={"format": "pdf"})
+    assert response.status_code == 503 and response.json()["detail"] == "فونت فارسی پیدا نشد"
+    assert job_store.stats()["queued"] == 0
+
+
+def test_lifespan_warms_and_shuts_down_pools(monkeypatch):
+    calls = []
+
+    class _Pool:
+        def __init__(self, name):
+            self.name = name
+
+        def warm(self):
+            calls.append(("warm", self.name))
+
+        def shutdown(self):
+            calls.append(("shutdown", self.name))
+
+    monkeypatch.setattr(main, "compare_pool", _Pool("compare"))
+    monkeypatch.setattr(main, "job_pool", _Pool("jobs"))
+    monkeypatch.setattr(main.snapshot_store, "init_db", lambda: calls.append(("init_db", None)))
+    with TestClient(main.app):
+        assert calls[0] == ("init_db", None)
+        assert sorted(calls[1:]) == [("warm", "compare"), ("warm", "jobs")]
+    assert calls[3:] == [("shutdown", "compare"), ("shutdown", "jobs")]
@@ -0,0 +1,79 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.metrics import CONTENT_TYPE, Registry, StageTimer, stage
+
+STATEMENT = "شرح,مبلغ\nبتن ریزی,100\nگچ کاری,50\n".encode("utf-8-sig")
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    latency = registry.histogram("t_seconds", "مدت", ("route",), buckets=(0.1, 1.0))
+    latency.observe(0.05, "/a")
+    latency.observe(0.5, "/a")
+    rows = registry.counter("t_rows_total", "سطرها", ("stage",))
+    rows.inc(3, "merge")
+    rows.inc(2.5, "merge")
+    registry.gauge("t_queue", "صف", ("pool",), lambda: {("jobs",): 2, ("idle",): None})
+    assert registry.counter("t_rows_total", "دوباره") is rows
+
+    assert registry.render().splitlines() == [
+        "# HELP t_seconds مدت",
+        "# TYPE t_seconds histogram",
+        't_seconds_bucket{route="/a",le="0.1"} 1',
+        't_seconds_bucket{route="/a",le="1"} 2',
+        't_seconds_bucket{route="/a",le="+Inf"} 2',
+        't_seconds_sum{route="/a"} 0.55',
+        't_seconds_count{route="/a"} 2',
+        "# HELP t_rows_total سطرها",
+        "# TYPE t_rows_total counter",
+        't_rows_total{stage="merge"} 5.5',
+        "# HELP t_queue صف",
+        "# TYPE t_queue gauge",
+        't_queue{pool="jobs"} 2',
+    ]
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter("t_total", "h", ("name",)).inc(1, 'a"b\\c\nd')
+    assert 't_total{name="a\\"b\\\\c\\nd"} 1' in registry.render()
+
+
+def test_stage_timer_sums_repeated_stages():
+    with StageTimer() as timer:
+        with stage("parse", rows=2, nbytes=10):
+            pass
+        with stage("parse") as parsed:
+            parsed.rows = 3
+    assert set(timer.stages) == {"parse"}
+    assert (timer.stages["parse"]["rows"], timer.stages["parse"]["bytes"]) == (5, 10)
+    header = timer.server_timing(total=0.5)
+    assert header.startswith("parse;dur=") and 'desc="rows=5 bytes=10"' in header
+    assert header.endswith("total;dur=500.0")
+
+
+def test_metrics_endpoint_reports_requests_by_route():
+    client = TestClient(app)
+    assert "Server-Timing" in client.get("/").headers
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(CONTENT_TYPE)
+    assert 'metreyar_http_request_duration_seconds_count{app="api",method="GET",route="/",status="200"}' \
+        in response.text
+    assert "# TYPE metreyar_price_catalog gauge" in response.text
+
+
+def test_compare_app_metrics_include_pipeline_stages(app_client):
+    response = app_client.post("/api/v1/compare-sooratvaziat/", files={
+        "previous_file": ("prev.csv", STATEMENT, "text/csv"), "current_file": ("curr.csv", STATEMENT, "text/csv"),
+    })
+    assert response.status_code == 200
+    assert "merge;dur=" in response.headers["Server-Timing"]
+
+    text = app_client.get("/metrics").text
+    assert 'metreyar_stage_duration_seconds_count{stage="merge"}' in text
+    assert 'metreyar_pool_jobs{pool="compare",state="running"} 0' in text
+    assert "metreyar_process_rss_megabytes " in text
+    route = 'route="/api/v1/compare-sooratvaziat/",status="200"'
+    assert f'metreyar_http_request_duration_seconds_count{{app="compare",method="POST",{route}}}' in text
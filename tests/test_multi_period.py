@@ -0,0 +1,107 @@
+import csv
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.compare_engine import CODE_KEY_PREFIX, code_keys, merge_keys
+from app.services.multi_period import align_periods, period_summaries, series_rows
+
+MULTI = "/api/v1/compare-sooratvaziat/multi/"
+
+
+def _statement(rows, coded=True):
+    df = pd.DataFrame(rows, columns=["کد", "شرح کار", "مبلغ"]).astype({"مبلغ": float})
+    df["__merge_key__"] = merge_keys(df["شرح کار"].astype(object))
+    if coded:
+        df["__code_key__"] = code_keys(df["کد"].astype(object))
+    df.attrs["column_map"] = {"description": "شرح کار", "amount": "مبلغ"}
+    return df
+
+
+# شرح آیتم کددار در دوره‌ی سوم عوض شده؛ «گچ» در دوره‌ی دوم بدون کد آمده
+PERIODS = [
+    [("010101", "بتن ریزی", 100), ("020202", "گچ", 50), (None, "آجر", 30)],
+    [("010101", "بتن ریزی", 120), (None, "گچ", 60), (None, "آجر", 30), ("010101", "بتن ریزی", 5)],
+    [("010101", "بتن ریزی با پمپ", 200), ("030303", "سیمان", 10)],
+]
+
+
+def test_align_periods_matches_by_code_first():
+    amounts, titles = align_periods([_statement(rows) for rows in PERIODS])
+    assert amounts.attrs["match_strategy"] == "code"
+    assert list(amounts.index) == [f"{CODE_KEY_PREFIX}10101", f"{CODE_KEY_PREFIX}20202", "آجر",
+                                   f"{CODE_KEY_PREFIX}30303"]
+    assert amounts.iloc[0].tolist() == [100, 125, 200]
+    assert amounts.iloc[1].tolist()[:2] == [50, 60] and np.isnan(amounts.iloc[1, 2])
+    assert titles.tolist() == ["بتن ریزی با پمپ", "گچ", "آجر", "سیمان"]
+
+
+@pytest.mark.parametrize("coded, match", [((True, True, False), "auto"), ((True, True, True), "text")])
+def test_align_periods_falls_back_to_text(coded, match):
+    frames = [_statement(rows, c) for rows, c in zip(PERIODS, coded)]
+    amounts, _ = align_periods(frames, match)
+    assert amounts.attrs["match_strategy"] == "text"
+    assert list(amounts.index) == ["بتن ریزی", "گچ", "آجر", "بتن ریزی با پمپ", "سیمان"]
+    assert amounts.loc["بتن ریزی"].tolist()[:2] == [100, 125]
+
+
+def test_align_periods_keeps_blank_rows_apart():
+    frames = [_statement([(None, "بتن", 1), (None, "", 2)]), _statement([(None, "بتن", 1), (None, None, 3)]),
+              _statement([(None, "بتن", 1), (None, "", 4)])]
+    amounts, _ = align_periods(frames)
+    assert len(amounts) == 4
+    assert amounts.notna().sum().tolist() == [2, 2, 2]
+    assert period_summaries(amounts)[2]["added_count"] == period_summaries(amounts)[2]["removed_count"] == 1
+
+
+def test_align_periods_unknown_match():
+    with pytest.raises(ValueError):
+        align_periods([_statement(rows) for rows in PERIODS], "fuzzy")
+
+
+def test_period_summaries_and_series_rows():
+    amounts, titles = align_periods([_statement(rows) for rows in PERIODS])
+    periods = period_summaries(amounts, ["1.csv", "2.csv", "3.csv"])
+    assert [p["total"] for p in periods] == [180, 215, 210]
+    assert periods[0]["delta"] is None
+    assert (periods[2]["delta"], periods[2]["added_count"], periods[2]["removed_count"]) == (-5, 1, 2)
+
+    rows = series_rows(amounts, titles)
+    assert rows["مبالغ"][3] == [None, None, 10]
+    assert rows["تغییر کل"].tolist() == [100, -50, -30, 10]
+    assert rows["وضعیت"].tolist() == ["افزایش", "کاهش", "کاهش", "افزایش"]
+
+
+def _csv(rows):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["کد", "شرح", "مبلغ"])
+    writer.writerows((code or "", title, amount) for code, title, amount in rows)
+    return out.getvalue().encode("utf-8-sig")
+
+
+def _files():
+    return [("files", (f"{i}.csv", _csv(rows), "text/csv")) for i, rows in enumerate(PERIODS, 1)]
+
+
+def test_multi_period_endpoint(app_client):
+    response = app_client.post(MULTI, files=_files(), params={"sort_by": "-change"})
+    assert response.status_code == 200 and response.headers["X-Cache"] == "MISS"
+    body = response.json()
+    assert (body["periods_count"], body["items_count"], body["match_strategy"]) == (3, 4, "code")
+    assert body["summary"]["difference"] == 30
+    assert [p["filename"] for p in body["periods"]] == ["1.csv", "2.csv", "3.csv"]
+    assert [row["شرح کار"] for row in body["data"]] == ["بتن ریزی با پمپ", "سیمان", "آجر", "گچ"]
+
+    assert app_client.post(MULTI, files=_files(), params={"sort_by": "-change"}).headers["X-Cache"] == "HIT"
+    text = app_client.post(MULTI, files=_files(), params={"match": "text"})
+    assert text.headers["X-Cache"] == "MISS"
+    assert (text.json()["match_strategy"], text.json()["items_count"]) == ("text", 5)
+
+
+def test_multi_period_endpoint_limits(app_client):
+    response = app_client.post(MULTI, files=_files()[:1])
+    assert response.status_code == 400
+    assert app_client.post(MULTI, files=_files(), params={"match": "code"}).status_code == 422
@@ -0,0 +1,54 @@
+from app.models.price_list import CoefficientTable, PriceItem
+from app.services.price_catalog import PriceCatalog, price_catalog
+
+
+def _item(code, price):
+    return PriceItem(code=code, name="بتن", unit="متر مکعب", unit_price=price)
+
+
+def test_flush_invalidates_only_after_commit(db, session_factory):
+    db.add(_item("010101", 100.0))
+    db.commit()
+    assert price_catalog.load(db)[0]["010101"].unit_price == 100.0
+
+    db.query(PriceItem).filter(PriceItem.code == "010101").one().unit_price = 200.0
+    db.flush()
+    # پیش از commit: فهرست معتبر می‌ماند و درخواست هم‌زمان نسخه‌ی commit‌شده را می‌بیند
+    other = session_factory()
+    assert price_catalog.item(other, "010101").unit_price == 100.0
+    other.close()
+
+    db.commit()
+    assert price_catalog.stats()["loaded"] is False
+    assert price_catalog.item(db, "010101").unit_price == 200.0
+
+
+def test_rollback_of_flushed_write_invalidates(db):
+    db.add(CoefficientTable(name="ارتفاع", table_data={"1": 1.1}))
+    db.commit()
+    price_catalog.load(db)
+
+    db.add(_item("020202", 5.0))
+    db.flush()
+    db.rollback()
+    assert price_catalog.stats()["loaded"] is False
+    assert price_catalog.item(db, "020202") is None
+
+
+def test_plain_rollback_keeps_catalog(db):
+    price_catalog.load(db)
+    db.rollback()
+    assert price_catalog.stats()["loaded"] is True
+
+
+def test_load_racing_invalidate_is_not_kept(db, monkeypatch):
+    catalog = PriceCatalog()
+    read_stamp = catalog._read_stamp
+
+    def _stamp(session):
+        catalog.invalidate()  # نوشتن commit شد وقتی بارگذاری هنوز سطرهای قبلی را می‌خواند
+        return read_stamp(session)
+
+    monkeypatch.setattr(catalog, "_read_stamp", _stamp)
+    catalog.load(db)
+    assert catalog.stats()["loaded"] is False
@@ -0,0 +1,100 @@
+import csv
+import io
+
+import pytest
+from openpyxl import Workbook
+
+from app.models.price_list import CoefficientTable, PriceItem
+from app.services.price_import import PriceImportError, import_price_list
+
+HEADER = ["کد", "شرح", "واحد", "بهای واحد (ریال)"]
+
+
+def _xlsx(sheets):
+    wb = Workbook()
+    wb.remove(wb.active)
+    for name, rows in sheets.items():
+        ws = wb.create_sheet(name)
+        for row in rows:
+            ws.append(row)
+    stream = io.BytesIO()
+    wb.save(stream)
+    stream.seek(0)
+    return stream
+
+
+def _csv(rows):
+    text = io.StringIO()
+    csv.writer(text).writerows(rows)
+    return io.BytesIO(text.getvalue().encode("utf-8"))
+
+
+def _items(db):
+    return {item.code: item for item in db.query(PriceItem)}
+
+
+def test_csv_import_keeps_leading_zero_codes_and_derives_chapters(db):
+    report = import_price_list(db, _csv([HEADER, ["010101", "بتن", "متر مکعب", "1,200"],
+                                         ["0102003", "گچ", "", "۵۰"]]), "fehrest.csv")
+    assert (report["inserted"], report["updated"], report["rejected"]) == (2, 0, 0)
+    items = _items(db)
+    assert items["010101"].unit_price == 1200 and items["010101"].category == "01"
+    assert items["010101"].sub_category == "0101"
+    # کد هفت‌رقمی فصل استاندارد ندارد؛ واحد خالی پیش‌فرض می‌گیرد
+    assert items["0102003"].category is None and items["0102003"].unit == "عدد"
+
+
+def test_upsert_updates_only_columns_in_file(db):
+    db.add(PriceItem(code="010101", name="قدیمی", unit="متر", unit_price=1.0, formula="{طول} * 2"))
+    db.commit()
+    report = import_price_list(db, _csv([["کد", "شرح", "بها"], ["010101", "بتن", "300"], ["010102", "گچ", "40"]]),
+                               "f.csv")
+    assert (report["inserted"], report["updated"]) == (1, 1)
+    item = _items(db)["010101"]
+    db.refresh(item)
+    assert (item.name, item.unit_price, item.unit, item.formula) == ("بتن", 300.0, "متر", "{طول} * 2")
+
+
+def test_rejected_rows_report_file_row_and_reason(db):
+    rows = [["فهرست بهای ابنیه ۱۴۰۳"], HEADER,
+            ["010101", "بتن", "متر", "100"],
+            ["010102", "", "متر", "100"],
+            [None, None, None, None],
+            ["010101", "تکراری", "متر", "5"],
+            ["010103", "منفی", "متر", "-3"],
+            ["010104", "متنی", "متر", "نامشخص"]]
+    report = import_price_list(db, _xlsx({"ابنیه": rows}), "f.xlsx")
+    assert (report["valid"], report["inserted"], report["rejected"]) == (1, 1, 4)
+    assert [(r["row"], r["code"], r["error"]) for r in report["rejected_rows"]] == [
+        (4, "010102", "شرح خالی"),
+        (6, "010101", "کد تکراری در فایل"),
+        (7, "010103", "بهای منفی"),
+        (8, "010104", "بهای واحد نامعتبر یا خالی"),
+    ]
+    assert all(r["sheet"] == "ابنیه" for r in report["rejected_rows"])
+
+
+def test_coefficient_sheet_and_skipped_sheet(db):
+    stream = _xlsx({
+        "آیتم‌ها": [HEADER, ["010101", "بتن", "متر", "100"]],
+        "ضریب ارتفاع": [["طبقه", "ضریب"], ["همکف", "1"], ["اول", "1.05"], ["", "2"]],
+        "یادداشت": [["توضیح"], ["متن"]],
+    })
+    report = import_price_list(db, stream, "f.xlsx")
+    assert report["coefficient_tables"] == [{"name": "ضریب ارتفاع", "entries": 2, "replaced": False}]
+    assert report["skipped_sheets"] == ["یادداشت"]
+    assert report["rejected_rows"] == [{"sheet": "ضریب ارتفاع", "row": 4, "code": None,
+                                        "error": "عنوان یا ضریب نامعتبر"}]
+    table = db.query(CoefficientTable).one()
+    assert table.table_data == {"همکف": 1.0, "اول": 1.05}
+
+
+def test_dry_run_writes_nothing(db):
+    report = import_price_list(db, _csv([HEADER, ["010101", "بتن", "متر", "100"]]), "f.csv", dry_run=True)
+    assert report["valid"] == 1 and report["inserted"] == 0
+    assert db.query(PriceItem).count() == 0
+
+
+def test_unsupported_extension(db):
+    with pytest.raises(PriceImportError):
+        import_price_list(db, io.BytesIO(b"x"), "f.pdf")
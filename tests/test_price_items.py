@@ -0,0 +1,59 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.database import get_db
+from app.main import app
+from app.models.price_list import PriceItem
+
+URL = "/api/v1/price-list/price-items"
+
+
+@pytest.fixture
+def client(db):
+    codes = [f"{chapter:02d}{n:04d}" for chapter in (1, 2) for n in range(1, 6)]
+    db.add_all(PriceItem(code=code, name=f"بتن ریزی {code}" if code < "02" else f"آجر کاری {code}", unit="متر",
+                         unit_price=1.0, category=code[:2]) for code in reversed(codes))
+    db.commit()
+    app.dependency_overrides[get_db] = lambda: db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def _pages(client, **params):
+    pages, cursor = [], None
+    while True:
+        response = client.get(URL, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        pages.append([item["code"] for item in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+        assert cursor == pages[-1][-1]
+
+
+def test_keyset_pages_cover_all_items_in_code_order(client):
+    pages = _pages(client, limit=4)
+    assert [len(p) for p in pages] == [4, 4, 2]
+    codes = [code for page in pages for code in page]
+    assert codes == sorted(codes) and len(set(codes)) == 10
+
+
+def test_last_full_page_has_no_cursor(client):
+    response = client.get(URL, params={"limit": 10})
+    assert len(response.json()) == 10
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_cursor_with_category_filter(client):
+    pages = _pages(client, limit=2, category="02")
+    assert [code for page in pages for code in page] == [f"02{n:04d}" for n in range(1, 6)]
+
+
+def test_search_with_cursor(client):
+    pages = _pages(client, limit=3, q="بتن")
+    assert [code for page in pages for code in page] == [f"01{n:04d}" for n in range(1, 6)]
+
+
+def test_cursor_header_exposed_to_browsers(client):
+    response = client.get(URL, params={"limit": 1}, headers={"Origin": "http://localhost:3000"})
+    assert "X-Next-Cursor" in response.headers["Access-Control-Expose-Headers"]
@@ -0,0 +1,83 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.database import get_db
+from app.main import app
+from app.models.price_list import PriceItem
+from app.services.formula_engine import FormulaError
+from app.services.price_service import NO_UNIT_PRICE, PriceService
+
+URL = "/api/v1/price-list/calculate"
+
+
+@pytest.fixture
+def items(db):
+    db.add_all([
+        PriceItem(code="01", name="بتن", unit="متر", unit_price=10.0),
+        PriceItem(code="02", name="قالب", unit="متر", unit_price=1.0, formula="{طول} * {عرض} * {ضریب}",
+                  parameters={"ضریب": 2}),
+        PriceItem(code="03", name="بدون فی", unit="متر", unit_price=None),
+        PriceItem(code="04", name="فرمول خراب", unit="متر", formula="{a} +"),
+        PriceItem(code="05", name="تقسیم", unit="متر", formula="{a} / {b}"),
+    ])
+    # default ستون جای None صریح را می‌گیرد؛ فی خالی مثل ردیف واردشده از بیرون
+    db.flush()
+    db.query(PriceItem).filter(PriceItem.code == "03").update({"unit_price": None})
+    db.commit()
+    return db
+
+
+@pytest.fixture
+def client(items):
+    app.dependency_overrides[get_db] = lambda: items
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_batch_matches_single_item_calculation(items):
+    lines = [("01", {"quantity": 3}), ("02", {"طول": 2, "عرض": "1.5"}), ("01", {}), ("05", {"a": 1, "b": 4})]
+    result = PriceService.calculate_batch(lines, items)
+    assert (result["count"], result["errors_count"]) == (4, 0)
+    expected = [PriceService.calculate_item_price(code, q, items) for code, q in lines]
+    assert [r["result"] for r in result["results"]] == pytest.approx(expected) == [30, 6, 10, 0.25]
+    assert result["total"] == pytest.approx(46.25)
+
+
+def test_batch_row_errors_do_not_stop_other_rows(items):
+    lines = [("99", {}), ("03", {"quantity": 2}), ("04", {"a": 1}), ("05", {"a": 1, "b": 0}), ("02", {"طول": 1}),
+             ("01", {"quantity": 2})]
+    result = PriceService.calculate_batch(lines, items)
+    rows = result["results"]
+    assert [r["index"] for r in rows] == list(range(6))
+    assert rows[0]["error"] == "آیتم یافت نشد"
+    assert rows[1]["error"] == NO_UNIT_PRICE
+    assert all("error" in r for r in rows[2:5])
+    assert rows[5] == {"index": 5, "item_code": "01", "result": 20.0}
+    assert (result["errors_count"], result["total"]) == (5, 20.0)
+
+
+def test_missing_unit_price_is_an_error_in_both_paths(items):
+    with pytest.raises(FormulaError, match=NO_UNIT_PRICE):
+        PriceService.calculate_item_price("03", {"quantity": 2}, items)
+    assert PriceService.calculate_batch([("03", {})], items)["results"][0]["error"] == NO_UNIT_PRICE
+
+
+def test_calculate_endpoints(client):
+    response = client.post(URL, json={"item_code": "03", "quantities": {}})
+    assert response.status_code == 400 and response.json()["detail"] == NO_UNIT_PRICE
+
+    response = client.post(f"{URL}/batch", json={"lines": [
+        {"item_code": "01", "quantities": {"quantity": 2}},
+        {"item_code": "02", "quantities": {"طول": 2, "عرض": 3}},
+        {"item_code": "03"},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["success"], body["count"], body["errors_count"], body["total"]) == (True, 3, 1, 32.0)
+    assert body["results"][2] == {"index": 2, "item_code": "03", "error": NO_UNIT_PRICE}
+
+
+def test_batch_endpoint_line_limit(client, monkeypatch):
+    monkeypatch.setattr("app.api.v1.endpoints.price_list.MAX_BATCH_LINES", 2)
+    response = client.post(f"{URL}/batch", json={"lines": [{"item_code": "01"}] * 3})
+    assert response.status_code == 400
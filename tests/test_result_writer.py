@@ -0,0 +1,54 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from app.services import result_writer
+from app.services.result_writer import iter_row_batches, write_result
+
+ROWS = pd.DataFrame({"شرح کار": ["بتن", "گچ", "آجر"], "تفاوت": [1.5, -2.0, 0.0], "تعداد": [1, 2, 3]})
+META = {"message": "success", "summary": {"difference": -0.5}}
+
+
+@pytest.fixture(params=[True, False], ids=["orjson", "json"])
+def encoder(request, monkeypatch):
+    monkeypatch.setattr(result_writer, "_HAS_ORJSON", request.param and result_writer._HAS_ORJSON)
+
+
+def _write(rows, fmt, batch_rows=2, meta=META):
+    fh = io.BytesIO()
+    write_result(fh, meta, rows, fmt, batch_rows=batch_rows)
+    return fh.getvalue()
+
+
+def test_json_document_matches_to_dict(encoder):
+    body = json.loads(_write(ROWS, "json"))
+    assert body == {**META, "data": ROWS.to_dict(orient="records")}
+    assert isinstance(body["data"][0]["تعداد"], int)
+
+
+def test_json_without_rows_and_without_meta(encoder):
+    assert json.loads(_write(ROWS.iloc[:0], "json")) == {**META, "data": []}
+    assert json.loads(_write(ROWS, "json", meta={})) == {"data": ROWS.to_dict(orient="records")}
+
+
+def test_ndjson_meta_line_then_one_row_per_line(encoder):
+    lines = _write(ROWS, "ndjson").decode("utf-8").splitlines()
+    assert json.loads(lines[0]) == META
+    assert [json.loads(line) for line in lines[1:]] == ROWS.to_dict(orient="records")
+    assert "بتن" in lines[1]   # UTF-8، نه \u escape
+
+
+def test_batches_cover_all_rows():
+    batches = list(iter_row_batches(ROWS, batch_rows=2))
+    assert [len(b) for b in batches] == [2, 1]
+    assert batches[1] == [{"شرح کار": "آجر", "تفاوت": 0.0, "تعداد": 3}]
+
+
+def test_nan_never_written_as_invalid_json(monkeypatch):
+    if result_writer._HAS_ORJSON:
+        assert json.loads(result_writer.dumps({"x": float("nan")})) == {"x": None}
+    monkeypatch.setattr(result_writer, "_HAS_ORJSON", False)
+    with pytest.raises(ValueError):
+        result_writer.dumps({"x": float("nan")})
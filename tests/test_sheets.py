@@ -0,0 +1,107 @@
+import io
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+from openpyxl import Workbook
+
+from app.api.v1.endpoints.main import _combine_sheets
+from app.services.compare_engine import EMPTY_KEY_PREFIX, merge_keys
+from app.services.statement_reader import read_statement, workbook_sheets
+
+COMPARE = "/api/v1/compare-sooratvaziat/"
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _workbook(sheets, hidden=(), chart=False):
+    wb = Workbook()
+    wb.remove(wb.active)
+    for name, rows in sheets.items():
+        ws = wb.create_sheet(name)
+        for row in rows:
+            ws.append(row)
+        if name in hidden:
+            ws.sheet_state = "hidden"
+    if chart:
+        wb.create_chartsheet("نمودار")
+    stream = io.BytesIO()
+    wb.save(stream)
+    stream.seek(0)
+    return stream
+
+
+def _rows(*items):
+    return [["شرح", "مبلغ"], *items]
+
+
+def test_workbook_sheets_lists_visible_worksheets():
+    stream = _workbook({"ابنیه": _rows(), "کمکی": _rows(), "تاسیسات": _rows()}, hidden=("کمکی",), chart=True)
+    assert workbook_sheets(stream, "s.xlsx") == ["ابنیه", "تاسیسات"]
+    assert stream.tell() == 0
+    assert workbook_sheets(io.BytesIO(b"a,b\n"), "s.csv") == []
+    assert workbook_sheets(io.BytesIO(b"not a zip"), "s.xlsx") == []
+
+
+def test_read_statement_reads_requested_sheet():
+    stream = _workbook({"ابنیه": _rows(["بتن", 10]), "تاسیسات": [["عنوان"], ["شرح کار", "مبلغ"], ["لوله", 7]]})
+    assert read_statement(stream, "s.xlsx")["شرح"].tolist() == ["بتن"]
+    stream.seek(0)
+    df = read_statement(stream, "s.xlsx", sheet="تاسیسات", row_numbers=True)
+    assert df["شرح کار"].tolist() == ["لوله"] and df.index.tolist() == [3]
+
+
+def _frame(desc_col, titles, amounts, codes=None):
+    titles = pd.Series(titles, dtype=object)
+    df = pd.DataFrame({desc_col: titles, "مبلغ": pd.Series(amounts, dtype=float)})
+    df["__merge_key__"] = merge_keys(titles)
+    if codes is not None:
+        df["__code_key__"] = pd.Series(codes, dtype=object)
+        df["__chapter__"] = pd.Series(codes, dtype=object)
+    df.attrs["column_map"] = {"description": desc_col, "amount": "مبلغ"}
+    return df
+
+
+def test_combine_sheets_stacks_readable_sheets():
+    empty = HTTPException(status_code=400, detail="برگه خالی است")
+    combined = _combine_sheets(["ابنیه", "خالی", "تاسیسات"], [
+        _frame("شرح", ["بتن", None], [10, 1], codes=["__code__10101", ""]),
+        empty,
+        _frame("شرح کار", [None, "لوله"], [2, 7]),
+    ])
+    assert list(combined.columns) == ["شرح", "مبلغ", "__merge_key__", "__code_key__", "__chapter__", "__sheet__"]
+    assert combined["__sheet__"].tolist() == ["ابنیه", "ابنیه", "تاسیسات", "تاسیسات"]
+    assert combined["__merge_key__"].tolist() == ["بتن", f"{EMPTY_KEY_PREFIX}1", f"{EMPTY_KEY_PREFIX}2", "لوله"]
+    assert combined["__code_key__"].tolist() == ["__code__10101", "", "", ""]
+    assert combined.attrs["sheets"] == {"read": ["ابنیه", "تاسیسات"], "skipped": ["خالی"]}
+    assert combined.attrs["column_map"] == {"description": "شرح", "amount": "مبلغ"}
+
+
+def test_combine_sheets_errors():
+    bad_request = HTTPException(status_code=400, detail="بدون ستون شرح")
+    with pytest.raises(HTTPException) as raised:
+        _combine_sheets(["الف", "ب"], [bad_request, HTTPException(status_code=400, detail="خالی")])
+    assert raised.value is bad_request
+    with pytest.raises(HTTPException) as raised:
+        _combine_sheets(["الف", "ب"], [_frame("شرح", ["بتن"], [1]), HTTPException(status_code=500)])
+    assert raised.value.status_code == 500
+    single = _frame("شرح", ["بتن"], [1])
+    assert _combine_sheets([None], [single]) is single
+
+
+def test_compare_multi_sheet_workbooks(app_client):
+    previous = _workbook({"ابنیه": _rows(["بتن", 10]), "تاسیسات": _rows(["لوله", 7])})
+    current = _workbook({"ابنیه": _rows(["بتن", 12]), "تاسیسات": _rows(["لوله", 7], ["کابل", 3])})
+    files = {"previous_file": ("prev.xlsx", previous.getvalue(), XLSX),
+             "current_file": ("curr.xlsx", current.getvalue(), XLSX)}
+
+    body = app_client.post(COMPARE, files=files).json()
+    assert body["sheets"]["current"] == {"read": ["ابنیه", "تاسیسات"], "skipped": []}
+    assert [(row["شرح کار"], row["برگه"]) for row in body["data"]] == [
+        ("بتن", "ابنیه"), ("لوله", "تاسیسات"), ("کابل", "تاسیسات"),
+    ]
+    assert body["summary"]["difference"] == 5
+
+    body = app_client.post(COMPARE, files=files, params={"sheet": "تاسیسات"}).json()
+    assert [row["شرح کار"] for row in body["data"]] == ["لوله", "کابل"]
+    response = app_client.post(COMPARE, files=files, params={"sheet": "نیست"})
+    assert response.status_code == 400
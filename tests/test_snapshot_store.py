@@ -0,0 +1,86 @@
+import os
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.project import Project, StatementSnapshot
+from app.services import snapshot_store as store_module
+from app.services.snapshot_store import SnapshotStore
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    # فایل SQLite تا دو Session دو اتصال جدا (مثل دو درخواست هم‌زمان) داشته باشند
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def _frame(amounts):
+    df = pd.DataFrame({"شرح": [f"آیتم {i}" for i in range(len(amounts))], "مبلغ": amounts})
+    df.attrs["column_map"] = {"description": "شرح", "amount": "مبلغ"}
+    return df
+
+
+def _race(db, other, digest):
+    """قبل از اولین flush این Session، Session دیگر همان دوره را ثبت می‌کند"""
+    done = []
+
+    def before_flush(session, flush_context, instances):
+        if done:
+            return
+        done.append(True)
+        other.add(StatementSnapshot(project_id=1, period=1, digest=digest, column_map={}, path="other.parquet"))
+        other.commit()
+    event.listen(db, "before_flush", before_flush)
+
+
+def test_add_numbers_periods(sessions, tmp_path):
+    store, db = SnapshotStore(str(tmp_path / "snapshots")), sessions()
+    project = Project(name="پروژه")
+    db.add(project)
+    db.commit()
+    first = store.add(db, project, _frame([1.0, 2.0]), "p1.csv", "a" * 8)
+    second = store.add(db, project, _frame([5.0]), "p2.csv", "b" * 8)
+    assert (first.period, second.period) == (1, 2)
+    assert (first.total, first.rows) == (3.0, 2)
+    assert os.path.exists(second.path)
+
+
+def test_concurrent_period_retries_next(sessions, tmp_path):
+    store, db, other = SnapshotStore(str(tmp_path / "snapshots")), sessions(), sessions()
+    project = Project(name="پروژه")
+    db.add(project)
+    db.commit()
+    _race(db, other, "other")
+    snapshot = store.add(db, project, _frame([1.0]), "p.csv", "a" * 8)
+    assert snapshot.period == 2
+    assert os.path.exists(snapshot.path)
+
+
+def test_concurrent_same_file_returns_existing(sessions, tmp_path):
+    store, db, other = SnapshotStore(str(tmp_path / "snapshots")), sessions(), sessions()
+    project = Project(name="پروژه")
+    db.add(project)
+    db.commit()
+    _race(db, other, "a" * 8)
+    snapshot = store.add(db, project, _frame([1.0]), "p.csv", "a" * 8)
+    assert snapshot.period == 1 and snapshot.path == "other.parquet"
+    assert db.query(StatementSnapshot).count() == 1
+
+
+def test_failed_insert_removes_table(sessions, tmp_path, monkeypatch):
+    monkeypatch.setattr(store_module, "ADD_RETRIES", 1)
+    store, db, other = SnapshotStore(str(tmp_path / "snapshots")), sessions(), sessions()
+    project = Project(name="پروژه")
+    db.add(project)
+    db.commit()
+    _race(db, other, "other")
+    with pytest.raises(IntegrityError):
+        store.add(db, project, _frame([1.0]), "p.csv", "a" * 8)
+    assert os.listdir(tmp_path / "snapshots" / str(project.id)) == []
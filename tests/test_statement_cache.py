@@ -0,0 +1,86 @@
+import io
+import os
+import time
+
+import pandas as pd
+from fastapi import UploadFile
+
+from app.api.v1.endpoints.main import _load_statement
+from app.core.config import settings
+from app.services import statement_cache as cache_module
+from app.services.statement_cache import StatementCache, result_key, statement_cache
+
+STATEMENT = "شرح,مبلغ\nبتن ریزی,\"1,200\"\nگچ کاری,50\n".encode("utf-8-sig")
+
+
+def _frame_files():
+    return sorted(n for n in os.listdir(statement_cache.directory) if n.startswith("frame-"))
+
+
+def _upload():
+    return UploadFile(io.BytesIO(STATEMENT), filename="s.csv")
+
+
+def test_frame_round_trip_and_format_version(monkeypatch):
+    statement_cache.take_counters()
+    df = pd.DataFrame({"شرح": ["بتن", None], "مبلغ": [1.5, 2.0]})
+    df.attrs["column_map"] = {"description": "شرح", "amount": "مبلغ"}
+    statement_cache.put_frame("abc", df)
+    cached = statement_cache.get_frame("abc")
+    pd.testing.assert_frame_equal(cached, df)
+    assert cached.attrs["column_map"] == df.attrs["column_map"]
+
+    # frame ذخیره‌شده با ساختار قبلی دیگر خوانده نمی‌شود
+    monkeypatch.setattr(cache_module, "CACHE_FORMAT_VERSION", cache_module.CACHE_FORMAT_VERSION + 1)
+    assert statement_cache.get_frame("abc") is None
+    counters = statement_cache.take_counters()
+    assert (counters["frame_hits"], counters["frame_misses"]) == (1, 1)
+
+
+def test_result_key_covers_version_and_params(monkeypatch):
+    key = result_key("a", "b", fuzzy=False)
+    assert key == result_key("a", "b", fuzzy=False)
+    assert key != result_key("b", "a", fuzzy=False)
+    assert key != result_key("a", "b", fuzzy=True)
+    monkeypatch.setattr(cache_module, "CACHE_FORMAT_VERSION", cache_module.CACHE_FORMAT_VERSION + 1)
+    assert key != result_key("a", "b", fuzzy=False)
+
+
+def test_low_memory_frames_are_cached_separately(monkeypatch):
+    statement_cache.take_counters()
+    normal = _load_statement(_upload(), "d1")
+    assert _load_statement(_upload(), "d1") is not None and len(_frame_files()) == 1
+
+    monkeypatch.setattr(settings, "LOW_MEMORY_MODE", True)
+    compact = _load_statement(_upload(), "d1")
+    assert len(_frame_files()) == 2
+    assert compact["مبلغ"].tolist() == normal["مبلغ"].tolist() == [1200, 50]
+    assert compact["__merge_key__"].astype(str).tolist() == normal["__merge_key__"].tolist()
+    counters = statement_cache.take_counters()
+    assert (counters["frame_hits"], counters["frame_misses"]) == (1, 2)
+
+
+def _put_result(cache, key, nbytes=100):
+    tmp = cache.result_tmp_path()
+    with open(tmp, "wb") as fh:
+        fh.write(b"x" * nbytes)
+    cache.put_result_file(key, tmp)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    directory = tmp_path / "lru"
+    cache = StatementCache(str(directory), max_bytes=250)
+    now = time.time()
+    for age, key in ((20, "a"), (10, "b")):
+        _put_result(cache, key)
+        # دقت mtime چند میلی‌ثانیه است؛ ترتیب LRU بعد از بازسازی ایندکس از روی پوشه خوانده می‌شود
+        os.utime(directory / f"result-{key}.json", (now - age, now - age))
+    cache.open_result("a").close()   # a تازه‌تر از b می‌شود
+
+    _put_result(cache, "c")
+
+    assert cache.open_result("b") is None
+    assert cache.open_result("a") is not None and cache.open_result("c") is not None
+    stats = cache.stats()
+    assert (stats["entries"], stats["size_bytes"], stats["evictions"]) == (2, 200, 1)
+    assert sorted(os.listdir(directory)) == ["result-a.json", "result-c.json"]
@@ -0,0 +1,43 @@
+import io
+
+import pytest
+
+from benchmarks.statement_generator import HEADER, generate_periods, statement_pair
+from app.services.statement_reader import read_statement
+
+
+def test_generate_periods_is_deterministic():
+    assert generate_periods(200, seed=3) == generate_periods(200, seed=3)
+    assert generate_periods(200, seed=3) != generate_periods(200, seed=4)
+
+
+def test_generate_periods_shape_and_ratios():
+    previous, current = generate_periods(2000, seed=1, duplicate_ratio=0.1, churn_ratio=0.1, missing_code_ratio=0.2)
+    assert len(previous) == len(current) == 2000
+    assert all(len(row) == len(HEADER) for row in previous + current)
+    assert previous[0][0] == "۱" and previous[-1][0] == "۲۰۰۰"
+    missing = sum(row[1] == "" for row in previous) / len(previous)
+    assert 0.15 < missing < 0.25
+    assert all(len(row[1]) == 6 and row[1].isdigit() for row in previous if row[1])
+    duplicates = len(previous) - len({row[2] for row in previous})
+    assert 100 < duplicates < 300
+    # آیتم‌های حذف‌شده با آیتم‌های جدید جایگزین می‌شوند
+    assert len({row[2] for row in current} - {row[2] for row in previous}) > 100
+
+
+def test_generate_periods_amount_formats():
+    previous, _ = generate_periods(1000, seed=2, text_amount_ratio=0.5)
+    text = [row[6] for row in previous if isinstance(row[6], str)]
+    assert 350 < len(text) < 650
+    assert any("٬" in t for t in text) and any("," in t for t in text)
+    assert all(row[6] == row[4] * row[5] for row in previous if isinstance(row[6], int))
+
+
+@pytest.mark.parametrize("fmt", ["xlsx", "csv"])
+@pytest.mark.parametrize("with_title", [True, False])
+def test_statement_pair_is_readable(fmt, with_title):
+    previous, current = statement_pair(50, fmt, seed=5, with_title=with_title)
+    for data in (previous, current):
+        df = read_statement(io.BytesIO(data), f"s.{fmt}")
+        assert list(df.columns) == HEADER and len(df) == 50
+    assert df["کد فهرست بها"].str.len().dropna().eq(6).all()
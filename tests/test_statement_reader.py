@@ -0,0 +1,90 @@
+import io
+
+import pytest
+from openpyxl import Workbook
+
+from app.services import statement_reader
+from app.services.statement_reader import find_header_row, header_names, read_statement
+
+
+def _csv(text, encoding="utf-8-sig"):
+    return io.BytesIO(text.encode(encoding))
+
+
+def _xlsx(rows):
+    wb = Workbook()
+    ws = wb.active
+    for row in rows:
+        ws.append(row)
+    stream = io.BytesIO()
+    wb.save(stream)
+    stream.seek(0)
+    return stream
+
+
+def _statement(filename, rows):
+    if filename.endswith(".xlsx"):
+        return _xlsx(rows)
+    return _csv("\n".join(",".join(v or "" for v in r) for r in rows) + "\n")
+
+
+STATEMENT = "گزارش شماره 2\nکد,شرح,مبلغ\n010101,0012.50 متر,\"1,200\"\n\n000300,بتن,7\n"
+
+
+@pytest.mark.parametrize("arrow", [True, False])
+@pytest.mark.parametrize("encoding", ["utf-8-sig", "cp1256"])
+def test_csv_keeps_leading_zeros(monkeypatch, arrow, encoding):
+    monkeypatch.setattr(statement_reader, "_HAS_PYARROW", arrow and statement_reader._HAS_PYARROW)
+    df = read_statement(_csv(STATEMENT, encoding), "s.csv")
+    assert df["کد"].tolist() == ["010101", "000300"]
+    assert df["شرح"].tolist() == ["0012.50 متر", "بتن"]
+    assert df["مبلغ"].tolist() == ["1,200", "7"]
+
+
+def test_find_header_row_skips_title_and_numeric_rows():
+    rows = [
+        ["صورت وضعیت", None, None],
+        [1, 2, 3],
+        ["کد", "شرح", "مبلغ"],
+        ["010101", "بتن", 10],
+    ]
+    assert find_header_row(rows) == 2
+    assert find_header_row([[1, 2], [3, 4]]) == 0
+
+
+def test_header_names_like_pandas():
+    assert header_names(["شرح", None, "شرح", " مبلغ "]) == ["شرح", "Unnamed: 1", "شرح.1", "مبلغ"]
+
+
+@pytest.mark.parametrize("filename", ["s.csv", "s.xlsx"])
+def test_column_pruning(filename):
+    rows = [["عنوان"], ["کد", "شرح", "واحد", "مبلغ"], ["01", "بتن", "متر", "5"], ["02", "گچ", "کیلو", "6"]]
+    stream = _statement(filename, rows)
+    seen = []
+
+    def select(sample):
+        seen.append(list(sample.columns))
+        return ["شرح", "مبلغ"]
+
+    df = read_statement(stream, filename, select_columns=select)
+    assert seen == [["کد", "شرح", "واحد", "مبلغ"]]
+    assert list(df.columns) == ["شرح", "مبلغ"]
+    assert df["شرح"].tolist() == ["بتن", "گچ"]
+
+
+@pytest.mark.parametrize("filename", ["s.csv", "s.xlsx"])
+def test_row_numbers_are_file_lines(filename):
+    rows = [["عنوان"], ["شرح", "مبلغ"], ["بتن", "5"], [None, None], ["گچ", "6"]]
+    assert read_statement(_statement(filename, rows), filename, row_numbers=True).index.tolist() == [3, 5]
+    assert read_statement(_statement(filename, rows), filename).index.tolist() == [0, 1]
+
+
+@pytest.mark.parametrize("arrow", [True, False])
+def test_header_below_multiline_quoted_title(monkeypatch, arrow):
+    # عنوان دوخطی یک رکورد CSV است؛ سرستون نباید سطر داده‌ی اول شود
+    monkeypatch.setattr(statement_reader, "_HAS_PYARROW", arrow and statement_reader._HAS_PYARROW)
+    text = '"صورت وضعیت\nپروژه الف"\nردیف,شرح,مبلغ\n1,بتن,5\n\n2,گچ,6\n'
+    df = read_statement(_csv(text), "s.csv", row_numbers=True)
+    assert list(df.columns) == ["ردیف", "شرح", "مبلغ"]
+    assert df["شرح"].tolist() == ["بتن", "گچ"]
+    assert df.index.tolist() == [4, 6]
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from app.core import text_normalizer
+from app.core.text_normalizer import normalize_batch, normalize_series, normalize_text
+
+
+def test_fold_arabic_letters_digits_and_marks():
+    assert normalize_text("بتن ريزي  كف‌سازي ۱۲") == "بتن ریزی کفسازی 12"
+    assert normalize_text("مُقاومَتــها، (نوع A)") == "مقاومتها نوع a"
+    assert normalize_text("شرح_کار", underscore_as_space=True) == "شرح کار"
+    assert normalize_text(None) == "" and normalize_text(float("nan")) == ""
+
+
+def test_batch_matches_single_values_with_newlines_inside():
+    values = ["بتن\nریزی", "  گچ کاری ", "", "آجر؛ چینی"]
+    assert normalize_batch(values) == [normalize_text(v) for v in values] == ["بتن ریزی", "گچ کاری", "", "آجر چینی"]
+
+
+def test_series_keeps_index_and_maps_na_to_empty():
+    ser = pd.Series(["بتن ريزي", None, "بتن ريزي", 12], index=[5, 6, 7, 8], dtype=object)
+    out = normalize_series(ser)
+    assert out.index.tolist() == [5, 6, 7, 8]
+    assert out.tolist() == ["بتن ریزی", "", "بتن ریزی", "12"]
+
+
+def test_series_without_cache_leaves_cache_untouched():
+    text_normalizer.clear_cache()
+    normalize_series(pd.Series(["لوله کشي"]), use_cache=False)
+    assert text_normalizer._key_cache == {}
+    normalize_series(pd.Series(["لوله کشي"]))
+    assert text_normalizer._key_cache == {"لوله کشي": "لوله کشی"}
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.services.worker_pool import (
+    DEFAULT_RETRY_AFTER, BoundedPool, JobError, JobTimeout, PoolSaturated, _kill_workers, _mp_context,
+)
+
+INIT_SECONDS = 1
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def _slow_init():
+    time.sleep(INIT_SECONDS)
+
+
+def _fail():
+    raise JobError(422, "ستون مبلغ پیدا نشد")
+
+
+def test_saturated_pool_rejects_with_retry_after():
+    pool = BoundedPool(workers=0, max_queue=1, timeout=10)
+    release = threading.Event()
+
+    async def scenario():
+        running = pool.submit(release.wait)
+        queued = pool.submit(release.wait)
+        with pytest.raises(PoolSaturated) as exc:
+            pool.submit(release.wait)
+        release.set()
+        await asyncio.gather(running, queued)
+        return exc.value
+
+    try:
+        error = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert error.retry_after == DEFAULT_RETRY_AFTER
+    assert pool.stats()["rejected"] == 1 and pool.stats()["completed"] == 2
+
+
+def test_saturated_pool_is_503_with_retry_after_header():
+    from app.api.v1.endpoints.main import _job_http_error
+
+    error = _job_http_error(PoolSaturated(7))
+    assert error.status_code == 503
+    assert error.headers == {"Retry-After": "7"}
+    assert _job_http_error(JobTimeout()).status_code == 504
+
+
+def test_timeout_kills_running_worker_and_frees_slot():
+    pool = BoundedPool(workers=1, max_queue=1, timeout=3)
+
+    async def scenario():
+        # اولین کار process را می‌سازد؛ pid آن برای مقایسه با process جایگزین
+        first_pid = await pool.run(_sleep, 0)
+        pool.timeout = 0.5
+        with pytest.raises(JobTimeout):
+            await pool.run(_sleep, 60)
+        pool.timeout = 30
+        t0 = time.perf_counter()
+        second_pid = await pool.run(_sleep, 0)
+        return first_pid, second_pid, time.perf_counter() - t0
+
+    try:
+        first_pid, second_pid, seconds = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert second_pid != first_pid
+    assert seconds < 30
+    stats = pool.stats()
+    assert stats["timeouts"] == 1 and stats["killed"] == 1
+    assert stats["running"] == 0 and stats["queue_depth"] == 0
+
+
+def test_job_error_keeps_worker():
+    pool = BoundedPool(workers=1, max_queue=0, timeout=30)
+
+    async def scenario():
+        pid = await pool.run(_sleep, 0)
+        with pytest.raises(JobError) as exc:
+            await pool.run(_fail)
+        return pid, exc.value, await pool.run(_sleep, 0)
+
+    try:
+        pid, error, after = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert error.status_code == 422
+    assert after == pid
+
+
+def test_kill_workers_stops_running_job():
+    # پیش از Python 3.14 از ProcessPoolExecutor._processes (خصوصی) استفاده می‌شود
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=_mp_context())
+    executor.submit(os.getpid).result()
+    future = executor.submit(time.sleep, 60)
+    time.sleep(0.2)
+    t0 = time.perf_counter()
+    _kill_workers(executor)
+    with pytest.raises(BrokenProcessPool):
+        future.result(timeout=10)
+    assert time.perf_counter() - t0 < 10
+
+
+def test_warm_pool_first_job_does_not_wait_for_process_start():
+    pool = BoundedPool(workers=2, max_queue=0, timeout=30, initializer=_slow_init)
+    try:
+        t0 = time.perf_counter()
+        pool.warm()
+        assert time.perf_counter() - t0 >= INIT_SECONDS
+
+        async def scenario():
+            return await asyncio.gather(pool.run(_sleep, 0.2), pool.run(_sleep, 0.2))
+
+        assert len(set(asyncio.run(scenario()))) == 2
+        stats = pool.stats()
+    finally:
+        pool.shutdown()
+    assert stats["wait_seconds_max"] < INIT_SECONDS
+
+
+def test_killed_worker_is_replaced_by_started_process():
+    pool = BoundedPool(workers=1, max_queue=0, timeout=0.5, initializer=_slow_init)
+    try:
+        pool.warm()
+        with pytest.raises(JobTimeout):
+            asyncio.run(pool.run(_sleep, 60))
+        pool.timeout = 30
+        # جایگزین در thread توزیع ساخته می‌شود؛ کار بعدی منتظر initializer نمی‌ماند
+        time.sleep(INIT_SECONDS + 2)
+        asyncio.run(pool.run(_sleep, 0))
+        stats = pool.stats()
+    finally:
+        pool.shutdown()
+    assert stats["killed"] == 1 and stats["wait_seconds_max"] < INIT_SECONDS